@@ -0,0 +1,166 @@
+import os
+import re
+import csv
+import sys
+import json
+import argparse
+import subprocess
+import tempfile
+
+from migen import *
+from migen.fhdl import verilog
+
+from litevideo.sim.verilator import default_ios
+
+
+yosys_families = {
+    "xc6": "xc6s",
+    "xc7": "xc7"
+}
+
+resources = [
+    ("LUT",   r"LUT[1-6]"),
+    ("FF",    r"FD\w*"),
+    ("CARRY", r"CARRY4"),
+    ("DSP",   r"DSP48\w*"),
+    ("BRAM",  r"RAMB\w*"),
+]
+
+columns = [resource for resource, pattern in resources] + ["levels"]
+
+
+def _count(log, pattern):
+    # "LUT2    12" (older Yosys) or "12    LUT2" (newer Yosys) stat lines
+    count = 0
+    for m in re.finditer(r"^\s+(?:(\d+)\s+{p}|{p}\s+(\d+))\s*$".format(p=pattern), log, re.M):
+        count += int(m.group(1) or m.group(2))
+    return count
+
+
+def synthesize(module, ios, family="xc7", name="top"):
+    """Synthesizes module with Yosys (synth_xilinx) and returns its resource
+    usage and the number of logic levels of its longest register to register
+    path (a rough Fmax indicator, Yosys having no timing model)"""
+    with tempfile.TemporaryDirectory() as build_dir:
+        conv = verilog.convert(module, ios, name=name)
+        # memory initialization files are read relative to the working directory
+        files = dict(conv.data_files)
+        files[name + ".v"] = conv.main_source
+        for filename, content in files.items():
+            with open(os.path.join(build_dir, filename), "w") as f:
+                f.write(content)
+        script = "read_verilog {}.v; synth_xilinx -family {} -top {}; stat; ltp -noff".format(
+            name, yosys_families[family], name)
+        subprocess.check_call(["yosys", "-q", "-l", "yosys.log", "-p", script], cwd=build_dir)
+        with open(os.path.join(build_dir, "yosys.log")) as f:
+            log = f.read()
+
+    r = {resource: _count(log, pattern) for resource, pattern in resources}
+    levels = re.findall(r"Longest topological path in \S+ \(length=(\d+)\)", log)
+    r["levels"] = int(levels[-1]) if levels else None
+    return r
+
+
+def yosys_version():
+    return subprocess.check_output(["yosys", "-V"]).decode().strip()
+
+
+def write_json(rows, filename, family):
+    with open(filename, "w") as f:
+        json.dump({
+            "family":  family,
+            "yosys":   yosys_version(),
+            "results": {variant: r for variant, r in rows}
+        }, f, indent=4, sort_keys=True)
+
+
+def write_csv(rows, filename, columns=columns):
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["variant"] + columns)
+        for variant, r in rows:
+            writer.writerow([variant] + [r[c] for c in columns])
+
+
+def read_json(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+
+def compare(rows, baseline, tolerance=0.05, columns=columns):
+    """Returns the (variant, column, baseline value, value) of the results of
+    rows exceeding baseline results by more than tolerance (relative)"""
+    regressions = []
+    for variant, r in rows:
+        b = baseline["results"].get(variant)
+        if b is None:
+            continue
+        for c in columns:
+            if r[c] is not None and b.get(c) is not None and r[c] > b[c]*(1 + tolerance):
+                regressions.append((variant, c, b[c], r[c]))
+    return regressions
+
+
+def print_table(rows, baseline=None, columns=columns):
+    def cell(variant, c, value):
+        b = baseline["results"].get(variant, {}).get(c) if baseline is not None else None
+        if b is None or value is None or value == b:
+            return str(value)
+        return "{} ({:+d})".format(value, value - b)
+    print(" ".join(["{:>20}".format("variant")] + ["{:>16}".format(c) for c in columns]))
+    for variant, r in rows:
+        print(" ".join(["{:>20}".format(variant)] + ["{:>16}".format(cell(variant, c, r[c])) for c in columns]))
+
+
+def main(variants, description):
+    """Benchmark entry point
+
+    variants is a list of (name, function) where function(family) returns a
+    module (default_ios being its ios) or a (module, ios) tuple.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--family", default="xc7", choices=sorted(yosys_families.keys()))
+    parser.add_argument("--filter", default=None, help="only run the variants matching this regexp")
+    parser.add_argument("--list", action="store_true", help="list the variants")
+    parser.add_argument("--json", default=None, help="write the results to this JSON file")
+    parser.add_argument("--csv", default=None, help="write the results to this CSV file")
+    parser.add_argument("--baseline", default=None, help="compare against this JSON file (see --json)")
+    parser.add_argument("--tolerance", default=5, type=float,
+                        help="increase over the baseline reported as a regression (%%)")
+    args = parser.parse_args()
+
+    variants = [(name, variant) for name, variant in variants
+                if args.filter is None or re.search(args.filter, name)]
+    if args.list:
+        for name, variant in variants:
+            print(name)
+        return
+
+    baseline = None
+    if args.baseline is not None:
+        baseline = read_json(args.baseline)
+        if baseline["family"] != args.family:
+            raise ValueError("Baseline is for {}, not {}".format(baseline["family"], args.family))
+        if baseline["yosys"] != yosys_version():
+            print("Warning: baseline obtained with {}".format(baseline["yosys"]), file=sys.stderr)
+
+    rows = []
+    for name, variant in variants:
+        module = variant(args.family)
+        if isinstance(module, tuple):
+            module, ios = module
+        else:
+            ios = default_ios(module)
+        rows.append((name, synthesize(module, ios, args.family)))
+    print_table(rows, baseline)
+
+    if args.json is not None:
+        write_json(rows, args.json, args.family)
+    if args.csv is not None:
+        write_csv(rows, args.csv)
+    if baseline is not None:
+        regressions = compare(rows, baseline, args.tolerance/100)
+        for variant, c, b, r in regressions:
+            print("{}: {} {} -> {}".format(variant, c, b, r), file=sys.stderr)
+        if regressions:
+            sys.exit(1)
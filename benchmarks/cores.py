@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+"""Resource usage and logic depth of the LiteVideo cores at several parameter
+points (vendor primitives being black boxes)"""
+
+from common import *
+
+from litedram.common import LiteDRAMPort
+
+import litevideo.input
+from litevideo.input import HDMIIn
+from litevideo.output.core import VideoOutCore
+from litevideo.output.hdmi.encoder import Encoder, DualEncoder
+
+from litevideo.csc.rgb2ycbcr import RGB2YCbCr
+from litevideo.csc.ycbcr2rgb import YCbCr2RGB
+from litevideo.csc.ycbcr444to422 import YCbCr444to422
+from litevideo.csc.ycbcr422to444 import YCbCr422to444
+from litevideo.csc.rgb2rgb16f import RGB2RGB16f
+from litevideo.csc.rgb16f2rgb import RGB16f2RGB
+from litevideo.csc.lut import LUT1D
+from litevideo.csc.lut3d import LUT3D
+from litevideo.csc.tonemapping import ToneMapping
+
+from litevideo.float_arithmetic.floatadd import FloatAdd
+from litevideo.float_arithmetic.floatmult import FloatMult
+from litevideo.float_arithmetic.floatfma import FloatFMA, FloatAccumulator
+from litevideo.float_arithmetic.floatdiv import FloatDiv, FloatRecip
+from litevideo.float_arithmetic.floatsqrt import FloatSqrt
+
+import csc
+
+
+def port_ios(port):
+    return set(port.cmd.flatten()) | set(port.wdata.flatten()) | set(port.rdata.flatten())
+
+
+def video_out_core(mode, dw, fifo_depth):
+    dram_port = LiteDRAMPort(mode="read", aw=32, dw=dw, cd="video")
+    core = VideoOutCore(dram_port, mode, fifo_depth)
+    return core, default_ios(core) | port_ios(dram_port)
+
+
+class _HDMIInClocking(Module):
+    # without its vendor primitives: the clock domains are ios
+    def __init__(self, pads, *args, **kwargs):
+        pass
+
+
+class _HDMIInDataCapture(Module):
+    # without its vendor primitives: the deserialized characters and the
+    # controls are ios
+    def __init__(self, pad_p, pad_n, **kwargs):
+        self.d = Signal(10)
+        self.auto_ctl = Signal(7)
+        self.phsaligned = Signal()
+
+
+def hdmi_in(family, mode="ycbcr422", dw=32, fifo_depth=512, hdmi=False):
+    litevideo.input.clocking_cls[family] = _HDMIInClocking
+    litevideo.input.datacapture_cls[family] = _HDMIInDataCapture
+    pads = Record([(name + suffix, 1) for name in ["clk", "data0", "data1", "data2"]
+                                      for suffix in ["_p", "_n"]])
+    dram_port = LiteDRAMPort(mode="write", aw=32, dw=dw, cd="sys")
+    core = HDMIIn(pads, dram_port, fifo_depth=fifo_depth, device=family, mode=mode, hdmi=hdmi,
+                  packet_fifo_depth=8 if hdmi else 0, audio_fifo_depth=64 if hdmi else 0)
+    ios = default_ios(core) | port_ios(dram_port)
+    for i in range(3):
+        cap = getattr(core, "data{}_cap".format(i))
+        ios |= {cap.d, cap.auto_ctl, cap.phsaligned}
+    return core, ios
+
+
+def encoder():
+    e = Encoder()
+    return e, {e.d, e.c, e.de, e.terc4, e.raw_en, e.raw, e.out}
+
+
+def dual_encoder():
+    e = DualEncoder()
+    return e, set(e.lanes[0].flatten()) | set(e.lanes[1].flatten()) | {e.out}
+
+
+variants = [
+    # output
+    ("video_out_rgb",       lambda family: video_out_core("rgb", 32, 512)),
+    ("video_out_rgb_2048",  lambda family: video_out_core("rgb", 32, 2048)),
+    ("video_out_ycbcr422",  lambda family: video_out_core("ycbcr422", 16, 512)),
+    ("video_out_rgb36",     lambda family: video_out_core("rgb36", 64, 512)),
+    ("encoder",             lambda family: encoder()),
+    ("dual_encoder",        lambda family: dual_encoder()),
+
+    # input
+    ("hdmi_in",             lambda family: hdmi_in(family)),
+    ("hdmi_in_rgb",         lambda family: hdmi_in(family, mode="rgb", dw=64)),
+    ("hdmi_in_2048",        lambda family: hdmi_in(family, fifo_depth=2048)),
+    ("hdmi_in_hdmi",        lambda family: hdmi_in(family, hdmi=True)),
+
+    # csc
+] + csc.variants + [
+    ("rgb2ycbcr_10",        lambda family: RGB2YCbCr(rgb_w=10, ycbcr_w=10)),
+    ("rgb2ycbcr_2lanes",    lambda family: RGB2YCbCr(lanes=2)),
+    ("ycbcr2rgb_10",        lambda family: YCbCr2RGB(ycbcr_w=10, rgb_w=10)),
+    ("ycbcr444to422",       lambda family: YCbCr444to422()),
+    ("ycbcr422to444",       lambda family: YCbCr422to444()),
+    ("rgb2rgb16f",          lambda family: RGB2RGB16f()),
+    ("rgb16f2rgb",          lambda family: RGB16f2RGB()),
+    ("lut1d",               lambda family: LUT1D()),
+    ("lut1d_10",            lambda family: LUT1D(in_w=10)),
+    ("lut3d",               lambda family: LUT3D()),
+    ("tone_mapping",        lambda family: ToneMapping()),
+
+    # float
+    ("float16_add",         lambda family: FloatAdd()),
+    ("float16_mult",        lambda family: FloatMult()),
+    ("float16_fma",         lambda family: FloatFMA()),
+    ("float32_fma",         lambda family: FloatFMA(32, 8)),
+    ("float16_accumulator", lambda family: FloatAccumulator()),
+    ("float16_div",         lambda family: FloatDiv()),
+    ("float16_recip",       lambda family: FloatRecip()),
+    ("float16_sqrt",        lambda family: FloatSqrt()),
+    ("float32_div",         lambda family: FloatDiv(32, 8)),
+]
+
+
+if __name__ == "__main__":
+    main(variants, __doc__)
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+
+"""Resource usage of the CSC datapath variants (generic and DSP48 structured)"""
+
+from common import *
+
+from litevideo.csc.rgb2ycbcr import RGB2YCbCr
+from litevideo.csc.ycbcr2rgb import YCbCr2RGB
+from litevideo.csc.matrix import ColorMatrix
+
+
+variants = [
+    ("rgb2ycbcr",     lambda family: RGB2YCbCr()),
+    ("rgb2ycbcr_dsp", lambda family: RGB2YCbCr(dsp=True)),
+    ("ycbcr2rgb",     lambda family: YCbCr2RGB()),
+    ("ycbcr2rgb_dsp", lambda family: YCbCr2RGB(dsp=True)),
+    ("color_matrix",  lambda family: ColorMatrix()),
+]
+
+
+if __name__ == "__main__":
+    main(variants, __doc__)
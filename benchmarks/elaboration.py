@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+"""Elaboration profile of the LiteVideo cores: construction, finalization and
+Verilog conversion times, statement/expression counts and size of the
+generated Verilog"""
+
+import time
+import cProfile
+import pstats
+import platform
+
+from common import *
+
+from migen.fhdl.visit import NodeVisitor
+from migen.fhdl.structure import _Statement, _Fragment
+
+from litevideo.input.charsync import CharSync
+from litevideo.input.decoding import Decoding, DecodeTERC4
+
+import cores
+
+
+columns = ["construct_ms", "finalize_ms", "convert_ms", "statements", "nodes", "verilog_lines"]
+
+
+class _Counter(NodeVisitor):
+    def __init__(self):
+        self.statements = 0
+        self.nodes = 0
+
+    def visit(self, node):
+        if isinstance(node, _Statement):
+            self.statements += 1
+        elif not isinstance(node, (list, tuple, dict, _Fragment)):
+            self.nodes += 1
+        NodeVisitor.visit(self, node)
+
+
+def count(fragment):
+    """Number of statements and of expression nodes of fragment"""
+    counter = _Counter()
+    counter.visit(fragment)
+    return counter.statements, counter.nodes
+
+
+def _ms(t):
+    return int(round(1000*t))
+
+
+def _tree(module, path="top"):
+    # modules of the hierarchy in post order: (path, module, children paths)
+    r = []
+    children = []
+    for i, (name, submodule) in enumerate(module._submodules):
+        subpath = "{}.{}".format(path, name if name is not None else "_" + str(i))
+        r += _tree(submodule, subpath)
+        children.append(subpath)
+    r.append((path, module, children))
+    return r
+
+
+def elaborate(variant, family):
+    """Elaborates variant and converts it to Verilog
+
+    Returns its results and, for each module of its hierarchy (submodules
+    created at finalization being part of their parent), its path, class name,
+    finalization time, statements and expression nodes (without the ones of its
+    submodules).
+    """
+    t = time.perf_counter()
+    module = variant(family)
+    construct = time.perf_counter() - t
+    if isinstance(module, tuple):
+        module, ios = module
+    else:
+        ios = default_ios(module)
+
+    # finalize bottom-up to time each module
+    tree = _tree(module)
+    finalize = {}
+    for path, m, children in tree:
+        t = time.perf_counter()
+        m.finalize()
+        finalize[path] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    conv = verilog.convert(module, ios)
+    convert = time.perf_counter() - t
+
+    inclusive = {path: count(m._fragment) for path, m, children in tree}
+    modules = []
+    for path, m, children in tree:
+        statements, nodes = inclusive[path]
+        for child in children:
+            statements -= inclusive[child][0]
+            nodes -= inclusive[child][1]
+        modules.append((path, m.__class__.__name__, finalize[path], statements, nodes))
+
+    statements, nodes = inclusive["top"]
+    r = {
+        "construct_ms":  _ms(construct),
+        "finalize_ms":   _ms(sum(finalize.values())),
+        "convert_ms":    _ms(convert),
+        "statements":    statements,
+        "nodes":         nodes,
+        "verilog_lines": conv.main_source.count("\n")
+    }
+    return r, modules
+
+
+def _init_classes():
+    # __init__ code -> Module class name, for the classes defining __init__
+    classes = {}
+    ambiguous = set()
+    stack = [Module]
+    while stack:
+        cls = stack.pop()
+        stack += cls.__subclasses__()
+        init = cls.__dict__.get("__init__")
+        code = getattr(init, "__code__", None)
+        if code is not None:
+            key = (code.co_filename, code.co_firstlineno, "__init__")
+            if classes.get(key, cls.__name__) != cls.__name__:
+                ambiguous.add(key)
+            classes[key] = cls.__name__
+    for key in ambiguous:
+        del classes[key]
+    return classes
+
+
+def construction_profile(variant, family):
+    """Construction time of each Module class of variant: {class name:
+    (instances, cumulative time)}, the time of a class including the one of
+    the submodules it creates"""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    variant(family)
+    profiler.disable()
+    classes = _init_classes()
+    r = {}
+    for key, (cc, nc, tt, ct, callers) in pstats.Stats(profiler).stats.items():
+        name = classes.get(key)
+        if name is not None:
+            instances, cumulative = r.get(name, (0, 0))
+            r[name] = (instances + nc, cumulative + ct)
+    return r
+
+
+def print_modules(variant, family, top=20):
+    """Per Module class breakdown of the elaboration of variant"""
+    construction = construction_profile(variant, family)
+    r, modules = elaborate(variant, family)
+    by_class = {}
+    for path, name, finalize, statements, nodes in modules:
+        c = by_class.setdefault(name, [0, 0, 0])
+        c[0] += finalize
+        c[1] += statements
+        c[2] += nodes
+    rows = sorted(by_class.items(), key=lambda item: -item[1][2])
+    print("{:>24} {:>10} {:>14} {:>12} {:>12} {:>10}".format(
+        "module", "instances", "construct_ms", "finalize_ms", "statements", "nodes"))
+    for name, (finalize, statements, nodes) in rows[:top]:
+        instances, construct = construction.get(name, (None, None))
+        print("{:>24} {:>10} {:>14} {:>12} {:>12} {:>10}".format(
+            name, str(instances) if instances is not None else "-",
+            _ms(construct) if construct is not None else "-",
+            _ms(finalize), statements, nodes))
+
+
+variants = [
+    ("decoding",        lambda family: Decoding()),
+    ("decode_terc4",    lambda family: DecodeTERC4()),
+    ("charsync",        lambda family: CharSync()),
+] + cores.variants
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--family", default="xc7", choices=sorted(yosys_families.keys()))
+    parser.add_argument("--filter", default=None, help="only run the variants matching this regexp")
+    parser.add_argument("--list", action="store_true", help="list the variants")
+    parser.add_argument("--repeat", default=1, type=int, help="runs per variant (times are the minimum)")
+    parser.add_argument("--modules", action="store_true", help="print the per module breakdown")
+    parser.add_argument("--json", default=None, help="write the results to this JSON file")
+    parser.add_argument("--csv", default=None, help="write the results to this CSV file")
+    parser.add_argument("--baseline", default=None, help="compare against this JSON file (see --json)")
+    parser.add_argument("--tolerance", default=25, type=float,
+                        help="increase over the baseline reported as a regression (%%)")
+    parser.add_argument("--min-ms", default=10, type=int,
+                        help="smallest time increase reported as a regression (ms)")
+    args = parser.parse_args()
+
+    selected = [(name, variant) for name, variant in variants
+                if args.filter is None or re.search(args.filter, name)]
+    if args.list:
+        for name, variant in selected:
+            print(name)
+        return
+
+    baseline = None
+    if args.baseline is not None:
+        baseline = read_json(args.baseline)
+        if baseline["python"] != platform.python_version():
+            print("Warning: baseline obtained with Python {}".format(baseline["python"]), file=sys.stderr)
+
+    rows = []
+    for name, variant in selected:
+        if args.modules:
+            print(name)
+            print_modules(variant, args.family)
+            print()
+        runs = [elaborate(variant, args.family)[0] for i in range(args.repeat)]
+        rows.append((name, {c: min(r[c] for r in runs) for c in columns}))
+    print_table(rows, baseline, columns)
+
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump({
+                "family":  args.family,
+                "python":  platform.python_version(),
+                "results": {variant: r for variant, r in rows}
+            }, f, indent=4, sort_keys=True)
+    if args.csv is not None:
+        write_csv(rows, args.csv, columns)
+    if baseline is not None:
+        # short times are mostly noise
+        regressions = [(variant, c, b, r) for variant, c, b, r in
+                       compare(rows, baseline, args.tolerance/100, columns)
+                       if not c.endswith("_ms") or r - b >= args.min_ms]
+        for variant, c, b, r in regressions:
+            print("{}: {} {} -> {}".format(variant, c, b, r), file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
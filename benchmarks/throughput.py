@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+"""Throughput, latency and beat integrity of the stream actors under
+randomized valid/ready patterns (Migen simulation)"""
+
+import re
+import random
+import argparse
+
+from migen import *
+
+from litedram.common import LiteDRAMPort
+
+from litevideo.csc.rgb2ycbcr import RGB2YCbCr
+from litevideo.csc.ycbcr444to422 import YCbCr444to422
+from litevideo.csc.ycbcr422to444 import YCbCr422to444
+from litevideo.float_arithmetic.floatadd import FloatAdd
+from litevideo.output.core import VideoOutCore
+from litevideo.sim.dram import DRAMPortModel, ddr3_timing
+
+
+# valid (source) and ready (sink) probabilities per cycle
+patterns = [(1, 1), (0.5, 1), (1, 0.5), (0.5, 0.5), (0.9, 0.9)]
+
+
+def payload(endpoint):
+    return [name for name, *_ in endpoint.description.payload_layout]
+
+
+class StreamDriver:
+    """Sends beats on endpoint, valid being raised with a probability of p
+    per cycle (and held until ready)"""
+    def __init__(self, endpoint, beats, p, prng):
+        self.endpoint = endpoint
+        self.beats = beats
+        self.p = p
+        self.prng = prng
+        self.cycles = []
+
+    @passive
+    def generator(self):
+        valid = False
+        cycle = 0
+        for beat in self.beats:
+            while True:
+                valid = valid or self.prng.random() < self.p
+                yield self.endpoint.valid.eq(valid)
+                for name, value in beat.items():
+                    yield getattr(self.endpoint, name).eq(value)
+                yield
+                cycle += 1
+                if valid and (yield self.endpoint.ready):
+                    self.cycles.append(cycle)
+                    valid = False
+                    break
+        yield self.endpoint.valid.eq(0)
+
+
+class StreamMonitor:
+    """Receives the beats of endpoint, ready being set with a probability of
+    p per cycle (and when qualifier is set, if given)"""
+    def __init__(self, endpoint, p, prng, qualifier=None):
+        self.endpoint = endpoint
+        self.names = payload(endpoint)
+        self.p = p
+        self.prng = prng
+        self.qualifier = qualifier
+        self.beats = []
+        self.cycles = []
+
+    @passive
+    def generator(self):
+        cycle = 0
+        while True:
+            ready = self.prng.random() < self.p
+            yield self.endpoint.ready.eq(ready)
+            yield
+            cycle += 1
+            if ready and (yield self.endpoint.valid):
+                if self.qualifier is None or (yield self.qualifier):
+                    beat = {}
+                    for name in self.names:
+                        beat[name] = (yield getattr(self.endpoint, name))
+                    self.beats.append(beat)
+                    self.cycles.append(cycle)
+
+
+def wait(monitor, n, timeout):
+    for i in range(timeout):
+        if len(monitor.beats) >= n:
+            break
+        yield
+
+
+def run_actor(actor_cls, n, p_valid, p_ready, seed):
+    actor = actor_cls()
+    prng = random.Random(seed)
+    beats = [{name: prng.getrandbits(len(getattr(actor.sink, name))) for name in payload(actor.sink)}
+             for i in range(n)]
+    driver = StreamDriver(actor.sink, beats, p_valid, prng)
+    monitor = StreamMonitor(actor.source, p_ready, prng)
+    run_simulation(actor, [driver.generator(), monitor.generator(), wait(monitor, n, 64*n)])
+    return driver.cycles, monitor
+
+
+class VideoOutTB(Module):
+    def __init__(self):
+        self.dram_port = LiteDRAMPort(mode="read", aw=32, dw=32, cd="sys")
+        self.submodules.core = VideoOutCore(self.dram_port)
+
+
+def video_out_generator(dut, hres, vres):
+    initiator = dut.core.initiator
+    for name, value in [("hres", hres), ("hsync_start", hres + 2),
+                        ("hsync_end", hres + 4), ("hscan", hres + 8),
+                        ("vres", vres), ("vsync_start", vres + 1),
+                        ("vsync_end", vres + 2), ("vscan", vres + 3),
+                        ("base", 0), ("length", hres*vres*4)]:
+        yield getattr(initiator, name).storage.eq(value)
+    yield
+    yield initiator.enable.storage.eq(1)
+
+
+def run_video_out(n, p_valid, p_ready, seed, hres=32):
+    # the DRAM is the source: p_valid is the share of the controller given
+    # to the port
+    vres = (n + hres - 1)//hres
+    tb = VideoOutTB()
+    prng = random.Random(seed)
+    frame = [prng.getrandbits(24) for i in range(hres*vres)]
+    mem = DRAMPortModel(tb.dram_port, hres*vres, frame, ddr3_timing, load=1 - p_valid, seed=seed)
+    monitor = StreamMonitor(tb.core.source, p_ready, prng, qualifier=tb.core.source.de)
+    generators = {
+        "sys": [video_out_generator(tb, hres, vres), mem.generator(), monitor.generator(),
+                wait(monitor, n, 64*n)]
+    }
+    run_simulation(tb, generators, {"sys": 10, "pix_o": 10})
+    return None, monitor, [{"data": d} for d in frame]
+
+
+def check(beats, reference):
+    """Integrity of beats against the reference sequence"""
+    if beats == reference:
+        return "ok"
+    n = min(len(beats), len(reference))
+    first = next((i for i in range(n) if beats[i] != reference[i]), n)
+    if len(beats) < len(reference):
+        return "dropped {} (first at {})".format(len(reference) - len(beats), first)
+    if len(beats) > len(reference):
+        return "duplicated {} (first at {})".format(len(beats) - len(reference), first)
+    return "corrupted (first at {})".format(first)
+
+
+def latencies(in_cycles, out_cycles):
+    lat = sorted(o - i for i, o in zip(in_cycles, out_cycles))
+    if not lat:
+        return "-"
+    return "{}/{}/{}".format(lat[0], lat[len(lat)//2], lat[-1])
+
+
+actors = [
+    ("rgb2ycbcr",     RGB2YCbCr),
+    ("ycbcr444to422", YCbCr444to422),
+    ("ycbcr422to444", YCbCr422to444),
+    ("float16_add",   FloatAdd),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--beats", default=256, type=int, help="beats per run")
+    parser.add_argument("--seed", default=42, type=int)
+    parser.add_argument("--filter", default=None, help="only run the actors matching this regexp")
+    args = parser.parse_args()
+
+    print("{:>14} {:>6} {:>6} {:>10} {:>10} {:>12}  {}".format(
+        "actor", "valid", "ready", "beats/cyc", "efficiency", "latency", "integrity"))
+    def row(name, p_valid, p_ready, monitor, in_cycles, reference):
+        n = len(monitor.beats)
+        rate = n/monitor.cycles[-1] if n else 0
+        print("{:>14} {:>6} {:>6} {:>10.3f} {:>10.3f} {:>12}  {}".format(
+            name, p_valid, p_ready, rate, rate/min(p_valid, p_ready),
+            latencies(in_cycles, monitor.cycles) if in_cycles is not None else "-",
+            check(monitor.beats[:len(reference)], reference)))
+
+    for name, actor_cls in actors:
+        if args.filter is not None and not re.search(args.filter, name):
+            continue
+        # the actors are deterministic: the beats must be the ones of the
+        # run without backpressure
+        reference = None
+        for p_valid, p_ready in patterns:
+            in_cycles, monitor = run_actor(actor_cls, args.beats, p_valid, p_ready, args.seed)
+            if reference is None:
+                reference = monitor.beats
+            row(name, p_valid, p_ready, monitor, in_cycles, reference)
+
+    if args.filter is None or re.search(args.filter, "video_out"):
+        for p_valid, p_ready in patterns:
+            in_cycles, monitor, reference = run_video_out(args.beats, p_valid, p_ready, args.seed)
+            row("video_out", p_valid, p_ready, monitor, in_cycles, reference)
+
+if __name__ == "__main__":
+    main()
@@ -15,8 +15,28 @@ def saturate(i, o, minimum, maximum):
     ]
 
 
+def lane(signal, i, dw):
+    """Lane i of a multi-lane signal (lane 0 in the LSBs)"""
+    return signal[i*dw:(i+1)*dw]
+
+
+def rescale(value, from_w, to_w):
+    """Rescales a from_w bits value to to_w bits, rounding to nearest"""
+    if to_w > from_w:
+        return value << (to_w - from_w)
+    elif to_w < from_w:
+        shift = from_w - to_w
+        return (value + 2**(shift-1)) >> shift
+    else:
+        return value
+
+
 def coef(value, cw=None):
-    return int(value * 2**cw) if cw is not None else value
+    return round(value * 2**cw) if cw is not None else value
+
+def default_coef_w(*dws):
+    """Coefficient width keeping the conversions within 1 LSB of dw"""
+    return max(dws) + 2
 
 def rgb_layout(dw):
     return [("r", dw), ("g", dw), ("b", dw)]
@@ -0,0 +1,118 @@
+# 1D lut
+
+from migen import *
+from migen.genlib.cdc import MultiReg
+
+from litex.soc.interconnect.stream import *
+from litex.soc.interconnect.csr import *
+
+from litevideo.csc.common import *
+
+
+def lut_write_layout(n_channels, in_w, out_w):
+    return [
+        ("channel", bits_for(n_channels-1)),
+        ("adr",     in_w + 1),
+        ("data",    out_w)
+    ]
+
+
+def identity_table(in_w, out_w):
+    if out_w < in_w:
+        return [i >> (in_w - out_w) for i in range(2**in_w)]
+    else:
+        return [i << (out_w - in_w) for i in range(2**in_w)]
+
+
+def gamma_table(gamma, in_w, out_w):
+    return [round(((i/(2**in_w-1))**gamma)*(2**out_w-1)) for i in range(2**in_w)]
+
+
+class LUT1D(PipelinedActor, Module, AutoCSR):
+    """1D lookup tables
+
+    Replaces each component by its entry in the table of its channel (2**in_w
+    entries of out_w bits, a block RAM per channel). Each channel has two
+    banks: the bank CSR selects the one used for the next frames, the swap
+    happening on the vsync rising edge, and active_bank tells when it did.
+    Tables are initialized to identity (or tables, a list of tables per
+    channel) in both banks.
+
+    Entries are written through the table CSRs or the table endpoint (e.g. a
+    DMA), the bank being the MSB of adr. The CSRs and the table endpoint are in
+    the write clock domain, the pixels in sys (rename them as with
+    AsyncFIFO).
+    """
+    latency = 1
+
+    def __init__(self, names=["r", "g", "b"], in_w=8, out_w=None, tables=None):
+        if out_w is None:
+            out_w = in_w
+        n = len(names)
+        self.sink = sink = stream.Endpoint(EndpointDescription([(name, in_w) for name in names]))
+        self.source = source = stream.Endpoint(EndpointDescription([(name, out_w) for name in names]))
+        self.vsync = Signal()
+        self.table = table = stream.Endpoint(lut_write_layout(n, in_w, out_w))
+
+        self._bank = CSRStorage()
+        self._active_bank = CSRStatus()
+        self._table_channel = CSRStorage(bits_for(n-1))
+        self._table_adr = CSRStorage(in_w + 1)
+        self._table_dat_w = CSRStorage(out_w)
+        self._table_we = CSR()
+
+        # # #
+
+        PipelinedActor.__init__(self, self.latency)
+
+        # bank swap on vsync
+        bank = Signal()
+        active_bank = Signal()
+        vsync_r = Signal()
+        self.specials += [
+            MultiReg(self._bank.storage, bank),
+            MultiReg(active_bank, self._active_bank.status, "write")
+        ]
+        self.sync += [
+            vsync_r.eq(self.vsync),
+            If(self.vsync & ~vsync_r,
+                active_bank.eq(bank)
+            )
+        ]
+
+        # table writes, CSRs first
+        write = Record(lut_write_layout(n, in_w, out_w))
+        we = Signal()
+        self.comb += [
+            table.ready.eq(~self._table_we.re),
+            If(self._table_we.re,
+                we.eq(1),
+                write.channel.eq(self._table_channel.storage),
+                write.adr.eq(self._table_adr.storage),
+                write.data.eq(self._table_dat_w.storage)
+            ).Else(
+                we.eq(table.valid),
+                write.channel.eq(table.channel),
+                write.adr.eq(table.adr),
+                write.data.eq(table.data)
+            )
+        ]
+
+        for i, name in enumerate(names):
+            if tables is None:
+                init = identity_table(in_w, out_w)
+            else:
+                init = tables[i]
+            mem = Memory(out_w, 2*2**in_w, init=init + init)
+            wrport = mem.get_port(write_capable=True, clock_domain="write")
+            rdport = mem.get_port(has_re=True)
+            self.specials += mem, wrport, rdport
+            self.comb += [
+                wrport.adr.eq(write.adr),
+                wrport.dat_w.eq(write.data),
+                wrport.we.eq(we & (write.channel == i)),
+
+                rdport.adr.eq(Cat(getattr(sink, name), active_bank)),
+                rdport.re.eq(self.pipe_ce),
+                getattr(source, name).eq(rdport.dat_r)
+            ]
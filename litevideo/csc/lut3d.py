@@ -0,0 +1,235 @@
+# 3D lut
+
+from itertools import permutations, product
+
+from migen import *
+
+from litex.soc.interconnect.stream import *
+from litex.soc.interconnect.csr import *
+
+from litevideo.csc.common import *
+
+
+def lut3d_write_layout(size, out_w):
+    return [
+        ("adr",  3*bits_for(size-1)),
+        ("data", 3*(out_w + 1))
+    ]
+
+
+def lut3d_table(function, size=17, dw=8, out_w=8):
+    """Table of a LUT3D from function, which maps normalized (r, g, b) to
+    normalized (r, g, b). The last node is at 2**dw (normalized slightly
+    above 1) and can hold 2**out_w, so that the identity is exact."""
+    step = 2**dw//(size-1)
+    table = []
+    for nodes in product(range(size), repeat=3):
+        rgb = function(*[n*step/(2**dw-1) for n in nodes])
+        table.append([min(max(round(v*(2**out_w-1)), 0), 2**out_w) for v in rgb])
+    return table
+
+
+def lut3d_identity(size=17, dw=8, out_w=8):
+    return lut3d_table(lambda r, g, b: (r, g, b), size, dw, out_w)
+
+
+@CEInserter()
+class LUT3DDatapath(Module):
+    """3D LUT with tetrahedral interpolation
+
+    The nodes are split in 8 banks by parity of their r, g, b indexes so that
+    the 8 corners of the cube of a pixel are read in a single cycle, from
+    adrs (registered by the datapath) to dats (registered by the block RAMs,
+    with the same clock enable).
+    """
+    latency = 7
+
+    def __init__(self, size, rgb_w, out_w):
+        self.sink = sink = Record(rgb_layout(rgb_w))
+        self.source = source = Record(rgb_layout(out_w))
+        bank_size = ((size + 1)//2)**3
+        self.adrs = [Signal(max=bank_size) for i in range(8)]
+        self.dats = [Signal(3*(out_w + 1)) for i in range(8)]
+
+        # # #
+
+        node_w = out_w + 1
+        index_w = log2_int(size - 1)
+        frac_w = rgb_w - index_w
+        assert frac_w > 0
+        m = (size + 1)//2
+        names = ["r", "g", "b"]
+
+        # Hardware implementation:
+        #   sort the fractions f1 >= f2 >= f3 of the pixel in its cube and
+        #   take the corners v0 (origin), v1, v2 (adding the axis of f1, then
+        #   of f2) and v3 (opposite corner):
+        #   out = v0 + f1*(v1 - v0) + f2*(v2 - v1) + f3*(v3 - v2)
+
+        # stage 1
+        # indexes, fractions and bank addresses
+        indexes = [getattr(sink, name)[frac_w:] for name in names]
+        fracs = [Signal(frac_w) for i in range(3)]
+        parities = [Signal() for i in range(3)]
+        self.sync += [f.eq(getattr(sink, name)[:frac_w]) for f, name in zip(fracs, names)]
+        self.sync += [p.eq(index[0]) for p, index in zip(parities, indexes)]
+        for k, bank in enumerate(product(range(2), repeat=3)):
+            # bank holds the corners of parity bank
+            coords = [(index + (bank_parity ^ index[0])) >> 1
+                      for index, bank_parity in zip(indexes, bank)]
+            self.sync += self.adrs[k].eq((coords[0]*m + coords[1])*m + coords[2])
+
+        # stage 2
+        # block RAMs read
+        fracs_r = [Signal(frac_w) for i in range(3)]
+        parities_r = [Signal() for i in range(3)]
+        self.sync += [a.eq(b) for a, b in zip(fracs_r + parities_r, fracs + parities)]
+
+        # stage 3
+        # corners & tetrahedron selection
+        corners = {}
+        for corner in product(range(2), repeat=3):
+            data = Signal(3*node_w)
+            cases = {}
+            for k, bank in enumerate(product(range(2), repeat=3)):
+                # corner of offset corner is in bank corner ^ parities
+                cases[sum(b << (2-i) for i, b in enumerate(bank))] = data.eq(self.dats[k])
+            self.comb += Case(Cat(*[c ^ p for c, p in reversed(list(zip(corner, parities_r)))]), cases)
+            corners[corner] = data
+
+        v = [Signal(3*node_w) for i in range(4)]
+        f = [Signal(frac_w) for i in range(3)]
+        self.sync += [
+            v[0].eq(corners[(0, 0, 0)]),
+            v[3].eq(corners[(1, 1, 1)])
+        ]
+        tetrahedra = None
+        for order in permutations(range(3)):
+            first = [int(i == order[0]) for i in range(3)]
+            second = [int(i in order[:2]) for i in range(3)]
+            statements = [
+                v[1].eq(corners[tuple(first)]),
+                v[2].eq(corners[tuple(second)]),
+                [f[i].eq(fracs_r[axis]) for i, axis in enumerate(order)]
+            ]
+            condition = ((fracs_r[order[0]] >= fracs_r[order[1]]) &
+                         (fracs_r[order[1]] >= fracs_r[order[2]]))
+            if tetrahedra is None:
+                tetrahedra = If(condition, *statements)
+            else:
+                tetrahedra = tetrahedra.Elif(condition, *statements)
+        self.sync += tetrahedra
+
+        f_r = [Signal((frac_w + 1, True)) for i in range(3)]
+        self.sync += [a.eq(b) for a, b in zip(f_r, f)]
+        for c, name in enumerate(names):
+            vc = [vi[c*node_w:(c+1)*node_w] for vi in v]
+
+            # stage 4
+            # differences
+            base = Signal(node_w)
+            d = [Signal((node_w + 1, True)) for i in range(3)]
+            self.sync += [
+                base.eq(vc[0]),
+                [d[i].eq(vc[i+1] - vc[i]) for i in range(3)]
+            ]
+
+            # stage 5
+            # products
+            base_r = Signal(node_w)
+            p = [Signal((node_w + frac_w + 2, True)) for i in range(3)]
+            self.sync += [
+                base_r.eq(base),
+                [p[i].eq(d[i]*f_r[i]) for i in range(3)]
+            ]
+
+            # stage 6
+            # sum (+ rounding)
+            s = Signal((node_w + frac_w + 4, True))
+            self.sync += s.eq((base_r << frac_w) + p[0] + p[1] + p[2] + 2**(frac_w-1))
+            s_rounded = Signal((node_w + 4, True))
+            self.comb += s_rounded.eq(s[frac_w:])
+
+            # stage 7
+            # saturate
+            self.sync += saturate(s_rounded, getattr(source, name), 0, 2**out_w-1)
+
+
+class LUT3D(PipelinedActor, Module, AutoCSR):
+    """3D LUT
+
+    Maps RGB pixels through a size**3 (17 or 33) nodes table with tetrahedral
+    interpolation, one pixel per clock. Each node holds out_w + 1 bits r, g,
+    b, the last node of each axis being at 2**rgb_w (see lut3d_table). tables
+    defaults to the identity.
+
+    Nodes are written through the table CSRs or the table endpoint (e.g. a
+    DMA): adr is Cat(b, g, r) of the node indexes and data Cat(r, g, b). The
+    CSRs and the table endpoint are in the write clock domain, the pixels in
+    sys (rename them as with AsyncFIFO). Writes take effect immediately: do
+    them during blanking or on a frame that can be glitched.
+    """
+    def __init__(self, size=17, rgb_w=8, out_w=None, table=None):
+        if out_w is None:
+            out_w = rgb_w
+        if table is None:
+            table = lut3d_identity(size, rgb_w, out_w)
+        node_w = out_w + 1
+        index_w = bits_for(size-1)
+        self.sink = sink = stream.Endpoint(EndpointDescription(rgb_layout(rgb_w)))
+        self.source = source = stream.Endpoint(EndpointDescription(rgb_layout(out_w)))
+        self.table = table_sink = stream.Endpoint(lut3d_write_layout(size, out_w))
+
+        self._table_adr = CSRStorage(3*index_w)
+        self._table_dat_w = CSRStorage(3*node_w)
+        self._table_we = CSR()
+
+        # # #
+
+        self.submodules.datapath = LUT3DDatapath(size, rgb_w, out_w)
+        PipelinedActor.__init__(self, self.datapath.latency)
+        self.comb += self.datapath.ce.eq(self.pipe_ce)
+        for name in ["r", "g", "b"]:
+            self.comb += [
+                getattr(self.datapath.sink, name).eq(getattr(sink, name)),
+                getattr(source, name).eq(getattr(self.datapath.source, name))
+            ]
+
+        # table writes, CSRs first
+        write = Record(lut3d_write_layout(size, out_w))
+        we = Signal()
+        self.comb += [
+            table_sink.ready.eq(~self._table_we.re),
+            If(self._table_we.re,
+                we.eq(1),
+                write.adr.eq(self._table_adr.storage),
+                write.data.eq(self._table_dat_w.storage)
+            ).Else(
+                we.eq(table_sink.valid),
+                write.adr.eq(table_sink.adr),
+                write.data.eq(table_sink.data)
+            )
+        ]
+        b, g, r = [write.adr[i*index_w:(i+1)*index_w] for i in range(3)]
+        m = (size + 1)//2
+
+        # banks
+        inits = [[0]*m**3 for i in range(8)]
+        for n, nodes in enumerate(product(range(size), repeat=3)):
+            k = sum((c & 1) << (2-i) for i, c in enumerate(nodes))
+            adr = ((nodes[0] >> 1)*m + (nodes[1] >> 1))*m + (nodes[2] >> 1)
+            inits[k][adr] = sum(v << (i*node_w) for i, v in enumerate(table[n]))
+        for k, bank in enumerate(product(range(2), repeat=3)):
+            mem = Memory(3*node_w, m**3, init=inits[k])
+            wrport = mem.get_port(write_capable=True, clock_domain="write")
+            rdport = mem.get_port(has_re=True)
+            self.specials += mem, wrport, rdport
+            self.comb += [
+                wrport.adr.eq(((r >> 1)*m + (g >> 1))*m + (b >> 1)),
+                wrport.dat_w.eq(write.data),
+                wrport.we.eq(we & (Cat(b[0], g[0], r[0]) == sum(p << (2-i) for i, p in enumerate(bank)))),
+
+                rdport.adr.eq(self.datapath.adrs[k]),
+                rdport.re.eq(self.pipe_ce),
+                self.datapath.dats[k].eq(rdport.dat_r)
+            ]
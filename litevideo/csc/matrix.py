@@ -0,0 +1,186 @@
+# color matrix
+
+from migen import *
+from migen.genlib.cdc import MultiReg
+
+from litex.soc.interconnect.stream import *
+from litex.soc.interconnect.csr import *
+
+from litevideo.csc.common import *
+
+
+# Kr, Kb of the YCbCr standards
+ycbcr_standards = {
+    "bt601":  (0.299,  0.114),
+    "bt709":  (0.2126, 0.0722),
+    "bt2020": (0.2627, 0.0593)
+}
+
+
+def _inverse(m):
+    (a, b, c), (d, e, f), (g, h, i) = m
+    det = a*(e*i - f*h) - b*(d*i - f*g) + c*(d*h - e*g)
+    return [
+        [(e*i - f*h)/det, (c*h - b*i)/det, (b*f - c*e)/det],
+        [(f*g - d*i)/det, (a*i - c*g)/det, (c*d - a*f)/det],
+        [(d*h - e*g)/det, (b*g - a*h)/det, (a*e - b*d)/det]
+    ]
+
+
+def rgb2ycbcr_matrix(standard="bt601", limited=True, dw=8):
+    """Matrix, pre offsets and post offsets of a full range RGB to YCbCr
+    conversion"""
+    kr, kb = ycbcr_standards[standard]
+    kg = 1 - kr - kb
+    if limited:
+        y_scale = 219*2**(dw-8)/(2**dw-1)
+        c_scale = 224*2**(dw-8)/(2**dw-1)
+        y_offset = 16*2**(dw-8)
+    else:
+        y_scale = 1
+        c_scale = 1
+        y_offset = 0
+    c_offset = 2**(dw-1)
+    matrix = [
+        [y_scale*kr, y_scale*kg, y_scale*kb],
+        [-c_scale*kr/(2*(1-kb)), -c_scale*kg/(2*(1-kb)), c_scale/2],
+        [c_scale/2, -c_scale*kg/(2*(1-kr)), -c_scale*kb/(2*(1-kr))]
+    ]
+    return matrix, [0, 0, 0], [y_offset, c_offset, c_offset]
+
+
+def ycbcr2rgb_matrix(standard="bt601", limited=True, dw=8):
+    """Matrix, pre offsets and post offsets of a YCbCr to full range RGB
+    conversion"""
+    matrix, pre_offsets, post_offsets = rgb2ycbcr_matrix(standard, limited, dw)
+    return _inverse(matrix), [-o for o in post_offsets], [0, 0, 0]
+
+
+def color_matrix_coefs(matrix, pre_offsets, post_offsets, coef_frac=14):
+    """Integer coefficients and offsets of ColorMatrix"""
+    return {
+        "matrix": [[round(c*2**coef_frac) for c in row] for row in matrix],
+        "pre_offsets": [round(o) for o in pre_offsets],
+        "post_offsets": [round(o) for o in post_offsets]
+    }
+
+
+@CEInserter()
+class ColorMatrixDatapath(Module):
+    latency = 6
+
+    def __init__(self, in_w, out_w, coef_w, coef_frac):
+        self.sink = sink = [Signal(in_w) for i in range(3)]
+        self.source = source = [Signal(out_w) for i in range(3)]
+        self.matrix = [[Signal((coef_w, True)) for j in range(3)] for i in range(3)]
+        self.pre_offsets = [Signal((in_w + 1, True)) for i in range(3)]
+        self.post_offsets = [Signal((out_w + 1, True)) for i in range(3)]
+
+        # # #
+
+        # Hardware implementation:
+        #   out_i = sum_j(m_ij*(in_j + pre_offset_j)) + post_offset_i
+        # Each output is a pre-adder / multiplier / post-adder chain with the
+        # products added one per stage (DSP48 cascade).
+
+        # stage 1
+        # in_j + pre_offset_j
+        a = [Signal((in_w + 2, True)) for j in range(3)]
+        self.sync += [a[j].eq(sink[j] + self.pre_offsets[j]) for j in range(3)]
+
+        # stage 2
+        # m_ij*a_j
+        product_w = in_w + 2 + coef_w
+        p = [[Signal((product_w, True)) for j in range(3)] for i in range(3)]
+        for i in range(3):
+            self.sync += [p[i][j].eq(self.matrix[i][j]*a[j]) for j in range(3)]
+
+        # stages 3 to 5
+        # (post_offset_i + rounding) + m_i0*a_0, + m_i1*a_1, + m_i2*a_2
+        sum_w = product_w + 2
+        for i in range(3):
+            s = Signal((sum_w, True))
+            self.sync += s.eq(p[i][0] + (self.post_offsets[i] << coef_frac) + 2**(coef_frac-1))
+            for j in range(1, 3):
+                p_d = p[i][j]
+                for k in range(j):
+                    p_n = Signal((product_w, True))
+                    self.sync += p_n.eq(p_d)
+                    p_d = p_n
+                s_n = Signal((sum_w, True))
+                self.sync += s_n.eq(s + p_d)
+                s = s_n
+
+            # stage 6
+            # saturate
+            out = Signal((sum_w - coef_frac, True))
+            self.comb += out.eq(s[coef_frac:])
+            self.sync += saturate(out, source[i], 0, 2**out_w-1)
+
+
+class ColorMatrix(PipelinedActor, Module, AutoCSR):
+    """Color matrix
+
+    out_i = sum_j(m_ij*(in_j + pre_offset_j)) + post_offset_i, saturated, the
+    coefficients being signed with coef_frac fractional bits (see
+    color_matrix_coefs, rgb2ycbcr_matrix and ycbcr2rgb_matrix).
+
+    Coefficients and offsets are double buffered: the CSRs are copied to the
+    datapath on the vsync rising edges, unless hold is set. Set hold while
+    updating them to avoid using a partially written set.
+    """
+    def __init__(self, in_names=["r", "g", "b"], out_names=["y", "cb", "cr"],
+                 in_w=8, out_w=8, coef_w=18, coef_frac=14, coefs=None):
+        self.sink = sink = stream.Endpoint(EndpointDescription([(n, in_w) for n in in_names]))
+        self.source = source = stream.Endpoint(EndpointDescription([(n, out_w) for n in out_names]))
+        self.vsync = Signal()
+
+        if coefs is None:
+            coefs = color_matrix_coefs([[int(i == j) for j in range(3)] for i in range(3)],
+                                       [0, 0, 0], [0, 0, 0], coef_frac)
+        self._hold = CSRStorage()
+        for i in range(3):
+            for j in range(3):
+                name = "m{}{}".format(i, j)
+                setattr(self, "_" + name,
+                    CSRStorage(coef_w, name=name, reset=coefs["matrix"][i][j] & (2**coef_w-1)))
+        for i in range(3):
+            name = "pre_offset{}".format(i)
+            setattr(self, "_" + name,
+                CSRStorage(in_w + 1, name=name, reset=coefs["pre_offsets"][i] & (2**(in_w+1)-1)))
+            name = "post_offset{}".format(i)
+            setattr(self, "_" + name,
+                CSRStorage(out_w + 1, name=name, reset=coefs["post_offsets"][i] & (2**(out_w+1)-1)))
+
+        # # #
+
+        self.submodules.datapath = ColorMatrixDatapath(in_w, out_w, coef_w, coef_frac)
+        PipelinedActor.__init__(self, self.datapath.latency)
+        self.comb += self.datapath.ce.eq(self.pipe_ce)
+        for i in range(3):
+            self.comb += [
+                self.datapath.sink[i].eq(getattr(sink, in_names[i])),
+                getattr(source, out_names[i]).eq(self.datapath.source[i])
+            ]
+
+        # double buffering
+        hold = Signal()
+        vsync_r = Signal()
+        self.specials += MultiReg(self._hold.storage, hold)
+        self.sync += vsync_r.eq(self.vsync)
+        latch = Signal()
+        self.comb += latch.eq(self.vsync & ~vsync_r & ~hold)
+
+        csrs = []
+        for i in range(3):
+            for j in range(3):
+                csrs.append((self.datapath.matrix[i][j], getattr(self, "_m{}{}".format(i, j)),
+                             coefs["matrix"][i][j]))
+            csrs.append((self.datapath.pre_offsets[i], getattr(self, "_pre_offset{}".format(i)),
+                         coefs["pre_offsets"][i]))
+            csrs.append((self.datapath.post_offsets[i], getattr(self, "_post_offset{}".format(i)),
+                         coefs["post_offsets"][i]))
+        for datapath_input, csr, reset in csrs:
+            register = Signal((len(datapath_input), True), reset=reset)
+            self.sync += If(latch, register.eq(csr.storage))
+            self.comb += datapath_input.eq(register)
@@ -11,11 +11,14 @@ from litevideo.csc.common import *
 class PIXF2PIXDatapath(Module):
     """
     Converts a 16 bit half precision floating point
-    number defined in the range [0-1] to 8 bit unsigned
-    int represented by a pixel in the range [0-255]
+    number defined in the range [0-1] to pix_w bits unsigned
+    int represented by a pixel in the range [0-2**pix_w-1],
+    saturating negative numbers to 0 and numbers >= 1
+    (NaNs included) to 2**pix_w-1
     """
     latency = 2
     def __init__(self, pixf_w, pix_w):
+        assert pix_w <= 11
         self.sink = sink = Record(pixf_layout(pixf_w))
         self.source = source = Record(pix_layout(pix_w))
 
@@ -34,32 +37,55 @@ class PIXF2PIXDatapath(Module):
         # Stage 1
         # Unpack frac and exp components
         # Correct exponent offset for shifting later
+        # Detect saturation
         frac = Signal(11)
         exp = Signal(5)
         exp_offset = Signal(5)
+        negative = Signal()
+        one = Signal()
 
         self.sync += [
             exp_offset.eq(15 - sink.pixf[10:15] - 1),
             frac[:10].eq(sink.pixf[:10]),
-            frac[10].eq(1)
+            frac[10].eq(1),
+            negative.eq(sink.pixf[15] & (sink.pixf[:15] <= 0x7c00)),
+            one.eq(sink.pixf[10:15] >= 15)
         ]
 
         # Stage 2
         # Right shift frac by exp_offset
-        # Most significant 8 bits of frac assigned to uint8 pix
-        self.sync += source.pix.eq( (frac >> exp_offset)[3:])
+        # Most significant pix_w bits of frac assigned to pix
+        self.sync += [
+            If(negative,
+                source.pix.eq(0)
+            ).Elif(one,
+                source.pix.eq(2**pix_w-1)
+            ).Else(
+                source.pix.eq((frac >> exp_offset)[11-pix_w:])
+            )
+        ]
 
 
 class RGB16f2RGB(PipelinedActor, Module):
-    def __init__(self, rgb_w=8, rgb16f_w=16):
-        self.sink = sink = stream.Endpoint(EndpointDescription(rgb16f_layout(rgb16f_w)))
-        self.source = source = stream.Endpoint(EndpointDescription(rgb_layout(rgb_w)))
+    """RGB 16 bit float to RGB
+
+    Converts lanes pixels per beat, lane 0 in the LSBs of each component.
+    """
+    def __init__(self, rgb_w=8, rgb16f_w=16, lanes=1):
+        self.sink = sink = stream.Endpoint(EndpointDescription(rgb16f_layout(rgb16f_w*lanes)))
+        self.source = source = stream.Endpoint(EndpointDescription(rgb_layout(rgb_w*lanes)))
 
         # # #
 
-        for name in ["r", "g", "b"]:
-            self.submodules.datapath = PIXF2PIXDatapath(rgb16f_w, rgb_w)
-            PipelinedActor.__init__(self, self.datapath.latency) # FIXME
-            self.comb += self.datapath.ce.eq(self.pipe_ce)
-            self.comb += getattr(self.datapath.sink, "pixf").eq(getattr(sink, name +"f"))
-            self.comb += getattr(source, name).eq(getattr(self.datapath.source, "pix"))
+        self.datapaths = []
+        for i in range(lanes):
+            for name in ["r", "g", "b"]:
+                datapath = PIXF2PIXDatapath(rgb16f_w, rgb_w)
+                self.submodules += datapath
+                self.datapaths.append(datapath)
+                self.comb += [
+                    datapath.sink.pixf.eq(lane(getattr(sink, name + "f"), i, rgb16f_w)),
+                    lane(getattr(source, name), i, rgb_w).eq(datapath.source.pix)
+                ]
+        PipelinedActor.__init__(self, PIXF2PIXDatapath.latency)
+        self.comb += [datapath.ce.eq(self.pipe_ce) for datapath in self.datapaths]
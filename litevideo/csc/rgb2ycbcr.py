@@ -32,7 +32,8 @@ class RGB2YCbCrDatapath(Module):
 
         # # #
 
-        coefs = rgb2ycbcr_coefs(ycbcr_w, coef_w)
+        coefs = rgb2ycbcr_coefs(rgb_w, coef_w)
+        out_coefs = rgb2ycbcr_coefs(ycbcr_w)
 
         # delay rgb signals
         rgb_delayed = [sink]
@@ -67,17 +68,19 @@ class RGB2YCbCrDatapath(Module):
         ]
 
         # stage 3
-        # ca*(r-g) + cb*(b-g)
-        carg_plus_cbbg = Signal((rgb_w + coef_w + 9, True)) # XXX
+        # ca*(r-g) + cb*(b-g) (+ rounding)
+        carg_plus_cbbg = Signal((rgb_w + coef_w + 1, True))
         self.sync += [
-            carg_plus_cbbg.eq(ca_mult_rg + cb_mult_bg)
+            carg_plus_cbbg.eq(ca_mult_rg + cb_mult_bg + 2**(coef_w-1))
         ]
+        carg_plus_cbbg_rounded = Signal((rgb_w + 1, True))
+        self.comb += carg_plus_cbbg_rounded.eq(carg_plus_cbbg[coef_w:])
 
         # stage 4
         # yraw = ca*(r-g) + cb*(b-g) + g
         yraw = Signal((rgb_w + 3, True))
         self.sync += [
-            yraw.eq(carg_plus_cbbg[coef_w:] + rgb_delayed[3].g)
+            yraw.eq(carg_plus_cbbg_rounded + rgb_delayed[3].g)
         ]
 
         # stage 5
@@ -93,14 +96,14 @@ class RGB2YCbCrDatapath(Module):
         ]
 
         # stage 6
-        # cc*yraw
-        # cd*yraw
+        # cc*yraw (+ rounding)
+        # cd*yraw (+ rounding)
         cc_mult_ryraw = Signal((rgb_w + coef_w + 4, True))
         cd_mult_byraw = Signal((rgb_w + coef_w + 4, True))
         yraw_r1 = Signal((rgb_w + 3, True))
         self.sync += [
-            cc_mult_ryraw.eq(b_minus_yraw * coefs["cc"]),
-            cd_mult_byraw.eq(r_minus_yraw * coefs["cd"]),
+            cc_mult_ryraw.eq(b_minus_yraw * coefs["cc"] + 2**(coef_w-1)),
+            cd_mult_byraw.eq(r_minus_yraw * coefs["cd"] + 2**(coef_w-1)),
             yraw_r1.eq(yraw_r0)
         ]
 
@@ -118,25 +121,157 @@ class RGB2YCbCrDatapath(Module):
         ]
 
         # stage 8
-        # saturate
+        # rescale & saturate
         self.sync += [
-            saturate(y, source.y, coefs["ymin"], coefs["ymax"]),
-            saturate(cb, source.cb, coefs["cmin"], coefs["cmax"]),
-            saturate(cr, source.cr, coefs["cmin"], coefs["cmax"])
+            saturate(rescale(y, rgb_w, ycbcr_w), source.y, out_coefs["ymin"], out_coefs["ymax"]),
+            saturate(rescale(cb, rgb_w, ycbcr_w), source.cb, out_coefs["cmin"], out_coefs["cmax"]),
+            saturate(rescale(cr, rgb_w, ycbcr_w), source.cr, out_coefs["cmin"], out_coefs["cmax"])
+        ]
+
+
+@CEInserter()
+class RGB2YCbCrDSPDatapath(Module):
+    """Same computation as RGB2YCbCrDatapath, structured for DSP48E1/DSP48A1
+    slices: pre-adder, multiplier and post-adder (C or PCIN cascade) with their
+    pipeline registers, offsets and g being added by the post-adders."""
+    latency = 8
+
+    def __init__(self, rgb_w, ycbcr_w, coef_w):
+        self.sink = sink = Record(rgb_layout(rgb_w))
+        self.source = source = Record(ycbcr444_layout(ycbcr_w))
+
+        # # #
+
+        coefs = rgb2ycbcr_coefs(rgb_w, coef_w)
+        out_coefs = rgb2ycbcr_coefs(ycbcr_w)
+
+        # delay rgb signals
+        rgb_delayed = [sink]
+        for i in range(self.latency):
+            rgb_n = Record(rgb_layout(rgb_w))
+            for name in ["r", "g", "b"]:
+                self.sync += getattr(rgb_n, name).eq(getattr(rgb_delayed[-1], name))
+            rgb_delayed.append(rgb_n)
+
+        # Hardware implementation:
+        #   DSP1:  yraw  = ca*(r-g) + (g << coef_w) + rounding
+        #   DSP2:  yraw += cb*(b-g)                  (PCIN cascade)
+        #   DSP3:    cb  = cc*(b-yraw) + (coffset << coef_w) + rounding
+        #   DSP4:    cr  = cd*(r-yraw) + (coffset << coef_w) + rounding
+
+        product_w = rgb_w + coef_w + 4
+
+        # stage 1 (pre-adders)
+        # (r-g) & (b-g)
+        r_minus_g = Signal((rgb_w + 1, True))
+        b_minus_g = Signal((rgb_w + 1, True))
+        self.sync += [
+            r_minus_g.eq(sink.r - sink.g),
+            b_minus_g.eq(sink.b - sink.g)
+        ]
+
+        # stage 2 (multipliers)
+        # ca*(r-g) & cb*(b-g)
+        ca_mult_rg = Signal((product_w, True))
+        cb_mult_bg = Signal((product_w, True))
+        self.sync += [
+            ca_mult_rg.eq(r_minus_g * coefs["ca"]),
+            cb_mult_bg.eq(b_minus_g * coefs["cb"])
+        ]
+
+        # stage 3 (DSP1 post-adder, DSP2 multiplier output register)
+        # ca*(r-g) + g << coef_w (+ rounding)
+        yraw_p1 = Signal((product_w + 1, True))
+        cb_mult_bg_r = Signal((product_w, True))
+        self.sync += [
+            yraw_p1.eq(ca_mult_rg + (rgb_delayed[2].g << coef_w) + 2**(coef_w-1)),
+            cb_mult_bg_r.eq(cb_mult_bg)
+        ]
+
+        # stage 4 (DSP2 post-adder)
+        # + cb*(b-g)
+        yraw_p2 = Signal((product_w + 2, True))
+        self.sync += yraw_p2.eq(yraw_p1 + cb_mult_bg_r)
+        yraw = Signal((product_w + 2 - coef_w, True))
+        self.comb += yraw.eq(yraw_p2[coef_w:])
+
+        # stage 5 (pre-adders)
+        # b - yraw & r - yraw
+        b_minus_yraw = Signal((rgb_w + 4, True))
+        r_minus_yraw = Signal((rgb_w + 4, True))
+        yraw_r0 = Signal((rgb_w + 3, True))
+        self.sync += [
+            b_minus_yraw.eq(rgb_delayed[4].b - yraw),
+            r_minus_yraw.eq(rgb_delayed[4].r - yraw),
+            yraw_r0.eq(yraw)
+        ]
+
+        # stage 6 (multipliers)
+        # cc*(b - yraw) & cd*(r - yraw)
+        cc_mult_byraw = Signal((product_w, True))
+        cd_mult_ryraw = Signal((product_w, True))
+        yraw_r1 = Signal((rgb_w + 3, True))
+        self.sync += [
+            cc_mult_byraw.eq(b_minus_yraw * coefs["cc"]),
+            cd_mult_ryraw.eq(r_minus_yraw * coefs["cd"]),
+            yraw_r1.eq(yraw_r0)
+        ]
+
+        # stage 7 (post-adders)
+        # y = yraw + yoffset
+        # cb = cc*(b - yraw) + coffset << coef_w (+ rounding)
+        # cr = cd*(r - yraw) + coffset << coef_w (+ rounding)
+        y = Signal((rgb_w + 3, True))
+        cb_p = Signal((product_w + 1, True))
+        cr_p = Signal((product_w + 1, True))
+        self.sync += [
+            y.eq(yraw_r1 + coefs["yoffset"]),
+            cb_p.eq(cc_mult_byraw + (coefs["coffset"] << coef_w) + 2**(coef_w-1)),
+            cr_p.eq(cd_mult_ryraw + (coefs["coffset"] << coef_w) + 2**(coef_w-1))
+        ]
+        cb = Signal((product_w + 1 - coef_w, True))
+        cr = Signal((product_w + 1 - coef_w, True))
+        self.comb += [
+            cb.eq(cb_p[coef_w:]),
+            cr.eq(cr_p[coef_w:])
+        ]
+
+        # stage 8
+        # rescale & saturate
+        self.sync += [
+            saturate(rescale(y, rgb_w, ycbcr_w), source.y, out_coefs["ymin"], out_coefs["ymax"]),
+            saturate(rescale(cb, rgb_w, ycbcr_w), source.cb, out_coefs["cmin"], out_coefs["cmax"]),
+            saturate(rescale(cr, rgb_w, ycbcr_w), source.cr, out_coefs["cmin"], out_coefs["cmax"])
         ]
 
 
 class RGB2YCbCr(PipelinedActor, Module):
-    def __init__(self, rgb_w=8, ycbcr_w=8, coef_w=8):
-        self.sink = sink = stream.Endpoint(EndpointDescription(rgb_layout(rgb_w)))
-        self.source = source = stream.Endpoint(EndpointDescription(ycbcr444_layout(ycbcr_w)))
+    """RGB to YCbCr 444
+
+    The conversion is done at rgb_w bits and rounded to ycbcr_w bits, with
+    coef_w bits coefficients (by default 2 more than the widest component).
+    Converts lanes pixels per beat, lane 0 in the LSBs of each component.
+    """
+    def __init__(self, rgb_w=8, ycbcr_w=8, coef_w=None, dsp=False, lanes=1):
+        self.sink = sink = stream.Endpoint(EndpointDescription(rgb_layout(rgb_w*lanes)))
+        self.source = source = stream.Endpoint(EndpointDescription(ycbcr444_layout(ycbcr_w*lanes)))
 
         # # #
 
-        self.submodules.datapath = RGB2YCbCrDatapath(rgb_w, ycbcr_w, coef_w)
+        if coef_w is None:
+            coef_w = default_coef_w(rgb_w, ycbcr_w)
+        self.datapaths = []
+        for i in range(lanes):
+            if dsp:
+                datapath = RGB2YCbCrDSPDatapath(rgb_w, ycbcr_w, coef_w)
+            else:
+                datapath = RGB2YCbCrDatapath(rgb_w, ycbcr_w, coef_w)
+            self.submodules += datapath
+            self.datapaths.append(datapath)
+            for name in ["r", "g", "b"]:
+                self.comb += getattr(datapath.sink, name).eq(lane(getattr(sink, name), i, rgb_w))
+            for name in ["y", "cb", "cr"]:
+                self.comb += lane(getattr(source, name), i, ycbcr_w).eq(getattr(datapath.source, name))
+        self.datapath = self.datapaths[0]
         PipelinedActor.__init__(self, self.datapath.latency)
-        self.comb += self.datapath.ce.eq(self.pipe_ce)
-        for name in ["r", "g", "b"]:
-            self.comb += getattr(self.datapath.sink, name).eq(getattr(sink, name))
-        for name in ["y", "cb", "cr"]:
-            self.comb += getattr(source, name).eq(getattr(self.datapath.source, name))
+        self.comb += [datapath.ce.eq(self.pipe_ce) for datapath in self.datapaths]
@@ -1,12 +1,20 @@
+import numpy as np
 from PIL import Image
 
-import random
-from copy import deepcopy
-
 from migen import *
 
 from litex.soc.interconnect.stream import *
 
+from litevideo.csc.common import default_coef_w
+from litevideo.csc.rgb2ycbcr import rgb2ycbcr_coefs
+from litevideo.csc.ycbcr2rgb import ycbcr2rgb_coefs
+
+
+# The planes (r, g, b, y, cb, cr, rf, gf, bf) are NumPy arrays. The packed
+# words are little endian arrays whose bytes (24 bit formats) or half words
+# (rgb16f) are viewed as the planes, so packing writes the planes in place and
+# unpacking returns views of the words without copying.
+
 class RAWImage:
     def __init__(self, coefs, filename=None, size=None):
         self.r = None
@@ -17,7 +25,11 @@ class RAWImage:
         self.cb = None
         self.cr = None
 
-        self.data = []
+        self.rf = None
+        self.gf = None
+        self.bf = None
+
+        self.data = np.zeros(0, "<u4")
 
         self.coefs = coefs
         self.size = size
@@ -28,206 +40,303 @@ class RAWImage:
 
 
     def open(self, filename):
-        img = Image.open(filename)
+        img = Image.open(filename).convert("RGB")
         if self.size is not None:
-            img = img.resize((self.size, self.size), Image.ANTIALIAS)
-        r, g, b = zip(*list(img.getdata()))
-        self.set_rgb(r, g, b)
+            img = img.resize((self.size, self.size), Image.LANCZOS)
+        pixels = np.asarray(img).reshape(-1, 3)
+        self.set_rgb(pixels[:, 0], pixels[:, 1], pixels[:, 2])
 
 
     def save(self, filename):
-        img = Image.new("RGB" ,(self.size, self.size))
-        img.putdata(list(zip(self.r, self.g, self.b)))
+        pixels = np.stack([self.r, self.g, self.b], axis=-1)
+        pixels = np.clip(pixels, 0, 255).astype(np.uint8)
+        img = Image.fromarray(pixels.reshape(self.size, self.size, 3), "RGB")
         img.save(filename)
 
 
     def set_rgb(self, r, g, b):
-        self.r = r
-        self.g = g
-        self.b = b
-        self.length = len(r)
+        self.r = np.asarray(r)
+        self.g = np.asarray(g)
+        self.b = np.asarray(b)
+        self.length = len(self.r)
 
 
     def set_ycbcr(self, y, cb, cr):
-        self.y = y
-        self.cb = cb
-        self.cr = cr
-        self.length = len(y)
+        self.y = np.asarray(y)
+        self.cb = np.asarray(cb)
+        self.cr = np.asarray(cr)
+        self.length = len(self.y)
 
 
     def set_data(self, data):
         self.data = data
 
 
-    def pack_rgb(self):
-        self.data = []
-        for i in range(self.length):
-            data = (self.r[i] & 0xff) << 16
-            data |= (self.g[i] & 0xff) << 8
-            data |= (self.b[i] & 0xff) << 0
-            self.data.append(data)
+    # Packing: the components are written in the byte/half word views of the
+    # words, which truncates them as the & 0xff/0xffff masks would.
+    def _pack(self, planes, dtype, field_dtype):
+        self.data = np.zeros(self.length, dtype)
+        fields = self.data.view(field_dtype).reshape(self.length, -1)
+        for i, plane in enumerate(reversed(planes)):
+            fields[:, i] = plane
         return self.data
 
+    def _unpack(self, n, dtype, field_dtype):
+        self.data = np.asarray(self.data, dtype)
+        fields = self.data.view(field_dtype).reshape(len(self.data), -1)
+        self.length = len(self.data)
+        return [fields[:, i] for i in reversed(range(n))]
+
+    def pack_rgb(self):
+        return self._pack([self.r, self.g, self.b], "<u4", np.uint8)
+
 
     def pack_ycbcr(self):
-        self.data = []
-        for i in range(self.length):
-            data = (self.y[i] & 0xff) << 16
-            data |= (self.cb[i] & 0xff) << 8
-            data |= (self.cr[i] & 0xff) << 0
-            self.data.append(data)
-        return self.data
+        return self._pack([self.y, self.cb, self.cr], "<u4", np.uint8)
 
     def pack_rgb16f(self):
-        self.data = []
-        for i in range(self.length):
-            data  = (self.rf[i] & 0xffff) << 32
-            data |= (self.gf[i] & 0xffff) << 16
-            data |= (self.bf[i] & 0xffff) << 0
-            self.data.append(data)
-        return self.data
+        return self._pack([self.rf, self.gf, self.bf], "<u8", "<u2")
 
 
     def unpack_rgb(self):
-        self.r = []
-        self.g = []
-        self.b = []
-        for data in self.data:
-            self.r.append((data >> 16) & 0xff)
-            self.g.append((data >> 8) & 0xff)
-            self.b.append((data >> 0) & 0xff)
+        self.r, self.g, self.b = self._unpack(3, "<u4", np.uint8)
         return self.r, self.g, self.b
 
 
     def unpack_ycbcr(self):
-        self.y = []
-        self.cb = []
-        self.cr = []
-        for data in self.data:
-            self.y.append((data >> 16) & 0xff)
-            self.cb.append((data >> 8) & 0xff)
-            self.cr.append((data >> 0) & 0xff)
+        self.y, self.cb, self.cr = self._unpack(3, "<u4", np.uint8)
         return self.y, self.cb, self.cr
 
     def unpack_rgb16f(self):
-        self.rf = []
-        self.gf = []
-        self.bf = []
-        for data in self.data:
-            self.rf.append((data >> 32) & 0xffff)
-            self.gf.append((data >> 16) & 0xffff)
-            self.bf.append((data >> 0 ) & 0xffff)
+        self.rf, self.gf, self.bf = self._unpack(3, "<u8", "<u2")
         return self.rf, self.gf, self.bf
 
     # Model for our implementation
     def rgb2ycbcr_model(self):
-        self.y  = []
-        self.cb = []
-        self.cr = []
-        for r, g, b in zip(self.r, self.g, self.b):
-            yraw = self.coefs["ca"]*(r-g) + self.coefs["cb"]*(b-g) + g
-            self.y.append(int(yraw + self.coefs["yoffset"]))
-            self.cb.append(int(self.coefs["cc"]*(b-yraw) + self.coefs["coffset"]))
-            self.cr.append(int(self.coefs["cd"]*(r-yraw) + self.coefs["coffset"]))
+        r, g, b = _int(self.r), _int(self.g), _int(self.b)
+        yraw = self.coefs["ca"]*(r-g) + self.coefs["cb"]*(b-g) + g
+        self.y  = _trunc(yraw + self.coefs["yoffset"])
+        self.cb = _trunc(self.coefs["cc"]*(b-yraw) + self.coefs["coffset"])
+        self.cr = _trunc(self.coefs["cd"]*(r-yraw) + self.coefs["coffset"])
+        return self.y, self.cb, self.cr
+
+
+    # Bit exact model of our implementation
+    def rgb2ycbcr_fixed(self, rgb_w=8, ycbcr_w=8, coef_w=None):
+        self.y, self.cb, self.cr = rgb2ycbcr_fixed(self.r, self.g, self.b,
+                                                   rgb_w, ycbcr_w, coef_w)
         return self.y, self.cb, self.cr
 
 
     # Wikipedia implementation used as reference
     def rgb2ycbcr(self):
-        self.y = []
-        self.cb = []
-        self.cr = []
-        for r, g, b in zip(self.r, self.g, self.b):
-            self.y.append(int(0.299*r + 0.587*g + 0.114*b))
-            self.cb.append(int(-0.1687*r - 0.3313*g + 0.5*b + 128))
-            self.cr.append(int(0.5*r - 0.4187*g - 0.0813*b + 128))
+        r, g, b = _int(self.r), _int(self.g), _int(self.b)
+        self.y  = _trunc(0.299*r + 0.587*g + 0.114*b)
+        self.cb = _trunc(-0.1687*r - 0.3313*g + 0.5*b + 128)
+        self.cr = _trunc(0.5*r - 0.4187*g - 0.0813*b + 128)
         return self.y, self.cb, self.cr
 
 
     # Model for our implementation
     def ycbcr2rgb_model(self):
-        self.r = []
-        self.g = []
-        self.b = []
-        for y, cb, cr in zip(self.y, self.cb, self.cr):
-            self.r.append(int(y - self.coefs["yoffset"] + (cr - self.coefs["coffset"])*self.coefs["acoef"]))
-            self.g.append(int(y - self.coefs["yoffset"] + (cb - self.coefs["coffset"])*self.coefs["bcoef"] + (cr - self.coefs["coffset"])*self.coefs["ccoef"]))
-            self.b.append(int(y - self.coefs["yoffset"] + (cb - self.coefs["coffset"])*self.coefs["dcoef"]))
+        y = _int(self.y) - self.coefs["yoffset"]
+        cb = _int(self.cb) - self.coefs["coffset"]
+        cr = _int(self.cr) - self.coefs["coffset"]
+        self.r = _trunc(y + cr*self.coefs["acoef"])
+        self.g = _trunc(y + cb*self.coefs["bcoef"] + cr*self.coefs["ccoef"])
+        self.b = _trunc(y + cb*self.coefs["dcoef"])
+        return self.r, self.g, self.b
+
+
+    # Bit exact model of our implementation
+    def ycbcr2rgb_fixed(self, ycbcr_w=8, rgb_w=8, coef_w=None, dsp=False):
+        self.r, self.g, self.b = ycbcr2rgb_fixed(self.y, self.cb, self.cr,
+                                                 ycbcr_w, rgb_w, coef_w, dsp)
         return self.r, self.g, self.b
 
 
     # Wikipedia implementation used as reference
     def ycbcr2rgb(self):
-        self.r = []
-        self.g = []
-        self.b = []
-        for y, cb, cr in zip(self.y, self.cb, self.cr):
-            self.r.append(int(y + (cr - 128) *  1.402))
-            self.g.append(int(y + (cb - 128) * -0.34414 + (cr - 128) * -0.71414))
-            self.b.append(int(y + (cb - 128) *  1.772))
+        y = _int(self.y)
+        cb = _int(self.cb) - 128
+        cr = _int(self.cr) - 128
+        self.r = _trunc(y + cr *  1.402)
+        self.g = _trunc(y + cb * -0.34414 + cr * -0.71414)
+        self.b = _trunc(y + cb *  1.772)
         return self.r, self.g, self.b
 
+    # YCbCr 444 to 422 to 444 (Cb/Cr means of the pixel pairs)
+    def ycbcr_resampling_model(self):
+        y, cb_cr = ycbcr444to422_fixed(self.y, self.cb, self.cr)
+        self.y, self.cb, self.cr = ycbcr422to444_fixed(y, cb_cr)
+        return self.y, self.cb, self.cr
+
     # Convert 16 bit float to 8 bit pixel
     def rgb16f2rgb_model(self):
-        self.r = []
-        self.g = []
-        self.b = []
-        for rf, gf, bf in zip(self.rf, self.gf, self.bf):
-            self.r.append(float2int(rf))
-            self.g.append(float2int(gf))
-            self.b.append(float2int(bf))
+        self.r = float2int(self.rf)
+        self.g = float2int(self.gf)
+        self.b = float2int(self.bf)
         return self.r, self.g, self.b
 
     # Convert 8 bit pixel to 16 bit float
     def rgb2rgb16f_model(self):
-        self.rf = []
-        self.gf = []
-        self.bf = []
-        for r, g, b in zip(self.r, self.g, self.b):
-            self.rf.append(int2float(r))
-            self.gf.append(int2float(g))
-            self.bf.append(int2float(b))
+        self.rf = int2float(self.r)
+        self.gf = int2float(self.g)
+        self.bf = int2float(self.b)
         return self.rf, self.gf, self.bf
 
-def int2float(x):
+
+def _int(x):
+    return np.asarray(x, np.int64)
+
+def _trunc(x):
+    # int() of each element: rounds toward zero
+    return np.trunc(x).astype(np.int64)
+
+def _result(x):
+    # Python int for scalar inputs, array otherwise
+    return x.item() if x.ndim == 0 else x
+
+def _rescale(value, from_w, to_w):
+    # csc.common.rescale: arithmetic shifts round towards -inf
+    if to_w > from_w:
+        return value << (to_w - from_w)
+    elif to_w < from_w:
+        shift = from_w - to_w
+        return (value + 2**(shift-1)) >> shift
+    else:
+        return value
+
+def _saturate(value, w):
+    return np.clip(value, 0, 2**w-1)
+
+
+def rgb2ycbcr_fixed(r, g, b, rgb_w=8, ycbcr_w=8, coef_w=None):
+    """Bit exact model of RGB2YCbCrDatapath and RGB2YCbCrDSPDatapath"""
+    if coef_w is None:
+        coef_w = default_coef_w(rgb_w, ycbcr_w)
+    coefs = rgb2ycbcr_coefs(rgb_w, coef_w)
+    r, g, b = _int(r), _int(g), _int(b)
+    rounding = 2**(coef_w-1)
+    yraw = ((coefs["ca"]*(r - g) + coefs["cb"]*(b - g) + rounding) >> coef_w) + g
+    y = yraw + coefs["yoffset"]
+    cb = ((coefs["cc"]*(b - yraw) + rounding) >> coef_w) + coefs["coffset"]
+    cr = ((coefs["cd"]*(r - yraw) + rounding) >> coef_w) + coefs["coffset"]
+    return [_result(_saturate(_rescale(v, rgb_w, ycbcr_w), ycbcr_w)) for v in [y, cb, cr]]
+
+
+def ycbcr2rgb_fixed(y, cb, cr, ycbcr_w=8, rgb_w=8, coef_w=None, dsp=False):
+    """Bit exact model of YCbCr2RGBDatapath (the two products of g rounded
+    separately) or, with dsp, of YCbCr2RGBDSPDatapath (rounded once)"""
+    if coef_w is None:
+        coef_w = default_coef_w(ycbcr_w, rgb_w)
+    coefs = ycbcr2rgb_coefs(ycbcr_w, coef_w)
+    shift = coef_w - 2
+    rounding = 2**(shift-1)
+    y = _int(y) - coefs["yoffset"]
+    cb = _int(cb) - coefs["coffset"]
+    cr = _int(cr) - coefs["coffset"]
+    r = y + ((cr*coefs["acoef"] + rounding) >> shift)
+    if dsp:
+        g = y + ((cb*coefs["bcoef"] + cr*coefs["ccoef"] + rounding) >> shift)
+    else:
+        g = y + ((cb*coefs["bcoef"] + rounding) >> shift) + ((cr*coefs["ccoef"] + rounding) >> shift)
+    b = y + ((cb*coefs["dcoef"] + rounding) >> shift)
+    return [_result(_saturate(_rescale(v, ycbcr_w, rgb_w), rgb_w)) for v in [r, g, b]]
+
+
+def ycbcr444to422_fixed(y, cb, cr):
+    """YCbCr 444 to 422: Cb01 Cr01 Cb23 Cr23..., the (truncated) means of the
+    pixel pairs"""
+    y, cb, cr = _int(y), _int(cb), _int(cr)
+    cb_cr = np.empty_like(y)
+    cb_cr[0::2] = (cb[0::2] + cb[1::2]) >> 1
+    cb_cr[1::2] = (cr[0::2] + cr[1::2]) >> 1
+    return y, cb_cr
+
+
+def ycbcr422to444_fixed(y, cb_cr):
+    """YCbCr 422 to 444: Cb and Cr repeated on the pixel pairs"""
+    cb_cr = _int(cb_cr)
+    return _int(y), np.repeat(cb_cr[0::2], 2), np.repeat(cb_cr[1::2], 2)
+
+
+def color_matrix_fixed(coefs, c0, c1, c2, out_w=8, coef_frac=14):
+    """Bit exact model of ColorMatrix (see csc.matrix.color_matrix_coefs)"""
+    c = [_int(c0), _int(c1), _int(c2)]
+    outputs = []
+    for i in range(3):
+        s = (coefs["post_offsets"][i] << coef_frac) + 2**(coef_frac-1)
+        for j in range(3):
+            s = s + coefs["matrix"][i][j]*(c[j] + coefs["pre_offsets"][j])
+        outputs.append(_result(_saturate(s >> coef_frac, out_w)))
+    return outputs
+
+
+def int2float(x, pix_w=8):
     '''
-    Converts a 8 bit unsigned int to 16 bit half precision floating
-    point represntation.Expected input is in the range [0-255]
+    Converts pix_w bits unsigned ints (scalar or array) to 16 bit half
+    precision floating point represntation (see csc.rgb2rgb16f.pix2pixf_table).
     Output is an 16 bit integer whose bit representation correspond
     to half precision float format.
     The value of float output is in the range [0-1]
     (higher precision in this range)
     '''
-    if x==0:
-        return 0
-    else:
-        y = bin(x)[2:].zfill(8)     # Unpack in string
-        for i in range(len(y)):     # Leading one detector
-            if y[i] == '1':
-                shift_val = i
-                break
-
-        sign = '0'
-        exp = 15 - 1 - shift_val
-        frac = y[shift_val+1:][::-1].zfill(10)[::-1]
-        x = sign+bin(exp)[2:].zfill(5)+frac     # Pack together in string
-        z = int(x, 2)                           # Convert string to correspondinf float
-        return z
-
-def float2int(x):
+    x = _int(x)
+    return _result((x/2**pix_w).astype(np.float16).view(np.uint16).astype(np.int64))
+
+def float2int(x, pix_w=8):
     '''
-    Converts a 16 bit half precision floating point represntation
-    to 8 bit unsigned int.
-    Output is an 16 bit integer whose bit representation correspond
-    to half precision float format.
+    Converts 16 bit half precision floating point represntations (scalar or
+    array) to pix_w bits unsigned ints, as PIXF2PIXDatapath: truncated,
+    negative numbers saturated to 0 and numbers >= 1 to 2**pix_w-1.
     Input is in the range [0-1]
-    Expected output is in the corresponding range [0-255]
-
+    Expected output is in the corresponding range [0-2**pix_w-1]
     '''
-    if x==0:
-        return 0
-    else:
-        y = bin(x)[2:].zfill(16)    # Unpack in string
-        exp = y[1:6]                # Unpack exp
-        frac = '1'+y[6:16]          # Unpack frac
-        return int(frac,2) >> (17-int(exp,2))
+    x = _int(x)
+    exp = (x >> 10) & 0x1f
+    frac = (x & 0x3ff) | 0x400
+    negative = ((x >> 15) & 1).astype(bool) & ((x & 0x7fff) <= 0x7c00)
+    # exp < 15 here, shifting by more than the 11 bits of frac gives 0
+    pix = (frac >> np.clip(14 - exp, 0, 63)) >> (11 - pix_w)
+    pix = np.where(exp >= 15, 2**pix_w-1, pix)
+    return _result(np.where(negative, 0, pix))
+
+
+# Simulation helpers
+
+def read(record, names):
+    """Values of the names fields of record (a stream endpoint...)"""
+    values = []
+    for name in names:
+        values.append((yield getattr(record, name)))
+    return values
+
+def stream_generator(sink, source, beats, in_names, out_names, results, markers=None, cycles=None):
+    """Streams beats (lists of values of in_names, first/last on the first and
+    last ones) to sink at full rate, appending the values of out_names of the
+    source beats to results until all are received. With markers, first/last
+    of the source beats are appended to it, with cycles, the number of cycles
+    taken."""
+    yield source.ready.eq(1)
+    n = 0
+    cycle = 0
+    while len(results) < len(beats):
+        if n < len(beats):
+            yield sink.valid.eq(1)
+            yield sink.first.eq(n == 0)
+            yield sink.last.eq(n == len(beats) - 1)
+            for name, value in zip(in_names, beats[n]):
+                yield getattr(sink, name).eq(value)
+        else:
+            yield sink.valid.eq(0)
+        yield
+        cycle += 1
+        if n < len(beats) and (yield sink.ready):
+            n += 1
+        if (yield source.valid):
+            results.append((yield from read(source, out_names)))
+            if markers is not None:
+                markers.append((yield from read(source, ["first", "last"])))
+    if cycles is not None:
+        cycles.append(cycle)
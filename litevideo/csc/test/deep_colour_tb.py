@@ -0,0 +1,79 @@
+import random
+import unittest
+
+from migen import *
+
+from litevideo.csc.common import default_coef_w
+from litevideo.csc.rgb2ycbcr import RGB2YCbCrDatapath, RGB2YCbCrDSPDatapath
+from litevideo.csc.ycbcr2rgb import YCbCr2RGBDatapath, YCbCr2RGBDSPDatapath
+
+from litevideo.csc.test.common import read
+
+
+prng = random.Random(42)
+
+ca, cb, cc, cd = 0.1819, 0.0618, 0.5512, 0.6495
+
+
+def rescale(value, in_w, out_w):
+    # the conversions are done at in_w bits
+    if out_w > in_w:
+        value = round(value)
+    return min(max(round(value*2**(out_w-in_w)), 0), 2**out_w-1)
+
+def rgb2ycbcr_model(pixel, in_w, out_w):
+    r, g, b = pixel
+    yraw = ca*(r - g) + cb*(b - g) + g
+    y = yraw + 2**(in_w-4)
+    cb_ = cc*(b - yraw) + 2**(in_w-1)
+    cr_ = cd*(r - yraw) + 2**(in_w-1)
+    return [rescale(v, in_w, out_w) for v in [y, cb_, cr_]]
+
+def ycbcr2rgb_model(pixel, in_w, out_w):
+    y, cb_, cr_ = pixel
+    y = y - 2**(in_w-4)
+    cb_ = cb_ - 2**(in_w-1)
+    cr_ = cr_ - 2**(in_w-1)
+    r = y + cr_/cd
+    g = y - cb/(cc*(1-ca-cb))*cb_ - ca/(cd*(1-ca-cb))*cr_
+    b = y + cb_/cc
+    return [rescale(v, in_w, out_w) for v in [r, g, b]]
+
+
+def run(datapath, pixels, in_names, out_names):
+    results = []
+    def generator():
+        yield datapath.ce.eq(1)
+        for n in range(len(pixels) + datapath.latency + 1):
+            if n < len(pixels):
+                for name, value in zip(in_names, pixels[n]):
+                    yield getattr(datapath.sink, name).eq(value)
+            yield
+            if datapath.latency <= n < datapath.latency + len(pixels):
+                results.append((yield from read(datapath.source, out_names)))
+    run_simulation(datapath, generator())
+    return results
+
+def check(testcase, datapath_cls, model, in_w, out_w, in_names, out_names):
+    pixels = [[prng.randrange(2**in_w) for i in range(3)] for j in range(256)]
+    # extremes
+    pixels += [[0, 0, 0], [2**in_w-1]*3, [2**in_w-1, 0, 0], [0, 2**in_w-1, 0], [0, 0, 2**in_w-1]]
+    datapath = datapath_cls(in_w, out_w, default_coef_w(in_w, out_w))
+    results = run(datapath, pixels, in_names, out_names)
+    testcase.assertEqual(len(results), len(pixels))
+    # 1 LSB at the conversion width
+    tolerance = 2**max(out_w - in_w, 0)
+    for pixel, result in zip(pixels, results):
+        for a, b in zip(result, model(pixel, in_w, out_w)):
+            testcase.assertLessEqual(abs(a - b), tolerance, (datapath_cls.__name__, in_w, out_w, pixel))
+
+
+if __name__ == "__main__":
+    testcase = unittest.TestCase()
+    for in_w, out_w in [(8, 8), (10, 10), (12, 12), (10, 8), (8, 10), (12, 10)]:
+        for datapath_cls in [RGB2YCbCrDatapath, RGB2YCbCrDSPDatapath]:
+            check(testcase, datapath_cls, rgb2ycbcr_model, in_w, out_w,
+                  ["r", "g", "b"], ["y", "cb", "cr"])
+        for datapath_cls in [YCbCr2RGBDatapath, YCbCr2RGBDSPDatapath]:
+            check(testcase, datapath_cls, ycbcr2rgb_model, in_w, out_w,
+                  ["y", "cb", "cr"], ["r", "g", "b"])
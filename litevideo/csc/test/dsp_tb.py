@@ -0,0 +1,60 @@
+import random
+import unittest
+
+from migen import *
+
+from litevideo.csc.rgb2ycbcr import RGB2YCbCrDatapath, RGB2YCbCrDSPDatapath
+from litevideo.csc.ycbcr2rgb import YCbCr2RGBDatapath, YCbCr2RGBDSPDatapath
+
+from litevideo.csc.test.common import read
+
+
+prng = random.Random(42)
+
+pixels = [[prng.randrange(256) for i in range(3)] for j in range(256)]
+
+
+class TB(Module):
+    def __init__(self, datapath_cls, dsp_datapath_cls):
+        self.submodules.datapath = datapath_cls(8, 8, 8)
+        self.submodules.dsp_datapath = dsp_datapath_cls(8, 8, 8)
+        self.comb += [
+            self.datapath.ce.eq(1),
+            self.dsp_datapath.ce.eq(1),
+            self.dsp_datapath.sink.eq(self.datapath.sink)
+        ]
+
+
+def run(datapath_cls, dsp_datapath_cls, in_names, out_names):
+    tb = TB(datapath_cls, dsp_datapath_cls)
+    results = []
+    dsp_results = []
+    def generator():
+        latency = tb.datapath.latency
+        dsp_latency = tb.dsp_datapath.latency
+        for n in range(len(pixels) + max(latency, dsp_latency) + 1):
+            if n < len(pixels):
+                for name, value in zip(in_names, pixels[n]):
+                    yield getattr(tb.datapath.sink, name).eq(value)
+            yield
+            if latency <= n < latency + len(pixels):
+                results.append((yield from read(tb.datapath.source, out_names)))
+            if dsp_latency <= n < dsp_latency + len(pixels):
+                dsp_results.append((yield from read(tb.dsp_datapath.source, out_names)))
+    run_simulation(tb, generator())
+    return results, dsp_results
+
+if __name__ == "__main__":
+    testcase = unittest.TestCase()
+
+    results, dsp_results = run(RGB2YCbCrDatapath, RGB2YCbCrDSPDatapath,
+                               ["r", "g", "b"], ["y", "cb", "cr"])
+    testcase.assertEqual(len(results), len(pixels))
+    testcase.assertEqual(results, dsp_results)
+
+    results, dsp_results = run(YCbCr2RGBDatapath, YCbCr2RGBDSPDatapath,
+                               ["y", "cb", "cr"], ["r", "g", "b"])
+    testcase.assertEqual(len(dsp_results), len(pixels))
+    for result, dsp_result in zip(results, dsp_results):
+        for a, b in zip(result, dsp_result):
+            testcase.assertLessEqual(abs(a - b), 1)
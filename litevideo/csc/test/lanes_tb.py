@@ -0,0 +1,82 @@
+import random
+import unittest
+
+from migen import *
+
+from litevideo.csc.rgb2ycbcr import RGB2YCbCr
+from litevideo.csc.ycbcr2rgb import YCbCr2RGB
+from litevideo.csc.rgb2rgb16f import RGB2RGB16f
+from litevideo.csc.rgb16f2rgb import RGB16f2RGB
+from litevideo.csc.ycbcr444to422 import YCbCr444to422
+from litevideo.csc.ycbcr422to444 import YCbCr422to444
+
+from litevideo.csc.test.common import stream_generator
+
+
+prng = random.Random(42)
+
+lanes = 2
+
+
+def stream(actor, beats, in_names, out_names, markers=None):
+    """Streams beats (lists of values of in_names) through actor, with
+    markers, first/last of the output beats are appended to it"""
+    results = []
+    run_simulation(actor, stream_generator(actor.sink, actor.source, beats,
+                                           in_names, out_names, results, markers))
+    return results
+
+def pack(pixels, w):
+    beats = []
+    for i in range(0, len(pixels), lanes):
+        beat = []
+        for c in range(len(pixels[0])):
+            beat.append(sum(pixels[i + j][c] << (j*w) for j in range(lanes)))
+        beats.append(beat)
+    return beats
+
+def unpack(beats, w):
+    pixels = []
+    for beat in beats:
+        for j in range(lanes):
+            pixels.append([(v >> (j*w)) & (2**w-1) for v in beat])
+    return pixels
+
+def check(testcase, actor_cls, kwargs, in_names, in_w, out_names, out_w, pixels):
+    results = stream(actor_cls(**kwargs), pixels, in_names, out_names)
+    lanes_results = stream(actor_cls(lanes=lanes, **kwargs), pack(pixels, in_w),
+                           in_names, out_names)
+    testcase.assertEqual(results, unpack(lanes_results, out_w))
+
+
+if __name__ == "__main__":
+    testcase = unittest.TestCase()
+
+    pixels = [[prng.randrange(256) for i in range(3)] for j in range(64)]
+    check(testcase, RGB2YCbCr, {}, ["r", "g", "b"], 8, ["y", "cb", "cr"], 8, pixels)
+    check(testcase, RGB2YCbCr, {"dsp": True}, ["r", "g", "b"], 8, ["y", "cb", "cr"], 8, pixels)
+    check(testcase, YCbCr2RGB, {}, ["y", "cb", "cr"], 8, ["r", "g", "b"], 8, pixels)
+    check(testcase, RGB2RGB16f, {}, ["r", "g", "b"], 8, ["rf", "gf", "bf"], 16, pixels)
+
+    pixels16f = stream(RGB2RGB16f(), pixels, ["r", "g", "b"], ["rf", "gf", "bf"])
+    check(testcase, RGB16f2RGB, {}, ["rf", "gf", "bf"], 16, ["r", "g", "b"], 8, pixels16f)
+
+    # 444 to 422: cb/cr means of the pixel pairs
+    results = unpack(stream(YCbCr444to422(lanes=lanes), pack(pixels, 8),
+                            ["y", "cb", "cr"], ["y", "cb_cr"]), 8)
+    for i in range(0, len(pixels), 2):
+        p0, p1 = pixels[i], pixels[i+1]
+        testcase.assertEqual(results[i], [p0[0], (p0[1] + p1[1])//2])
+        testcase.assertEqual(results[i+1], [p1[0], (p0[2] + p1[2])//2])
+
+    # 422 to 444: cb/cr shared by the pixel pairs, first/last forwarded
+    markers = []
+    beats = pack(results, 8)
+    results = unpack(stream(YCbCr422to444(lanes=lanes), beats,
+                            ["y", "cb_cr"], ["y", "cb", "cr"], markers), 8)
+    testcase.assertEqual(markers, [[int(i == 0), int(i == len(beats) - 1)] for i in range(len(beats))])
+    for i in range(0, len(pixels), 2):
+        p0, p1 = pixels[i], pixels[i+1]
+        cb, cr = (p0[1] + p1[1])//2, (p0[2] + p1[2])//2
+        testcase.assertEqual(results[i], [p0[0], cb, cr])
+        testcase.assertEqual(results[i+1], [p1[0], cb, cr])
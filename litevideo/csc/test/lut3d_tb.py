@@ -0,0 +1,74 @@
+import random
+import unittest
+from itertools import permutations
+
+from migen import *
+
+from litevideo.csc.lut3d import LUT3D, lut3d_table, lut3d_identity
+
+from litevideo.csc.test.common import read
+
+
+prng = random.Random(42)
+
+pixels = [[prng.randrange(256) for i in range(3)] for j in range(256)]
+pixels += [[0, 0, 0], [255, 255, 255], [255, 0, 0], [0, 255, 0], [0, 0, 255], [16, 16, 16]]
+
+
+def grade(r, g, b):
+    # saturation boost and warm tint, clipped by lut3d_table
+    y = 0.2126*r + 0.7152*g + 0.0722*b
+    return [y + 1.3*(r - y) + 0.05, y + 1.3*(g - y), y + 1.3*(b - y) - 0.05]
+
+
+def tetrahedral_model(pixel, table, size, dw, out_w):
+    frac_w = dw - (size - 1).bit_length() + 1
+    index = [x >> frac_w for x in pixel]
+    frac = [x & (2**frac_w-1) for x in pixel]
+    def node(offset):
+        i, j, k = [a + b for a, b in zip(index, offset)]
+        return table[(i*size + j)*size + k]
+    for order in permutations(range(3)):
+        if frac[order[0]] >= frac[order[1]] >= frac[order[2]]:
+            break
+    first = [int(i == order[0]) for i in range(3)]
+    second = [int(i in order[:2]) for i in range(3)]
+    v = [node([0, 0, 0]), node(first), node(second), node([1, 1, 1])]
+    f = [frac[axis] for axis in order]
+    result = []
+    for c in range(3):
+        s = (v[0][c] << frac_w) + sum(f[i]*(v[i+1][c] - v[i][c]) for i in range(3))
+        s = (s + 2**(frac_w-1)) >> frac_w
+        result.append(min(max(s, 0), 2**out_w-1))
+    return result
+
+
+def run(dut):
+    results = []
+    def generator():
+        yield dut.source.ready.eq(1)
+        yield dut.sink.valid.eq(1)
+        for n in range(len(pixels) + dut.datapath.latency):
+            if n < len(pixels):
+                for name, value in zip(["r", "g", "b"], pixels[n]):
+                    yield getattr(dut.sink, name).eq(value)
+            yield
+            if dut.datapath.latency <= n < dut.datapath.latency + len(pixels):
+                results.append((yield from read(dut.source, ["r", "g", "b"])))
+    run_simulation(dut, generator())
+    return results
+
+
+if __name__ == "__main__":
+    testcase = unittest.TestCase()
+
+    # identity is exact
+    dut = ClockDomainsRenamer({"write": "sys"})(LUT3D())
+    testcase.assertEqual(run(dut), pixels)
+
+    # tetrahedral interpolation, 17 and 33 nodes
+    for size in [17, 33]:
+        table = lut3d_table(grade, size)
+        dut = ClockDomainsRenamer({"write": "sys"})(LUT3D(size, table=table))
+        expected = [tetrahedral_model(pixel, table, size, 8, 8) for pixel in pixels]
+        testcase.assertEqual(run(dut), expected)
@@ -0,0 +1,81 @@
+import random
+import unittest
+
+from migen import *
+
+from litevideo.csc.lut import LUT1D, gamma_table
+
+from litevideo.csc.test.common import read
+
+
+prng = random.Random(42)
+
+pixels = [[prng.randrange(256) for i in range(3)] for j in range(64)]
+tables = [gamma_table(2.2, 8, 8), [255 - i for i in range(256)], gamma_table(1/2.2, 8, 8)]
+
+
+def stream(dut, results):
+    yield dut.source.ready.eq(1)
+    yield dut.sink.valid.eq(1)
+    for n in range(len(pixels) + dut.latency):
+        if n < len(pixels):
+            for name, value in zip(["r", "g", "b"], pixels[n]):
+                yield getattr(dut.sink, name).eq(value)
+        yield
+        if dut.latency <= n < dut.latency + len(pixels):
+            results.append((yield from read(dut.source, ["r", "g", "b"])))
+    yield dut.sink.valid.eq(0)
+    yield
+
+def vsync(dut):
+    yield dut.vsync.eq(1)
+    yield
+    yield dut.vsync.eq(0)
+    for i in range(4):
+        yield
+
+def generator(dut, testcase):
+    # identity tables
+    results = []
+    yield from stream(dut, results)
+    testcase.assertEqual(results, pixels)
+
+    # write the tables in bank 1: r through the table endpoint, g and b through the CSRs
+    for adr, data in enumerate(tables[0]):
+        yield dut.table.valid.eq(1)
+        yield dut.table.channel.eq(0)
+        yield dut.table.adr.eq(256 + adr)
+        yield dut.table.data.eq(data)
+        yield
+    yield dut.table.valid.eq(0)
+    for channel in [1, 2]:
+        yield dut._table_channel.storage.eq(channel)
+        for adr, data in enumerate(tables[channel]):
+            yield dut._table_adr.storage.eq(256 + adr)
+            yield dut._table_dat_w.storage.eq(data)
+            yield dut._table_we.re.eq(1)
+            yield
+        yield dut._table_we.re.eq(0)
+
+    # bank 0 is still used until the swap
+    results = []
+    yield from stream(dut, results)
+    testcase.assertEqual(results, pixels)
+    yield dut._bank.storage.eq(1)
+    for i in range(4):
+        yield
+    results = []
+    yield from stream(dut, results)
+    testcase.assertEqual(results, pixels)
+
+    yield from vsync(dut)
+    testcase.assertEqual((yield dut._active_bank.status), 1)
+    results = []
+    yield from stream(dut, results)
+    testcase.assertEqual(results, [[table[v] for table, v in zip(tables, pixel)] for pixel in pixels])
+
+
+if __name__ == "__main__":
+    testcase = unittest.TestCase()
+    dut = ClockDomainsRenamer({"write": "sys"})(LUT1D())
+    run_simulation(dut, generator(dut, testcase))
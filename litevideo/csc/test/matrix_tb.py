@@ -0,0 +1,80 @@
+import random
+import unittest
+
+import numpy as np
+
+from migen import *
+
+from litevideo.csc.matrix import *
+
+from litevideo.csc.test.common import color_matrix_fixed
+
+
+prng = random.Random(42)
+
+coef_frac = 14
+
+bt601 = color_matrix_coefs(*rgb2ycbcr_matrix("bt601", True), coef_frac)
+bt709 = color_matrix_coefs(*rgb2ycbcr_matrix("bt709", False), coef_frac)
+
+pixels = [[prng.randrange(256) for i in range(3)] for j in range(128)]
+reference = []
+for coefs in [bt601, bt709]:
+    reference += np.stack(color_matrix_fixed(coefs, *np.array(pixels).T, 8, coef_frac), 1).tolist()
+results = []
+
+
+def main_generator(dut):
+    # BT.601 limited (reset values)
+    for pixel in pixels:
+        yield from send(dut, pixel)
+    while len(results) < len(pixels):
+        yield
+    # BT.709 full, latched on vsync
+    yield dut._hold.storage.eq(1)
+    yield
+    for i in range(3):
+        for j in range(3):
+            yield getattr(dut, "_m{}{}".format(i, j)).storage.eq(bt709["matrix"][i][j] & (2**18-1))
+        yield getattr(dut, "_pre_offset{}".format(i)).storage.eq(bt709["pre_offsets"][i] & 0x1ff)
+        yield getattr(dut, "_post_offset{}".format(i)).storage.eq(bt709["post_offsets"][i] & 0x1ff)
+    for i in range(4):
+        yield
+    yield dut._hold.storage.eq(0)
+    for i in range(4):
+        yield
+    yield dut.vsync.eq(1)
+    yield
+    yield dut.vsync.eq(0)
+    yield
+    for pixel in pixels:
+        yield from send(dut, pixel)
+    while len(results) < 2*len(pixels):
+        yield
+
+def send(dut, pixel):
+    yield dut.sink.valid.eq(1)
+    for name, value in zip(["r", "g", "b"], pixel):
+        yield getattr(dut.sink, name).eq(value)
+    yield
+    while not (yield dut.sink.ready):
+        yield
+    yield dut.sink.valid.eq(0)
+
+@passive
+def source_generator(dut):
+    while True:
+        if (yield dut.source.valid) and (yield dut.source.ready):
+            result = []
+            for name in ["y", "cb", "cr"]:
+                result.append((yield getattr(dut.source, name)))
+            results.append(result)
+        yield dut.source.ready.eq(prng.randrange(2))
+        yield
+
+if __name__ == "__main__":
+    dut = ColorMatrix(coefs=bt601)
+    run_simulation(dut, [main_generator(dut), source_generator(dut)], vcd_name="sim.vcd")
+
+    testcase = unittest.TestCase()
+    testcase.assertEqual(results, reference)
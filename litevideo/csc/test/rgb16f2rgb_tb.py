@@ -1,3 +1,5 @@
+import numpy as np
+
 from migen import *
 
 from litex.soc.interconnect.stream import *
@@ -40,13 +42,18 @@ def main_generator(dut):
     raw_image = RAWImage(None, "lena.png", 64)
     raw_image.rgb2rgb16f_model()
     raw_image.pack_rgb16f()
-    packet = Packet(raw_image.data)
+    packet = Packet(raw_image.data.tolist())
     dut.streamer.send(packet)
     yield from dut.logger.receive()
     raw_image.set_data(dut.logger.packet)
     raw_image.unpack_rgb()
     raw_image.save("lena_rgb16f2rgb.png")
 
+    # check against the model
+    reference = RAWImage(None, "lena.png", 64)
+    for name in ["r", "g", "b"]:
+        np.testing.assert_array_equal(getattr(raw_image, name), getattr(reference, name), name)
+
 
 if __name__ == "__main__":
     tb = TB()
@@ -0,0 +1,51 @@
+import random
+import unittest
+
+from migen import *
+
+from litevideo.csc.rgb2rgb16f import RGB2RGB16f
+from litevideo.csc.rgb16f2rgb import RGB16f2RGB
+
+from litevideo.csc.test.common import int2float, float2int, read, stream_generator
+
+
+prng = random.Random(42)
+
+pixels = [[prng.randrange(256) for i in range(3)] for j in range(1024)]
+pixels += [[0, 0, 0], [255, 255, 255], [1, 128, 254]]
+
+
+class TB(Module):
+    def __init__(self):
+        self.submodules.rgb2rgb16f = RGB2RGB16f()
+        self.submodules.rgb16f2rgb = RGB16f2RGB()
+        self.comb += self.rgb2rgb16f.source.connect(self.rgb16f2rgb.sink)
+        self.latency = self.rgb2rgb16f.latency + self.rgb16f2rgb.latency
+
+
+@passive
+def float_monitor(source, floats):
+    while True:
+        yield
+        if (yield source.valid):
+            floats.append((yield from read(source, ["rf", "gf", "bf"])))
+
+
+if __name__ == "__main__":
+    testcase = unittest.TestCase()
+    tb = TB()
+    floats, results, cycles = [], [], []
+    generators = [
+        stream_generator(tb.rgb2rgb16f.sink, tb.rgb16f2rgb.source, pixels, ["r", "g", "b"],
+                         ["r", "g", "b"], results, cycles=cycles),
+        float_monitor(tb.rgb2rgb16f.source, floats)
+    ]
+    run_simulation(tb, generators)
+
+    # values
+    testcase.assertEqual(floats, [[int2float(v) for v in pixel] for pixel in pixels])
+    testcase.assertEqual(results, [[float2int(int2float(v)) for v in pixel] for pixel in pixels])
+    testcase.assertEqual(results, pixels)
+
+    # throughput: 1 pixel/clock, after the latency of the pipeline
+    testcase.assertEqual(cycles[0], len(pixels) + tb.latency)
@@ -1,3 +1,5 @@
+import numpy as np
+
 from migen import *
 
 from litex.soc.interconnect.stream import *
@@ -40,11 +42,18 @@ def main_generator(dut):
         # convert image using rgb2ycbcr implementation
         raw_image = RAWImage(None, "lena.png", 64)
         raw_image.pack_rgb()
-        packet = Packet(raw_image.data)
+        packet = Packet(raw_image.data.tolist())
         dut.streamer.send(packet)
         yield from dut.logger.receive()
         raw_image.set_data(dut.logger.packet)
         raw_image.unpack_rgb16f()
+
+        # check against the model
+        reference = RAWImage(None, "lena.png", 64)
+        reference.rgb2rgb16f_model()
+        for name in ["rf", "gf", "bf"]:
+            np.testing.assert_array_equal(getattr(raw_image, name), getattr(reference, name), name)
+
         raw_image.rgb16f2rgb_model()
         raw_image.save("lena_rgb2rgb16f.png")
 
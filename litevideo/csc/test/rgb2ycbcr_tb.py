@@ -1,3 +1,5 @@
+import numpy as np
+
 from migen import *
 
 from litex.soc.interconnect.stream import *
@@ -41,11 +43,18 @@ def main_generator(dut):
     # convert image using rgb2ycbcr implementation
     raw_image = RAWImage(rgb2ycbcr_coefs(8), "lena.png", 64)
     raw_image.pack_rgb()
-    packet = Packet(raw_image.data)
+    packet = Packet(raw_image.data.tolist())
     dut.streamer.send(packet)
     yield from dut.logger.receive()
     raw_image.set_data(dut.logger.packet)
     raw_image.unpack_ycbcr()
+
+    # check against the bit exact model
+    reference = RAWImage(None, "lena.png", 64)
+    reference.rgb2ycbcr_fixed()
+    for name in ["y", "cb", "cr"]:
+        np.testing.assert_array_equal(getattr(raw_image, name), getattr(reference, name), name)
+
     raw_image.ycbcr2rgb()
     raw_image.save("lena_rgb2ycbcr.png")
 
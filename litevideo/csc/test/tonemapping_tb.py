@@ -0,0 +1,46 @@
+import random
+import unittest
+from fractions import Fraction
+
+from migen import *
+
+from litevideo.csc.rgb2rgb16f import pix2pixf_table
+from litevideo.csc.tonemapping import ToneMapping, float16
+from litevideo.float_arithmetic.test.common import Format
+from litevideo.csc.test.common import stream_generator
+
+
+prng = random.Random(42)
+
+in_w = 10
+exposure = 4.0
+white = 2.0
+
+pixels = [[prng.randrange(2**in_w) for i in range(3)] for j in range(64)]
+pixels += [[0, 0, 0], [2**in_w-1, 2**in_w-1, 2**in_w-1], [1, 128, 512]]
+
+
+def model(pix):
+    fmt = Format(16, 5)
+    one = fmt.encode(1)
+    x = fmt.fma(pix2pixf_table(in_w)[pix], float16(exposure), 0)
+    n = fmt.fma(x, fmt.fma(x, float16(1/white**2), one), 0)
+    out = fmt.decode(fmt.div(n, fmt.fma(x, one, one)))
+    # truncated, saturated to 8 bits
+    return min(int(out*256), 255)
+
+
+if __name__ == "__main__":
+    testcase = unittest.TestCase()
+    dut = ToneMapping(in_w, 8, exposure=exposure, white=white)
+    results, cycles = [], []
+    run_simulation(dut, stream_generator(dut.sink, dut.source, pixels, ["r", "g", "b"],
+                                         ["r", "g", "b"], results, cycles=cycles))
+
+    # values
+    testcase.assertEqual(results, [[model(v) for v in pixel] for pixel in pixels])
+    # white is mapped to white
+    testcase.assertEqual(model(round(white/exposure*2**in_w)), 255)
+
+    # throughput: 1 pixel/clock, after the latency of the pipeline
+    testcase.assertEqual(cycles[0], len(pixels) + dut.latency)
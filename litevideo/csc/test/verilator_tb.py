@@ -0,0 +1,57 @@
+import numpy as np
+
+from migen import *
+
+from litevideo.csc.rgb2ycbcr import RGB2YCbCr
+from litevideo.csc.ycbcr2rgb import YCbCr2RGB
+from litevideo.sim.verilator import *
+
+from litevideo.csc.test.common import *
+
+
+# 1080p frame of random pixels
+n = 1920*1080
+
+prng = np.random.RandomState(42)
+
+
+def main_generator(sink):
+    while len(sink.data) < n:
+        yield Cycles(65536)
+
+def run(actor, in_names, out_names, words, build_dir):
+    source = StreamSource(actor.sink, in_names, n)
+    sink = StreamSink(actor.source, out_names, n)
+    sim = VerilatorSim(actor, models=[source, sink], build_dir=build_dir)
+    source.send(words)
+    sim.run(main_generator(sink))
+    sim.close()
+    return sink.data
+
+
+if __name__ == "__main__":
+    # rgb2ycbcr
+    raw_image = RAWImage(None)
+    raw_image.set_rgb(*prng.randint(0, 256, (3, n)))
+    words = raw_image.pack_rgb()
+    reference = RAWImage(None)
+    reference.set_rgb(raw_image.r, raw_image.g, raw_image.b)
+    reference.rgb2ycbcr_fixed()
+    raw_image.set_data(run(RGB2YCbCr(), ["b", "g", "r"], ["cr", "cb", "y"], words,
+                           "build_verilator_rgb2ycbcr"))
+    raw_image.unpack_ycbcr()
+    for name in ["y", "cb", "cr"]:
+        np.testing.assert_array_equal(getattr(raw_image, name), getattr(reference, name), name)
+
+    # ycbcr2rgb (dsp)
+    raw_image = RAWImage(None)
+    raw_image.set_ycbcr(*prng.randint(0, 256, (3, n)))
+    words = raw_image.pack_ycbcr()
+    reference = RAWImage(None)
+    reference.set_ycbcr(raw_image.y, raw_image.cb, raw_image.cr)
+    reference.ycbcr2rgb_fixed(dsp=True)
+    raw_image.set_data(run(YCbCr2RGB(dsp=True), ["cr", "cb", "y"], ["b", "g", "r"], words,
+                           "build_verilator_ycbcr2rgb"))
+    raw_image.unpack_rgb()
+    for name in ["r", "g", "b"]:
+        np.testing.assert_array_equal(getattr(raw_image, name), getattr(reference, name), name)
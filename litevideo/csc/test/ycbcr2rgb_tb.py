@@ -1,3 +1,5 @@
+import numpy as np
+
 from migen import *
 
 from litex.soc.interconnect.stream import *
@@ -41,13 +43,20 @@ def main_generator(dut):
     raw_image = RAWImage(ycbcr2rgb_coefs(8), "lena.png", 64)
     raw_image.rgb2ycbcr()
     raw_image.pack_ycbcr()
-    packet = Packet(raw_image.data)
+    packet = Packet(raw_image.data.tolist())
     dut.streamer.send(packet)
     yield from dut.logger.receive()
     raw_image.set_data(dut.logger.packet)
     raw_image.unpack_rgb()
     raw_image.save("lena_ycbcr2rgb.png")
 
+    # check against the bit exact model
+    reference = RAWImage(None, "lena.png", 64)
+    reference.rgb2ycbcr()
+    reference.ycbcr2rgb_fixed()
+    for name in ["r", "g", "b"]:
+        np.testing.assert_array_equal(getattr(raw_image, name), getattr(reference, name), name)
+
 
 if __name__ == "__main__":
     tb = TB()
@@ -28,6 +28,8 @@ sink_cb_cr = reference_cb_cr
 source_y = []
 source_cb = []
 source_cr = []
+source_first = []
+source_last = []
 
 
 def sink_generator(sink, rand_threshold=100):
@@ -38,6 +40,8 @@ def sink_generator(sink, rand_threshold=100):
             valid = (prng.randrange(100) < rand_threshold)
             if valid:
                 yield sink.valid.eq(1)
+                yield sink.first.eq(i == 0)
+                yield sink.last.eq(i == len(sink_cb_cr) - 1)
                 yield sink.y.eq(sink_y[i])
                 yield sink.cb_cr.eq(sink_cb_cr[i])
                 yield
@@ -60,6 +64,8 @@ def source_generator(source, rand_threshold=100):
             source_y.append((yield source.y))
             source_cb.append((yield source.cb))
             source_cr.append((yield source.cr))
+            source_first.append((yield source.first))
+            source_last.append((yield source.last))
         ready = (prng.randrange(100) < rand_threshold)
         yield source.ready.eq(ready)
         yield
@@ -76,3 +82,5 @@ if __name__ == "__main__":
     testcase.assertEqual(source_y, reference_y)
     testcase.assertEqual(source_cb, reference_cb)
     testcase.assertEqual(source_cr, reference_cr)
+    testcase.assertEqual(source_first, [1] + [0]*(len(reference_y) - 1))
+    testcase.assertEqual(source_last, [0]*(len(reference_y) - 1) + [1])
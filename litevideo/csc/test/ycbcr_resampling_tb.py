@@ -1,3 +1,7 @@
+import random
+
+import numpy as np
+
 from migen import *
 
 from litex.soc.interconnect.stream import *
@@ -16,9 +20,12 @@ class TB(Module):
         self.submodules.ycbcr444to422 = YCbCr444to422()
         self.submodules.ycbcr422to444 = YCbCr422to444()
         self.submodules.logger = PacketLogger(EndpointDescription([("data", 24)]))
+        self.bubble = Signal()
 
         self.comb += [
-            self.streamer.source.connect(self.ycbcr444to422.sink, omit=["data"]),
+            self.streamer.source.connect(self.ycbcr444to422.sink, omit=["data", "valid", "ready"]),
+            self.ycbcr444to422.sink.valid.eq(self.streamer.source.valid & ~self.bubble),
+            self.streamer.source.ready.eq(self.ycbcr444to422.sink.ready & ~self.bubble),
             self.ycbcr444to422.sink.payload.y.eq(self.streamer.source.data[16:24]),
             self.ycbcr444to422.sink.payload.cb.eq(self.streamer.source.data[8:16]),
             self.ycbcr444to422.sink.payload.cr.eq(self.streamer.source.data[0:8]),
@@ -32,7 +39,15 @@ class TB(Module):
         ]
 
 
-def main_generator(dut):
+@passive
+def bubble_generator(dut, prng):
+    # random bubbles at the input of ycbcr444to422
+    while True:
+        yield dut.bubble.eq(prng.randrange(4) == 0)
+        yield
+
+
+def main_generator(dut, filename):
     for i in range(16):
         yield
 
@@ -40,21 +55,39 @@ def main_generator(dut):
     raw_image = RAWImage(None, "lena.png", 64)
     raw_image.rgb2ycbcr()
     raw_image.pack_ycbcr()
-    packet = Packet(raw_image.data)
+    packet = Packet(raw_image.data.tolist())
     dut.streamer.send(packet)
-    yield from dut.logger.receive()
+    yield from dut.logger.receive(raw_image.length)
     raw_image.set_data(dut.logger.packet)
     raw_image.unpack_ycbcr()
+
+    # check against the bit exact models
+    reference = RAWImage(None, "lena.png", 64)
+    reference.rgb2ycbcr()
+    y, cb_cr = ycbcr444to422_fixed(reference.y, reference.cb, reference.cr)
+    for name, expected in zip(["y", "cb", "cr"], ycbcr422to444_fixed(y, cb_cr)):
+        np.testing.assert_array_equal(getattr(raw_image, name), expected, name)
+
     raw_image.ycbcr2rgb()
-    raw_image.save("lena_resampling.png")
+    raw_image.save(filename)
 
 if __name__ == "__main__":
-    tb = TB()
-    generators = {"sys" : [main_generator(tb)]}
-    generators = {
-        "sys" :   [main_generator(tb),
-                   tb.streamer.generator(),
-                   tb.logger.generator()]
-    }
-    clocks = {"sys": 10}
-    run_simulation(tb, generators, clocks, vcd_name="sim.vcd")
+    # resample image using the model
+    raw_image = RAWImage(None, "lena.png", 64)
+    raw_image.rgb2ycbcr()
+    raw_image.ycbcr_resampling_model()
+    raw_image.ycbcr2rgb()
+    raw_image.save("lena_resampling_reference.png")
+
+    # continuous stream, then with bubbles between (and inside) the pixel pairs
+    for name, bubbles in [("lena_resampling.png", False), ("lena_resampling_bubbles.png", True)]:
+        tb = TB()
+        generators = {
+            "sys" :   [main_generator(tb, name),
+                       tb.streamer.generator(),
+                       tb.logger.generator()]
+        }
+        if bubbles:
+            generators["sys"].append(bubble_generator(tb, random.Random(42)))
+        clocks = {"sys": 10}
+        run_simulation(tb, generators, clocks, vcd_name="sim.vcd")
@@ -0,0 +1,175 @@
+# tone mapping
+
+from struct import pack, unpack
+
+from migen import *
+from migen.genlib.cdc import MultiReg
+
+from litex.soc.interconnect.stream import *
+from litex.soc.interconnect.csr import *
+
+from litevideo.csc.common import *
+from litevideo.csc.rgb2rgb16f import RGB2RGB16f
+from litevideo.csc.rgb16f2rgb import RGB16f2RGB
+from litevideo.float_arithmetic.common import delay
+from litevideo.float_arithmetic.floatfma import FloatFMADatapath
+from litevideo.float_arithmetic.floatdiv import FloatDivDatapath
+
+
+def float16(value):
+    """Half precision float of value, for the CSRs of ToneMapping"""
+    return unpack("<H", pack("<e", value))[0]
+
+
+@CEInserter()
+class ReinhardDatapath(Module):
+    """
+    Extended Reinhard operator on floats:
+    x = exposure*pixf, pixf = x*(1 + x*inv_white2)/(1 + x), x = 1/sqrt(inv_white2)
+    being mapped to 1.
+    """
+    def __init__(self, pixf_w=16, exp_w=5):
+        self.sink = sink = Record(pixf_layout(pixf_w))
+        self.source = source = Record(pixf_layout(pixf_w))
+        self.exposure = Signal(pixf_w)
+        self.inv_white2 = Signal(pixf_w)
+
+        # # #
+
+        one = (2**(exp_w-1) - 1) << (pixf_w - 1 - exp_w)
+
+        # Hardware implementation:
+        #   fused multiply-adds x = exposure*pixf + 0, then t = x*inv_white2 + 1
+        #   and d = x*1 + 1, then n = x*t + 0, and division n/d. The units are
+        #   clock enabled by this datapath.
+        exposure = FloatFMADatapath(pixf_w, exp_w)
+        white = FloatFMADatapath(pixf_w, exp_w)
+        denominator = FloatFMADatapath(pixf_w, exp_w)
+        numerator = FloatFMADatapath(pixf_w, exp_w)
+        division = FloatDivDatapath(pixf_w, exp_w)
+        units = [exposure, white, denominator, numerator, division]
+        self.submodules += units
+        self.comb += [unit.ce.eq(1) for unit in units]
+        fma_latency = FloatFMADatapath.latency
+        self.latency = 3*fma_latency + division.latency
+
+        # stages 1 to 5
+        # x
+        self.comb += [
+            exposure.sink.in1.eq(sink.pixf),
+            exposure.sink.in2.eq(self.exposure),
+            exposure.sink.in3.eq(0)
+        ]
+        x = exposure.source.out
+
+        # stages 6 to 10
+        # 1 + x*inv_white2 and 1 + x
+        self.comb += [
+            white.sink.in1.eq(x),
+            white.sink.in2.eq(delay(self, self.inv_white2, fma_latency)),
+            white.sink.in3.eq(one),
+            denominator.sink.in1.eq(x),
+            denominator.sink.in2.eq(one),
+            denominator.sink.in3.eq(one)
+        ]
+
+        # stages 11 to 15
+        # x*(1 + x*inv_white2)
+        self.comb += [
+            numerator.sink.in1.eq(delay(self, x, fma_latency)),
+            numerator.sink.in2.eq(white.source.out),
+            numerator.sink.in3.eq(0)
+        ]
+
+        # last stages
+        # division
+        self.comb += [
+            division.sink.in1.eq(numerator.source.out),
+            division.sink.in2.eq(delay(self, denominator.source.out, fma_latency)),
+            source.pixf.eq(division.source.out)
+        ]
+
+
+class Reinhard(PipelinedActor, Module):
+    """Extended Reinhard operator on RGB 16 bit floats (see ReinhardDatapath)
+
+    Converts lanes pixels per beat, lane 0 in the LSBs of each component.
+    """
+    def __init__(self, rgb16f_w=16, lanes=1):
+        self.sink = sink = stream.Endpoint(EndpointDescription(rgb16f_layout(rgb16f_w*lanes)))
+        self.source = source = stream.Endpoint(EndpointDescription(rgb16f_layout(rgb16f_w*lanes)))
+        self.exposure = Signal(rgb16f_w)
+        self.inv_white2 = Signal(rgb16f_w)
+
+        # # #
+
+        self.datapaths = []
+        for i in range(lanes):
+            for name in ["rf", "gf", "bf"]:
+                datapath = ReinhardDatapath(rgb16f_w)
+                self.submodules += datapath
+                self.datapaths.append(datapath)
+                self.comb += [
+                    datapath.exposure.eq(self.exposure),
+                    datapath.inv_white2.eq(self.inv_white2),
+                    datapath.sink.pixf.eq(lane(getattr(sink, name), i, rgb16f_w)),
+                    lane(getattr(source, name), i, rgb16f_w).eq(datapath.source.pixf)
+                ]
+        PipelinedActor.__init__(self, self.datapaths[0].latency)
+        self.comb += [datapath.ce.eq(self.pipe_ce) for datapath in self.datapaths]
+
+
+class ToneMapping(Module, AutoCSR):
+    """Tone mapping
+
+    Maps in_w bits HDR components (in [0-1], scaled by exposure) to out_w bits
+    SDR components with the extended Reinhard operator, in half precision
+    floats (RGB2RGB16f, Reinhard, RGB16f2RGB), at lanes pixels per clock.
+
+    exposure and inv_white2 (1/white**2, 0 for the plain x/(1 + x)) are
+    half precision floats (see float16). They are double buffered: the CSRs
+    are copied to the datapath on the vsync rising edges, unless hold is set.
+    The CSRs are synchronized to sys, the pixel clock domain (renamed as with
+    LUT1D).
+    """
+    def __init__(self, in_w=10, out_w=8, lanes=1, exposure=1.0, white=None):
+        self.sink = sink = stream.Endpoint(EndpointDescription(rgb_layout(in_w*lanes)))
+        self.source = source = stream.Endpoint(EndpointDescription(rgb_layout(out_w*lanes)))
+        self.vsync = Signal()
+
+        exposure = float16(exposure)
+        inv_white2 = 0 if white is None else float16(1/white**2)
+        self._hold = CSRStorage()
+        self._exposure = CSRStorage(16, reset=exposure)
+        self._inv_white2 = CSRStorage(16, reset=inv_white2)
+
+        # # #
+
+        self.submodules.rgb2rgb16f = RGB2RGB16f(in_w, 16, lanes)
+        self.submodules.reinhard = Reinhard(16, lanes)
+        self.submodules.rgb16f2rgb = RGB16f2RGB(out_w, 16, lanes)
+        self.latency = self.rgb2rgb16f.latency + self.reinhard.latency + self.rgb16f2rgb.latency
+        self.comb += [
+            sink.connect(self.rgb2rgb16f.sink),
+            self.rgb2rgb16f.source.connect(self.reinhard.sink),
+            self.reinhard.source.connect(self.rgb16f2rgb.sink),
+            self.rgb16f2rgb.source.connect(source)
+        ]
+
+        # double buffering
+        hold = Signal()
+        vsync_r = Signal()
+        self.specials += MultiReg(self._hold.storage, hold)
+        self.sync += vsync_r.eq(self.vsync)
+        latch = Signal()
+        self.comb += latch.eq(self.vsync & ~vsync_r & ~hold)
+
+        # the values are stable when hold, going through the same
+        # synchronizers, is released
+        for datapath_input, csr, reset in [(self.reinhard.exposure, self._exposure, exposure),
+                                           (self.reinhard.inv_white2, self._inv_white2, inv_white2)]:
+            value = Signal(16, reset=reset)
+            register = Signal(16, reset=reset)
+            self.specials += MultiReg(csr.storage, value, reset=reset)
+            self.sync += If(latch, register.eq(value))
+            self.comb += datapath_input.eq(register)
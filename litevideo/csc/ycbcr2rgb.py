@@ -39,7 +39,7 @@ class YCbCr2RGBDatapath(Module):
 
         # # #
 
-        coefs = ycbcr2rgb_coefs(rgb_w, coef_w)
+        coefs = ycbcr2rgb_coefs(ycbcr_w, coef_w)
 
         # delay ycbcr signals
         ycbcr_delayed = [sink]
@@ -66,10 +66,11 @@ class YCbCr2RGBDatapath(Module):
 
         # stage 2
         # (y - yoffset)
-        # (cr - coffset)*acoef
-        # (cb - coffset)*bcoef
-        # (cr - coffset)*ccoef
-        # (cb - coffset)*dcoef
+        # (cr - coffset)*acoef (+ rounding)
+        # (cb - coffset)*bcoef (+ rounding)
+        # (cr - coffset)*ccoef (+ rounding)
+        # (cb - coffset)*dcoef (+ rounding)
+        rounding = 2**(coef_w-3)
         y_minus_yoffset = Signal((ycbcr_w + 1, True))
         cr_minus_coffset_mult_acoef = Signal((ycbcr_w + coef_w + 4, True))
         cb_minus_coffset_mult_bcoef = Signal((ycbcr_w + coef_w + 4, True))
@@ -77,10 +78,10 @@ class YCbCr2RGBDatapath(Module):
         cb_minus_coffset_mult_dcoef = Signal((ycbcr_w + coef_w + 4, True))
         self.sync += [
             y_minus_yoffset.eq(ycbcr_delayed[1].y - coefs["yoffset"]),
-            cr_minus_coffset_mult_acoef.eq(cr_minus_coffset * coefs["acoef"]),
-            cb_minus_coffset_mult_bcoef.eq(cb_minus_coffset * coefs["bcoef"]),
-            cr_minus_coffset_mult_ccoef.eq(cr_minus_coffset * coefs["ccoef"]),
-            cb_minus_coffset_mult_dcoef.eq(cb_minus_coffset * coefs["dcoef"])
+            cr_minus_coffset_mult_acoef.eq(cr_minus_coffset * coefs["acoef"] + rounding),
+            cb_minus_coffset_mult_bcoef.eq(cb_minus_coffset * coefs["bcoef"] + rounding),
+            cr_minus_coffset_mult_ccoef.eq(cr_minus_coffset * coefs["ccoef"] + rounding),
+            cb_minus_coffset_mult_dcoef.eq(cb_minus_coffset * coefs["dcoef"] + rounding)
         ]
 
         # stage 3
@@ -96,25 +97,130 @@ class YCbCr2RGBDatapath(Module):
         ]
 
         # stage 4
-        # saturate
+        # rescale & saturate
         self.sync += [
-            saturate(r, source.r, 0, 2**rgb_w-1),
-            saturate(g, source.g, 0, 2**rgb_w-1),
-            saturate(b, source.b, 0, 2**rgb_w-1)
+            saturate(rescale(r, ycbcr_w, rgb_w), source.r, 0, 2**rgb_w-1),
+            saturate(rescale(g, ycbcr_w, rgb_w), source.g, 0, 2**rgb_w-1),
+            saturate(rescale(b, ycbcr_w, rgb_w), source.b, 0, 2**rgb_w-1)
+        ]
+
+
+@CEInserter()
+class YCbCr2RGBDSPDatapath(Module):
+    """YCbCr2RGBDatapath structured for DSP48E1/DSP48A1 slices: pre-adder,
+    multiplier and post-adder (C or PCIN cascade) with their pipeline
+    registers. The two products of g are summed before rounding (instead of
+    each), which can differ by one LSB from YCbCr2RGBDatapath."""
+    latency = 5
+
+    def __init__(self, ycbcr_w, rgb_w, coef_w):
+        self.sink = sink = Record(ycbcr444_layout(ycbcr_w))
+        self.source = source = Record(rgb_layout(rgb_w))
+
+        # # #
+
+        coefs = ycbcr2rgb_coefs(ycbcr_w, coef_w)
+        shift = coef_w - 2
+        product_w = ycbcr_w + coef_w + 4
+
+        # Hardware implementation:
+        #   DSP1: r  = (cr - coffset)*acoef + ((y - yoffset) << shift) + rounding
+        #   DSP2: g  = (cb - coffset)*bcoef + ((y - yoffset) << shift) + rounding
+        #   DSP3: g += (cr - coffset)*ccoef                 (PCIN cascade)
+        #   DSP4: b  = (cb - coffset)*dcoef + ((y - yoffset) << shift) + rounding
+
+        # stage 1 (pre-adders)
+        # (cb - coffset), (cr - coffset) & (y - yoffset)
+        cb_minus_coffset = Signal((ycbcr_w + 1, True))
+        cr_minus_coffset = Signal((ycbcr_w + 1, True))
+        y_minus_yoffset = Signal((ycbcr_w + 1, True))
+        self.sync += [
+            cb_minus_coffset.eq(sink.cb - coefs["coffset"]),
+            cr_minus_coffset.eq(sink.cr - coefs["coffset"]),
+            y_minus_yoffset.eq(sink.y - coefs["yoffset"])
+        ]
+
+        # stage 2 (multipliers)
+        cr_mult_acoef = Signal((product_w, True))
+        cb_mult_bcoef = Signal((product_w, True))
+        cr_mult_ccoef = Signal((product_w, True))
+        cb_mult_dcoef = Signal((product_w, True))
+        y_minus_yoffset_r = Signal((ycbcr_w + 1, True))
+        self.sync += [
+            cr_mult_acoef.eq(cr_minus_coffset * coefs["acoef"]),
+            cb_mult_bcoef.eq(cb_minus_coffset * coefs["bcoef"]),
+            cr_mult_ccoef.eq(cr_minus_coffset * coefs["ccoef"]),
+            cb_mult_dcoef.eq(cb_minus_coffset * coefs["dcoef"]),
+            y_minus_yoffset_r.eq(y_minus_yoffset)
+        ]
+
+        # stage 3 (DSP1/2/4 post-adders, DSP3 multiplier output register)
+        r_p = Signal((product_w + 1, True))
+        g_p1 = Signal((product_w + 1, True))
+        b_p = Signal((product_w + 1, True))
+        cr_mult_ccoef_r = Signal((product_w, True))
+        rounding = 2**(shift-1)
+        self.sync += [
+            r_p.eq(cr_mult_acoef + (y_minus_yoffset_r << shift) + rounding),
+            g_p1.eq(cb_mult_bcoef + (y_minus_yoffset_r << shift) + rounding),
+            b_p.eq(cb_mult_dcoef + (y_minus_yoffset_r << shift) + rounding),
+            cr_mult_ccoef_r.eq(cr_mult_ccoef)
+        ]
+
+        # stage 4 (DSP3 post-adder)
+        r_p_r = Signal((product_w + 1, True))
+        g_p2 = Signal((product_w + 2, True))
+        b_p_r = Signal((product_w + 1, True))
+        self.sync += [
+            r_p_r.eq(r_p),
+            g_p2.eq(g_p1 + cr_mult_ccoef_r),
+            b_p_r.eq(b_p)
+        ]
+        r = Signal((product_w + 1 - shift, True))
+        g = Signal((product_w + 2 - shift, True))
+        b = Signal((product_w + 1 - shift, True))
+        self.comb += [
+            r.eq(r_p_r[shift:]),
+            g.eq(g_p2[shift:]),
+            b.eq(b_p_r[shift:])
+        ]
+
+        # stage 5
+        # rescale & saturate
+        self.sync += [
+            saturate(rescale(r, ycbcr_w, rgb_w), source.r, 0, 2**rgb_w-1),
+            saturate(rescale(g, ycbcr_w, rgb_w), source.g, 0, 2**rgb_w-1),
+            saturate(rescale(b, ycbcr_w, rgb_w), source.b, 0, 2**rgb_w-1)
         ]
 
 
 class YCbCr2RGB(PipelinedActor, Module):
-    def __init__(self, ycbcr_w=8, rgb_w=8, coef_w=8):
-        self.sink = sink = stream.Endpoint(EndpointDescription(ycbcr444_layout(ycbcr_w)))
-        self.source = source = stream.Endpoint(EndpointDescription(rgb_layout(rgb_w)))
+    """YCbCr 444 to RGB
+
+    The conversion is done at ycbcr_w bits and rounded to rgb_w bits, with
+    coef_w bits coefficients (by default 2 more than the widest component).
+    Converts lanes pixels per beat, lane 0 in the LSBs of each component.
+    """
+    def __init__(self, ycbcr_w=8, rgb_w=8, coef_w=None, dsp=False, lanes=1):
+        self.sink = sink = stream.Endpoint(EndpointDescription(ycbcr444_layout(ycbcr_w*lanes)))
+        self.source = source = stream.Endpoint(EndpointDescription(rgb_layout(rgb_w*lanes)))
 
         # # #
 
-        self.submodules.datapath = YCbCr2RGBDatapath(ycbcr_w, rgb_w, coef_w)
+        if coef_w is None:
+            coef_w = default_coef_w(ycbcr_w, rgb_w)
+        self.datapaths = []
+        for i in range(lanes):
+            if dsp:
+                datapath = YCbCr2RGBDSPDatapath(ycbcr_w, rgb_w, coef_w)
+            else:
+                datapath = YCbCr2RGBDatapath(ycbcr_w, rgb_w, coef_w)
+            self.submodules += datapath
+            self.datapaths.append(datapath)
+            for name in ["y", "cb", "cr"]:
+                self.comb += getattr(datapath.sink, name).eq(lane(getattr(sink, name), i, ycbcr_w))
+            for name in ["r", "g", "b"]:
+                self.comb += lane(getattr(source, name), i, rgb_w).eq(getattr(datapath.source, name))
+        self.datapath = self.datapaths[0]
         PipelinedActor.__init__(self, self.datapath.latency)
-        self.comb += self.datapath.ce.eq(self.pipe_ce)
-        for name in ["y", "cb", "cr"]:
-            self.comb += getattr(self.datapath.sink, name).eq(getattr(sink, name))
-        for name in ["r", "g", "b"]:
-            self.comb += getattr(source, name).eq(getattr(self.datapath.source, name))
+        self.comb += [datapath.ce.eq(self.pipe_ce) for datapath in self.datapaths]
@@ -14,50 +14,72 @@ class YCbCr422to444(Module):
         Y0    Y1    Y2   Y3       Y0     Y1   Y2   Y3
       Cb01  Cr01  Cb23 Cr23  --> Cb01  Cb01 Cb23 Cb23
                                  Cr01  Cr01 Cr23 Cr23
+
+    Converts lanes pixels per beat, lane 0 in the LSBs of each component.
+    With more than one lane, lanes must be even and the pixel pairs are taken
+    from the lanes: Cb from the even lane, Cr from the odd lane.
     """
     latency = 2
-    def __init__(self, dw=8):
-        self.sink = sink = stream.Endpoint(EndpointDescription(ycbcr422_layout(dw)))
-        self.source = source = stream.Endpoint(EndpointDescription(ycbcr444_layout(dw)))
+    def __init__(self, dw=8, lanes=1):
+        self.sink = sink = stream.Endpoint(EndpointDescription(ycbcr422_layout(dw*lanes)))
+        self.source = source = stream.Endpoint(EndpointDescription(ycbcr444_layout(dw*lanes)))
 
         # # #
 
-        y_fifo = stream.SyncFIFO([("data", dw)], 4)
-        cb_fifo = stream.SyncFIFO([("data", dw)], 4)
-        cr_fifo = stream.SyncFIFO([("data", dw)], 4)
-        self.submodules += y_fifo, cb_fifo, cr_fifo
-
-        # input
-        parity_in = Signal()
-        self.sync += If(sink.valid & sink.ready, parity_in.eq(~parity_in))
-        self.comb += [
-            If(~parity_in,
-                y_fifo.sink.valid.eq(sink.valid & sink.ready),
-                y_fifo.sink.data.eq(sink.y),
-                cb_fifo.sink.valid.eq(sink.valid & sink.ready),
-                cb_fifo.sink.data.eq(sink.cb_cr),
-                sink.ready.eq(y_fifo.sink.ready & cb_fifo.sink.ready)
-            ).Else(
-                y_fifo.sink.valid.eq(sink.valid & sink.ready),
-                y_fifo.sink.data.eq(sink.y),
-                cr_fifo.sink.valid.eq(sink.valid & sink.ready),
-                cr_fifo.sink.data.eq(sink.cb_cr),
-                sink.ready.eq(y_fifo.sink.ready & cr_fifo.sink.ready)
-            )
-        ]
-
-
-        # output
-        parity_out = Signal()
-        self.sync += If(source.valid & source.ready, parity_out.eq(~parity_out))
-        self.comb += [
-            source.valid.eq(y_fifo.source.valid &
-                            cb_fifo.source.valid &
-                            cr_fifo.source.valid),
-            source.y.eq(y_fifo.source.data),
-            source.cb.eq(cb_fifo.source.data),
-            source.cr.eq(cr_fifo.source.data),
-            y_fifo.source.ready.eq(source.valid & source.ready),
-            cb_fifo.source.ready.eq(source.valid & source.ready & parity_out),
-            cr_fifo.source.ready.eq(source.valid & source.ready & parity_out)
-        ]
+        if lanes == 1:
+            y_fifo = stream.SyncFIFO([("data", dw)], 4)
+            cb_fifo = stream.SyncFIFO([("data", dw)], 4)
+            cr_fifo = stream.SyncFIFO([("data", dw)], 4)
+            self.submodules += y_fifo, cb_fifo, cr_fifo
+
+            # input, first/last going through the y fifo
+            parity_in = Signal()
+            self.sync += If(sink.valid & sink.ready, parity_in.eq(~parity_in))
+            self.comb += [
+                y_fifo.sink.first.eq(sink.first),
+                y_fifo.sink.last.eq(sink.last),
+                If(~parity_in,
+                    y_fifo.sink.valid.eq(sink.valid & sink.ready),
+                    y_fifo.sink.data.eq(sink.y),
+                    cb_fifo.sink.valid.eq(sink.valid & sink.ready),
+                    cb_fifo.sink.data.eq(sink.cb_cr),
+                    sink.ready.eq(y_fifo.sink.ready & cb_fifo.sink.ready)
+                ).Else(
+                    y_fifo.sink.valid.eq(sink.valid & sink.ready),
+                    y_fifo.sink.data.eq(sink.y),
+                    cr_fifo.sink.valid.eq(sink.valid & sink.ready),
+                    cr_fifo.sink.data.eq(sink.cb_cr),
+                    sink.ready.eq(y_fifo.sink.ready & cr_fifo.sink.ready)
+                )
+            ]
+
+            # output
+            parity_out = Signal()
+            self.sync += If(source.valid & source.ready, parity_out.eq(~parity_out))
+            self.comb += [
+                source.valid.eq(y_fifo.source.valid &
+                                cb_fifo.source.valid &
+                                cr_fifo.source.valid),
+                source.first.eq(y_fifo.source.first),
+                source.last.eq(y_fifo.source.last),
+                source.y.eq(y_fifo.source.data),
+                source.cb.eq(cb_fifo.source.data),
+                source.cr.eq(cr_fifo.source.data),
+                y_fifo.source.ready.eq(source.valid & source.ready),
+                cb_fifo.source.ready.eq(source.valid & source.ready & parity_out),
+                cr_fifo.source.ready.eq(source.valid & source.ready & parity_out)
+            ]
+        else:
+            assert lanes % 2 == 0
+            self.comb += sink.ready.eq(~source.valid | source.ready)
+            self.sync += \
+                If(sink.ready,
+                    source.valid.eq(sink.valid),
+                    source.first.eq(sink.first),
+                    source.last.eq(sink.last),
+                    source.y.eq(sink.y),
+                    [lane(source.cb, i + j, dw).eq(lane(sink.cb_cr, i, dw))
+                        for i in range(0, lanes, 2) for j in range(2)],
+                    [lane(source.cr, i + j, dw).eq(lane(sink.cb_cr, i + 1, dw))
+                        for i in range(0, lanes, 2) for j in range(2)]
+                )
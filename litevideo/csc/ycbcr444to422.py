@@ -21,25 +21,40 @@ class YCbCr444to422Datapath(Module):
     def __init__(self, dw):
         self.sink = sink = Record(ycbcr444_layout(dw))
         self.source = source = Record(ycbcr422_layout(dw))
+        self.valid = Signal()
         self.first = Signal()
 
         # # #
 
-        # delay data signals
-        ycbcr_delayed = [sink]
+        # delay y
+        y_delayed = [sink.y]
         for i in range(self.latency):
-            ycbcr_n = Record(ycbcr444_layout(dw))
-            for name in ["y", "cb", "cr"]:
-                self.sync += getattr(ycbcr_n, name).eq(getattr(ycbcr_delayed[-1], name))
-            ycbcr_delayed.append(ycbcr_n)
+            y_n = Signal(dw)
+            self.sync += y_n.eq(y_delayed[-1])
+            y_delayed.append(y_n)
 
-        # parity
-        parity = Signal()
+        # parity (set on the odd pixels), only advanced by the valid pixels
+        # and delayed with the data for the output
+        self.parity = parity = Signal()
         self.sync += \
-            If(self.first | ~parity,
+            If(self.first,
                 parity.eq(1)
-            ).Else(
-                parity.eq(0)
+            ).Elif(self.valid,
+                parity.eq(~parity)
+            )
+        parity_delayed = [parity]
+        for i in range(2):
+            parity_n = Signal()
+            self.sync += parity_n.eq(parity_delayed[-1])
+            parity_delayed.append(parity_n)
+
+        # cb and cr of the previous valid pixel
+        cb_prev = Signal(dw)
+        cr_prev = Signal(dw)
+        self.sync += \
+            If(self.valid,
+                cb_prev.eq(sink.cb),
+                cr_prev.eq(sink.cr)
             )
 
         # compute mean of cb and cr compoments
@@ -54,33 +69,126 @@ class YCbCr444to422Datapath(Module):
         ]
 
         self.sync += \
-            If(parity,
-                cb_sum.eq(sink.cb + ycbcr_delayed[1].cb),
-                cr_sum.eq(sink.cr + ycbcr_delayed[1].cr)
+            If(self.valid & parity,
+                cb_sum.eq(sink.cb + cb_prev),
+                cr_sum.eq(sink.cr + cr_prev)
             )
 
         # output
         self.sync += \
-            If(parity,
-                self.source.y.eq(ycbcr_delayed[2].y),
+            If(parity_delayed[2],
+                self.source.y.eq(y_delayed[2]),
                 self.source.cb_cr.eq(cr_mean)
             ).Else(
-                self.source.y.eq(ycbcr_delayed[2].y),
+                self.source.y.eq(y_delayed[2]),
                 self.source.cb_cr.eq(cb_mean)
             )
 
 
+@CEInserter()
+class YCbCr444to422LanesDatapath(Module):
+    """YCbCr 444 to 422, lanes pixels per cycle
+
+    Same as YCbCr444to422Datapath, the pixel pairs being taken from the lanes
+    (lanes is even) instead of from consecutive cycles.
+    """
+    latency = 2
+
+    def __init__(self, dw, lanes):
+        assert lanes % 2 == 0
+        self.sink = sink = Record(ycbcr444_layout(dw*lanes))
+        self.source = source = Record(ycbcr422_layout(dw*lanes))
+
+        # # #
+
+        y_delayed = Signal(dw*lanes)
+        self.sync += [
+            y_delayed.eq(sink.y),
+            source.y.eq(y_delayed)
+        ]
+
+        for i in range(0, lanes, 2):
+            # compute mean of cb and cr compoments
+            cb_sum = Signal(dw+1)
+            cr_sum = Signal(dw+1)
+            self.sync += [
+                cb_sum.eq(lane(sink.cb, i, dw) + lane(sink.cb, i+1, dw)),
+                cr_sum.eq(lane(sink.cr, i, dw) + lane(sink.cr, i+1, dw))
+            ]
+
+            # output
+            self.sync += [
+                lane(source.cb_cr, i, dw).eq(cb_sum[1:]),
+                lane(source.cb_cr, i+1, dw).eq(cr_sum[1:])
+            ]
+
+
 class YCbCr444to422(PipelinedActor, Module):
-    def __init__(self, dw=8):
-        self.sink = sink = stream.Endpoint(EndpointDescription(ycbcr444_layout(dw)))
-        self.source = source = stream.Endpoint(EndpointDescription(ycbcr422_layout(dw)))
+    """YCbCr 444 to 422
+
+    Converts lanes pixels per beat, lane 0 in the LSBs of each component.
+    With more than one lane, lanes must be even and Cb/Cr are shared by the
+    pairs of lanes.
+
+    With one lane, the pixel pairs start on sink.first and the pipeline is
+    held on the bubbles between the two pixels of a pair, the odd pixel
+    being averaged with the even one on the next stage.
+    """
+    def __init__(self, dw=8, lanes=1):
+        self.sink = sink = stream.Endpoint(EndpointDescription(ycbcr444_layout(dw*lanes)))
+        self.source = source = stream.Endpoint(EndpointDescription(ycbcr422_layout(dw*lanes)))
 
         # # #
 
-        self.submodules.datapath = YCbCr444to422Datapath(dw)
+        if lanes == 1:
+            self.submodules.datapath = YCbCr444to422Datapath(dw)
+        else:
+            self.submodules.datapath = YCbCr444to422LanesDatapath(dw, lanes)
         PipelinedActor.__init__(self, self.datapath.latency)
         self.comb += self.datapath.ce.eq(self.pipe_ce)
+        if lanes == 1:
+            self.comb += [
+                self.datapath.valid.eq(sink.valid),
+                self.datapath.first.eq(sink.valid & sink.first)
+            ]
         for name in ["y", "cb", "cr"]:
             self.comb += getattr(self.datapath.sink, name).eq(getattr(sink, name))
         for name in ["y", "cb_cr"]:
             self.comb += getattr(source, name).eq(getattr(self.datapath.source, name))
+
+    def build_binary_control(self, sink, source, latency):
+        busy  = 0
+        valid = sink.valid
+        for i in range(latency):
+            valid_n = Signal()
+            self.sync += If(self.pipe_ce, valid_n.eq(valid))
+            valid = valid_n
+            busy = busy | valid
+
+        # waiting for the odd pixel of a pair, the output is held too
+        hold = 0
+        if isinstance(self.datapath, YCbCr444to422Datapath):
+            hold = self.datapath.parity & ~sink.valid
+
+        self.comb += [
+            self.pipe_ce.eq((source.ready | ~valid) & ~hold),
+            sink.ready.eq(source.ready | ~valid),
+            source.valid.eq(valid & ~hold),
+            self.busy.eq(busy)
+        ]
+        first = sink.valid & sink.first
+        last  = sink.valid & sink.last
+        for i in range(latency):
+            first_n = Signal(reset_less=True)
+            last_n  = Signal(reset_less=True)
+            self.sync += \
+                If(self.pipe_ce,
+                    first_n.eq(first),
+                    last_n.eq(last)
+                )
+            first = first_n
+            last  = last_n
+        self.comb += [
+            source.first.eq(first),
+            source.last.eq(last)
+        ]
@@ -0,0 +1,193 @@
+from migen import *
+from migen.genlib.cdc import MultiReg
+
+from litex.soc.interconnect.csr import *
+
+
+def drp_layout(adr_width=7):
+    return [
+        ("adr",  adr_width, DIR_M_TO_S),
+        ("di",   16,        DIR_M_TO_S),
+        ("do",   16,        DIR_S_TO_M),
+        ("den",  1,         DIR_M_TO_S),
+        ("dwe",  1,         DIR_M_TO_S),
+        ("drdy", 1,         DIR_S_TO_M)
+    ]
+
+def drp_entry_layout(adr_width=7):
+    return [
+        ("data", 16),
+        ("mask", 16),
+        ("adr",  adr_width),
+        ("last", 1)
+    ]
+
+
+class DRPSequencer(Module, AutoCSR):
+    """DRP sequencer
+
+    Reconfigures an MMCM/PLL from a table of DRP register sets, one per mode.
+    Writing the mode CSR holds the MMCM/PLL in reset, does the read-modify-write
+    of each register of the mode (new = (old & mask) | data), releases the reset
+    and waits for lock, busy being set until then. Entries whose mask is 0xffff
+    are skipped.
+
+    modes is a list of (adr, mask, data) lists, one per mode. The table can also
+    be rewritten through the table CSRs (see drp_entry_layout, the entry of
+    register i of mode m being at m*2**bits_for(max_regs-1) + i).
+
+    cpu is driven by the raw DRP CSRs of the clocking module and goes through to
+    drp when the sequencer is idle.
+    """
+    def __init__(self, modes, adr_width=7, max_regs=None):
+        if max_regs is None:
+            max_regs = max(len(regs) for regs in modes)
+        n_modes = len(modes)
+        reg_bits = bits_for(max_regs-1)
+        mode_bits = bits_for(n_modes-1)
+        entry_w = sum(w for n, w in drp_entry_layout(adr_width))
+
+        self.cpu = cpu = Record(drp_layout(adr_width))
+        self.drp = drp = Record(drp_layout(adr_width))
+        self.reset = Signal()
+        self.locked = Signal()
+        self.busy = Signal()
+
+        self._mode = CSRStorage(mode_bits)
+        self._busy = CSRStatus()
+        self._table_adr = CSRStorage(mode_bits + reg_bits)
+        self._table_dat_w = CSRStorage(entry_w)
+        self._table_we = CSR()
+
+        # # #
+
+        # table
+        init = []
+        for regs in modes:
+            assert len(regs) <= max_regs
+            entries = [(adr, mask, data, 0) for adr, mask, data in regs]
+            if entries:
+                entries[-1] = entries[-1][:3] + (1,)
+            else:
+                entries = [(0, 0xffff, 0, 1)]
+            entries += [(0, 0xffff, 0, 1)]*(2**reg_bits - len(entries))
+            for adr, mask, data, last in entries:
+                init.append(data | (mask << 16) | (adr << 32) | (last << (32 + adr_width)))
+        table = Memory(entry_w, len(init), init=init)
+        table_wrport = table.get_port(write_capable=True)
+        table_rdport = table.get_port()
+        self.specials += table, table_wrport, table_rdport
+        self.comb += [
+            table_wrport.adr.eq(self._table_adr.storage),
+            table_wrport.dat_w.eq(self._table_dat_w.storage),
+            table_wrport.we.eq(self._table_we.re)
+        ]
+
+        mode = Signal(mode_bits)
+        reg = Signal(reg_bits)
+        entry = Record(drp_entry_layout(adr_width))
+        value = Signal(16)
+        self.comb += [
+            table_rdport.adr.eq(Cat(reg, mode)),
+            entry.raw_bits().eq(table_rdport.dat_r)
+        ]
+
+        locked = Signal()
+        self.specials += MultiReg(self.locked, locked)
+
+        # sequencing
+        self.submodules.fsm = fsm = FSM(reset_state="IDLE")
+        fsm.act("IDLE",
+            cpu.connect(drp, omit={"do", "drdy"}),
+            If(self._mode.re,
+                NextValue(mode, self._mode.storage),
+                NextValue(reg, 0),
+                NextState("FETCH")
+            )
+        )
+        fsm.act("FETCH",
+            self.reset.eq(1),
+            NextState("READ")
+        )
+        fsm.act("READ",
+            self.reset.eq(1),
+            If(entry.mask == 0xffff,
+                NextState("NEXT")
+            ).Else(
+                drp.adr.eq(entry.adr),
+                drp.den.eq(1),
+                NextState("WAIT_READ")
+            )
+        )
+        fsm.act("WAIT_READ",
+            self.reset.eq(1),
+            If(drp.drdy,
+                NextValue(value, (drp.do & entry.mask) | entry.data),
+                NextState("WRITE")
+            )
+        )
+        fsm.act("WRITE",
+            self.reset.eq(1),
+            drp.adr.eq(entry.adr),
+            drp.di.eq(value),
+            drp.den.eq(1),
+            drp.dwe.eq(1),
+            NextState("WAIT_WRITE")
+        )
+        fsm.act("WAIT_WRITE",
+            self.reset.eq(1),
+            If(drp.drdy,
+                NextState("NEXT")
+            )
+        )
+        fsm.act("NEXT",
+            self.reset.eq(1),
+            If(entry.last,
+                NextState("WAIT_LOCK")
+            ).Else(
+                NextValue(reg, reg + 1),
+                NextState("FETCH")
+            )
+        )
+        # the MultiReg delays locked by more than the time LOCKED takes to fall
+        fsm.act("WAIT_LOCK",
+            If(locked,
+                NextState("IDLE")
+            )
+        )
+        self.comb += [
+            cpu.do.eq(drp.do),
+            cpu.drdy.eq(drp.drdy & fsm.ongoing("IDLE")),
+            self.busy.eq(~fsm.ongoing("IDLE")),
+            self._busy.status.eq(self.busy)
+        ]
+
+
+def add_drp(module, adr, dat_w, read, write, reset, locked, modes=None, adr_width=7):
+    """DRP port and reset of an MMCM/PLL
+
+    Driven by the raw DRP CSRs (adr/dat_w storages, read/write strobes, reset
+    storage) and, with modes, by a DRPSequencer added to module as
+    drp_sequencer. Returns the DRP record and the reset to connect to the
+    MMCM/PLL.
+    """
+    drp = Record(drp_layout(adr_width))
+    mmcm_reset = Signal()
+    if modes is None:
+        cpu = drp
+        module.comb += mmcm_reset.eq(reset)
+    else:
+        module.submodules.drp_sequencer = sequencer = DRPSequencer(modes, adr_width)
+        cpu = sequencer.cpu
+        module.comb += [
+            sequencer.drp.connect(drp),
+            sequencer.locked.eq(locked),
+            mmcm_reset.eq(reset | sequencer.reset)
+        ]
+    module.comb += [
+        cpu.adr.eq(adr),
+        cpu.di.eq(dat_w),
+        cpu.den.eq(read | write),
+        cpu.dwe.eq(write)
+    ]
+    return drp, mmcm_reset
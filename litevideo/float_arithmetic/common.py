@@ -2,21 +2,74 @@ from migen import *
 
 from litex.soc.interconnect import stream
 
+# (dw, exp_w) of the supported floating point formats, the fraction being
+# dw - 1 - exp_w bits
+float_formats = {
+    "float16":  (16, 5),
+    "bfloat16": (16, 8),
+    "fp24":     (24, 7)
+}
+
+def unary_in_layout(dw):
+    return [("in1", dw)]
+
 def in_layout(dw):
     return [("in1", dw), ("in2", dw)]
 
+def fma_in_layout(dw):
+    return [("in1", dw), ("in2", dw), ("in3", dw)]
+
 def out_layout(dw):
     return [("out", dw)]
 
+def delay(module, signal, n):
+    """signal delayed by n cycles of module's sync"""
+    for i in range(n):
+        signal_n = Signal.like(signal)
+        module.sync += signal_n.eq(signal)
+        signal = signal_n
+    return signal
+
 
 class LeadOne(Module):
     """
-    This return the position of leading one of the Signal Object datai, as the
-    leadone Signal object. Function input dw defines the data width of datai
-    Signal object.
+    This return the position of leading one of the Signal Object datai (its
+    number of leading zeros), as the leadone Signal object, 0 when datai is 0
+    (zero is then set). Function input dw defines the data width of datai
+    Signal object. Implemented as a tree of log2(dw) levels of 2:1 multiplexers.
     """
     def __init__(self, dw):
         self.datai = Signal(dw)
-        self.leadone = Signal(max=dw)
-        for j in range(dw):
-            self.comb += If(self.datai[j], self.leadone.eq(dw - j - 1))
+        self.leadone = Signal(max=max(dw, 2))
+        self.zero = Signal()
+
+        # # #
+
+        n = 2**bits_for(max(dw, 2) - 1)
+        count, zero = self.count(Cat(Replicate(0, n - dw), self.datai), n)
+        self.comb += [
+            self.zero.eq(zero),
+            If(~zero, self.leadone.eq(count))
+        ]
+
+    def count(self, data, n):
+        """Leading zeros of the n (power of 2) bits of data and all zero flag"""
+        count = Signal(log2_int(n))
+        zero = Signal()
+        if n == 2:
+            self.comb += [
+                count.eq(~data[1]),
+                zero.eq(~data[0] & ~data[1])
+            ]
+        else:
+            count_high, zero_high = self.count(data[n//2:], n//2)
+            count_low, zero_low = self.count(data[:n//2], n//2)
+            self.comb += [
+                If(zero_high,
+                    count.eq(Cat(count_low, 1))
+                ).Else(
+                    count.eq(Cat(count_high, 0))
+                ),
+                zero.eq(zero_high & zero_low)
+            ]
+        return count, zero
@@ -1,6 +1,6 @@
 '''
 FloatAddDatapath class: Add two floating point numbers in1 and in2, returns
-their output out in the same float16 format.
+their output out in the same format (float16 by default, see float_formats).
 
 FloatAdd class: Use the FloatAddDatapath above and generates a pipelined
 module implemented using five stage pipeline.
@@ -17,10 +17,13 @@ from litevideo.float_arithmetic.common import *
 @CEInserter()
 class FloatAddDatapath(Module):
     latency = 5
-    def __init__(self, dw):
+    def __init__(self, dw, exp_w=5):
         self.sink = sink = Record(in_layout(dw))
         self.source = source = Record(out_layout(dw))
 
+        frac_w = dw - 1 - exp_w
+        mant_w = frac_w + 1
+
         # delay input signals
         in_delayed = [sink]
         for i in range(self.latency):
@@ -35,19 +38,19 @@ class FloatAddDatapath(Module):
         # Unpack
         # Substract Exponents
 
-        in1_frac = Signal(10)
-        in2_frac = Signal(10)
+        in1_frac = Signal(frac_w)
+        in2_frac = Signal(frac_w)
 
-        in1_mant = Signal(11)
-        in2_mant = Signal(11)
+        in1_mant = Signal(mant_w)
+        in2_mant = Signal(mant_w)
 
-        in1_exp = Signal(5)
-        in2_exp = Signal(5)
+        in1_exp = Signal(exp_w)
+        in2_exp = Signal(exp_w)
 
-        in1_minus_in2_exp = Signal((6, True))
+        in1_minus_in2_exp = Signal((exp_w + 1, True))
 
-        in1_exp1 = Signal(5)
-        in2_exp1 = Signal(5)
+        in1_exp1 = Signal(exp_w)
+        in2_exp1 = Signal(exp_w)
 
         in1_sign = Signal()
         in2_sign = Signal()
@@ -59,44 +62,44 @@ class FloatAddDatapath(Module):
         # 10-2 Nan
         # 11-3 Normal
 
-        in1_stage1 = Signal(16)
-        in2_stage1 = Signal(16)
+        in1_stage1 = Signal(dw)
+        in2_stage1 = Signal(dw)
 
         self.comb += [
-            in1_frac.eq(sink.in1[:10]),
-            in2_frac.eq(sink.in2[:10]),
+            in1_frac.eq(sink.in1[:frac_w]),
+            in2_frac.eq(sink.in2[:frac_w]),
 
-            in1_exp.eq(sink.in1[10:15]),
-            in2_exp.eq(sink.in2[10:15]),
+            in1_exp.eq(sink.in1[frac_w:dw-1]),
+            in2_exp.eq(sink.in2[frac_w:dw-1]),
 
-            in1_sign.eq(sink.in1[15]),
-            in2_sign.eq(sink.in1[15])
+            in1_sign.eq(sink.in1[dw-1]),
+            in2_sign.eq(sink.in2[dw-1])
         ]
 
         self.comb += [
             If(in1_exp == 0,
-                in1_mant.eq(Cat(sink.in1[:10], 0)),
-                in1_exp1.eq(sink.in1[10:15] + 1)
+                in1_mant.eq(Cat(in1_frac, 0)),
+                in1_exp1.eq(in1_exp + 1)
             ).Else(
-                in1_mant.eq(Cat(sink.in1[:10], 1)),
-                in1_exp1.eq(sink.in1[10:15])
+                in1_mant.eq(Cat(in1_frac, 1)),
+                in1_exp1.eq(in1_exp)
             ),
 
             If(in2_exp == 0,
-                in2_mant.eq(Cat(sink.in2[:10], 0)),
-                in2_exp1.eq(sink.in2[10:15] + 1)
+                in2_mant.eq(Cat(in2_frac, 0)),
+                in2_exp1.eq(in2_exp + 1)
             ).Else(
-                in2_mant.eq(Cat(sink.in2[:10], 1)),
-                in2_exp1.eq(sink.in2[10:15])
+                in2_mant.eq(Cat(in2_frac, 1)),
+                in2_exp1.eq(in2_exp)
             )
         ]
 
-        in1_frac_stage1 = Signal(11)
-        in2_frac_stage1 = Signal(11)
-        in1_sign_stage1 = Signal(11)
-        in2_sign_stage1 = Signal(11)
-        in1_exp_stage1 = Signal(5)
-        in2_exp_stage1 = Signal(5)
+        in1_frac_stage1 = Signal(mant_w)
+        in2_frac_stage1 = Signal(mant_w)
+        in1_sign_stage1 = Signal()
+        in2_sign_stage1 = Signal()
+        in1_exp_stage1 = Signal(exp_w)
+        in2_exp_stage1 = Signal(exp_w)
 
         self.sync += [
             in1_minus_in2_exp.eq(in1_exp1 - in2_exp),
@@ -111,15 +114,15 @@ class FloatAddDatapath(Module):
 
         # Stage 2
         # Adjust both the input fracs to common exponent
-        in1_frac_stage2 = Signal(11)
-        in2_frac_stage2 = Signal(11)
-        in1_sign_stage2 = Signal(11)
-        in2_sign_stage2 = Signal(11)
-        in1_minus_in2_exp_stage2 = Signal(5)
-        out_2 = Signal(16)
+        in1_frac_stage2 = Signal(mant_w)
+        in2_frac_stage2 = Signal(mant_w)
+        in1_sign_stage2 = Signal()
+        in2_sign_stage2 = Signal()
+        in1_minus_in2_exp_stage2 = Signal(exp_w)
+        out_2 = Signal(dw)
 
         self.sync += [
-            If(~in1_minus_in2_exp[5],
+            If(~in1_minus_in2_exp[exp_w],
                 in2_frac_stage2.eq(in2_frac_stage1 >> in1_minus_in2_exp),
                 in1_frac_stage2.eq(in1_frac_stage1),
                 in1_minus_in2_exp_stage2.eq(in1_exp_stage1)
@@ -134,10 +137,10 @@ class FloatAddDatapath(Module):
 
         # Stage 3
         # Adder Unit
-        in1_plus_in2_frac = Signal(12)
+        in1_plus_in2_frac = Signal(mant_w + 1)
         in1_plus_in2_sign = Signal(1)
-        in1_minus_in2_exp_stage3 = Signal(5)
-        out_3 = Signal(16)
+        in1_minus_in2_exp_stage3 = Signal(exp_w)
+        out_3 = Signal(dw)
 
         self.sync += [
             Cat(in1_plus_in2_frac, in1_plus_in2_sign).eq(in1_frac_stage2 + in2_frac_stage2),
@@ -147,16 +150,16 @@ class FloatAddDatapath(Module):
 
         # Stage 4
         # Shift and Adjust
-        leadone = Signal(4)
-        self.submodules.l1 = LeadOne(12)
+        leadone = Signal(max=mant_w + 1)
+        self.submodules.l1 = LeadOne(mant_w + 1)
         self.comb += [
             self.l1.datai.eq(in1_plus_in2_frac),
             leadone.eq(self.l1.leadone)
         ]
         out_sign_stage4 = Signal(1)
-        out_frac_stage4 = Signal(12)
-        out_exp_stage4 = Signal(5)
-        out_4 = Signal(16)
+        out_frac_stage4 = Signal(mant_w + 1)
+        out_exp_stage4 = Signal(exp_w)
+        out_4 = Signal(dw)
         self.sync += [
             out_frac_stage4.eq(in1_plus_in2_frac << (leadone)),
             out_exp_stage4.eq(in1_minus_in2_exp_stage3 - leadone + 1),
@@ -167,18 +170,18 @@ class FloatAddDatapath(Module):
         # stage 5
         # Normalize and pack
         self.sync += [
-            source.out.eq(Cat(out_frac_stage4[1:11], out_exp_stage4, out_sign_stage4))
+            source.out.eq(Cat(out_frac_stage4[1:mant_w], out_exp_stage4, out_sign_stage4))
         ]
 
 
 class FloatAdd(PipelinedActor, Module, AutoCSR):
-    def __init__(self, dw=16):
+    def __init__(self, dw=16, exp_w=5):
         self.sink = sink = stream.Endpoint(EndpointDescription(in_layout(dw)))
         self.source = source = stream.Endpoint(EndpointDescription(out_layout(dw)))
 
         # # #
 
-        self.submodules.datapath = FloatAddDatapath(dw)
+        self.submodules.datapath = FloatAddDatapath(dw, exp_w)
         PipelinedActor.__init__(self, self.datapath.latency)
         self.comb += self.datapath.ce.eq(self.pipe_ce)
         for name in ["in1", "in2"]:
@@ -0,0 +1,179 @@
+'''
+FloatDivDatapath class: Divides in1 by in2 (floating point numbers), returns
+out in the same format (float16 by default, see float_formats), rounded to
+nearest even.
+
+FloatDiv class: Use the FloatDivDatapath above and generates a pipelined module.
+
+FloatRecip class: Same as FloatDiv for 1/in1.
+'''
+
+from migen import *
+
+from litex.soc.interconnect.stream import *
+
+from litevideo.float_arithmetic.common import *
+from litevideo.float_arithmetic.floatfma import FloatUnpack, FloatRound, internal_exp_w
+
+
+def nr_params(mant_w):
+    """Seed table index bits, fixed point fraction bits of the Newton-Raphson
+    iterations and number of iterations for mant_w bits mantissas"""
+    index_w = min(7, mant_w - 1)
+    frac_w = mant_w + 5
+    iterations = 0
+    while (index_w + 1)*2**iterations < mant_w + 4:
+        iterations += 1
+    return index_w, frac_w, iterations
+
+
+def recip_seed_table(mant_w):
+    """1/m at the middle of the 2**index_w intervals of [1, 2), index_w + 3
+    fraction bits"""
+    index_w, frac_w, iterations = nr_params(mant_w)
+    return [round(2**(index_w + 3)/(1 + (i + 0.5)/2**index_w)) for i in range(2**index_w)]
+
+
+@CEInserter()
+class FloatDivDatapath(Module):
+    """
+    This adds a floating point division unit: out = in1/in2.
+    Hardware implementation:
+      The reciprocal y of the mantissa of in2 is seeded from a table and
+      refined by Newton-Raphson iterations (y = y*(2 - m*y), 2 stages each).
+      The quotient q = in1*y is then corrected with the remainder of the
+      division, giving the exact truncated quotient and a sticky bit, and
+      rounded once.
+    Implemented as a 6 + 2*iterations stage pipeline (8 for float16).
+    """
+    def __init__(self, dw, exp_w=5):
+        self.sink = sink = Record(in_layout(dw))
+        self.source = source = Record(out_layout(dw))
+
+        frac_w = dw - 1 - exp_w
+        mant_w = frac_w + 1
+        bias = 2**(exp_w-1) - 1
+        ie = internal_exp_w(dw, exp_w)
+        index_w, nr_w, iterations = nr_params(mant_w)
+        quotient_w = mant_w + 1
+        self.latency = 6 + 2*iterations
+
+        # # #
+
+        in1 = FloatUnpack(sink.in1, dw, exp_w, True, ie)
+        in2 = FloatUnpack(sink.in2, dw, exp_w, True, ie)
+        self.submodules += in1, in2
+
+        # stage 1
+        # Seed, exponent, special cases
+        seeds = Array(recip_seed_table(mant_w))
+        ma = Signal(mant_w)
+        mb = Signal(mant_w)
+        y = Signal(nr_w + 1)
+        exp = Signal((ie, True))
+        sign = Signal()
+        zero = Signal()
+        inf = Signal()
+        nan = Signal()
+        self.sync += [
+            ma.eq(in1.mant),
+            mb.eq(in2.mant),
+            y.eq(seeds[in2.mant[mant_w-1-index_w:mant_w-1]] << (nr_w - index_w - 3)),
+            exp.eq(in1.exp - in2.exp + bias),
+            sign.eq(in1.sign ^ in2.sign),
+            zero.eq(in1.zero | in2.inf),
+            inf.eq(in1.inf | in2.zero),
+            nan.eq(in1.nan | in2.nan | (in1.zero & in2.zero) | (in1.inf & in2.inf))
+        ]
+
+        # stages 2 to 1 + 2*iterations
+        # Newton-Raphson iterations
+        for i in range(iterations):
+            t = Signal(nr_w + 2)
+            y_d = Signal(nr_w + 1)
+            mb_d = Signal(mant_w)
+            y_n = Signal(nr_w + 1)
+            self.sync += [
+                t.eq((mb*y) >> (mant_w - 1)),
+                y_d.eq(y),
+                mb_d.eq(mb),
+                y_n.eq((y_d*(2**(nr_w + 1) - t)) >> nr_w)
+            ]
+            ma = delay(self, ma, 2)
+            mb = delay(self, mb_d, 1)
+            y = y_n
+
+        # stage 2 + 2*iterations
+        # Quotient
+        q = Signal(quotient_w + 2)
+        self.sync += q.eq((ma*y) >> (nr_w + mant_w - 1 - quotient_w))
+        ma = delay(self, ma, 1)
+        mb = delay(self, mb, 1)
+
+        # stage 3 + 2*iterations
+        # Remainder
+        r = Signal((quotient_w + mant_w + 2, True))
+        self.sync += r.eq((ma << quotient_w) - q*mb)
+        q = delay(self, q, 1)
+        mb = delay(self, mb, 1)
+
+        # stage 4 + 2*iterations
+        # Correct the quotient by one if needed
+        stages = 2 + 2*iterations
+        self.submodules.round = FloatRound(quotient_w + 1, dw, exp_w, ie)
+        self.sync += [
+            If(delay(self, zero, stages),
+                self.round.mag.eq(0),
+                self.round.sticky.eq(0)
+            ).Elif(r < 0,
+                self.round.mag.eq(q - 1),
+                self.round.sticky.eq(r + mb != 0)
+            ).Elif(r >= mb,
+                self.round.mag.eq(q + 1),
+                self.round.sticky.eq(r - mb != 0)
+            ).Else(
+                self.round.mag.eq(q),
+                self.round.sticky.eq(r != 0)
+            ),
+            self.round.exp.eq(delay(self, exp, stages)),
+            self.round.sign.eq(delay(self, sign, stages)),
+            self.round.inf.eq(delay(self, inf, stages)),
+            self.round.nan.eq(delay(self, nan, stages))
+        ]
+
+        # last 2 stages
+        # Normalize, round and pack
+        self.comb += source.out.eq(self.round.out)
+
+
+class FloatDiv(PipelinedActor, Module):
+    def __init__(self, dw=16, exp_w=5):
+        self.sink = sink = stream.Endpoint(EndpointDescription(in_layout(dw)))
+        self.source = source = stream.Endpoint(EndpointDescription(out_layout(dw)))
+
+        # # #
+
+        self.submodules.datapath = FloatDivDatapath(dw, exp_w)
+        PipelinedActor.__init__(self, self.datapath.latency)
+        self.comb += self.datapath.ce.eq(self.pipe_ce)
+        for name in ["in1", "in2"]:
+            self.comb += getattr(self.datapath.sink, name).eq(getattr(sink, name))
+        self.comb += source.out.eq(self.datapath.source.out)
+
+
+class FloatRecip(PipelinedActor, Module):
+    def __init__(self, dw=16, exp_w=5):
+        self.sink = sink = stream.Endpoint(EndpointDescription(unary_in_layout(dw)))
+        self.source = source = stream.Endpoint(EndpointDescription(out_layout(dw)))
+
+        # # #
+
+        frac_w = dw - 1 - exp_w
+        self.submodules.datapath = FloatDivDatapath(dw, exp_w)
+        PipelinedActor.__init__(self, self.datapath.latency)
+        self.comb += [
+            self.datapath.ce.eq(self.pipe_ce),
+            self.datapath.sink.in1.eq((2**(exp_w-1) - 1) << frac_w),
+            self.datapath.sink.in2.eq(sink.in1),
+            source.out.eq(self.datapath.source.out)
+        ]
@@ -0,0 +1,511 @@
+'''
+FloatFMADatapath class: Computes in1*in2 + in3 on floating point numbers with a
+single rounding (to nearest even), returns out in the same format (float16 by
+default, see float_formats).
+
+FloatFMA class: Use the FloatFMADatapath above and generates a pipelined module
+implemented using five stage pipeline.
+
+FloatAccumulator class: Sums the in1*in2 products of packets (dot products) in
+an exact fixed point register and rounds the sum once per packet.
+'''
+
+from migen import *
+
+from litex.soc.interconnect.stream import *
+
+from litevideo.float_arithmetic.common import *
+
+
+class FloatUnpack(Module):
+    """
+    Unpacks a float (dw bits, exp_w exponent bits): mantissa (with the hidden
+    bit) and exponent, subnormals having an exponent of 1. With normalize,
+    subnormal mantissas are shifted to set their MSB, the exponent going below
+    1 (int_exp_w signed bits).
+    """
+    def __init__(self, x, dw=16, exp_w=5, normalize=False, int_exp_w=8):
+        frac_w = dw - 1 - exp_w
+        self.mant = Signal(frac_w + 1)
+        self.exp = Signal((int_exp_w, True))
+        self.sign = Signal()
+        self.zero = Signal()
+        self.inf = Signal()
+        self.nan = Signal()
+
+        # # #
+
+        frac = x[:frac_w]
+        exp = x[frac_w:dw-1]
+        mant = Signal(frac_w + 1)
+        self.comb += [
+            self.sign.eq(x[dw-1]),
+            self.zero.eq(x[:dw-1] == 0),
+            self.inf.eq((exp == 2**exp_w-1) & (frac == 0)),
+            self.nan.eq((exp == 2**exp_w-1) & (frac != 0)),
+            If(exp == 0,
+                mant.eq(Cat(frac, 0))
+            ).Else(
+                mant.eq(Cat(frac, 1))
+            )
+        ]
+        if normalize:
+            self.submodules.leadone = LeadOne(frac_w + 1)
+            self.comb += [
+                self.leadone.datai.eq(mant),
+                If(exp == 0,
+                    self.mant.eq(mant << self.leadone.leadone),
+                    self.exp.eq(1 - self.leadone.leadone)
+                ).Else(
+                    self.mant.eq(mant),
+                    self.exp.eq(exp)
+                )
+            ]
+        else:
+            self.comb += [
+                self.mant.eq(mant),
+                If(exp == 0,
+                    self.exp.eq(1)
+                ).Else(
+                    self.exp.eq(exp)
+                )
+            ]
+
+
+def shift_right_sticky(module, value, shift, w):
+    """value >> shift (w bits, shift <= w) and the OR of the bits shifted out"""
+    t = Signal(2*w)
+    module.comb += t.eq(Cat(Replicate(0, w), value) >> shift)
+    return t[w:], t[:w] != 0
+
+
+class FloatRound(Module):
+    """
+    Normalizes a w bits magnitude and rounds it (to nearest even) to a float
+    of dw bits with exp_w exponent bits. The value is
+    mag/2**(w-1)*2**(exp-bias): exp (int_exp_w signed bits) is the biased
+    exponent of the result if the MSB of mag is set. sticky tells that non zero
+    bits below mag were lost. Subnormals and overflows to infinity are handled,
+    inf and nan override the result. Implemented as a 2 stage pipeline.
+    """
+    latency = 2
+    def __init__(self, w, dw=16, exp_w=5, int_exp_w=8):
+        frac_w = dw - 1 - exp_w
+        mant_w = frac_w + 1
+        assert w >= mant_w + 2
+        self.mag = Signal(w)
+        self.exp = Signal((int_exp_w, True))
+        self.sign = Signal()
+        self.sticky = Signal()
+        self.inf = Signal()
+        self.nan = Signal()
+        self.out = Signal(dw)
+
+        # # #
+
+        # stage 1
+        # Normalize, down to the exponent of the subnormals
+        self.submodules.leadone = LeadOne(w)
+        self.comb += self.leadone.datai.eq(self.mag)
+        lz = self.leadone.leadone
+
+        left_shift = Signal(max=w)
+        right_shift = Signal(max=w+1)
+        self.comb += [
+            If(lz < self.exp - 1,
+                left_shift.eq(lz)
+            ).Elif(self.exp > 1,
+                left_shift.eq(self.exp - 1)
+            ),
+            If(self.exp < 1 - w,
+                right_shift.eq(w)
+            ).Elif(self.exp < 1,
+                right_shift.eq(1 - self.exp)
+            )
+        ]
+        shifted_right, shifted_out = shift_right_sticky(self, self.mag, right_shift, w)
+        left = Signal(w)
+        self.comb += left.eq(self.mag << left_shift)
+
+        norm = Signal(w)
+        field = Signal(int_exp_w)
+        sticky = Signal()
+        sign = Signal()
+        inf = Signal()
+        nan = Signal()
+        self.sync += [
+            If(self.exp < 1,
+                norm.eq(shifted_right),
+                field.eq(0),
+                sticky.eq(self.sticky | shifted_out)
+            ).Else(
+                norm.eq(left),
+                If(left[w-1],
+                    field.eq(self.exp - left_shift)
+                ).Else(
+                    field.eq(0)
+                ),
+                sticky.eq(self.sticky)
+            ),
+            sign.eq(self.sign),
+            inf.eq(self.inf),
+            nan.eq(self.nan)
+        ]
+
+        # stage 2
+        # Round and pack, the rounding carry going into the exponent
+        mant = norm[w-mant_w:]
+        inc = Signal()
+        rounded = Signal(frac_w + int_exp_w)
+        self.comb += [
+            inc.eq(norm[w-mant_w-1] & ((norm[:w-mant_w-1] != 0) | sticky | mant[0])),
+            rounded.eq(Cat(mant[:frac_w], field) + inc)
+        ]
+        self.sync += [
+            If(nan,
+                self.out.eq(Cat(Replicate(0, frac_w-1), Replicate(1, exp_w + 1), 0))
+            ).Elif(inf | (rounded[frac_w:] >= 2**exp_w-1),
+                self.out.eq(Cat(Replicate(0, frac_w), Replicate(1, exp_w), sign))
+            ).Else(
+                self.out.eq(Cat(rounded[:dw-1], sign))
+            )
+        ]
+
+
+def internal_exp_w(dw, exp_w):
+    """Signed width of the internal exponents of FloatFMADatapath"""
+    return max(exp_w, bits_for(dw - 1 - exp_w)) + 3
+
+
+@CEInserter()
+class FloatFMADatapath(Module):
+    """
+    This adds a floating point fused multiply-add unit: out = in1*in2 + in3
+    with a single rounding. Formats have exp_w exponent bits and
+    dw - 1 - exp_w fraction bits.
+    Implemented as a 5 stage pipeline.
+    """
+    latency = 3 + FloatRound.latency
+    def __init__(self, dw, exp_w=5):
+        self.sink = sink = Record(fma_in_layout(dw))
+        self.source = source = Record(out_layout(dw))
+
+        # # #
+
+        frac_w = dw - 1 - exp_w
+        mant_w = frac_w + 1
+        bias = 2**(exp_w-1) - 1
+        ie = internal_exp_w(dw, exp_w)
+
+        in1 = FloatUnpack(sink.in1, dw, exp_w, True, ie)
+        in2 = FloatUnpack(sink.in2, dw, exp_w, True, ie)
+        in3 = FloatUnpack(sink.in3, dw, exp_w, True, ie)
+        self.submodules += in1, in2, in3
+
+        # Hardware implementation (float16: mant_w = 11, bias = 15):
+        #   in1*in2 = p*2**(e1+e2-50) and in3 = m3*2**(e3-25), the mantissas
+        #   being normalized. x = p << 3 and y = m3 << 14 are 25 bits windows
+        #   with their MSBs at the same place: the window with the lower
+        #   exponent is shifted right by the exponent difference, the bits
+        #   shifted out being kept as a sticky bit, then both are added (or
+        #   subtracted) and the result is rounded once.
+        window_w = 2*mant_w + 3
+
+        # stage 1
+        # Multiply mantissas, exponent difference, special cases
+        p = Signal(2*mant_w)
+        m3 = Signal(mant_w)
+        d = Signal((ie, True))
+        exp_x = Signal((ie, True))
+        exp_y = Signal((ie, True))
+        sign_x = Signal()
+        sign_y = Signal()
+        inf1 = Signal()
+        nan1 = Signal()
+        inf_sign1 = Signal()
+
+        inf_x = Signal()
+        self.comb += inf_x.eq(in1.inf | in2.inf)
+        self.sync += [
+            p.eq(in1.mant*in2.mant),
+            m3.eq(in3.mant),
+            If(in1.zero | in2.zero,
+                d.eq(-2**(ie-1))
+            ).Elif(in3.zero,
+                d.eq(2**(ie-1)-1)
+            ).Else(
+                d.eq(in1.exp + in2.exp - in3.exp - bias + 1)
+            ),
+            exp_x.eq(in1.exp + in2.exp - bias + 2),
+            exp_y.eq(in3.exp + 1),
+            sign_x.eq(in1.sign ^ in2.sign),
+            sign_y.eq(in3.sign),
+            nan1.eq(in1.nan | in2.nan | in3.nan |
+                    (inf_x & (in1.zero | in2.zero)) |
+                    (inf_x & in3.inf & (in1.sign ^ in2.sign ^ in3.sign))),
+            inf1.eq(inf_x | in3.inf),
+            If(inf_x,
+                inf_sign1.eq(in1.sign ^ in2.sign)
+            ).Else(
+                inf_sign1.eq(in3.sign)
+            )
+        ]
+
+        # stage 2
+        # Align on the larger exponent
+        x = Cat(Replicate(0, 3), p)
+        y = Cat(Replicate(0, mant_w + 3), m3)
+        small = Signal(window_w)
+        shift = Signal(max=window_w+1)
+        self.comb += [
+            If(d >= 0,
+                small.eq(y),
+                If(d > window_w, shift.eq(window_w)).Else(shift.eq(d))
+            ).Else(
+                small.eq(x),
+                If(d < -window_w, shift.eq(window_w)).Else(shift.eq(-d))
+            )
+        ]
+        small_shifted, shifted_out = shift_right_sticky(self, small, shift, window_w)
+
+        big2 = Signal(window_w)
+        small2 = Signal(window_w)
+        sticky2 = Signal()
+        exp2 = Signal((ie, True))
+        sign_big2 = Signal()
+        sign_small2 = Signal()
+        inf2 = Signal()
+        nan2 = Signal()
+        inf_sign2 = Signal()
+        self.sync += [
+            If(d >= 0,
+                big2.eq(x),
+                exp2.eq(exp_x),
+                sign_big2.eq(sign_x),
+                sign_small2.eq(sign_y)
+            ).Else(
+                big2.eq(y),
+                exp2.eq(exp_y),
+                sign_big2.eq(sign_y),
+                sign_small2.eq(sign_x)
+            ),
+            small2.eq(small_shifted),
+            sticky2.eq(shifted_out),
+            inf2.eq(inf1),
+            nan2.eq(nan1),
+            inf_sign2.eq(inf_sign1)
+        ]
+
+        # stage 3
+        # Add or subtract, the sticky bit as LSB of the smaller operand
+        total = Signal((window_w + 3, True))
+        self.comb += [
+            If(sign_big2 == sign_small2,
+                total.eq(Cat(0, big2) + Cat(sticky2, small2))
+            ).Else(
+                total.eq(Cat(0, big2) - Cat(sticky2, small2))
+            )
+        ]
+
+        self.submodules.round = FloatRound(window_w + 2, dw, exp_w, ie)
+        self.sync += [
+            If(total < 0,
+                self.round.mag.eq(-total),
+                self.round.sign.eq(~sign_big2)
+            ).Elif((total == 0) & (sign_big2 != sign_small2),
+                self.round.mag.eq(0),
+                self.round.sign.eq(0)
+            ).Else(
+                self.round.mag.eq(total),
+                self.round.sign.eq(sign_big2)
+            ),
+            self.round.exp.eq(exp2),
+            If(inf2,
+                self.round.sign.eq(inf_sign2)
+            ),
+            self.round.inf.eq(inf2),
+            self.round.nan.eq(nan2)
+        ]
+
+        # stages 4 and 5
+        # Normalize, round and pack
+        self.comb += source.out.eq(self.round.out)
+
+
+class FloatFMA(PipelinedActor, Module):
+    def __init__(self, dw=16, exp_w=5):
+        self.sink = sink = stream.Endpoint(EndpointDescription(fma_in_layout(dw)))
+        self.source = source = stream.Endpoint(EndpointDescription(out_layout(dw)))
+
+        # # #
+
+        self.submodules.datapath = FloatFMADatapath(dw, exp_w)
+        PipelinedActor.__init__(self, self.datapath.latency)
+        self.comb += self.datapath.ce.eq(self.pipe_ce)
+        for name in ["in1", "in2", "in3"]:
+            self.comb += getattr(self.datapath.sink, name).eq(getattr(sink, name))
+        self.comb += source.out.eq(self.datapath.source.out)
+
+
+@CEInserter()
+class FloatAccumulatorDatapath(Module):
+    """
+    Sums the in1*in2 products from first to last (when valid) in a fixed point
+    register where every product is exact (80 + guard_w bits with a 2**-48 LSB
+    for float16), and rounds the sum once: out_valid is set latency cycles
+    after last. Up to 2**guard_w products of the largest magnitude can be
+    summed without overflow.
+
+    The register covers the whole exponent range and doubles with each
+    exponent bit: only formats with exp_w <= 5 are supported (it would be
+    522 + guard_w bits for bfloat16 and 284 + guard_w bits for fp24).
+    """
+    latency = 4 + FloatRound.latency
+    def __init__(self, dw, exp_w=5, guard_w=8):
+        assert exp_w <= 5
+        self.sink = sink = Record(in_layout(dw))
+        self.valid = Signal()
+        self.first = Signal()
+        self.last = Signal()
+        self.source = source = Record(out_layout(dw))
+        self.out_valid = Signal()
+
+        # # #
+
+        frac_w = dw - 1 - exp_w
+        mant_w = frac_w + 1
+        bias = 2**(exp_w-1) - 1
+        max_shift = 2*(2**exp_w - 2) - 2
+        product_w = 2*mant_w + max_shift
+        acc_w = product_w + guard_w
+
+        in1 = FloatUnpack(sink.in1, dw, exp_w, int_exp_w=exp_w + 1)
+        in2 = FloatUnpack(sink.in2, dw, exp_w, int_exp_w=exp_w + 1)
+        self.submodules += in1, in2
+
+        # stage 1
+        # Multiply mantissas, product position
+        p = Signal(2*mant_w)
+        k = Signal(max=max_shift+1)
+        sign1 = Signal()
+        valid1 = Signal()
+        first1 = Signal()
+        last1 = Signal()
+        nan1 = Signal()
+        inf1 = Signal()
+        self.sync += [
+            p.eq(in1.mant*in2.mant),
+            k.eq(in1.exp + in2.exp - 2),
+            sign1.eq(in1.sign ^ in2.sign),
+            valid1.eq(self.valid),
+            first1.eq(self.first),
+            last1.eq(self.last),
+            nan1.eq(in1.nan | in2.nan | ((in1.inf | in2.inf) & (in1.zero | in2.zero))),
+            inf1.eq(in1.inf | in2.inf)
+        ]
+
+        # stage 2
+        # Shift the product to its position, two's complement
+        product = Signal((product_w + 1, True))
+        valid2 = Signal()
+        first2 = Signal()
+        last2 = Signal()
+        nan2 = Signal()
+        inf2 = Signal()
+        inf_sign2 = Signal()
+        self.sync += [
+            If(sign1,
+                product.eq(-(p << k))
+            ).Else(
+                product.eq(p << k)
+            ),
+            valid2.eq(valid1),
+            first2.eq(first1),
+            last2.eq(last1),
+            nan2.eq(nan1),
+            inf2.eq(inf1),
+            inf_sign2.eq(sign1)
+        ]
+
+        # stage 3
+        # Accumulate, infinities of both signs giving nan
+        acc = Signal((acc_w + 1, True))
+        acc_nan = Signal()
+        acc_infp = Signal()
+        acc_infn = Signal()
+        done = Signal()
+        self.sync += [
+            If(valid2,
+                If(first2,
+                    acc.eq(product),
+                    acc_nan.eq(nan2),
+                    acc_infp.eq(inf2 & ~inf_sign2),
+                    acc_infn.eq(inf2 & inf_sign2)
+                ).Else(
+                    acc.eq(acc + product),
+                    acc_nan.eq(acc_nan | nan2),
+                    acc_infp.eq(acc_infp | (inf2 & ~inf_sign2)),
+                    acc_infn.eq(acc_infn | (inf2 & inf_sign2))
+                )
+            ),
+            done.eq(valid2 & last2)
+        ]
+
+        # stage 4
+        # Magnitude
+        self.submodules.round = FloatRound(acc_w, dw, exp_w, bits_for(acc_w) + 2)
+        self.sync += [
+            If(acc < 0,
+                self.round.mag.eq(-acc),
+                self.round.sign.eq(1)
+            ).Else(
+                self.round.mag.eq(acc),
+                self.round.sign.eq(0)
+            ),
+            If(acc_infp | acc_infn,
+                self.round.sign.eq(acc_infn)
+            ),
+            self.round.exp.eq(acc_w + 1 - bias - 2*frac_w),
+            self.round.inf.eq(acc_infp | acc_infn),
+            self.round.nan.eq(acc_nan | (acc_infp & acc_infn))
+        ]
+
+        # stages 5 and 6
+        # Normalize, round and pack
+        valid = done
+        for i in range(1 + FloatRound.latency):
+            valid_n = Signal()
+            self.sync += valid_n.eq(valid)
+            valid = valid_n
+        self.comb += [
+            source.out.eq(self.round.out),
+            self.out_valid.eq(valid)
+        ]
+
+
+class FloatAccumulator(Module):
+    """
+    Sums the in1*in2 products of each packet of sink (dot products), source
+    giving one float per packet (see FloatAccumulatorDatapath).
+    """
+    def __init__(self, dw=16, exp_w=5, guard_w=8):
+        self.sink = sink = stream.Endpoint(EndpointDescription(in_layout(dw)))
+        self.source = source = stream.Endpoint(EndpointDescription(out_layout(dw)))
+
+        # # #
+
+        self.submodules.datapath = FloatAccumulatorDatapath(dw, exp_w, guard_w)
+        self.latency = self.datapath.latency
+        pipe_ce = Signal()
+        self.comb += [
+            pipe_ce.eq(source.ready | ~source.valid),
+            sink.ready.eq(pipe_ce),
+            self.datapath.ce.eq(pipe_ce),
+            self.datapath.valid.eq(sink.valid),
+            self.datapath.first.eq(sink.first),
+            self.datapath.last.eq(sink.last),
+            self.datapath.sink.in1.eq(sink.in1),
+            self.datapath.sink.in2.eq(sink.in2),
+            source.valid.eq(self.datapath.out_valid),
+            source.out.eq(self.datapath.source.out)
+        ]
@@ -1,6 +1,6 @@
 '''
 FloatMultDatapath class: Multiply two floating point numbers a and b, returns
-their output c in the same float16 format.
+their output c in the same format (float16 by default, see float_formats).
 
 FloatMult class: Use the FloatMultDatapath above and generates a modules
 implemented using five stage pipeline.
@@ -22,12 +22,17 @@ class FloatMultDatapath(Module):
     Output: out
     Implemented as a 5 stage pipeline, design is based on float16 design doc.
     Google Docs Link: https://goo.gl/Rvx2B7
+    Formats have exp_w exponent bits and dw - 1 - exp_w fraction bits.
     """
     latency = 5
-    def __init__(self, dw):
+    def __init__(self, dw, exp_w=5):
         self.sink = sink = Record(in_layout(dw))
         self.source = source = Record(out_layout(dw))
 
+        frac_w = dw - 1 - exp_w
+        mant_w = frac_w + 1
+        bias = 2**(exp_w-1) - 1
+
         # delay input a/b signals
         in_delayed = [sink]
         for i in range(self.latency):
@@ -40,18 +45,19 @@ class FloatMultDatapath(Module):
         # Unpack
         # Look for special cases
 
-        in1_frac = Signal(10)
-        in2_frac = Signal(10)
-        in1_mant = Signal(11)
-        in2_mant = Signal(11)
+        in1_frac = Signal(frac_w)
+        in2_frac = Signal(frac_w)
+        in1_mant = Signal(mant_w)
+        in2_mant = Signal(mant_w)
 
-        in1_exp = Signal(5)
-        in2_exp = Signal(5)
-        in1_exp1 = Signal(5)
-        in2_exp1 = Signal(5)
+        in1_exp = Signal(exp_w)
+        in2_exp = Signal(exp_w)
+        in1_exp1 = Signal(exp_w)
+        in2_exp1 = Signal(exp_w)
 
         in1_sign = Signal()
         in2_sign = Signal()
+        out_sign1 = Signal()
 
         out_status1 = Signal(2)
         # 00-0 Zero
@@ -60,14 +66,14 @@ class FloatMultDatapath(Module):
         # 11-3 Normal
 
         self.comb += [
-            in1_frac.eq(sink.in1[:10]),
-            in2_frac.eq(sink.in2[:10]),
+            in1_frac.eq(sink.in1[:frac_w]),
+            in2_frac.eq(sink.in2[:frac_w]),
 
-            in1_exp.eq(sink.in1[10:15]),
-            in2_exp.eq(sink.in2[10:15]),
+            in1_exp.eq(sink.in1[frac_w:dw-1]),
+            in2_exp.eq(sink.in2[frac_w:dw-1]),
 
-            in1_sign.eq(sink.in1[15]),
-            in2_sign.eq(sink.in2[15])
+            in1_sign.eq(sink.in1[dw-1]),
+            in2_sign.eq(sink.in2[dw-1])
         ]
 
         self.sync += [
@@ -93,30 +99,34 @@ class FloatMultDatapath(Module):
                 out_status1.eq(0)
             ).Else(
                 out_status1.eq(3)
-            )
+            ),
+            out_sign1.eq(in1_sign ^ in2_sign)
         ]
 
         # stage 2
         # Multiply fractions and add exponents
-        out_mult = Signal(22)
-        out_exp = Signal((7, True))
+        out_mult = Signal(2*mant_w)
+        out_exp = Signal((exp_w + 2, True))
         out_status2 = Signal(2)
+        out_sign2 = Signal()
 
         self.sync += [
             out_mult.eq(in1_mant * in2_mant),
-            out_exp.eq(in1_exp1 + in2_exp1 - 15),
+            out_exp.eq(in1_exp1 + in2_exp1 - bias),
             out_status2.eq(out_status1),
+            out_sign2.eq(out_sign1)
         ]
 
         # stage 3
         # Leading one detector
-        one_ptr = Signal(5)
+        one_ptr = Signal(max=2*mant_w)
         out_status3 = Signal(2)
-        out_mult3 = Signal(22)
-        out_exp3 = Signal((7, True))
+        out_mult3 = Signal(2*mant_w)
+        out_exp3 = Signal((exp_w + 2, True))
+        out_sign3 = Signal()
 
-        lead_one_ptr = Signal(5)
-        self.submodules.leadone = LeadOne(22)
+        lead_one_ptr = Signal(max=2*mant_w)
+        self.submodules.leadone = LeadOne(2*mant_w)
         self.comb += [
             self.leadone.datai.eq(out_mult),
             lead_one_ptr.eq(self.leadone.leadone)
@@ -126,23 +136,26 @@ class FloatMultDatapath(Module):
             out_status3.eq(out_status2),
             out_mult3.eq(out_mult),
             out_exp3.eq(out_exp),
+            out_sign3.eq(out_sign2),
             one_ptr.eq(lead_one_ptr)
         ]
 
         # stage 4
         # Shift and Adjust
-        out_exp_adjust = Signal((7, True))
-        out_mult_shift = Signal(22)
+        out_exp_adjust = Signal((exp_w + 2, True))
+        out_mult_shift = Signal(2*mant_w)
         out_status4 = Signal(2)
+        out_sign4 = Signal()
 
         self.sync += [
             out_status4.eq(out_status3),
+            out_sign4.eq(out_sign3),
             If((out_exp3 - one_ptr) < 1,
                 out_exp_adjust.eq(0),
-                out_mult_shift.eq(((out_mult >> (0 - out_exp3)) << 1))
+                out_mult_shift.eq(((out_mult3 >> (0 - out_exp3)) << 1))
             ).Else(
                 out_exp_adjust.eq(out_exp3 + 1 - one_ptr),
-                out_mult_shift.eq(out_mult << one_ptr + 1)
+                out_mult_shift.eq(out_mult3 << one_ptr + 1)
             )
         ]
 
@@ -152,18 +165,18 @@ class FloatMultDatapath(Module):
             If(out_status4 == 0,
                 source.out.eq(0)
             ).Elif(out_status4 == 3,
-                source.out.eq(Cat(out_mult_shift[12:], out_exp_adjust[:5],0))
+                source.out.eq(Cat(out_mult_shift[frac_w+2:], out_exp_adjust[:exp_w], out_sign4))
             )
         ]
 
 class FloatMult(PipelinedActor, Module, AutoCSR):
-    def __init__(self, dw=16):
+    def __init__(self, dw=16, exp_w=5):
         self.sink = sink = stream.Endpoint(EndpointDescription(in_layout(dw)))
         self.source = source = stream.Endpoint(EndpointDescription(out_layout(dw)))
 
         # # #
 
-        self.submodules.datapath = FloatMultDatapath(dw)
+        self.submodules.datapath = FloatMultDatapath(dw, exp_w)
         PipelinedActor.__init__(self, self.datapath.latency)
         self.comb += self.datapath.ce.eq(self.pipe_ce)
         for name in ["in1", "in2"]:
@@ -0,0 +1,156 @@
+'''
+FloatSqrtDatapath class: Square root of in1 (floating point number), returns
+out in the same format (float16 by default, see float_formats), rounded to
+nearest even.
+
+FloatSqrt class: Use the FloatSqrtDatapath above and generates a pipelined
+module.
+'''
+
+from math import sqrt
+
+from migen import *
+
+from litex.soc.interconnect.stream import *
+
+from litevideo.float_arithmetic.common import *
+from litevideo.float_arithmetic.floatfma import FloatUnpack, FloatRound, internal_exp_w
+from litevideo.float_arithmetic.floatdiv import nr_params
+
+
+def rsqrt_seed_table(mant_w):
+    """1/sqrt(m) at the middle of the 2**index_w intervals of [1, 2) then of
+    [2, 4), index_w + 3 fraction bits"""
+    index_w, frac_w, iterations = nr_params(mant_w)
+    return [round(2**(index_w + 3)/sqrt((1 + (i + 0.5)/2**index_w)*2**odd))
+            for odd in range(2) for i in range(2**index_w)]
+
+
+@CEInserter()
+class FloatSqrtDatapath(Module):
+    """
+    This adds a floating point square root unit: out = sqrt(in1).
+    Hardware implementation:
+      The mantissa m is doubled when the exponent is odd (m in [1, 4)). The
+      reciprocal square root y of m is seeded from a table and refined by
+      Newton-Raphson iterations (y = y*(3 - m*y*y)/2, 3 stages each). The root
+      s = m*y is then corrected with the remainder m - s*s, giving the exact
+      truncated root and a sticky bit, and rounded once.
+    Implemented as a 6 + 3*iterations stage pipeline (9 for float16).
+    """
+    def __init__(self, dw, exp_w=5):
+        self.sink = sink = Record(unary_in_layout(dw))
+        self.source = source = Record(out_layout(dw))
+
+        frac_w = dw - 1 - exp_w
+        mant_w = frac_w + 1
+        bias = 2**(exp_w-1) - 1
+        ie = internal_exp_w(dw, exp_w)
+        index_w, nr_w, iterations = nr_params(mant_w)
+        root_w = mant_w + 1
+        self.latency = 6 + 3*iterations
+
+        # # #
+
+        in1 = FloatUnpack(sink.in1, dw, exp_w, True, ie)
+        self.submodules += in1
+
+        # stage 1
+        # Seed, exponent, special cases
+        unbiased = Signal((ie, True))
+        odd = Signal()
+        half = Signal((ie - 1, True))
+        self.comb += [
+            unbiased.eq(in1.exp - bias),
+            odd.eq(unbiased[0]),
+            half.eq((unbiased - odd)[1:])
+        ]
+
+        seeds = Array(rsqrt_seed_table(mant_w))
+        m = Signal(mant_w + 1)
+        y = Signal(nr_w + 1)
+        exp = Signal((ie, True))
+        sign = Signal()
+        zero = Signal()
+        inf = Signal()
+        nan = Signal()
+        self.sync += [
+            m.eq(in1.mant << odd),
+            y.eq(seeds[Cat(in1.mant[mant_w-1-index_w:mant_w-1], odd)] << (nr_w - index_w - 3)),
+            exp.eq(half + bias),
+            sign.eq(in1.sign),
+            zero.eq(in1.zero),
+            inf.eq(in1.inf & ~in1.sign),
+            nan.eq(in1.nan | (in1.sign & ~in1.zero))
+        ]
+
+        # stages 2 to 1 + 3*iterations
+        # Newton-Raphson iterations
+        for i in range(iterations):
+            t1 = Signal(nr_w + 1)
+            t2 = Signal(nr_w + 3)
+            y_d = delay(self, y, 2)
+            y_n = Signal(nr_w + 1)
+            self.sync += [
+                t1.eq((y*y) >> nr_w),
+                t2.eq((delay(self, m, 1)*t1) >> (mant_w - 1)),
+                y_n.eq((y_d*(3*2**nr_w - t2)) >> (nr_w + 1))
+            ]
+            m = delay(self, m, 3)
+            y = y_n
+
+        # stage 2 + 3*iterations
+        # Root
+        s = Signal(root_w + 2)
+        self.sync += s.eq((m*y) >> (nr_w + mant_w - 1 - root_w))
+        m = delay(self, m, 1)
+
+        # stage 3 + 3*iterations
+        # Remainder
+        r = Signal((2*root_w + 4, True))
+        self.sync += r.eq((m << (mant_w + 3)) - s*s)
+        s = delay(self, s, 1)
+
+        # stage 4 + 3*iterations
+        # Correct the root by one if needed
+        stages = 2 + 3*iterations
+        self.submodules.round = FloatRound(root_w + 1, dw, exp_w, ie)
+        self.sync += [
+            If(delay(self, zero, stages),
+                self.round.mag.eq(0),
+                self.round.sticky.eq(0)
+            ).Elif(r < 0,
+                self.round.mag.eq(s - 1),
+                self.round.sticky.eq(r + 2*s - 1 != 0)
+            ).Elif(r > 2*s,
+                self.round.mag.eq(s + 1),
+                self.round.sticky.eq(r - 2*s - 1 != 0)
+            ).Else(
+                self.round.mag.eq(s),
+                self.round.sticky.eq(r != 0)
+            ),
+            self.round.exp.eq(delay(self, exp, stages)),
+            self.round.sign.eq(delay(self, sign, stages)),
+            self.round.inf.eq(delay(self, inf, stages)),
+            self.round.nan.eq(delay(self, nan, stages))
+        ]
+
+        # last 2 stages
+        # Normalize, round and pack
+        self.comb += source.out.eq(self.round.out)
+
+
+class FloatSqrt(PipelinedActor, Module):
+    def __init__(self, dw=16, exp_w=5):
+        self.sink = sink = stream.Endpoint(EndpointDescription(unary_in_layout(dw)))
+        self.source = source = stream.Endpoint(EndpointDescription(out_layout(dw)))
+
+        # # #
+
+        self.submodules.datapath = FloatSqrtDatapath(dw, exp_w)
+        PipelinedActor.__init__(self, self.datapath.latency)
+        self.comb += [
+            self.datapath.ce.eq(self.pipe_ce),
+            self.datapath.sink.in1.eq(sink.in1),
+            source.out.eq(self.datapath.source.out)
+        ]
@@ -3,6 +3,8 @@ from PIL import Image
 import random
 import copy
 import numpy as np
+from fractions import Fraction
+from math import isqrt
 
 
 from migen import *
@@ -84,3 +86,120 @@ def binint2float(x):
 
     y = ((-1)**signv)*(2**(expn))*fracn*(2**(-10))
     return y
+
+
+class Format:
+    def __init__(self, dw, exp_w):
+        self.dw = dw
+        self.exp_w = exp_w
+        self.frac_w = dw - 1 - exp_w
+        self.bias = 2**(exp_w - 1) - 1
+        self.exp_max = 2**exp_w - 1
+        self.inf = self.exp_max << self.frac_w
+        self.nan = self.inf | (1 << (self.frac_w - 1))
+
+    def decode(self, x):
+        """float to Fraction, None for nan, "inf"/"-inf" for infinities"""
+        s = x >> (self.dw - 1)
+        e = (x >> self.frac_w) & self.exp_max
+        f = x & (2**self.frac_w - 1)
+        if e == self.exp_max:
+            return None if f else ["inf", "-inf"][s]
+        if e == 0:
+            v = Fraction(f, 2**self.frac_w)*Fraction(2)**(1 - self.bias)
+        else:
+            v = Fraction(2**self.frac_w + f, 2**self.frac_w)*Fraction(2)**(e - self.bias)
+        return -v if s else v
+
+    def encode(self, v):
+        """Fraction to float, rounded to nearest even"""
+        if v == 0:
+            return 0
+        s = int(v < 0) << (self.dw - 1)
+        v = abs(v)
+        e = v.numerator.bit_length() - v.denominator.bit_length()
+        if Fraction(2)**e > v:
+            e -= 1
+        e = max(e, 1 - self.bias)
+        m = round(v/Fraction(2)**(e - self.frac_w))
+        if m == 2**(self.frac_w + 1):
+            m, e = m//2, e + 1
+        if e > self.bias:
+            return s | self.inf
+        if m < 2**self.frac_w:
+            return s | m
+        return s | ((e + self.bias) << self.frac_w) | (m - 2**self.frac_w)
+
+    def fma(self, a, b, c):
+        va, vb, vc = self.decode(a), self.decode(b), self.decode(c)
+        if None in [va, vb, vc]:
+            return self.nan
+        sign = (a ^ b) >> (self.dw - 1)
+        if isinstance(va, str) or isinstance(vb, str):
+            if va == 0 or vb == 0:
+                return self.nan
+            if isinstance(vc, str) and (c >> (self.dw - 1)) != sign:
+                return self.nan
+            return (sign << (self.dw - 1)) | self.inf
+        if isinstance(vc, str):
+            return c
+        product = va*vb
+        if product == 0 and vc == 0:
+            return (sign & (c >> (self.dw - 1))) << (self.dw - 1)
+        return self.encode(product + vc)
+
+    def div(self, a, b):
+        va, vb = self.decode(a), self.decode(b)
+        if va is None or vb is None:
+            return self.nan
+        sign = ((a ^ b) >> (self.dw - 1)) << (self.dw - 1)
+        if isinstance(va, str):
+            return self.nan if isinstance(vb, str) else sign | self.inf
+        if isinstance(vb, str):
+            return sign
+        if vb == 0:
+            return self.nan if va == 0 else sign | self.inf
+        if va == 0:
+            return sign
+        return self.encode(va/vb)
+
+    def sqrt(self, a):
+        va = self.decode(a)
+        if va is None or va == "-inf":
+            return self.nan
+        if va == "inf" or va == 0:
+            return a
+        if va < 0:
+            return self.nan
+        # truncated root with enough bits, plus a sticky bit when inexact
+        k = 2*(self.frac_w + self.bias + 8)
+        n = va*Fraction(2)**k
+        root = isqrt(n.numerator//n.denominator)
+        v = Fraction(root, 2**(k//2))
+        if root*root*n.denominator != n.numerator:
+            v += Fraction(1, 2**(k//2 + 2))
+        return self.encode(v)
+
+    def random(self, finite=False):
+        while True:
+            if random.random() < 0.2:
+                # subnormals and small normals
+                x = (random.getrandbits(self.frac_w) | (random.randrange(3) << self.frac_w) |
+                     (random.getrandbits(1) << (self.dw - 1)))
+            else:
+                x = random.getrandbits(self.dw)
+            if not finite or isinstance(self.decode(x), Fraction):
+                return x
+
+    def fma_vectors(self, n):
+        vectors = []
+        for i in range(n):
+            a, b = self.random(), self.random()
+            if i % 2 and all(isinstance(self.decode(x), Fraction) for x in [a, b]):
+                # close to -a*b: cancellations
+                c = self.encode(-self.decode(a)*self.decode(b))
+                c ^= random.choice([0, 1, 2, 1 << (self.dw - 1)])
+            else:
+                c = self.random()
+            vectors.append((a, b, c))
+        return vectors
@@ -0,0 +1,84 @@
+import random
+from fractions import Fraction
+
+from migen import *
+
+from litevideo.float_arithmetic.common import float_formats
+from litevideo.float_arithmetic.floatdiv import FloatDivDatapath, FloatRecip
+from litevideo.float_arithmetic.floatsqrt import FloatSqrtDatapath
+from litevideo.float_arithmetic.test.common import Format
+
+
+def datapath_generator(dut, name, vectors, model):
+    results = []
+    yield dut.ce.eq(1)
+    for i in range(len(vectors) + dut.latency):
+        if i < len(vectors):
+            for port, value in zip(["in1", "in2"], vectors[i]):
+                yield getattr(dut.sink, port).eq(value)
+        yield
+        if i >= dut.latency:
+            results.append((yield dut.source.out))
+    errors = 0
+    for vector, out in zip(vectors, results):
+        expected = model(*vector)
+        if out != expected:
+            errors += 1
+            print("{}({}): {:x} != {:x}".format(name, ", ".join("{:x}".format(v) for v in vector),
+                                                 out, expected))
+    print("{}: {} errors / {} vectors".format(name, errors, len(vectors)))
+    assert errors == 0
+
+
+def recip_generator(dut, fmt, vectors):
+    one = fmt.encode(1)
+    yield dut.source.ready.eq(1)
+    results = []
+    for x in vectors:
+        yield dut.sink.valid.eq(1)
+        yield dut.sink.in1.eq(x)
+        yield
+        if (yield dut.source.valid):
+            results.append((yield dut.source.out))
+    yield dut.sink.valid.eq(0)
+    for i in range(dut.latency + 1):
+        yield
+        if (yield dut.source.valid):
+            results.append((yield dut.source.out))
+    errors = abs(len(results) - len(vectors))
+    for x, out in zip(vectors, results):
+        expected = fmt.div(one, x)
+        if out != expected:
+            errors += 1
+            print("recip({:x}): {:x} != {:x}".format(x, out, expected))
+    print("recip: {} errors / {} vectors".format(errors, len(vectors)))
+    assert errors == 0
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    for name, (dw, exp_w) in sorted(float_formats.items()):
+        print(name)
+        fmt = Format(dw, exp_w)
+        one = fmt.encode(1)
+
+        vectors = [(fmt.random(), fmt.random()) for i in range(2048)]
+        vectors += [(one, fmt.random()) for i in range(512)]
+        dut = FloatDivDatapath(dw, exp_w)
+        run_simulation(dut, datapath_generator(dut, "div", vectors, fmt.div),
+                       vcd_name="div_{}.vcd".format(name))
+
+        # zeros, infinities, NaN, smallest subnormal, largest normal
+        sign = 1 << (dw - 1)
+        vectors = [0, sign, fmt.inf, sign | fmt.inf, fmt.nan, 1, fmt.inf - 1, one]
+        vectors += [fmt.encode(Fraction(2)**e) for e in range(-8, 8)]
+        vectors += [fmt.random() for i in range(1024)]
+        dut = FloatRecip(dw, exp_w)
+        run_simulation(dut, recip_generator(dut, fmt, vectors),
+                       vcd_name="recip_{}.vcd".format(name))
+
+        vectors = [(fmt.random(),) for i in range(2048)]
+        vectors += [(fmt.encode(random.randrange(1, 256)**2),) for i in range(64)]
+        dut = FloatSqrtDatapath(dw, exp_w)
+        run_simulation(dut, datapath_generator(dut, "sqrt", vectors, fmt.sqrt),
+                       vcd_name="sqrt_{}.vcd".format(name))
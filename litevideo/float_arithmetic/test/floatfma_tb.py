@@ -0,0 +1,76 @@
+import random
+
+from migen import *
+
+from litevideo.float_arithmetic.common import float_formats
+from litevideo.float_arithmetic.floatfma import FloatFMADatapath, FloatAccumulator
+from litevideo.float_arithmetic.test.common import Format
+
+
+def fma_generator(dut, fmt, vectors):
+    results = []
+    yield dut.ce.eq(1)
+    for i in range(len(vectors) + dut.latency):
+        if i < len(vectors):
+            a, b, c = vectors[i]
+            yield dut.sink.in1.eq(a)
+            yield dut.sink.in2.eq(b)
+            yield dut.sink.in3.eq(c)
+        yield
+        if i >= dut.latency:
+            results.append((yield dut.source.out))
+    errors = 0
+    for (a, b, c), out in zip(vectors, results):
+        expected = fmt.fma(a, b, c)
+        if out != expected:
+            errors += 1
+            print("fma({:x}, {:x}, {:x}): {:x} != {:x}".format(a, b, c, out, expected))
+    print("fma: {} errors / {} vectors".format(errors, len(vectors)))
+    assert errors == 0
+
+
+def accumulator_generator(dut, fmt, packets):
+    expected = [fmt.encode(sum(fmt.decode(a)*fmt.decode(b) for a, b in packet))
+                for packet in packets]
+    yield dut.source.ready.eq(1)
+    results = []
+    for packet in packets:
+        for i, (a, b) in enumerate(packet):
+            yield dut.sink.valid.eq(1)
+            yield dut.sink.first.eq(i == 0)
+            yield dut.sink.last.eq(i == len(packet) - 1)
+            yield dut.sink.in1.eq(a)
+            yield dut.sink.in2.eq(b)
+            yield
+            if (yield dut.source.valid):
+                results.append((yield dut.source.out))
+    yield dut.sink.valid.eq(0)
+    for i in range(dut.latency + 1):
+        yield
+        if (yield dut.source.valid):
+            results.append((yield dut.source.out))
+    # the sign of zero sums is not checked
+    mask = 2**(fmt.dw - 1) - 1
+    errors = sum(((r & mask) or (e & mask)) and r != e for r, e in zip(results, expected))
+    errors += abs(len(results) - len(expected))
+    print("accumulator: {} errors / {} packets".format(errors, len(packets)))
+    assert errors == 0
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    for name, (dw, exp_w) in sorted(float_formats.items()):
+        print(name)
+        fmt = Format(dw, exp_w)
+        dut = FloatFMADatapath(dw, exp_w)
+        run_simulation(dut, fma_generator(dut, fmt, fmt.fma_vectors(2048)),
+                       vcd_name="fma_{}.vcd".format(name))
+
+        # the accumulator is limited to the narrow exponents
+        if exp_w > 5:
+            continue
+        packets = [[(fmt.random(True), fmt.random(True)) for i in range(random.randrange(1, 17))]
+                   for j in range(64)]
+        dut = FloatAccumulator(dw, exp_w)
+        run_simulation(dut, accumulator_generator(dut, fmt, packets),
+                       vcd_name="accumulator_{}.vcd".format(name))
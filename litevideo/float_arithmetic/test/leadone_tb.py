@@ -0,0 +1,27 @@
+import random
+
+from migen import *
+
+from litevideo.float_arithmetic.common import LeadOne
+
+
+def main_generator(dut, dw):
+    values = [0] + [1 << i for i in range(dw)] + [random.getrandbits(dw) for i in range(256)]
+    errors = 0
+    for value in values:
+        yield dut.datai.eq(value)
+        yield
+        leadone = (yield dut.leadone)
+        zero = (yield dut.zero)
+        expected = dw - value.bit_length() if value else 0
+        if leadone != expected or zero != (value == 0):
+            errors += 1
+            print("{:x}: {} != {}".format(value, leadone, expected))
+    print("dw={}: {} errors".format(dw, errors))
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    for dw in [1, 3, 12, 22, 27]:
+        dut = LeadOne(dw)
+        run_simulation(dut, main_generator(dut, dw))
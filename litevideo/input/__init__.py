@@ -8,6 +8,8 @@ from litevideo.input.datacapture import S6DataCapture, S7DataCapture
 from litevideo.input.charsync import CharSync
 from litevideo.input.wer import WER
 from litevideo.input.decoding import Decoding, DecodeTERC4
+from litevideo.input.packet import PacketDecoder, PacketFIFO
+from litevideo.input.audio import AudioExtraction
 from litevideo.input.chansync import ChanSync
 from litevideo.input.analysis import SyncPolarity, ResolutionDetection
 from litevideo.input.analysis import FrameExtraction
@@ -46,10 +48,12 @@ class TimingDelayChannel(Module):
 class HDMIIn(Module, AutoCSR):
     def __init__(self, pads, dram_port=None, n_dma_slots=2, fifo_depth=512, device="xc6",
                  default_edid=_default_edid, clkin_freq=148.5e6, split_mmcm=False, mode="ycbcr422",
-                 hdmi=False, iodelay_clk_freq=200e6, alt_delay=False):
+                 hdmi=False, iodelay_clk_freq=200e6, alt_delay=False, packet_fifo_depth=0,
+                 audio_fifo_depth=0, n_edid_banks=1, drp_modes=None, lut=False):
+        assert hdmi or not (packet_fifo_depth or audio_fifo_depth), "packet/audio extraction requires hdmi"
         if hasattr(pads, "scl"):
-            self.submodules.edid = EDID(pads, default_edid)
-        self.submodules.clocking = clocking_cls[device](pads, clkin_freq, split_mmcm)
+            self.submodules.edid = EDID(pads, default_edid, n_edid_banks)
+        self.submodules.clocking = clocking_cls[device](pads, clkin_freq, split_mmcm, drp_modes=drp_modes)
 
         for datan in range(3):
             name = "data" + str(datan)
@@ -135,18 +139,18 @@ class HDMIIn(Module, AutoCSR):
                      o_sdata=data2_bonded,
                      ),
             ]
-        self.comb += all_rdy.eq(data0_iamrdy & data1_iamrdy & data2_iamrdy)
-        self.submodules.auto0_decoding = Decoding()
-        self.submodules.auto1_decoding = Decoding()
-        self.submodules.auto2_decoding = Decoding()
-        self.comb += [
-            self.auto0_decoding.valid_i.eq(data0_iamrdy),
-            self.auto1_decoding.valid_i.eq(data1_iamrdy),
-            self.auto2_decoding.valid_i.eq(data2_iamrdy),
-            self.auto0_decoding.input.eq(data0_bonded),
-            self.auto1_decoding.input.eq(data1_bonded),
-            self.auto2_decoding.input.eq(data2_bonded)
-        ]
+            self.comb += all_rdy.eq(data0_iamrdy & data1_iamrdy & data2_iamrdy)
+            self.submodules.auto0_decoding = Decoding()
+            self.submodules.auto1_decoding = Decoding()
+            self.submodules.auto2_decoding = Decoding()
+            self.comb += [
+                self.auto0_decoding.valid_i.eq(data0_iamrdy),
+                self.auto1_decoding.valid_i.eq(data1_iamrdy),
+                self.auto2_decoding.valid_i.eq(data2_iamrdy),
+                self.auto0_decoding.input.eq(data0_bonded),
+                self.auto1_decoding.input.eq(data1_bonded),
+                self.auto2_decoding.input.eq(data2_bonded)
+            ]
 
         self.submodules.chansync = ChanSync()
         self.comb += [
@@ -159,22 +163,52 @@ class HDMIIn(Module, AutoCSR):
         ]
 
         if hdmi:
+            # synced channels, or bonded channels with use_alt_bond (the
+            # bonded channels only exist with alt_delay)
+            hdmi_valid = Signal()
+            hdmi_data = [Record(channel_layout) for datan in range(3)]
+            synced = [
+                hdmi_valid.eq(self.chansync.chan_synced),
+                hdmi_data[0].eq(self.chansync.data_out0),
+                hdmi_data[1].eq(self.chansync.data_out1),
+                hdmi_data[2].eq(self.chansync.data_out2)
+            ]
+            if alt_delay:
+                self.comb += [
+                    If(use_alt_bond,
+                       hdmi_valid.eq(all_rdy),
+                       hdmi_data[0].eq(self.auto0_decoding.output),
+                       hdmi_data[1].eq(self.auto1_decoding.output),
+                       hdmi_data[2].eq(self.auto2_decoding.output),
+                    ).Else(*synced)
+                ]
+            else:
+                self.comb += synced
+
             decode_terc4 = DecodeTERC4()
             self.submodules.decode_terc4 = ClockDomainsRenamer("pix")(decode_terc4) # rename so state machine is in pix domain, not default sys domain
             self.comb += [
-                If(use_alt_bond,
-                   self.decode_terc4.valid_i.eq(all_rdy),
-                   self.decode_terc4.data_in0.eq(self.auto0_decoding.output),
-                   self.decode_terc4.data_in1.eq(self.auto1_decoding.output),
-                   self.decode_terc4.data_in2.eq(self.auto2_decoding.output),
-                ).Else(
-                    self.decode_terc4.valid_i.eq(self.chansync.chan_synced),
-                    self.decode_terc4.data_in0.eq(self.chansync.data_out0),
-                    self.decode_terc4.data_in1.eq(self.chansync.data_out1),
-                    self.decode_terc4.data_in2.eq(self.chansync.data_out2),
-                )
+                self.decode_terc4.valid_i.eq(hdmi_valid),
+                self.decode_terc4.data_in0.eq(hdmi_data[0]),
+                self.decode_terc4.data_in1.eq(hdmi_data[1]),
+                self.decode_terc4.data_in2.eq(hdmi_data[2])
             ]
 
+            # checked/corrected data island packets (consumers are always ready)
+            if packet_fifo_depth or audio_fifo_depth:
+                self.submodules.packet_decoder = ClockDomainsRenamer("pix")(PacketDecoder())
+                self.comb += self.decode_terc4.source.connect(self.packet_decoder.sink)
+
+            # filtered and queued for the CPU
+            if packet_fifo_depth:
+                self.submodules.packets = PacketFIFO(packet_fifo_depth)
+                self.comb += self.packet_decoder.source.connect(self.packets.sink, omit={"ready"})
+
+            # audio samples stream (sys clock domain), N/CTS and channel status
+            if audio_fifo_depth:
+                self.submodules.audio = AudioExtraction(audio_fifo_depth)
+                self.comb += self.packet_decoder.source.connect(self.audio.sink, omit={"ready"})
+
             self.submodules.syncpol = SyncPolarity(hdmi, split_mmcm)
             self.comb += self.syncpol.de_int.eq(self.decode_terc4.de_o) # manually wire up the fancy de signal in case hdmi is True
 
@@ -191,25 +225,15 @@ class HDMIIn(Module, AutoCSR):
             self.submodules.data2_timingdelay = TimingDelayChannel(1)
 
             self.comb += [
-                If(use_alt_bond,
-                   self.data0_timingdelay.sink.eq(self.auto0_decoding.output),
-                   self.data1_timingdelay.sink.eq(self.auto1_decoding.output),
-                   self.data2_timingdelay.sink.eq(self.auto2_decoding.output),
-                ).Else(
-                    self.data0_timingdelay.sink.eq(self.chansync.data_out0),
-                    self.data1_timingdelay.sink.eq(self.chansync.data_out1),
-                    self.data2_timingdelay.sink.eq(self.chansync.data_out2),
-                )
+                self.data0_timingdelay.sink.eq(hdmi_data[0]),
+                self.data1_timingdelay.sink.eq(hdmi_data[1]),
+                self.data2_timingdelay.sink.eq(hdmi_data[2])
             ]
             self.comb += [
                 self.syncpol.data_in0.eq(self.data0_timingdelay.source),
                 self.syncpol.data_in1.eq(self.data1_timingdelay.source),
                 self.syncpol.data_in2.eq(self.data2_timingdelay.source),
-                If(use_alt_bond,
-                   self.syncpol.valid_i.eq(all_rdy)
-                ).Else(
-                   self.syncpol.valid_i.eq(self.chansync.chan_synced)  # OK not to delay because it's a "once in a blue moon" transition that sorts itself out on the next VSYNC
-                )
+                self.syncpol.valid_i.eq(hdmi_valid)  # OK not to delay because it's a "once in a blue moon" transition that sorts itself out on the next VSYNC
             ]
 
         else:
@@ -229,7 +253,7 @@ class HDMIIn(Module, AutoCSR):
         ]
 
         if dram_port is not None:
-            self.submodules.frame = FrameExtraction(dram_port.dw, fifo_depth, mode)
+            self.submodules.frame = FrameExtraction(dram_port.dw, fifo_depth, mode, lut)
             self.comb += [
                 self.frame.valid_i.eq(self.syncpol.valid_o),
                 self.frame.de.eq(self.syncpol.de_int),
@@ -243,6 +267,8 @@ class HDMIIn(Module, AutoCSR):
             self.submodules.dma = DMA(dram_port, n_dma_slots)
             self.comb += self.frame.frame.connect(self.dma.frame)
             self.ev = self.dma.ev
+        elif packet_fifo_depth:
+            self.ev = self.packets.ev   # only interrupt on packets enabled in the packet filter
         else:
             self.ev = decode_terc4.ev   # hdmi in0 (rx passthrough path) can decode terc4 packets and generate interrupts when they arrive
 
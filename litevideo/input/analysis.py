@@ -7,6 +7,7 @@ from litex.soc.interconnect import stream
 from litevideo.input.common import channel_layout
 from litevideo.csc.rgb2ycbcr import RGB2YCbCr
 from litevideo.csc.ycbcr444to422 import YCbCr444to422
+from litevideo.csc.lut import LUT1D
 
 
 class SyncPolarity(Module):
@@ -131,8 +132,34 @@ class ResolutionDetection(Module, AutoCSR):
         self.specials += MultiReg(vcounter_st, self._vres.status)
 
 
+# component width of the rgb modes, pixels being packed in 2**n bits slots
+rgb_modes_cw = {
+    "rgb":   8,
+    "rgb30": 10,
+    "rgb36": 12
+}
+
+
+def expand(value, from_w, to_w):
+    """Expands a from_w bits component to to_w bits, its MSBs being replicated
+    in the new LSBs so that full scale stays full scale"""
+    n = to_w - from_w
+    assert 0 <= n <= from_w
+    if n == 0:
+        return value
+    return Cat(value[from_w-n:], value)
+
+
 class FrameExtraction(Module, AutoCSR):
-    def __init__(self, word_width, fifo_depth, mode="ycbcr422"):
+    """Frame extraction
+
+    Packs the pixels of the active video into words: 16 bits per pixel in
+    ycbcr422 mode, 8/10/12 bits per component in rgb/rgb30/rgb36 modes, the
+    pixels being in 32 bits (rgb, rgb30) or 64 bits (rgb36) slots.
+
+    In ycbcr422 mode, lut adds a LUT1D (gamma...) before the conversion.
+    """
+    def __init__(self, word_width, fifo_depth, mode="ycbcr422", lut=False):
         # in pix clock domain
         self.valid_i = Signal()
         self.vsync = Signal()
@@ -165,18 +192,34 @@ class FrameExtraction(Module, AutoCSR):
             self.submodules += ClockDomainsRenamer("pix")(rgb2ycbcr)
             chroma_downsampler = YCbCr444to422()
             self.submodules += ClockDomainsRenamer("pix")(chroma_downsampler)
+            latency = rgb2ycbcr.latency + chroma_downsampler.latency
+            if lut:
+                self.submodules.lut = ClockDomainsRenamer({"sys": "pix", "write": "sys"})(LUT1D())
+                self.comb += [
+                    self.lut.vsync.eq(self.vsync),
+                    self.lut.sink.valid.eq(self.valid_i),
+                    self.lut.sink.first.eq(self.de & ~de_r),
+                    self.lut.sink.r.eq(self.r),
+                    self.lut.sink.g.eq(self.g),
+                    self.lut.sink.b.eq(self.b),
+                    self.lut.source.connect(rgb2ycbcr.sink)
+                ]
+                latency += self.lut.latency
+            else:
+                self.comb += [
+                    rgb2ycbcr.sink.valid.eq(self.valid_i),
+                    rgb2ycbcr.sink.first.eq(self.de & ~de_r),
+                    rgb2ycbcr.sink.r.eq(self.r),
+                    rgb2ycbcr.sink.g.eq(self.g),
+                    rgb2ycbcr.sink.b.eq(self.b)
+                ]
             self.comb += [
-                rgb2ycbcr.sink.valid.eq(self.valid_i),
-                rgb2ycbcr.sink.r.eq(self.r),
-                rgb2ycbcr.sink.g.eq(self.g),
-                rgb2ycbcr.sink.b.eq(self.b),
                 rgb2ycbcr.source.connect(chroma_downsampler.sink),
-                chroma_downsampler.source.ready.eq(1),
-                chroma_downsampler.datapath.first.eq(self.de & ~de_r) # XXX need clean up
+                chroma_downsampler.source.ready.eq(1)
             ]
             # XXX need clean up
             de = self.de
-            for i in range(rgb2ycbcr.latency + chroma_downsampler.latency):
+            for i in range(latency):
                 next_de = Signal()
                 next_vsync = Signal()
                 self.sync.pix += [
@@ -208,30 +251,43 @@ class FrameExtraction(Module, AutoCSR):
                     pack_counter.eq(pack_counter + 1)
                 )
             ]
-        else: # rgb case...should probably rewrite to call out unsupported modes instead of defaulting to rgb
+        elif mode in rgb_modes_cw:
             de = self.de
 
             # pack pixels into words
+            cw = rgb_modes_cw[mode]
+            pixel_w = 2**log2_int(3*cw, need_pow2=False)
             self.cur_word = cur_word = Signal(word_width)
             self.cur_word_valid = cur_word_valid = Signal()
-            encoded_pixel = Signal(32)
-            dummy8 = Signal(8)
-            self.comb += encoded_pixel.eq(Cat(self.b,self.g,self.r, dummy8)),
-            pack_factor = word_width//32
+            encoded_pixel = Signal(pixel_w)
+            self.comb += encoded_pixel.eq(Cat(expand(self.b, 8, cw),
+                                              expand(self.g, 8, cw),
+                                              expand(self.r, 8, cw))),
+            assert word_width >= pixel_w, \
+                "{} needs a word_width of at least {} bits, got {}".format(mode, pixel_w, word_width)
+            pack_factor = word_width//pixel_w
             assert(pack_factor & (pack_factor - 1) == 0)  # only support powers of 2
-            self.pack_counter = pack_counter = Signal(max=pack_factor)
+            # with one pixel per word, the counter stays at 0
+            self.pack_counter = pack_counter = Signal(max=max(pack_factor, 2))
+            last = pack_counter == (pack_factor - 1)
             self.sync.pix += [
                 cur_word_valid.eq(0),
                 If(new_frame,
-                    cur_word_valid.eq(pack_counter == (pack_factor - 1)),
+                    cur_word_valid.eq(last if pack_factor > 1 else 0),
                     pack_counter.eq(0),
                 ).Elif(self.valid_i & de,
                     [If(pack_counter == (pack_factor-i-1),
-                        cur_word[32*i:32*(i+1)].eq(encoded_pixel)) for i in range(pack_factor)],
-                    cur_word_valid.eq(pack_counter == (pack_factor - 1)),
-                    pack_counter.eq(pack_counter + 1)
+                        cur_word[pixel_w*i:pixel_w*(i+1)].eq(encoded_pixel)) for i in range(pack_factor)],
+                    cur_word_valid.eq(last),
+                    If(last,
+                        pack_counter.eq(0)
+                    ).Else(
+                        pack_counter.eq(pack_counter + 1)
+                    )
                 )
             ]
+        else:
+            raise ValueError("Unsupported {} video mode".format(mode))
 
 
         # FIFO
@@ -0,0 +1,148 @@
+from migen import *
+from migen.genlib.cdc import MultiReg, PulseSynchronizer, BusSynchronizer
+
+from litex.soc.interconnect import stream
+from litex.soc.interconnect.csr import *
+
+from litevideo.input.common import packet_layout, audio_sample_layout
+from litevideo.input.packet import packet_types
+
+
+class AudioExtraction(Module, AutoCSR):
+    """Audio extraction
+
+    Extracts the PCM samples of Audio Sample packets (2 channel and 8 channel
+    layouts) into a stream of channel pairs, and the N/CTS values of Audio
+    Clock Regeneration packets, from which the sample rate is:
+        fs = f_tmds*N/(128*CTS)
+
+    The first 40 bits of the IEC 60958 channel status of channel 1 (sample
+    rate, word length...) are also collected.
+
+    The overflow flag of the sample FIFO is cleared by writing to its CSR.
+    """
+    def __init__(self, fifo_depth=64):
+        self.sink = sink = stream.Endpoint(packet_layout)              # in pix clock domain
+        self.source = source = stream.Endpoint(audio_sample_layout)   # in sys clock domain
+
+        self._n = CSRStatus(20)
+        self._cts = CSRStatus(20)
+        self._layout = CSRStatus()
+        self._channel_status = CSRStatus(40)
+        self._overflow = CSR()
+
+        # # #
+
+        self.comb += sink.ready.eq(1)
+
+        # audio clock regeneration (all subpackets are identical, use the first)
+        n = Signal(20)
+        cts = Signal(20)
+        self.sync.pix += \
+            If(sink.valid & ~sink.error & (sink.header[:8] == packet_types["acr"]),
+                cts.eq(Cat(sink.sub0[24:32], sink.sub0[16:24], sink.sub0[8:12])),
+                n.eq(Cat(sink.sub0[48:56], sink.sub0[40:48], sink.sub0[32:36]))
+            )
+        self.submodules.sync_n = BusSynchronizer(20, "pix", "sys")
+        self.submodules.sync_cts = BusSynchronizer(20, "pix", "sys")
+        self.comb += [
+            self.sync_n.i.eq(n),
+            self._n.status.eq(self.sync_n.o),
+            self.sync_cts.i.eq(cts),
+            self._cts.status.eq(self.sync_cts.o)
+        ]
+
+        # audio samples: latch the packet, then output its present subpackets
+        hb1 = Signal(8)
+        hb2 = Signal(8)
+        subs = [Signal(56) for i in range(4)]
+        index = Signal(2)
+        busy = Signal()
+        self.sync.pix += [
+            If(sink.valid & ~sink.error & (sink.header[:8] == packet_types["audio_sample"]),
+                hb1.eq(sink.header[8:16]),
+                hb2.eq(sink.header[16:24]),
+                [s.eq(getattr(sink, "sub" + str(i))) for i, s in enumerate(subs)],
+                index.eq(0),
+                busy.eq(1)
+            ).Elif(busy,
+                index.eq(index + 1),
+                If(index == 3, busy.eq(0))
+            )
+        ]
+
+        layout = hb1[4]
+        sub = Signal(56)
+        self.comb += sub.eq(Array(subs)[index])
+
+        fifo = stream.AsyncFIFO(audio_sample_layout, fifo_depth)
+        fifo = ClockDomainsRenamer({"write": "pix", "read": "sys"})(fifo)
+        self.submodules += fifo
+        self.fifo = fifo
+        self.comb += [
+            fifo.sink.valid.eq(busy & Array(hb1[i] for i in range(4))[index]),
+            fifo.sink.left.eq(sub[0:24]),
+            fifo.sink.right.eq(sub[24:48]),
+            fifo.sink.vucp.eq(sub[48:56]),
+            fifo.sink.pair.eq(Mux(layout, index, 0)),
+            fifo.sink.block_start.eq(Array(hb2[4+i] for i in range(4))[index]),
+            fifo.sink.flat.eq(Array(hb2[i] for i in range(4))[index]),
+            fifo.source.connect(source)
+        ]
+
+        layout_r = Signal()
+        self.sync.pix += If(fifo.sink.valid, layout_r.eq(layout))
+        self.specials += MultiReg(layout_r, self._layout.status)
+
+        # channel status of channel 1, the C bit of the left subframe
+        c = fifo.sink.vucp[2]
+        cs_shift = Signal(40)
+        cs_count = Signal(max=41, reset=40) # wait for a block start
+        channel_status = Signal(40)
+        self.sync.pix += \
+            If(fifo.sink.valid & (fifo.sink.pair == 0),
+                If(fifo.sink.block_start | (cs_count != 40),
+                    cs_shift.eq(Cat(cs_shift[1:], c)),
+                    cs_count.eq(Mux(fifo.sink.block_start, 1, cs_count + 1))
+                ),
+                If(~fifo.sink.block_start & (cs_count == 39),
+                    channel_status.eq(Cat(cs_shift[1:], c))
+                )
+            )
+        self.submodules.sync_channel_status = BusSynchronizer(40, "pix", "sys")
+        self.comb += [
+            self.sync_channel_status.i.eq(channel_status),
+            self._channel_status.status.eq(self.sync_channel_status.o)
+        ]
+
+        # overflow detection
+        pix_overflow = Signal()
+        pix_overflow_reset = Signal()
+        self.sync.pix += [
+            If(fifo.sink.valid & ~fifo.sink.ready,
+                pix_overflow.eq(1)
+            ).Elif(pix_overflow_reset,
+                pix_overflow.eq(0)
+            )
+        ]
+
+        sys_overflow = Signal()
+        self.specials += MultiReg(pix_overflow, sys_overflow)
+        self.submodules.overflow_reset = PulseSynchronizer("sys", "pix")
+        self.submodules.overflow_reset_ack = PulseSynchronizer("pix", "sys")
+        self.comb += [
+            pix_overflow_reset.eq(self.overflow_reset.o),
+            self.overflow_reset_ack.i.eq(pix_overflow_reset)
+        ]
+
+        overflow_mask = Signal()
+        self.comb += [
+            self._overflow.w.eq(sys_overflow & ~overflow_mask),
+            self.overflow_reset.i.eq(self._overflow.re)
+        ]
+        self.sync += \
+            If(self._overflow.re,
+                overflow_mask.eq(1)
+            ).Elif(self.overflow_reset_ack.o,
+                overflow_mask.eq(0)
+            )
@@ -4,9 +4,11 @@ from migen.genlib.resetsync import AsyncResetSynchronizer
 
 from litex.soc.interconnect.csr import *
 
+from litevideo.drp import add_drp
+
 
 class S6Clocking(Module, AutoCSR):
-    def __init__(self, pads, clkin_freq=None, split_clocking=None):
+    def __init__(self, pads, clkin_freq=None, split_clocking=None, drp_modes=None):
         assert not bool(split_clocking), "Can't use split_clocking with S6Clocking"
         self._pll_reset = CSRStorage(reset=1)
         self._locked = CSRStatus()
@@ -38,12 +40,16 @@ class S6Clocking(Module, AutoCSR):
         pll_clk0 = Signal()
         pll_clk1 = Signal()
         pll_clk2 = Signal()
-        pll_drdy = Signal()
+        pll_drp, pll_reset = add_drp(self,
+            self._pll_adr.storage, self._pll_dat_w.storage,
+            self._pll_read.re, self._pll_write.re,
+            self._pll_reset.storage, pll_locked, drp_modes, 5)
         self.sync += If(self._pll_read.re | self._pll_write.re,
             self._pll_drdy.status.eq(0)
-        ).Elif(pll_drdy,
+        ).Elif(pll_drp.drdy,
             self._pll_drdy.status.eq(1)
         )
+        self.comb += self._pll_dat_r.status.eq(pll_drp.do)
         self.specials += [
             Instance("PLL_ADV",
                 name="hdmi_in_pll_adv",
@@ -57,14 +63,14 @@ class S6Clocking(Module, AutoCSR):
                 i_CLKIN1=self.clk_input,
                 o_CLKOUT0=pll_clk0, o_CLKOUT1=pll_clk1, o_CLKOUT2=pll_clk2,
                 o_CLKFBOUT=clkfbout, i_CLKFBIN=clkfbout,
-                o_LOCKED=pll_locked, i_RST=self._pll_reset.storage,
-
-                i_DADDR=self._pll_adr.storage,
-                o_DO=self._pll_dat_r.status,
-                i_DI=self._pll_dat_w.storage,
-                i_DEN=self._pll_read.re | self._pll_write.re,
-                i_DWE=self._pll_write.re,
-                o_DRDY=pll_drdy,
+                o_LOCKED=pll_locked, i_RST=pll_reset,
+
+                i_DADDR=pll_drp.adr,
+                o_DO=pll_drp.do,
+                i_DI=pll_drp.di,
+                i_DEN=pll_drp.den,
+                i_DWE=pll_drp.dwe,
+                o_DRDY=pll_drp.drdy,
                 i_DCLK=ClockSignal())
         ]
 
@@ -87,7 +93,7 @@ class S6Clocking(Module, AutoCSR):
 
 
 class S7Clocking(Module, AutoCSR):
-    def __init__(self, pads, clkin_freq=148.5e6, split_clocking=False):
+    def __init__(self, pads, clkin_freq=148.5e6, split_clocking=False, drp_modes=None):
         self._mmcm_reset = CSRStorage(reset=1)
         self._locked = CSRStatus()
         self._searchreset = CSRStorage()
@@ -116,7 +122,18 @@ class S7Clocking(Module, AutoCSR):
 
         # # #
 
-        assert clkin_freq in [74.25e6, 148.5e6]
+        # the VCO runs at pix5x (CLKOUT2 divides it by k), k being the smallest
+        # factor bringing it in the 600-1200MHz range
+        vco_k = 1
+        while 5*vco_k*clkin_freq < 600e6:
+            vco_k += 1
+        assert 5*vco_k*clkin_freq <= 1200e6, "Unsupported clkin_freq {}".format(clkin_freq)
+        # same for the PLL of split_clocking, whose VCO range is 800-1866MHz
+        pll_k = 1
+        while 5*pll_k*clkin_freq < 800e6:
+            pll_k += 1
+        if split_clocking:
+            assert 5*pll_k*clkin_freq <= 1866e6, "Unsupported clkin_freq {}".format(clkin_freq)
         self.clk_input = Signal()
         self.clock_domains.cd_pix_raw = ClockDomain()
         self.comb += self.cd_pix_raw.clk.eq(self.clk_input)
@@ -129,34 +146,37 @@ class S7Clocking(Module, AutoCSR):
         mmcm_clk0 = Signal()
         mmcm_clk1 = Signal()
         mmcm_clk2 = Signal()
-        mmcm_drdy = Signal()
+        mmcm_drp, mmcm_reset = add_drp(self,
+            self._mmcm_adr.storage, self._mmcm_dat_w.storage,
+            self._mmcm_read.re, self._mmcm_write.re,
+            self._mmcm_reset.storage, mmcm_locked, drp_modes)
         mmcm_fb_o = Signal() # this should be harmless in single domain, but essential for split
 
         self.specials += [
             Instance("MMCME2_ADV",
-                p_BANDWIDTH="OPTIMIZED", i_RST=self._mmcm_reset.storage, o_LOCKED=mmcm_locked, # HIGH emperically better than LOW setting
+                p_BANDWIDTH="OPTIMIZED", i_RST=mmcm_reset, o_LOCKED=mmcm_locked, # HIGH emperically better than LOW setting
                 # and in according to the manual, OPTIMIZED == HIGH
                 # VCO
-                p_REF_JITTER1=0.01, p_CLKIN1_PERIOD=6.734,
-                p_CLKFBOUT_MULT_F=5.0, p_CLKFBOUT_PHASE=0.000, p_DIVCLK_DIVIDE=1,
+                p_REF_JITTER1=0.01, p_CLKIN1_PERIOD=1e9/clkin_freq,
+                p_CLKFBOUT_MULT_F=5.0*vco_k, p_CLKFBOUT_PHASE=0.000, p_DIVCLK_DIVIDE=1,
                 # p_SS_EN="TRUE", p_SS_MODE="CENTER_LOW",
                 i_CLKIN1=self.clk_input, i_CLKFBIN=mmcm_fb_o, o_CLKFBOUT=mmcm_fb,
 
                 # pix clk
-                p_CLKOUT0_DIVIDE_F=5, p_CLKOUT0_PHASE=0.000, o_CLKOUT0=mmcm_clk0,
+                p_CLKOUT0_DIVIDE_F=5*vco_k, p_CLKOUT0_PHASE=0.000, o_CLKOUT0=mmcm_clk0,
                 # pix1p25x clk
-                p_CLKOUT1_DIVIDE=4, p_CLKOUT1_PHASE=0.000, o_CLKOUT1=mmcm_clk1,
+                p_CLKOUT1_DIVIDE=4*vco_k, p_CLKOUT1_PHASE=0.000, o_CLKOUT1=mmcm_clk1,
                 # pix5x clk
-                p_CLKOUT2_DIVIDE=1, p_CLKOUT2_PHASE=0.000, o_CLKOUT2=mmcm_clk2,
+                p_CLKOUT2_DIVIDE=vco_k, p_CLKOUT2_PHASE=0.000, o_CLKOUT2=mmcm_clk2,
 
                      # DRP
                 i_DCLK=ClockSignal(),
-                i_DWE=self._mmcm_write.re,
-                i_DEN=self._mmcm_read.re | self._mmcm_write.re,
-                o_DRDY=mmcm_drdy,
-                i_DADDR=self._mmcm_adr.storage,
-                i_DI=self._mmcm_dat_w.storage,
-                o_DO=self._mmcm_dat_r.status
+                i_DWE=mmcm_drp.dwe,
+                i_DEN=mmcm_drp.den,
+                o_DRDY=mmcm_drp.drdy,
+                i_DADDR=mmcm_drp.adr,
+                i_DI=mmcm_drp.di,
+                o_DO=mmcm_drp.do
             ),
             Instance("BUFG", i_I=mmcm_clk0, o_O=self.cd_pix.clk),
             Instance("BUFG", i_I=mmcm_clk1, o_O=self.cd_pix1p25x.clk),  # used only by gearbox to move into BUFG domain
@@ -168,10 +188,11 @@ class S7Clocking(Module, AutoCSR):
         self.sync += [
             If(self._mmcm_read.re | self._mmcm_write.re,
                 self._mmcm_drdy.status.eq(0)
-            ).Elif(mmcm_drdy,
+            ).Elif(mmcm_drp.drdy,
                 self._mmcm_drdy.status.eq(1)
             )
         ]
+        self.comb += self._mmcm_dat_r.status.eq(mmcm_drp.do)
 
         if split_clocking:
             mmcm_fb2_o = Signal()
@@ -182,17 +203,17 @@ class S7Clocking(Module, AutoCSR):
 
             self.specials += [
                 Instance("PLLE2_ADV",
-                    p_BANDWIDTH="OPTIMIZED", i_RST=self._mmcm_reset.storage, o_LOCKED=mmcm_locked_o,
+                    p_BANDWIDTH="OPTIMIZED", i_RST=mmcm_reset, o_LOCKED=mmcm_locked_o,
 
                     # VCO
-                    p_REF_JITTER1=0.01, p_CLKIN1_PERIOD=6.734,
-                    p_CLKFBOUT_MULT=10, p_CLKFBOUT_PHASE=0.000, p_DIVCLK_DIVIDE=1, # PLL range is 800-1866 MHz, unlike MMCM which is 600-1440 MHz
+                    p_REF_JITTER1=0.01, p_CLKIN1_PERIOD=1e9/clkin_freq,
+                    p_CLKFBOUT_MULT=5*pll_k, p_CLKFBOUT_PHASE=0.000, p_DIVCLK_DIVIDE=1, # PLL range is 800-1866 MHz, unlike MMCM which is 600-1440 MHz
                     i_CLKIN1=mmcm_clk0,  # uncompensated delay for best phase match between master/slave
                     i_CLKFBIN=mmcm_fb2_o, o_CLKFBOUT=mmcm_fb2_o,
 
                     # pix clk
-                    p_CLKOUT0_DIVIDE=10, p_CLKOUT0_PHASE=0.000, o_CLKOUT0=mmcm_clk0_o,
-                    p_CLKOUT2_DIVIDE=2, p_CLKOUT2_PHASE=0.000, o_CLKOUT2=mmcm_clk2_o,
+                    p_CLKOUT0_DIVIDE=5*pll_k, p_CLKOUT0_PHASE=0.000, o_CLKOUT0=mmcm_clk0_o,
+                    p_CLKOUT2_DIVIDE=pll_k, p_CLKOUT2_PHASE=0.000, o_CLKOUT2=mmcm_clk2_o,
 
                     # DRP
                     i_DCLK=ClockSignal(),
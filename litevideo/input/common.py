@@ -10,3 +10,32 @@ control_tokens = [
 ]
 
 channel_layout = [("raw", 10), ("d", 8), ("c", 2), ("de", 1)]
+
+# Data island packets: a 24-bit header (HB0-HB2) protected by BCH(32,24) and
+# four 56-bit subpackets (SB0-SB6) each protected by BCH(64,56).
+terc4_raw_packet_layout = [
+    ("header", 32),
+    ("sub0",   64),
+    ("sub1",   64),
+    ("sub2",   64),
+    ("sub3",   64),
+]
+
+packet_layout = [
+    ("header",  24),
+    ("sub0",    56),
+    ("sub1",    56),
+    ("sub2",    56),
+    ("sub3",    56),
+    ("corrected", 1), # at least one single-bit error was corrected
+    ("error",     1), # at least one uncorrectable error was found
+]
+
+audio_sample_layout = [
+    ("left",        24),
+    ("right",       24),
+    ("pair",         2), # channel pair: 0 for ch1/ch2 ... 3 for ch7/ch8
+    ("block_start",  1), # first frame of an IEC 60958 block
+    ("flat",         1),
+    ("vucp",         8), # V/U/C/P bits of the left then right subframe
+]
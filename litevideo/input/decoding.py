@@ -2,7 +2,7 @@ from migen import *
 
 from migen.genlib.cdc import MultiReg
 
-from litevideo.input.common import control_tokens, channel_layout
+from litevideo.input.common import control_tokens, channel_layout, terc4_raw_packet_layout
 from litex.soc.interconnect import stream
 from litex.soc.interconnect.csr import *
 from litex.soc.interconnect.csr_eventmanager import *
@@ -43,12 +43,9 @@ class Decoding(Module):
 
         # # #
 
-        self.sync.pix += self.output.de.eq(1)
-        for i, t in enumerate(control_tokens):
-            self.sync.pix += If(self.input == t,
-                self.output.de.eq(0),
-                self.output.c.eq(i)
-            )
+        cases = {t: [self.output.de.eq(0), self.output.c.eq(i)] for i, t in enumerate(control_tokens)}
+        cases["default"] = self.output.de.eq(1)
+        self.sync.pix += Case(self.input, cases)
         self.sync.pix += self.output.raw.eq(self.input)
         self.sync.pix += self.output.d[0].eq(self.input[0] ^ self.input[9])
         for i in range(1, 8):
@@ -59,126 +56,47 @@ class Decoding(Module):
 
 terc4_layout = [("c", 2), ("de", 1), ("dgb", 1), ("vgb", 1), ("c_valid", 1), ("d", 4)]
 
+terc4_control_fields = ["c", "de", "dgb", "vgb", "c_valid"]
+
+
+def terc4_control_table(channel):
+    """Control token -> values of terc4_control_fields, for channel"""
+    table = {t: (i, 0, 0, 0, 1) for i, t in enumerate(control_tokens)}
+    if channel != 1:
+        table[data_gb_tokens[0]] = (0, 0, 1, 0, 0)
+        table[video_gb_tokens[channel]] = (0, 0, 0, 1, 0)
+    else:
+        # green channel gb tokens are ambiguous
+        table[data_gb_tokens[0]] = (0, 0, 1, 1, 0)
+        table[video_gb_tokens[channel]] = (0, 0, 1, 1, 0)
+    return table
+
+
 class DecodeTERC4Channel(Module):
     def __init__(self, channel):
         self.decval = stream.Endpoint(terc4_layout)  # decoded values output
         self.data_in = Record(channel_layout)  # data input from chansync
         self.valid_in = Signal()  # valid input from chansync &|
 
+        # # #
+
+        def control(values):
+            return [getattr(self.decval, name).eq(value)
+                for name, value in zip(terc4_control_fields, values)]
+
         # decode the data path
-        ### NOTE NOTE NOTE THIS IS UNTESTED
-        for i, t in enumerate(terc4_tokens):
-            self.sync.pix += If(self.data_in.raw == t,
-                self.decval.d.eq(i)
-            )
+        self.sync.pix += Case(self.data_in.raw, {t: self.decval.d.eq(i) for i, t in enumerate(terc4_tokens)})
 
-        # decode the control signals
-        if channel != 1:
-            self.sync.pix += [
-                If(self.valid_in,
-                   If(self.data_in.raw == control_tokens[0],
-                      self.decval.c.eq(0),
-                      self.decval.de.eq(0),
-                      self.decval.dgb.eq(0),
-                      self.decval.vgb.eq(0),
-                      self.decval.c_valid.eq(1)
-                   ).Elif(self.data_in.raw == control_tokens[1],
-                          self.decval.c.eq(1),
-                          self.decval.de.eq(0),
-                          self.decval.dgb.eq(0),
-                          self.decval.vgb.eq(0),
-                          self.decval.c_valid.eq(1)
-                   ).Elif(self.data_in.raw == control_tokens[2],
-                          self.decval.c.eq(2),
-                          self.decval.de.eq(0),
-                          self.decval.dgb.eq(0),
-                          self.decval.vgb.eq(0),
-                          self.decval.c_valid.eq(1)
-                   ).Elif(self.data_in.raw == control_tokens[3],
-                          self.decval.c.eq(3),
-                          self.decval.de.eq(0),
-                          self.decval.dgb.eq(0),
-                          self.decval.vgb.eq(0),
-                          self.decval.c_valid.eq(1)
-                   ).Elif(self.data_in.raw == data_gb_tokens[0],
-                          self.decval.c.eq(0),
-                          self.decval.de.eq(0),
-                          self.decval.dgb.eq(1),
-                          self.decval.vgb.eq(0),
-                          self.decval.c_valid.eq(0)
-                   ).Elif(self.data_in.raw == video_gb_tokens[channel],
-                          self.decval.c.eq(0),
-                          self.decval.de.eq(0),
-                          self.decval.dgb.eq(0),
-                          self.decval.vgb.eq(1),
-                          self.decval.c_valid.eq(0)
-                   ).Else(
-                       self.decval.de.eq(1),
-                       self.decval.dgb.eq(0),
-                       self.decval.vgb.eq(0),
-                       self.decval.c_valid.eq(0)
-                   )
-                ).Else(
-                    self.decval.c.eq(0),
-                    self.decval.de.eq(0),
-                    self.decval.dgb.eq(0),
-                    self.decval.vgb.eq(0),
-                    self.decval.c_valid.eq(0)
-                )
-            ]
-        else: # green channel is special
-            self.sync.pix += [
-                If(self.valid_in,
-                   If(self.data_in.raw == control_tokens[0],
-                      self.decval.c.eq(0),
-                      self.decval.de.eq(0),
-                      self.decval.dgb.eq(0),
-                      self.decval.vgb.eq(0),
-                      self.decval.c_valid.eq(1)
-                   ).Elif(self.data_in.raw == control_tokens[1],
-                          self.decval.c.eq(1),
-                          self.decval.de.eq(0),
-                          self.decval.dgb.eq(0),
-                          self.decval.vgb.eq(0),
-                          self.decval.c_valid.eq(1)
-                   ).Elif(self.data_in.raw == control_tokens[2],
-                          self.decval.c.eq(2),
-                          self.decval.de.eq(0),
-                          self.decval.dgb.eq(0),
-                          self.decval.vgb.eq(0),
-                          self.decval.c_valid.eq(1)
-                   ).Elif(self.data_in.raw == control_tokens[3],
-                          self.decval.c.eq(3),
-                          self.decval.de.eq(0),
-                          self.decval.dgb.eq(0),
-                          self.decval.vgb.eq(0),
-                          self.decval.c_valid.eq(1)
-                   ).Elif(self.data_in.raw == data_gb_tokens[0],
-                          self.decval.c.eq(0),
-                          self.decval.de.eq(0),
-                          self.decval.dgb.eq(1), # green channel gb tokens are ambiguous
-                          self.decval.vgb.eq(1),
-                          self.decval.c_valid.eq(0)
-                   ).Elif(self.data_in.raw == video_gb_tokens[channel],
-                          self.decval.c.eq(0),
-                          self.decval.de.eq(0),
-                          self.decval.dgb.eq(1), #green channel gb tokens are ambiguous
-                          self.decval.vgb.eq(1),
-                          self.decval.c_valid.eq(0)
-                   ).Else(
-                       self.decval.de.eq(1),
-                       self.decval.dgb.eq(0),
-                       self.decval.vgb.eq(0),
-                       self.decval.c_valid.eq(0)
-                   )
-                ).Else(
-                    self.decval.c.eq(0),
-                    self.decval.de.eq(0),
-                    self.decval.dgb.eq(0),
-                    self.decval.vgb.eq(0),
-                    self.decval.c_valid.eq(0)
-                )
-            ]
+        # decode the control signals (c is kept on data characters)
+        cases = {t: control(values) for t, values in terc4_control_table(channel).items()}
+        cases["default"] = control((self.decval.c, 1, 0, 0, 0))
+        self.sync.pix += [
+            If(self.valid_in,
+                Case(self.data_in.raw, cases)
+            ).Else(
+                control((0, 0, 0, 0, 0))
+            )
+        ]
 
 
 class DecodeTERC4(Module, AutoCSR):
@@ -193,6 +111,7 @@ class DecodeTERC4(Module, AutoCSR):
         self.encoding_terc4 = Signal()  # 1 if encoding terc4, 0 if encoding hdmi
         self.encrypting_video = Signal()
         self.encrypting_data = Signal()
+        self.source = stream.Endpoint(terc4_raw_packet_layout)  # raw packets, valid for one cycle, no backpressure
 
         self.dvimode = CSRStorage()  # a bit to select DVI mode "de" detection
         dvimode_bit = Signal()
@@ -227,6 +146,17 @@ class DecodeTERC4(Module, AutoCSR):
             self.t4d_count.status.eq(t4d_count),
         ]
 
+        # the shift registers hold a full packet the cycle after the 32nd character
+        packet_done = Signal()
+        self.sync.pix += self.source.valid.eq(packet_done)
+        self.comb += [
+            self.source.header.eq(self.t4d_bch4.status),
+            self.source.sub0.eq(self.t4d_bch0.status),
+            self.source.sub1.eq(self.t4d_bch1.status),
+            self.source.sub2.eq(self.t4d_bch2.status),
+            self.source.sub3.eq(self.t4d_bch3.status),
+        ]
+
         # derive video, data guardbands and control codes
         for datan in range(3):
             name = "data" + str(datan)
@@ -281,22 +211,33 @@ class DecodeTERC4(Module, AutoCSR):
                 self.encrypting_video.eq(0),
                 self.de_hdmi.eq(0)
                 )
+        # packet bits, shifted in LSB first
+        shift = [
+            NextValue(self.t4d_bch0.status, Cat(self.t4d_bch0.status[2:],self.data1_dect4.decval.d[0], self.data2_dect4.decval.d[0])),
+            NextValue(self.t4d_bch1.status, Cat(self.t4d_bch1.status[2:],self.data1_dect4.decval.d[1], self.data2_dect4.decval.d[1])),
+            NextValue(self.t4d_bch2.status, Cat(self.t4d_bch2.status[2:],self.data1_dect4.decval.d[2], self.data2_dect4.decval.d[2])),
+            NextValue(self.t4d_bch3.status, Cat(self.t4d_bch3.status[2:],self.data1_dect4.decval.d[3], self.data2_dect4.decval.d[3])),
+            NextValue(self.t4d_bch4.status, Cat(self.t4d_bch4.status[1:],self.data0_dect4.decval.d[2])),
+        ]
         fsm.act("GOING_T4",
                 If(c2c1_dgb,
-                   NextState("GOING_T4")
+                   NextState("GOING_T4"),
+                   NextValue(self.t4d_bch0.status, 0),
+                   NextValue(self.t4d_bch1.status, 0),
+                   NextValue(self.t4d_bch2.status, 0),
+                   NextValue(self.t4d_bch3.status, 0),
+                   NextValue(self.t4d_bch4.status, 0),
+                   NextValue(t4d_char, 0)
                 ).Else(
-                    NextState("TERC4")
+                    # first character of the island
+                    NextState("TERC4"),
+                    shift,
+                    NextValue(t4d_char, 1)
                 ),
                 self.encoding_terc4.eq(1),
                 self.encrypting_data.eq(0),
                 self.encrypting_video.eq(0),
                 self.de_hdmi.eq(0),
-                NextValue(self.t4d_bch0.status, 0),
-                NextValue(self.t4d_bch1.status, 0),
-                NextValue(self.t4d_bch2.status, 0),
-                NextValue(self.t4d_bch3.status, 0),
-                NextValue(self.t4d_bch4.status, 0),
-                NextValue(t4d_char, 0),
                 NextValue(t4d_count, 0),
                 )
         fsm.act("TERC4",
@@ -313,14 +254,11 @@ class DecodeTERC4(Module, AutoCSR):
                 self.encrypting_data.eq(1),
                 self.encrypting_video.eq(0),
                 self.de_hdmi.eq(0),
-                NextValue(self.t4d_bch0.status, Cat(self.t4d_bch0.status[2:],self.data1_dect4.decval.d[0], self.data2_dect4.decval.d[0])),
-                NextValue(self.t4d_bch1.status, Cat(self.t4d_bch1.status[2:],self.data1_dect4.decval.d[1], self.data2_dect4.decval.d[1])),
-                NextValue(self.t4d_bch2.status, Cat(self.t4d_bch2.status[2:],self.data1_dect4.decval.d[2], self.data2_dect4.decval.d[2])),
-                NextValue(self.t4d_bch3.status, Cat(self.t4d_bch3.status[2:],self.data1_dect4.decval.d[3], self.data2_dect4.decval.d[3])),
-                NextValue(self.t4d_bch4.status, Cat(self.t4d_bch4.status[1:],self.data0_dect4.decval.d[2])),
+                shift,
                 If(t4d_char == 31,
                    NextValue(t4d_char, 0),
                    NextValue(t4d_count, t4d_count + 1),
+                   packet_done.eq(1),
                    self.ev.t4packet.trigger.eq(1), # trigger terc4 interrupt
                 ).Else(
                    NextValue(t4d_char, t4d_char + 1),
@@ -4,7 +4,7 @@ from migen.genlib.cdc import MultiReg
 from migen.genlib.fsm import FSM, NextState
 from migen.genlib.misc import chooser
 
-from litex.soc.interconnect.csr import CSRStorage, CSRStatus, AutoCSR
+from litex.soc.interconnect.csr import *
 
 _default_edid = [  # changed to be more compatible with rpi, prefer lower freq mode for lower power/bw
     0x00, 0xff, 0xff, 0xff, 0xff, 0xff, 0xff, 0x00, 0x05, 0xb8, 0x4e, 0x54, 0x00, 0x00, 0x00, 0x00,
@@ -28,15 +28,63 @@ _default_edid = [  # changed to be more compatible with rpi, prefer lower freq m
 
 
 class EDID(Module, AutoCSR):
-    def __init__(self, pads, default=_default_edid):
+    """EDID
+
+    Serves the EDID over DDC from a memory of nbanks banks of bank_size bytes,
+    all initialized with default and writable at runtime through the mem_*
+    CSRs. Writing bank_switch selects bank (ignored if bank >= nbanks); HPD
+    is held low for hpd_pulse sys clock cycles during the switch so the
+    source reads the new EDID.
+    EDIDs longer than 256 bytes are read through the E-DDC segment pointer.
+    """
+    def __init__(self, pads, default=_default_edid, nbanks=1, bank_size=None,
+                 hpd_pulse_cycles=int(100e-3*100e6)):
         self._hpd_notif = CSRStatus()
         self._hpd_en = CSRStorage()
-        mem_size = len(default)
-        assert mem_size%128 == 0
-        self.specials.mem = Memory(8, mem_size, init=default)
+        assert len(default)%128 == 0
+        if bank_size is None:
+            bank_size = 2**log2_int(len(default), need_pow2=False)
+        assert bank_size >= len(default)
+        assert bank_size == 2**log2_int(bank_size)
+        mem_size = nbanks*bank_size
+        init = (default + [0]*(bank_size - len(default)))*nbanks
+        self.specials.mem = Memory(8, mem_size, init=init)
+
+        self._mem_adr = CSRStorage(bits_for(mem_size - 1))
+        self._mem_dat_w = CSRStorage(8)
+        self._mem_dat_r = CSRStatus(8)
+        self._mem_we = CSR()
+        if nbanks > 1:
+            self._bank = CSRStorage(bits_for(nbanks-1))
+            self._bank_switch = CSR()
+            self._hpd_pulse = CSRStorage(32, reset=hpd_pulse_cycles)
 
         # # #
 
+        # runtime write port
+        wrport = self.mem.get_port(write_capable=True)
+        self.specials += wrport
+        self.comb += [
+            wrport.adr.eq(self._mem_adr.storage),
+            wrport.dat_w.eq(self._mem_dat_w.storage),
+            wrport.we.eq(self._mem_we.re),
+            self._mem_dat_r.status.eq(wrport.dat_r)
+        ]
+
+        # bank switch, HPD is held low while the FSM is held in WAIT_START
+        bank = Signal(max=max(nbanks, 2))
+        hpd_pulse = Signal()
+        if nbanks > 1:
+            hpd_pulse_counter = Signal(32)
+            self.comb += hpd_pulse.eq(hpd_pulse_counter != 0)
+            self.sync += \
+                If(self._bank_switch.re & (self._bank.storage < nbanks),
+                    bank.eq(self._bank.storage),
+                    hpd_pulse_counter.eq(self._hpd_pulse.storage)
+                ).Elif(hpd_pulse,
+                    hpd_pulse_counter.eq(hpd_pulse_counter - 1)
+                )
+
         # HPD
         if hasattr(pads, "hpd_notif"):
             if hasattr(getattr(pads, "hpd_notif"), "inverted"):
@@ -48,7 +96,7 @@ class EDID(Module, AutoCSR):
         else:
             self.comb += self._hpd_notif.status.eq(1)
         if hasattr(pads, "hpd_en"):
-            self.comb += pads.hpd_en.eq(self._hpd_en.storage)
+            self.comb += pads.hpd_en.eq(self._hpd_en.storage & ~hpd_pulse)
 
         # EDID
         scl_raw = Signal()
@@ -112,7 +160,11 @@ class EDID(Module, AutoCSR):
         ]
 
         start = Signal()
-        self.comb += start.eq(scl_i & sda_falling)
+        stop = Signal()
+        self.comb += [
+            start.eq(scl_i & sda_falling),
+            stop.eq(scl_i & sda_rising)
+        ]
 
         din = Signal(8)
         counter = Signal(max=9)
@@ -135,7 +187,7 @@ class EDID(Module, AutoCSR):
         update_is_read = Signal()
         self.sync += If(update_is_read, is_read.eq(din[0]))
 
-        offset_counter = Signal(max=mem_size)
+        offset_counter = Signal(max=min(bank_size, 256))
         oc_load = Signal()
         oc_inc = Signal()
         self.sync += \
@@ -145,9 +197,24 @@ class EDID(Module, AutoCSR):
                 offset_counter.eq(offset_counter + 1)
             )
 
+        # E-DDC segment pointer (256 bytes segments), reset on stop
+        segment = Signal(8)
+        segment_load = Signal()
+        self.sync += \
+            If(segment_load,
+                segment.eq(din)
+            ).Elif(stop,
+                segment.eq(0)
+            )
+
         rdport = self.mem.get_port()
         self.specials += rdport
-        self.comb += rdport.adr.eq(offset_counter)
+        adr = [offset_counter]
+        if bank_size > 256:
+            adr.append(segment[:log2_int(bank_size) - 8])
+        if nbanks > 1:
+            adr.append(bank)
+        self.comb += rdport.adr.eq(Cat(*adr))
         data_bit = Signal()
 
         zero_drv = Signal()
@@ -175,14 +242,37 @@ class EDID(Module, AutoCSR):
         self.submodules.fsm = fsm = FSM()
 
         fsm.act("WAIT_START")
+        rcv_address = If(din[1:] == 0x50,
+            update_is_read.eq(1),
+            NextState("ACK_ADDRESS0")
+        )
+        if bank_size > 256:
+            # only ack the segment pointer when there is more than one segment
+            rcv_address = rcv_address.Elif((din[1:] == 0x30) & ~din[0],
+                NextState("ACK_SEGMENT_ADDRESS0")
+            )
+        rcv_address = rcv_address.Else(
+            NextState("WAIT_START")
+        )
         fsm.act("RCV_ADDRESS",
+            If(counter == 8, rcv_address)
+        )
+        fsm.act("ACK_SEGMENT_ADDRESS0",
+            If(~scl_i, NextState("ACK_SEGMENT_ADDRESS1"))
+        )
+        fsm.act("ACK_SEGMENT_ADDRESS1",
+            zero_drv.eq(1),
+            If(scl_i, NextState("ACK_SEGMENT_ADDRESS2"))
+        )
+        fsm.act("ACK_SEGMENT_ADDRESS2",
+            zero_drv.eq(1),
+            If(~scl_i, NextState("RCV_SEGMENT"))
+        )
+
+        fsm.act("RCV_SEGMENT",
             If(counter == 8,
-                If(din[1:] == 0x50,
-                    update_is_read.eq(1),
-                    NextState("ACK_ADDRESS0")
-                ).Else(
-                    NextState("WAIT_START")
-                )
+                segment_load.eq(1),
+                NextState("ACK_OFFSET0")
             )
         )
         fsm.act("ACK_ADDRESS0",
@@ -252,3 +342,4 @@ class EDID(Module, AutoCSR):
             fsm.act(state, If(start, NextState("RCV_ADDRESS")))
             if hasattr(pads, "hpd_en"):
                 fsm.act(state, If(~self._hpd_en.storage, NextState("WAIT_START")))
+            fsm.act(state, If(hpd_pulse, NextState("WAIT_START")))
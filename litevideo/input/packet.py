@@ -0,0 +1,235 @@
+from functools import reduce
+from operator import xor, or_
+
+from migen import *
+from migen.genlib.cdc import MultiReg, BusSynchronizer
+
+from litex.soc.interconnect import stream
+from litex.soc.interconnect.csr import *
+from litex.soc.interconnect.csr_eventmanager import *
+
+from litevideo.input.common import terc4_raw_packet_layout, packet_layout
+
+
+# Data island packet types
+packet_types = {
+    "null":          0x00,
+    "acr":           0x01,
+    "audio_sample":  0x02,
+    "gcp":           0x03,
+    "acp":           0x04,
+    "isrc1":         0x05,
+    "isrc2":         0x06,
+    "one_bit_audio": 0x07,
+    "dst_audio":     0x08,
+    "hbr_audio":     0x09,
+    "gamut":         0x0a,
+    "vsi":           0x81,
+    "avi":           0x82,
+    "spd":           0x83,
+    "audio":         0x84,
+    "mpeg":          0x85,
+}
+
+
+def bch_ecc(data, n):
+    """BCH parity of the n LSBs of data, G(x) = 1 + x^6 + x^7 + x^8, LSB first"""
+    ecc = 0
+    for i in range(n):
+        feedback = ((data >> i) ^ ecc) & 1
+        ecc >>= 1
+        if feedback:
+            ecc ^= 0x83
+    return ecc
+
+
+def bch_parity(data, n):
+    """BCH parity of the n LSBs of a Signal, the ECC being linear in the data bits"""
+    parity = []
+    for k in range(8):
+        taps = [data[i] for i in range(n) if (bch_ecc(1 << i, n) >> k) & 1]
+        parity.append(reduce(xor, taps))
+    return Cat(*parity)
+
+
+def bch_syndromes(n):
+    """Syndrome of a single bit error for each of the n data and 8 parity bits"""
+    return [bch_ecc(1 << i, n) for i in range(n)] + [1 << i for i in range(8)]
+
+
+def packet_filter_bit(packet_type):
+    """Bit of PacketFIFO's filter CSR that enables packet_type"""
+    assert (packet_type & ~0x8f) == 0
+    return (packet_type & 0x0f) + (16 if packet_type & 0x80 else 0)
+
+
+class BCHDecoder(Module):
+    """BCH decoder
+
+    Checks a BCH(n+8, n) code word (n=24 for headers, n=56 for subpackets)
+    and corrects single-bit errors. Two cycles of latency.
+    """
+    latency = 2
+
+    def __init__(self, n):
+        self.i = Signal(n + 8)
+        self.o = Signal(n)
+        self.corrected = Signal()
+        self.error = Signal()
+
+        # # #
+
+        data = self.i[:n]
+        ecc = self.i[n:]
+
+        # stage 1: syndrome
+        data_r = Signal(n)
+        syndrome = Signal(8)
+        self.sync += [
+            data_r.eq(data),
+            syndrome.eq(bch_parity(data, n) ^ ecc)
+        ]
+
+        # stage 2: a non-zero syndrome matching a single bit error is corrected,
+        # any other non-zero syndrome is reported as an error
+        syndromes = bch_syndromes(n)
+        matches = Signal(n + 8)
+        self.comb += [matches[i].eq(syndrome == s) for i, s in enumerate(syndromes)]
+        self.sync += [
+            self.o.eq(data_r ^ matches[:n]),
+            self.corrected.eq(matches != 0),
+            self.error.eq((syndrome != 0) & (matches == 0))
+        ]
+
+
+class PacketDecoder(Module):
+    """Packet decoder
+
+    Checks and corrects the header and the four subpackets of the raw data
+    island packets extracted by DecodeTERC4.
+    """
+    def __init__(self):
+        self.sink = sink = stream.Endpoint(terc4_raw_packet_layout)
+        self.source = source = stream.Endpoint(packet_layout)
+
+        # # #
+
+        self.comb += sink.ready.eq(1)
+
+        names = ["header", "sub0", "sub1", "sub2", "sub3"]
+        decoders = []
+        for name in names:
+            decoder = BCHDecoder(24 if name == "header" else 56)
+            setattr(self.submodules, name + "_bch", decoder)
+            self.comb += [
+                decoder.i.eq(getattr(sink, name)),
+                getattr(source, name).eq(decoder.o)
+            ]
+            decoders.append(decoder)
+
+        valid = sink.valid
+        for i in range(BCHDecoder.latency):
+            valid_n = Signal()
+            self.sync += valid_n.eq(valid)
+            valid = valid_n
+        self.comb += [
+            source.valid.eq(valid),
+            source.corrected.eq(reduce(or_, [d.corrected for d in decoders])),
+            source.error.eq(reduce(or_, [d.error for d in decoders]))
+        ]
+
+
+class PacketFIFO(Module, AutoCSR):
+    """Packet FIFO
+
+    Stores the packets whose type is enabled in the filter CSR and lets the CPU
+    read them at its own pace. Bits 0-15 of the filter enable packet types
+    0x00-0x0f, bits 16-31 enable InfoFrames 0x80-0x8f (see packet_filter_bit).
+    Packets with uncorrectable errors are dropped unless keep_errors is set.
+
+    The packet event is level triggered on FIFO not empty: read the packet
+    CSRs then write next to pop it.
+    """
+    def __init__(self, depth=8):
+        self.sink = sink = stream.Endpoint(packet_layout) # in pix clock domain
+
+        self._filter = CSRStorage(32, reset=0xffff0000)
+        self._keep_errors = CSRStorage()
+        self._header = CSRStatus(24)
+        self._sub0 = CSRStatus(56)
+        self._sub1 = CSRStatus(56)
+        self._sub2 = CSRStatus(56)
+        self._sub3 = CSRStatus(56)
+        self._status = CSRStatus(2) # corrected, error
+        self._next = CSR()
+        self._overflow = CSRStatus()
+        self._corrected_count = CSRStatus(16)
+        self._error_count = CSRStatus(16)
+
+        self.submodules.ev = EventManager()
+        self.ev.packet = EventSourceLevel()
+        self.ev.finalize()
+
+        # # #
+
+        fifo = stream.AsyncFIFO(packet_layout, depth)
+        fifo = ClockDomainsRenamer({"write": "pix", "read": "sys"})(fifo)
+        self.submodules += fifo
+        self.fifo = fifo
+
+        # filter (pix clock domain)
+        filter_ = Signal(32)
+        keep_errors = Signal()
+        self.specials += [
+            MultiReg(self._filter.storage, filter_, "pix"),
+            MultiReg(self._keep_errors.storage, keep_errors, "pix")
+        ]
+
+        packet_type = sink.header[:8]
+        enabled = Signal()
+        self.comb += [
+            If(packet_type[4:7] == 0,
+                enabled.eq(Array(filter_[i] for i in range(32))[Cat(packet_type[:4], packet_type[7])])
+            ),
+            sink.ready.eq(1),
+            sink.connect(fifo.sink, omit={"valid", "ready"}),
+            fifo.sink.valid.eq(sink.valid & enabled & (~sink.error | keep_errors))
+        ]
+
+        # statistics (pix clock domain)
+        overflow = Signal()
+        corrected_count = Signal(16)
+        error_count = Signal(16)
+        self.sync.pix += [
+            If(fifo.sink.valid & ~fifo.sink.ready,
+                overflow.eq(1)
+            ),
+            If(sink.valid & sink.corrected & (corrected_count != 2**16-1),
+                corrected_count.eq(corrected_count + 1)
+            ),
+            If(sink.valid & sink.error & (error_count != 2**16-1),
+                error_count.eq(error_count + 1)
+            )
+        ]
+        # the counters are transferred as whole words (a MultiReg could tear them)
+        self.specials += MultiReg(overflow, self._overflow.status)
+        self.submodules.sync_corrected_count = BusSynchronizer(16, "pix", "sys")
+        self.submodules.sync_error_count = BusSynchronizer(16, "pix", "sys")
+        self.comb += [
+            self.sync_corrected_count.i.eq(corrected_count),
+            self._corrected_count.status.eq(self.sync_corrected_count.o),
+            self.sync_error_count.i.eq(error_count),
+            self._error_count.status.eq(self.sync_error_count.o)
+        ]
+
+        # CPU interface (sys clock domain)
+        self.comb += [
+            self._header.status.eq(fifo.source.header),
+            self._sub0.status.eq(fifo.source.sub0),
+            self._sub1.status.eq(fifo.source.sub1),
+            self._sub2.status.eq(fifo.source.sub2),
+            self._sub3.status.eq(fifo.source.sub3),
+            self._status.status.eq(Cat(fifo.source.corrected, fifo.source.error)),
+            fifo.source.ready.eq(self._next.re),
+            self.ev.packet.trigger.eq(fifo.source.valid)
+        ]
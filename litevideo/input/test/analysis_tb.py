@@ -0,0 +1,94 @@
+import random
+import unittest
+
+from migen import *
+
+from litevideo.input.analysis import FrameExtraction
+
+
+prng = random.Random(42)
+
+# one frame of 4 lines of 8 pixels
+hres, lines = 8, 4
+
+
+class TB(Module):
+    def __init__(self, word_width, mode):
+        self.clock_domains.cd_sys = ClockDomain()
+        self.clock_domains.cd_pix = ClockDomain()
+        self.submodules.frame = FrameExtraction(word_width, 64, mode)
+
+
+def expand(value, cw):
+    # 8 bits component on cw bits, MSBs replicated in the LSBs
+    n = cw - 8
+    return (value << n) | (value >> (8 - n))
+
+def reference_words(pixels, word_width, cw):
+    pixel_w = 32 if cw < 11 else 64
+    pack_factor = word_width//pixel_w
+    words = []
+    for i in range(0, len(pixels), pack_factor):
+        word = 0
+        # the first pixel in the MSBs
+        for j, (r, g, b) in enumerate(pixels[i:i + pack_factor]):
+            pixel = expand(b, cw) | (expand(g, cw) << cw) | (expand(r, cw) << 2*cw)
+            word |= pixel << (pixel_w*(pack_factor - 1 - j))
+        words.append(word)
+    return words
+
+
+def video_generator(dut, pixels):
+    yield dut.valid_i.eq(1)
+    yield dut.vsync.eq(1)
+    for i in range(4):
+        yield
+    yield dut.vsync.eq(0)
+    for line in range(lines):
+        for x in range(hres + 8):
+            de = x < hres
+            yield dut.de.eq(de)
+            if de:
+                r, g, b = pixels[line*hres + x]
+                yield dut.r.eq(r)
+                yield dut.g.eq(g)
+                yield dut.b.eq(b)
+            yield
+    yield dut.de.eq(0)
+    for i in range(32):
+        yield
+
+@passive
+def frame_generator(frame, words):
+    yield frame.ready.eq(1)
+    while True:
+        if (yield frame.valid):
+            words.append((yield frame.pixels))
+        yield
+
+
+class TestFrameExtraction(unittest.TestCase):
+    def run_mode(self, word_width, mode, cw):
+        pixels = [tuple(prng.getrandbits(8) for c in range(3)) for i in range(hres*lines)]
+        tb = TB(word_width, mode)
+        words = []
+        generators = {
+            "pix": video_generator(tb.frame, pixels),
+            "sys": frame_generator(tb.frame.frame, words)
+        }
+        run_simulation(tb, generators, {"sys": 10, "pix": 10})
+        self.assertEqual(words, reference_words(pixels, word_width, cw))
+
+    def test_rgb30(self):
+        self.run_mode(32, "rgb30", 10)
+        self.run_mode(64, "rgb30", 10)
+
+    def test_rgb36(self):
+        self.run_mode(64, "rgb36", 12)
+        self.run_mode(128, "rgb36", 12)
+        with self.assertRaises(AssertionError):
+            FrameExtraction(32, 64, "rgb36")
+
+
+if __name__ == "__main__":
+    unittest.main()
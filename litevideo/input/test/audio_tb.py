@@ -0,0 +1,97 @@
+import random
+import unittest
+
+from migen import *
+
+from litevideo.input.audio import AudioExtraction
+
+
+prng = random.Random(42)
+
+def audio_sample_packet(layout, present, samples, block_start=0, vucp=(0, 0, 0, 0)):
+    packet = {"header": 0x02 | ((layout << 4) | present) << 8 | (block_start << 4) << 16}
+    for i in range(4):
+        left, right = samples[i] if present & (1 << i) else (0, 0)
+        packet["sub" + str(i)] = left | (right << 24) | (vucp[i] << 48)
+    return packet
+
+def acr_packet(n, cts):
+    sub = (cts >> 16) << 8 | ((cts >> 8) & 0xff) << 16 | (cts & 0xff) << 24
+    sub |= (n >> 16) << 32 | ((n >> 8) & 0xff) << 40 | (n & 0xff) << 48
+    return {"header": 0x01, "sub0": sub, "sub1": sub, "sub2": sub, "sub3": sub}
+
+sink_packets = [acr_packet(6144, 148500)]
+reference_samples = []
+for i in range(8):
+    layout = i % 2
+    present = prng.randrange(1, 16)
+    samples = [(prng.getrandbits(24), prng.getrandbits(24)) for j in range(4)]
+    sink_packets.append(audio_sample_packet(layout, present, samples))
+    for j in range(4):
+        if present & (1 << j):
+            reference_samples.append((samples[j][0], samples[j][1], j if layout else 0))
+
+# a channel status block (C bit of the left subframes, from a block start)
+channel_status = prng.getrandbits(40)
+for i in range(10):
+    samples = [(prng.getrandbits(24), prng.getrandbits(24)) for j in range(4)]
+    vucp = [((channel_status >> (4*i + j)) & 1) << 2 for j in range(4)]
+    sink_packets.append(audio_sample_packet(0, 0b1111, samples, int(i == 0), vucp))
+    reference_samples += [(left, right, 0) for left, right in samples]
+
+source_samples = []
+statuses = {}
+overflows = []
+
+
+def sink_generator(dut):
+    for packet in sink_packets:
+        yield dut.sink.valid.eq(1)
+        for name in ["header", "sub0", "sub1", "sub2", "sub3"]:
+            yield getattr(dut.sink, name).eq(packet.get(name, 0))
+        yield
+        yield dut.sink.valid.eq(0)
+        for i in range(32):
+            yield
+    for i in range(64):
+        yield
+    for name in ["n", "cts", "channel_status"]:
+        statuses[name] = (yield getattr(dut, "_" + name).status)
+
+@passive
+def source_generator(source):
+    yield source.ready.eq(1)
+    while True:
+        if (yield source.valid):
+            source_samples.append(((yield source.left), (yield source.right), (yield source.pair)))
+        yield
+
+def overflow_generator(dut):
+    # the samples are not read: the fifo overflows, then the flag is cleared
+    for i in range(2048):
+        yield
+    overflows.append((yield dut._overflow.w))
+    yield dut._overflow.re.eq(1)
+    yield
+    yield dut._overflow.re.eq(0)
+    for i in range(32):
+        yield
+    overflows.append((yield dut._overflow.w))
+
+if __name__ == "__main__":
+    tb = AudioExtraction()
+    generators = {"pix" : [sink_generator(tb)],
+                  "sys" : [source_generator(tb.source)]}
+    clocks = {"sys": 10, "pix": 10}
+
+    run_simulation(tb, generators, clocks, vcd_name="sim.vcd")
+
+    testcase = unittest.TestCase()
+    testcase.assertEqual(source_samples, reference_samples)
+    testcase.assertEqual(statuses, {"n": 6144, "cts": 148500, "channel_status": channel_status})
+
+    tb = AudioExtraction(fifo_depth=16)
+    generators = {"pix" : [sink_generator(tb)],
+                  "sys" : [overflow_generator(tb)]}
+    run_simulation(tb, generators, clocks)
+    testcase.assertEqual(overflows, [1, 0])
@@ -0,0 +1,77 @@
+import numpy as np
+
+from migen import *
+
+from litevideo.output.hdmi.encoder import Encoder
+from litevideo.input.decoding import Decoding
+from litevideo.sim.verilator import *
+
+
+# one 1080p frame, TMDS encoded then decoded
+hres, hscan = 1920, 2200
+vres, vscan = 1080, 1125
+n = hscan*vscan
+
+# encoder (4) + decoding (1)
+latency = 5
+
+prng = np.random.RandomState(42)
+
+
+class TB(Module):
+    def __init__(self):
+        self.sink = Record([(name + str(i), w) for i in range(3)
+                                                for name, w in [("d", 8), ("c", 2), ("de", 1)]])
+        self.source = Record([(name + str(i), w) for i in range(3)
+                                                  for name, w in [("d", 8), ("c", 2), ("de", 1)]])
+
+        # # #
+
+        for i in range(3):
+            encoder = ClockDomainsRenamer("pix")(Encoder())
+            decoding = Decoding()
+            self.submodules += encoder, decoding
+            self.comb += [
+                encoder.d.eq(getattr(self.sink, "d" + str(i))),
+                encoder.c.eq(getattr(self.sink, "c" + str(i))),
+                encoder.de.eq(getattr(self.sink, "de" + str(i))),
+                decoding.valid_i.eq(1),
+                decoding.input.eq(encoder.out),
+                getattr(self.source, "d" + str(i)).eq(decoding.output.d),
+                getattr(self.source, "c" + str(i)).eq(decoding.output.c),
+                getattr(self.source, "de" + str(i)).eq(decoding.output.de)
+            ]
+
+
+def main_generator(sink):
+    while len(sink.data) < n + latency:
+        yield Cycles(65536)
+
+
+if __name__ == "__main__":
+    names = [name + str(i) for i in range(3) for name in ["d", "c", "de"]]
+    x, y = np.meshgrid(np.arange(hscan), np.arange(vscan))
+    de = ((x < hres) & (y < vres)).ravel().astype(np.uint64)
+    d = prng.randint(0, 256, (3, n)).astype(np.uint64)
+    c = prng.randint(0, 4, (3, n)).astype(np.uint64)
+    words = np.zeros(n, np.uint64)
+    for i in range(3):
+        words |= (d[i] | (c[i] << 8) | (de << 10)) << (11*i)
+
+    tb = TB()
+    source = StreamSource(tb.sink, names, n, domain="pix")
+    sink = StreamSink(tb.source, names, n + 2*latency, domain="pix")
+    sim = VerilatorSim(tb, {"pix": 10}, [source, sink], ios=set(tb.sink.flatten()) | set(tb.source.flatten()),
+                       domain="pix", build_dir="build_verilator_decoding")
+    source.send(words)
+    sim.run(main_generator(sink))
+    sim.close()
+
+    captured = sink.data[latency:latency + n]
+    for i in range(3):
+        fields = captured >> np.uint64(11*i)
+        np.testing.assert_array_equal((fields >> np.uint64(10)) & np.uint64(1), de, "de" + str(i))
+        active = de.astype(bool)
+        np.testing.assert_array_equal(fields[active] & np.uint64(0xff), d[i][active], "d" + str(i))
+        np.testing.assert_array_equal((fields[~active] >> np.uint64(8)) & np.uint64(3), c[i][~active],
+                                      "c" + str(i))
@@ -0,0 +1,89 @@
+from collections import deque
+
+from migen import *
+
+from litedram.common import LiteDRAMPort
+
+from litevideo.input.dma import DMA
+from litevideo.sim.dram import DRAMPortModel, ddr3_timing
+
+
+# frames of 16 lines of 32 words, one word every two cycles during the lines
+words, hscan = 32, 80
+lines, vscan = 16, 20
+frame_words = words*lines
+frames = 2
+
+
+class TB(Module):
+    def __init__(self):
+        self.dram_port = LiteDRAMPort(mode="write", aw=32, dw=32, cd="sys")
+        self.submodules.dma = DMA(self.dram_port, 2)
+
+
+class FrameSource:
+    """Frame words at the pixel rate, queued in an unbounded FIFO in front of
+    the DMA: the maximum level is the fifo_depth of FrameExtraction that
+    would not overflow"""
+    def __init__(self, frames):
+        self.frames = frames
+        self.max_level = 0
+
+    def generator(self, sink):
+        fifo = deque()
+        produced = [(i == 0, data) for frame in self.frames for i, data in enumerate(frame)]
+        cycle = 0
+        while produced or fifo:
+            x, y = cycle % hscan, (cycle//hscan) % vscan
+            if produced and y < lines and x < 2*words and x % 2 == 0:
+                fifo.append(produced.pop(0))
+            self.max_level = max(self.max_level, len(fifo))
+            if fifo:
+                sof, data = fifo[0]
+                yield sink.valid.eq(1)
+                yield sink.sof.eq(sof)
+                yield sink.pixels.eq(data)
+            else:
+                yield sink.valid.eq(0)
+            yield
+            if fifo and (yield sink.ready):
+                fifo.popleft()
+            cycle += 1
+        yield sink.valid.eq(0)
+
+
+def main_generator(dut):
+    slots = [getattr(dut.dma._slot_array, "slot" + str(n)) for n in range(frames)]
+    yield dut.dma._frame_size.storage.eq(frame_words)
+    for n, slot in enumerate(slots):
+        yield slot._address.storage.eq(n*frame_words)
+        yield slot._status.storage.eq(1)
+    yield
+    done = 0
+    while done < frames:
+        for slot in slots:
+            if (yield slot.address_done):
+                # write_from_dev update of the status (done by the CSR bank)
+                yield slot._status.storage.eq(2)
+                done += 1
+        yield
+
+
+if __name__ == "__main__":
+    data = [[(n << 16) | i for i in range(frame_words)] for n in range(frames)]
+    print("{:>6} {:>10} {:>10} {:>12} {:>12}".format(
+        "load", "max level", "row misses", "load stalls", "bank stalls"))
+    for load in [0, 0.25, 0.5]:
+        tb = TB()
+        mem = DRAMPortModel(tb.dram_port, frames*frame_words, timing=ddr3_timing, load=load)
+        source = FrameSource(data)
+        generators = {
+            "sys": [main_generator(tb),
+                    source.generator(tb.dma.frame),
+                    mem.generator()]
+        }
+        run_simulation(tb, generators, {"sys": 10})
+        assert mem.mem == sum(data, [])
+        print("{:>6} {:>10} {:>10} {:>12} {:>12}".format(
+            load, source.max_level, mem.stats["row_misses"],
+            mem.stats["load_stalls"], mem.stats["bank_stalls"]))
@@ -0,0 +1,194 @@
+import random
+import unittest
+
+from migen import *
+
+from litevideo.input.edid import EDID
+
+
+prng = random.Random(42)
+
+# 512 bytes EDID (base block and 3 extensions): 2 E-DDC segments
+default = [prng.getrandbits(8) for i in range(512)]
+bank1 = [prng.getrandbits(8) for i in range(512)]
+
+# sys cycles per quarter of SCL period (the EDID samples SCL/SDA every 64)
+quarter = 160
+
+
+class TB(Module):
+    def __init__(self, nbanks):
+        self.scl = Signal(reset=1)
+        self.sda = Signal(reset=1)
+        self.pads = pads = Record([("scl", 1), ("sda", 1), ("sda_drv", 1), ("hpd_en", 1)])
+        self.submodules.edid = EDID(pads, default, nbanks, hpd_pulse_cycles=1000)
+
+        # # #
+
+        # open drain SDA
+        self.comb += [
+            pads.scl.eq(self.scl),
+            pads.sda.eq(self.sda & ~pads.sda_drv)
+        ]
+
+
+def wait(n=quarter):
+    for i in range(n):
+        yield
+
+
+def i2c_start(tb):
+    yield tb.sda.eq(1)
+    yield from wait()
+    yield tb.scl.eq(1)
+    yield from wait()
+    yield tb.sda.eq(0)
+    yield from wait()
+    yield tb.scl.eq(0)
+    yield from wait()
+
+
+def i2c_stop(tb):
+    yield tb.sda.eq(0)
+    yield from wait()
+    yield tb.scl.eq(1)
+    yield from wait()
+    yield tb.sda.eq(1)
+    yield from wait()
+
+
+def i2c_bit(tb, bit):
+    # returns the SDA line sampled while SCL is high
+    yield tb.sda.eq(bit)
+    yield from wait()
+    yield tb.scl.eq(1)
+    yield from wait()
+    value = (yield tb.pads.sda)
+    yield from wait()
+    yield tb.scl.eq(0)
+    yield from wait()
+    return value
+
+
+def i2c_write(tb, byte):
+    for i in reversed(range(8)):
+        yield from i2c_bit(tb, (byte >> i) & 1)
+    ack = yield from i2c_bit(tb, 1)
+    return not ack
+
+
+def i2c_read(tb, n):
+    data = []
+    for k in range(n):
+        byte = 0
+        for i in range(8):
+            byte = (byte << 1) | (yield from i2c_bit(tb, 1))
+        yield from i2c_bit(tb, k == n - 1) # nack the last byte
+        data.append(byte)
+    return data
+
+
+def edid_read(tb, segment, offset, n):
+    """E-DDC read of n bytes at segment/offset, None when not acked"""
+    yield from i2c_start(tb)
+    if segment is not None:
+        if not (yield from i2c_write(tb, 0x60)):
+            return None
+        if not (yield from i2c_write(tb, segment)):
+            return None
+        yield from i2c_start(tb)
+    if not (yield from i2c_write(tb, 0xa0)):
+        return None
+    if not (yield from i2c_write(tb, offset)):
+        return None
+    yield from i2c_start(tb)
+    if not (yield from i2c_write(tb, 0xa1)):
+        return None
+    data = yield from i2c_read(tb, n)
+    yield from i2c_stop(tb)
+    return data
+
+
+def csr_write(storage, value):
+    yield storage.storage.eq(value)
+    yield
+
+
+def csr_strobe(csr):
+    yield csr.re.eq(1)
+    yield
+    yield csr.re.eq(0)
+    yield
+
+
+class TestEDID(unittest.TestCase):
+    def run_tb(self, nbanks, generator):
+        tb = TB(nbanks)
+        run_simulation(tb, generator(tb))
+
+    def test_segments(self):
+        reads = []
+        def generator(tb):
+            yield tb.edid._hpd_en.storage.eq(1)
+            reads.append((yield from edid_read(tb, None, 0x10, 4)))
+            reads.append((yield from edid_read(tb, 1, 0x80, 4)))
+            # the segment pointer is reset by the stop
+            reads.append((yield from edid_read(tb, None, 0x80, 4)))
+        self.run_tb(1, generator)
+        self.assertEqual(reads, [default[0x10:0x14], default[0x180:0x184], default[0x80:0x84]])
+
+    def test_banks(self):
+        reads = []
+        hpd = []
+        def generator(tb):
+            edid = tb.edid
+            yield edid._hpd_en.storage.eq(1)
+            # runtime write of bank 1 (at 512 in the memory)
+            for adr in range(0x100, 0x108):
+                yield from csr_write(edid._mem_adr, 512 + adr)
+                yield from csr_write(edid._mem_dat_w, bank1[adr])
+                yield from csr_strobe(edid._mem_we)
+            yield from csr_write(edid._mem_adr, 512 + 0x101)
+            yield
+            reads.append([(yield edid._mem_dat_r.status)])
+
+            reads.append((yield from edid_read(tb, 1, 0, 4)))
+            yield from csr_write(edid._bank, 1)
+            yield from csr_strobe(edid._bank_switch)
+            hpd.append((yield tb.pads.hpd_en))
+            yield from wait(1000)
+            hpd.append((yield tb.pads.hpd_en))
+            reads.append((yield from edid_read(tb, 1, 0, 8)))
+            yield from csr_write(edid._bank, 0)
+            yield from csr_strobe(edid._bank_switch)
+            yield from wait(1000)
+            reads.append((yield from edid_read(tb, 1, 0, 4)))
+        self.run_tb(2, generator)
+        self.assertEqual(reads, [[bank1[0x101]], default[0x100:0x104], bank1[0x100:0x108],
+                                 default[0x100:0x104]])
+        # HPD low during the switch
+        self.assertEqual(hpd, [0, 1])
+
+    def test_banks_npow2(self):
+        reads = []
+        def generator(tb):
+            edid = tb.edid
+            yield edid._hpd_en.storage.eq(1)
+            yield from csr_write(edid._mem_adr, 2*512 + 5)
+            yield from csr_write(edid._mem_dat_w, 0x5a)
+            yield from csr_strobe(edid._mem_we)
+            yield from csr_write(edid._bank, 2)
+            yield from csr_strobe(edid._bank_switch)
+            yield from wait(1000)
+            reads.append((yield from edid_read(tb, None, 4, 3)))
+            # out of range, bank 2 is still served
+            yield from csr_write(edid._bank, 3)
+            yield from csr_strobe(edid._bank_switch)
+            yield from wait(1000)
+            reads.append((yield from edid_read(tb, None, 4, 3)))
+        self.run_tb(3, generator)
+        self.assertEqual(reads, [[default[4], 0x5a, default[6]]]*2)
+
+
+if __name__ == "__main__":
+    unittest.main()
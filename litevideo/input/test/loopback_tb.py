@@ -0,0 +1,281 @@
+import random
+import unittest
+from functools import reduce
+from operator import and_
+
+from migen import *
+
+from litevideo.output.hdmi.s7 import S7HDMIOutEncoderSerializer
+from litevideo.output.hdmi.s6 import _S6HDMIOutEncoderSerializer
+from litevideo.input.datacapture import S7DataCapture, S6DataCapture
+from litevideo.input.charsync import CharSync
+from litevideo.input.decoding import Decoding
+from litevideo.input.chansync import ChanSync
+from litevideo.sim.primitives import bit_clocks, derived_clocks, primitive_overrides
+from litevideo.sim.tmds import TMDSChannel, tmds_characters
+
+
+# line cycles per bit
+ui = 8
+
+# lines of 16 pixels and 12 blanking characters
+hres, hblank, lines = 16, 12, 4
+
+prng = random.Random(42)
+
+# (de, d or c) of each channel
+video = [[] for i in range(3)]
+for y in range(lines):
+    for i in range(3):
+        c = prng.randrange(4)
+        video[i] += [(1, prng.getrandbits(8)) for x in range(hres)]
+        video[i] += [(0, c)]*hblank
+
+characters = tmds_characters()
+
+
+class LoopbackTB(Module):
+    """HDMI out -> HDMI in loopback of nchan TMDS channels
+
+    With dual, the 7-series output encodes two pixels per pixh cycle, its
+    pix2x/pix10x domains being the pix/pix5x ones of the input.
+    """
+    def __init__(self, device, nchan=3, dual=False):
+        self.dual = dual
+        self.clock_domains.cd_sys = ClockDomain()
+        self.clock_domains.cd_pix = ClockDomain()
+        if dual:
+            self.clock_domains.cd_pixh = ClockDomain()
+        if device == "xc7":
+            self.clock_domains.cd_pix1p25x = ClockDomain()
+            self.clock_domains.cd_pix1p25x_r = ClockDomain()
+            self.clock_domains.cd_pix5x = ClockDomain(reset_less=True)
+        else:
+            self.clock_domains.cd_pix2x = ClockDomain()
+            self.clock_domains.cd_pix10x = ClockDomain(reset_less=True)
+
+            # serdesstrobe on the first pix10x cycle of each pix2x cycle
+            serdesstrobe = Signal()
+            toggle = Signal()
+            toggle_r = Signal()
+            self.sync.pix2x += toggle.eq(~toggle)
+            self.sync.pix10x += toggle_r.eq(toggle)
+            self.comb += serdesstrobe.eq(toggle != toggle_r)
+
+        self.tx_pads = []
+        self.rx_pads = []
+        self.es = []
+        self.caps = []
+        self.charsyncs = []
+        self.submodules.chansync = ChanSync(nchan)
+        valid = []
+        for i in range(nchan):
+            tx_p, tx_n, rx_p, rx_n = Signal(), Signal(), Signal(), Signal()
+            if dual:
+                # pix renamed first
+                es = ClockDomainsRenamer({"pix": "pixh", "pix2x": "pix", "pix10x": "pix5x"})(
+                    S7HDMIOutEncoderSerializer(tx_p, tx_n, dual=True))
+                cap = S7DataCapture(rx_p, rx_n, ntbits=4)
+            elif device == "xc7":
+                es = S7HDMIOutEncoderSerializer(tx_p, tx_n)
+                cap = S7DataCapture(rx_p, rx_n, ntbits=4)
+            else:
+                es = _S6HDMIOutEncoderSerializer(serdesstrobe, tx_p, tx_n)
+                cap = S6DataCapture(rx_p, rx_n, ntbits=4)
+                self.comb += cap.serdesstrobe.eq(serdesstrobe)
+            charsync = CharSync()
+            decoding = Decoding()
+            setattr(self.submodules, "es" + str(i), es)
+            setattr(self.submodules, "cap" + str(i), cap)
+            setattr(self.submodules, "charsync" + str(i), charsync)
+            setattr(self.submodules, "decoding" + str(i), decoding)
+            self.comb += [
+                charsync.raw_data.eq(cap.d),
+                decoding.valid_i.eq(charsync.synced),
+                decoding.input.eq(charsync.data),
+                getattr(self.chansync, "data_in" + str(i)).eq(decoding.output)
+            ]
+            valid.append(decoding.valid_o)
+            self.tx_pads.append(tx_p)
+            self.rx_pads.append((rx_p, rx_n))
+            self.es.append(es)
+            self.caps.append(cap)
+            self.charsyncs.append(charsync)
+        self.comb += self.chansync.valid_i.eq(reduce(and_, valid))
+
+
+@passive
+def video_generator(tb):
+    lanes = 2 if tb.dual else 1
+    while True:
+        for n in range(0, len(video[0]), lanes):
+            for i in range(len(tb.es)):
+                for k in range(lanes):
+                    de, v = video[i][n + k]
+                    lane = tb.es[i].lanes[k] if tb.dual else tb.es[i]
+                    yield lane.de.eq(de)
+                    yield lane.d.eq(v if de else 0)
+                    yield lane.c.eq(0 if de else v)
+            yield
+
+
+class Monitor:
+    def __init__(self, nchan):
+        self.raw = [[] for i in range(nchan)]
+        self.decoded = [[] for i in range(nchan)]
+
+    @passive
+    def generator(self, tb):
+        while True:
+            yield
+            synced = (yield tb.chansync.chan_synced)
+            for i in range(len(tb.caps)):
+                self.raw[i].append((yield tb.caps[i].d))
+                if synced:
+                    data_out = getattr(tb.chansync, "data_out" + str(i))
+                    de = (yield data_out.de)
+                    self.decoded[i].append((de, (yield data_out.d) if de else (yield data_out.c)))
+
+
+def eye_open(words):
+    # the characters of the bit stream are valid at some position
+    bits = 0
+    for n, word in enumerate(words):
+        bits |= word << (10*n)
+    return any(all((bits >> (10*n + shift)) & 0x3ff in characters for n in range(len(words) - 1))
+               for shift in range(10))
+
+
+def eye_center(eye):
+    # center of the longest (circular) window of open taps
+    best, best_width = 0, 0
+    for start in range(len(eye)):
+        width = 0
+        while width < len(eye) and eye[(start + width) % len(eye)]:
+            width += 1
+        if width > best_width:
+            best, best_width = start, width
+    return (best + best_width//2) % len(eye)
+
+
+def write_csr(csr, value=1):
+    yield csr.r.eq(value)
+    yield csr.re.eq(1)
+    yield
+    yield csr.re.eq(0)
+    for i in range(6):
+        yield
+
+
+def s7_calibration(tb, rounds=8):
+    # delay calibration of the firmware: slave half a bit after the master,
+    # then both moved until the phase detector is balanced
+    for cap in tb.caps:
+        yield from write_csr(cap._dly_ctl, 0b00001)     # rst
+        for i in range(ui//2):
+            yield from write_csr(cap._dly_ctl, 0b01000) # slave inc
+        yield from write_csr(cap._phase_reset)
+    for n in range(rounds):
+        for i in range(16):
+            yield
+        for cap in tb.caps:
+            phase = (yield cap._phase.status)
+            if phase & 0b01:                            # too late
+                yield from write_csr(cap._dly_ctl, 0b10100)
+                yield from write_csr(cap._phase_reset)
+            elif phase & 0b10:                          # too early
+                yield from write_csr(cap._dly_ctl, 0b01010)
+                yield from write_csr(cap._phase_reset)
+
+
+def s6_calibration(tb, monitor, samples=24):
+    # the phase detector of ISERDES2 is not modelled: CAL/RST then scan of
+    # the eye over a bit period, the delays being set to its center
+    for cap in tb.caps:
+        yield from write_csr(cap._dly_ctl, 0b000101)    # master/slave cal
+        yield from write_csr(cap._dly_ctl, 0b001010)    # master/slave rst
+    eyes = [[] for cap in tb.caps]
+    for tap in range(ui):
+        for raw in monitor.raw:
+            raw.clear()
+        while len(monitor.raw[0]) < samples + 4:
+            yield
+        for i in range(len(tb.caps)):
+            eyes[i].append(eye_open(monitor.raw[i][4:]))
+        for cap in tb.caps:
+            yield from write_csr(cap._dly_ctl, 0b010000) # inc
+    for cap, eye in zip(tb.caps, eyes):
+        assert any(eye), "eye closed"
+        # a bit period after the start of the scan
+        for i in range(eye_center(eye)):
+            yield from write_csr(cap._dly_ctl, 0b010000) # inc
+
+
+def main_generator(tb, monitor, device, n):
+    if device == "xc7":
+        yield from s7_calibration(tb)
+    else:
+        yield from s6_calibration(tb, monitor)
+    # character/channel resynchronization on the next blanking
+    for i in range(len(video[0])):
+        yield
+    for decoded in monitor.decoded:
+        decoded.clear()
+    while len(monitor.decoded[0]) < n:
+        yield
+
+
+def run(device, skews, jitter, n=len(video[0]), dual=False):
+    nchan = len(skews)
+    tb = LoopbackTB(device, nchan, dual)
+    monitor = Monitor(nchan)
+    channels = [TMDSChannel(tb.tx_pads[i], *tb.rx_pads[i], skew=skews[i], jitter=jitter, seed=i)
+                for i in range(nchan)]
+    generators = {
+        "sys":  main_generator(tb, monitor, device, n),
+        "pix":  [monitor.generator(tb)],
+        "line": [channel.generator() for channel in channels]
+    }
+    generators.setdefault("pixh" if dual else "pix", []).append(video_generator(tb))
+    if device == "xc7":
+        clocks = bit_clocks({"sys": 10, "pix": 10, "pix1p25x": 8, "pix1p25x_r": 8, "pix5x": 1}, ui)
+        if dual:
+            clocks.update(bit_clocks({"pixh": 20}, ui))
+    else:
+        clocks = bit_clocks({"sys": 10, "pix": 10, "pix2x": 5, "pix10x": 1}, ui)
+    run_simulation(tb, generators, derived_clocks(tb, clocks), special_overrides=primitive_overrides())
+
+    # decoded characters must be the transmitted ones (from any position)
+    period = len(video[0])
+    decoded = [monitor.decoded[i][:n] for i in range(nchan)]
+    offsets = [k for k in range(period)
+               if all(decoded[i] == [video[i][(k + j) % period] for j in range(n)] for i in range(nchan))]
+    return offsets
+
+
+class TestLoopback(unittest.TestCase):
+    def check(self, device, skews, jitter, dual=False):
+        offsets = run(device, skews, jitter, dual=dual)
+        self.assertEqual(len(offsets), 1, "{} skews={} jitter={} dual={}".format(device, skews, jitter, dual))
+
+    # one channel, 2 taps of jitter (a bit being ui taps)
+    def test_s7_jitter(self):
+        self.check("xc7", [5], 2)
+
+    def test_s6_jitter(self):
+        self.check("xc6", [5], 2)
+
+    # up to 2.5 bits of skew between the channels
+    def test_s7_skew(self):
+        self.check("xc7", [3, 11, 23], 1)
+
+    def test_s6_skew(self):
+        self.check("xc6", [3, 11, 23], 1)
+
+    # two pixels per clock on the output
+    def test_s7_dual(self):
+        self.check("xc7", [5], 2, dual=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,215 @@
+import random
+import unittest
+
+from migen import *
+
+from litevideo.input.common import control_tokens
+from litevideo.input.decoding import DecodeTERC4, terc4_tokens, data_gb_tokens
+from litevideo.input.packet import bch_ecc, bch_syndromes, PacketDecoder, PacketFIFO
+
+
+prng = random.Random(42)
+
+names = ["header", "sub0", "sub1", "sub2", "sub3"]
+
+def width(name):
+    return 24 if name == "header" else 56
+
+def encode(data, n):
+    return data | (bch_ecc(data, n) << n)
+
+def random_packet(packet_type=None):
+    packet = {name: prng.getrandbits(width(name)) for name in names}
+    if packet_type is not None:
+        packet["header"] = (packet["header"] & ~0xff) | packet_type
+    return packet
+
+def raw_packet(packet):
+    return {name: encode(packet[name], width(name)) for name in names}
+
+def flip(raw, nbits):
+    """flip nbits bits of one of the code words of raw, 2 bits being an
+    uncorrectable error"""
+    name = prng.choice(names)
+    n = width(name)
+    syndromes = bch_syndromes(n)
+    while True:
+        bits = prng.sample(range(n + 8), nbits)
+        syndrome = 0
+        for bit in bits:
+            syndrome ^= syndromes[bit]
+        # a double error aliasing a single one would be miscorrected
+        if nbits == 1 or syndrome not in syndromes:
+            break
+    for bit in bits:
+        raw[name] ^= 1 << bit
+
+
+@passive
+def packet_monitor(source, packets, status=None):
+    while True:
+        if (yield source.valid):
+            packet = {}
+            for name in names:
+                packet[name] = (yield getattr(source, name))
+            packets.append(packet)
+            if status is not None:
+                status.append(((yield source.corrected), (yield source.error)))
+        yield
+
+
+# PacketDecoder
+
+def decoder_generator(sink, raw_packets):
+    for raw in raw_packets:
+        yield sink.valid.eq(1)
+        for name in names:
+            yield getattr(sink, name).eq(raw[name])
+        yield
+        yield sink.valid.eq(0)
+        for i in range(4):
+            yield
+    for i in range(16):
+        yield
+
+
+# PacketFIFO
+
+class FIFOTB(Module):
+    def __init__(self):
+        self.clock_domains.cd_sys = ClockDomain()
+        self.clock_domains.cd_pix = ClockDomain()
+        self.submodules.fifo = PacketFIFO()
+
+
+def fifo_sink_generator(sink, packets, flags):
+    for i in range(16):
+        yield
+    for packet, (corrected, error) in zip(packets, flags):
+        yield sink.valid.eq(1)
+        for name in names:
+            yield getattr(sink, name).eq(packet[name])
+        yield sink.corrected.eq(corrected)
+        yield sink.error.eq(error)
+        yield
+        yield sink.valid.eq(0)
+        for i in range(8):
+            yield
+
+def fifo_cpu_generator(fifo, keep_errors, packets, status, counts):
+    yield fifo._keep_errors.storage.eq(keep_errors)
+    for i in range(1024):
+        if (yield fifo.ev.packet.trigger):
+            packet = {}
+            for name in names:
+                packet[name] = (yield getattr(fifo, "_" + name).status)
+            packets.append(packet)
+            status.append((yield fifo._status.status))
+            yield fifo._next.re.eq(1)
+            yield
+            yield fifo._next.re.eq(0)
+        yield
+    counts.append((yield fifo._corrected_count.status))
+    counts.append((yield fifo._error_count.status))
+
+
+# DecodeTERC4
+
+class TERC4TB(Module):
+    def __init__(self):
+        self.clock_domains.cd_sys = ClockDomain()
+        self.clock_domains.cd_pix = ClockDomain()
+        self.submodules.decode_terc4 = DecodeTERC4()
+        self.comb += self.decode_terc4.valid_i.eq(1)
+
+
+def island(raw_packets):
+    """(ch0, ch1, ch2) characters of a data island carrying raw_packets,
+    between control periods"""
+    chars = [(control_tokens[0],)*3]*4
+    # preamble, leading guard band
+    chars += [(control_tokens[0], control_tokens[1], control_tokens[1])]*8
+    chars += [(terc4_tokens[0b1100], data_gb_tokens[0], data_gb_tokens[0])]*2
+    # packets: header bit on ch0 d[2], subpacket k even/odd bits on ch1/ch2 d[k]
+    for p, raw in enumerate(raw_packets):
+        for j in range(32):
+            d0 = (((raw["header"] >> j) & 1) << 2) | ((p != 0 or j != 0) << 3)
+            d1, d2 = 0, 0
+            for k in range(4):
+                sub = raw["sub" + str(k)]
+                d1 |= ((sub >> 2*j) & 1) << k
+                d2 |= ((sub >> (2*j + 1)) & 1) << k
+            chars.append((terc4_tokens[d0], terc4_tokens[d1], terc4_tokens[d2]))
+    # trailing guard band
+    chars += [(terc4_tokens[0b1100], data_gb_tokens[0], data_gb_tokens[0])]*2
+    chars += [(control_tokens[0],)*3]*4
+    return chars
+
+def terc4_generator(dut, islands):
+    for chars in islands:
+        for char in chars:
+            for i, raw in enumerate(char):
+                yield getattr(dut, "data_in" + str(i)).raw.eq(raw)
+            yield
+    for i in range(8):
+        yield
+
+
+class TestPacket(unittest.TestCase):
+    def test_decoder(self):
+        # no error, single bit error (corrected), double bit error (error)
+        reference = [random_packet() for i in range(24)]
+        raw_packets = []
+        for i, packet in enumerate(reference):
+            raw = raw_packet(packet)
+            if i % 3:
+                flip(raw, i % 3)
+            raw_packets.append(raw)
+
+        dut = PacketDecoder()
+        packets, status = [], []
+        generators = [decoder_generator(dut.sink, raw_packets),
+                      packet_monitor(dut.source, packets, status)]
+        run_simulation(dut, generators)
+
+        self.assertEqual(status, [(i % 3 == 1, i % 3 == 2) for i in range(24)])
+        for i in range(24):
+            if i % 3 != 2:
+                self.assertEqual(packets[i], reference[i])
+
+    def test_fifo(self):
+        # AVI and SPD InfoFrames are enabled by the default filter, audio
+        # samples are not
+        packets = [random_packet(t) for t in [0x82, 0x02, 0x83, 0x82, 0x02, 0x83, 0x82, 0x83]]
+        flags = [(0, 0), (1, 0), (1, 0), (0, 1), (0, 1), (0, 0), (1, 0), (0, 1)]
+        for keep_errors in [0, 1]:
+            tb = FIFOTB()
+            read, status, counts = [], [], []
+            generators = {
+                "sys": fifo_cpu_generator(tb.fifo, keep_errors, read, status, counts),
+                "pix": fifo_sink_generator(tb.fifo.sink, packets, flags)
+            }
+            run_simulation(tb, generators, {"sys": 10, "pix": 7})
+
+            kept = [i for i, packet in enumerate(packets)
+                if (packet["header"] & 0x80) and (keep_errors or not flags[i][1])]
+            self.assertEqual(read, [packets[i] for i in kept])
+            self.assertEqual(status, [flags[i][0] | (flags[i][1] << 1) for i in kept])
+            # counted before the filter
+            self.assertEqual(counts, [3, 3])
+
+    def test_decode_terc4(self):
+        # two packets in an island, one in the next
+        reference = [raw_packet(random_packet()) for i in range(3)]
+        tb = TERC4TB()
+        packets = []
+        generators = {
+            "pix": [terc4_generator(tb.decode_terc4, [island(reference[:2]), island(reference[2:])]),
+                    packet_monitor(tb.decode_terc4.source, packets)]
+        }
+        run_simulation(tb, generators, {"sys": 10, "pix": 10})
+        self.assertEqual(packets, reference)
+
+
+if __name__ == "__main__":
+    unittest.main()
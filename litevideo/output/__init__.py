@@ -4,11 +4,13 @@ from litex.soc.interconnect import stream
 from litex.soc.interconnect.csr import *
 
 from litevideo.output.common import *
-from litevideo.output.core import VideoOutCore
+from litevideo.output.core import VideoOutCore, modes_dw
 from litevideo.output.driver import Driver
 
 from litevideo.csc.ycbcr2rgb import YCbCr2RGB
 from litevideo.csc.ycbcr422to444 import YCbCr422to444
+from litevideo.csc.lut import LUT1D
+from litevideo.csc.tonemapping import ToneMapping
 
 
 class TimingDelay(Module):
@@ -31,15 +33,27 @@ class VideoOut(Module, AutoCSR):
     """Video out
 
     Generates a video from memory.
+
+    With hdmi, the HDMI PHY sends data islands (InfoFrames...) and ycbcr422
+    frames are sent natively (Y on channel 1, Cb/Cr on channel 2) without
+    conversion to RGB: the AVI InfoFrame written to the PHY must signal it.
+
+    Otherwise, lut adds a LUT1D (gamma...) after the ycbcr422 conversion.
+
+    With tone_mapping, rgb30/rgb36 (HDR) frames go through a ToneMapping to
+    the 8 bits of the PHY instead of being truncated.
     """
     def __init__(self, device, pads, dram_port,
         mode="rgb",
         fifo_depth=512,
-        external_clocking=None):
+        external_clocking=None,
+        hdmi=False,
+        lut=False,
+        tone_mapping=False):
         cd = dram_port.cd
 
         self.submodules.core = core = VideoOutCore(dram_port, mode, fifo_depth)
-        self.submodules.driver = driver = Driver(device, pads, mode, external_clocking)
+        self.submodules.driver = driver = Driver(device, pads, mode, external_clocking, hdmi)
 
         if mode == "raw":
             self.comb += [
@@ -55,10 +69,64 @@ class VideoOut(Module, AutoCSR):
                 driver.sink.g.eq(core.source.data[8:16]),
                 driver.sink.b.eq(core.source.data[16:24])
             ]
+        elif mode in ["rgb30", "rgb36"] and tone_mapping:
+            cw = modes_dw[mode]//3
+            self.submodules.tone_mapping = ClockDomainsRenamer({"sys": cd, "write": "sys"})(ToneMapping(cw, 8))
+            timing_delay = TimingDelay(self.tone_mapping.latency)
+            timing_delay = ClockDomainsRenamer(cd)(timing_delay)
+            self.submodules += timing_delay
+
+            # data / control
+            self.comb += [
+                core.source.ready.eq(1), # always ready, no flow control
+                self.tone_mapping.vsync.eq(core.source.vsync),
+                self.tone_mapping.sink.valid.eq(core.source.valid),
+                self.tone_mapping.sink.r.eq(core.source.data[0*cw:1*cw]),
+                self.tone_mapping.sink.g.eq(core.source.data[1*cw:2*cw]),
+                self.tone_mapping.sink.b.eq(core.source.data[2*cw:3*cw]),
+                self.tone_mapping.source.connect(driver.sink)
+            ]
+            # timing
+            self.comb += [
+                timing_delay.sink.de.eq(core.source.de),
+                timing_delay.sink.vsync.eq(core.source.vsync),
+                timing_delay.sink.hsync.eq(core.source.hsync),
+
+                driver.sink.de.eq(timing_delay.source.de),
+                driver.sink.vsync.eq(timing_delay.source.vsync),
+                driver.sink.hsync.eq(timing_delay.source.hsync)
+            ]
+        elif mode in ["rgb30", "rgb36"]:
+            # deep colour frames, the PHY taking the 8 MSBs of each component
+            cw = modes_dw[mode]//3
+            self.comb += [
+                core.source.connect(driver.sink, omit=["data"]),
+                driver.sink.r.eq(core.source.data[1*cw-8:1*cw]),
+                driver.sink.g.eq(core.source.data[2*cw-8:2*cw]),
+                driver.sink.b.eq(core.source.data[3*cw-8:3*cw])
+            ]
+        elif mode == "ycbcr422" and hdmi:
+            self.comb += [
+                core.source.connect(driver.sink, omit=["data"]),
+                driver.sink.g.eq(core.source.data[0:8]),
+                driver.sink.r.eq(core.source.data[8:16]),
+                driver.sink.b.eq(0)
+            ]
         elif mode == "ycbcr422":
             ycbcr422to444 = ClockDomainsRenamer(cd)(YCbCr422to444())
             ycbcr2rgb = ClockDomainsRenamer(cd)(YCbCr2RGB())
-            timing_delay = TimingDelay(ycbcr422to444.latency + ycbcr2rgb.latency)
+            latency = ycbcr422to444.latency + ycbcr2rgb.latency
+            if lut:
+                self.submodules.lut = ClockDomainsRenamer({"sys": cd, "write": "sys"})(LUT1D())
+                self.comb += [
+                    self.lut.vsync.eq(core.source.vsync),
+                    ycbcr2rgb.source.connect(self.lut.sink),
+                    self.lut.source.connect(driver.sink)
+                ]
+                latency += self.lut.latency
+            else:
+                self.comb += ycbcr2rgb.source.connect(driver.sink)
+            timing_delay = TimingDelay(latency)
             timing_delay = ClockDomainsRenamer(cd)(timing_delay)
             self.submodules += ycbcr422to444, ycbcr2rgb, timing_delay
 
@@ -80,9 +148,7 @@ class VideoOut(Module, AutoCSR):
                 ycbcr422to444.sink.y.eq(core_source_data_d[:8]),
                 ycbcr422to444.sink.cb_cr.eq(core_source_data_d[8:]),
 
-                ycbcr422to444.source.connect(ycbcr2rgb.sink),
-
-                ycbcr2rgb.source.connect(driver.sink)
+                ycbcr422to444.source.connect(ycbcr2rgb.sink)
             ]
             # timing
             self.comb += [
@@ -32,17 +32,37 @@ frame_timing_layout = [
 
 color_bar_parameter_layout = [("hres", hbits)]
 
+# HDMI data island packet: HB0-HB2 and the four SB0-SB6 subpackets, without ECC
+data_island_packet_layout = [
+    ("header", 24),
+    ("sub0",   56),
+    ("sub1",   56),
+    ("sub2",   56),
+    ("sub3",   56),
+]
+
+# TMDS Encoder controls of one channel
+encoder_layout = [
+    ("d",      8),
+    ("c",      2),
+    ("de",     1),
+    ("terc4",  1),
+    ("raw_en", 1),
+    ("raw",   10),
+]
+
 def video_out_layout(dw):
     param_layout = frame_timing_layout
     payload_layout = [("data", dw)]
     return stream.EndpointDescription(payload_layout, param_layout)
 
-def phy_layout(mode):
+def phy_layout(mode, lanes=1):
+    """PHY layout, with lanes pixels per clock (lane 0 in the LSBs)"""
     if mode == "raw":
-        param_layout = frame_timing_layout # not used
-        payload_layout = [("c0", 10), ("c1", 10), ("c2", 11)]
+        param_layout = [(name, lanes) for name, w in frame_timing_layout] # not used
+        payload_layout = [("c0", 10*lanes), ("c1", 10*lanes), ("c2", 11*lanes)]
         return stream.EndpointDescription(payload_layout, param_layout)
     else:
-        param_layout = frame_timing_layout
-        payload_layout = [("r", 8), ("g", 8), ("b", 8)]
+        param_layout = [(name, lanes) for name, w in frame_timing_layout]
+        payload_layout = [("r", 8*lanes), ("g", 8*lanes), ("b", 8*lanes)]
         return stream.EndpointDescription(payload_layout, param_layout)
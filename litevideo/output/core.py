@@ -306,6 +306,8 @@ class TimingGenerator(Module):
 modes_dw = {
     "raw":      32,
     "rgb":      24,
+    "rgb30":    30,
+    "rgb36":    36,
     "ycbcr422": 16
 }
 
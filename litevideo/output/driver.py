@@ -40,24 +40,39 @@ class Driver(Module, AutoCSR):
     """Driver
 
     Low level video interface module.
+
+    With dual (7-series HDMI/DVI only), the sink carries two pixels per pix
+    clock, pix being half the pixel clock. drp_modes adds a DRPSequencer to the
+    clocking.
     """
-    def __init__(self, device, pads, mode, external_clocking=None):
-        self.sink = sink = stream.Endpoint(phy_layout(mode))
+    def __init__(self, device, pads, mode, external_clocking=None, hdmi=False, dual=False,
+                 drp_modes=None):
+        lanes = 2 if dual else 1
+        self.sink = sink = stream.Endpoint(phy_layout(mode, lanes))
 
         # # #
 
         family = device[:3]
+        vga = hasattr(pads, "hsync_n")
 
         # clocking
-        self.submodules.clocking = clocking_cls[family](pads, external_clocking)
+        clocking_kwargs = {}
+        if dual:
+            assert family == "xc7" and not vga
+            clocking_kwargs["dual"] = True
+        if drp_modes is not None:
+            clocking_kwargs["drp_modes"] = drp_modes
+        self.submodules.clocking = clocking_cls[family](pads, external_clocking, **clocking_kwargs)
 
         # phy
-        vga = hasattr(pads, "hsync_n")
         if vga:
             self.submodules.vga_phy = VGAPHY(pads, mode)
             self.comb += sink.connect(self.vga_phy.sink)
         else:
-            self.submodules.hdmi_phy = hdmi_phy_cls[family](pads, mode)
+            if dual:
+                self.submodules.hdmi_phy = hdmi_phy_cls[family](pads, mode, hdmi, dual=True)
+            else:
+                self.submodules.hdmi_phy = hdmi_phy_cls[family](pads, mode, hdmi)
             self.comb += sink.connect(self.hdmi_phy.sink)
             if hasattr(self.hdmi_phy, "serdesstrobe"):
                 self.comb += self.hdmi_phy.serdesstrobe.eq(self.clocking.serdesstrobe)
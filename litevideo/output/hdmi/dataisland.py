@@ -0,0 +1,264 @@
+from functools import reduce
+from operator import or_
+
+from migen import *
+from migen.genlib.cdc import MultiReg
+
+from litex.soc.interconnect import stream
+from litex.soc.interconnect.csr import *
+
+from litevideo.output.common import *
+from litevideo.output.hdmi.encoder import data_gb_token, video_gb_tokens
+from litevideo.input.packet import bch_parity
+
+
+class DataIsland(Module, AutoCSR):
+    """Data island
+
+    Turns a phy_layout stream into the controls of the three TMDS Encoders of
+    an HDMI output: video preamble and guard band before active video, and
+    data islands (preamble, guard bands, TERC4 packets) after the hsync rising
+    edge when the horizontal blanking of the previous line leaves room for
+    them. The stream is delayed by latency cycles to look ahead for DE.
+
+    Packets are taken first from n_slots slots sent once per frame after the
+    vsync rising edge (AVI/audio InfoFrames...), then from a FIFO fed by sink
+    (sys clock domain, e.g. an audio packetizer or a DMA) or by the CPU. Both
+    are written through the header/sub CSRs, with slot_we or push. ECCs are
+    computed here.
+    """
+    latency = 10
+
+    def __init__(self, mode, n_slots=4, fifo_depth=16, max_packets=18):
+        assert mode != "raw"
+        self.sink = sink = stream.Endpoint(phy_layout(mode))                   # pix clock domain
+        self.packets = packets = stream.Endpoint(data_island_packet_layout)    # sys clock domain
+        self.ch0 = Record(encoder_layout)
+        self.ch1 = Record(encoder_layout)
+        self.ch2 = Record(encoder_layout)
+
+        self._hdmi = CSRStorage(reset=1)
+        self._header = CSRStorage(24)
+        self._sub0 = CSRStorage(56)
+        self._sub1 = CSRStorage(56)
+        self._sub2 = CSRStorage(56)
+        self._sub3 = CSRStorage(56)
+        self._slot_adr = CSRStorage(bits_for(n_slots-1))
+        self._slot_we = CSR()
+        self._slot_enable = CSRStorage(n_slots)
+        self._push = CSR()
+        self._push_ready = CSRStatus()
+
+        # # #
+
+        packet_w = sum(w for n, w in data_island_packet_layout)
+        csr_packet = Cat(self._header.storage,
+                         self._sub0.storage, self._sub1.storage,
+                         self._sub2.storage, self._sub3.storage)
+
+        # slots (written in sys, read in pix)
+        slots = Memory(packet_w, n_slots)
+        slots_wrport = slots.get_port(write_capable=True)
+        slots_rdport = slots.get_port(async_read=True)
+        self.specials += slots, slots_wrport, slots_rdport
+        self.comb += [
+            slots_wrport.adr.eq(self._slot_adr.storage),
+            slots_wrport.dat_w.eq(csr_packet),
+            slots_wrport.we.eq(self._slot_we.re)
+        ]
+
+        # fifo (written in sys, read in pix)
+        fifo = stream.AsyncFIFO(data_island_packet_layout, fifo_depth)
+        fifo = ClockDomainsRenamer({"write": "sys", "read": "pix"})(fifo)
+        self.submodules += fifo
+        self.comb += [
+            If(self._push.re,
+                fifo.sink.valid.eq(1),
+                fifo.sink.payload.raw_bits().eq(csr_packet)
+            ).Else(
+                packets.connect(fifo.sink)
+            ),
+            self._push_ready.status.eq(fifo.sink.ready)
+        ]
+
+        hdmi = Signal()
+        slot_enable = Signal(n_slots)
+        self.specials += [
+            MultiReg(self._hdmi.storage, hdmi, "pix"),
+            MultiReg(self._slot_enable.storage, slot_enable, "pix")
+        ]
+
+        # delay the video stream, keeping the DE of the next cycles
+        self.comb += sink.ready.eq(1)
+        de_line = [sink.de]
+        for i in range(self.latency):
+            de_n = Signal()
+            self.sync.pix += de_n.eq(de_line[-1])
+            de_line.append(de_n)
+        de = de_line[-1]
+        delayed = {}
+        for name in ["hsync", "vsync", "r", "g", "b"]:
+            s = getattr(sink, name)
+            for i in range(self.latency):
+                s_n = Signal(len(s))
+                self.sync.pix += s_n.eq(s)
+                s = s_n
+            delayed[name] = s
+        hsync, vsync = delayed["hsync"], delayed["vsync"]
+
+        # video guard band 2 cycles and preamble 8 cycles before DE
+        video_gb = Signal()
+        video_preamble = Signal()
+        self.comb += [
+            video_gb.eq(~de & (de_line[self.latency-1] | de_line[self.latency-2])),
+            video_preamble.eq(~de & ~video_gb & reduce(or_, de_line[:self.latency-2]))
+        ]
+
+        # room between the hsync rising edge and DE on the previous line
+        hsync_r = Signal()
+        de_r = Signal()
+        vsync_r = Signal()
+        hsync_rising = Signal()
+        line_counter = Signal(hbits)
+        budget = Signal(hbits)
+        self.comb += hsync_rising.eq(hsync & ~hsync_r)
+        self.sync.pix += [
+            hsync_r.eq(hsync),
+            de_r.eq(de),
+            vsync_r.eq(vsync),
+            If(hsync_rising,
+                line_counter.eq(0)
+            ).Elif(line_counter != 2**hbits-1,
+                line_counter.eq(line_counter + 1)
+            ),
+            If(de & ~de_r, budget.eq(line_counter))
+        ]
+
+        # packet selection: pending slots first, then fifo
+        pending = Signal(n_slots)
+        slot = Signal(max=max(n_slots, 2))
+        for i in reversed(range(n_slots)):
+            self.comb += If(pending[i], slot.eq(i))
+        self.comb += slots_rdport.adr.eq(slot)
+
+        available = Signal()
+        next_packet = Signal(packet_w)
+        self.comb += [
+            available.eq((pending != 0) | fifo.source.valid),
+            If(pending != 0,
+                next_packet.eq(slots_rdport.dat_r)
+            ).Else(
+                next_packet.eq(fifo.source.payload.raw_bits())
+            )
+        ]
+
+        load = Signal()
+        header_sr = Signal(32)
+        sub_srs = [Signal(64) for i in range(4)]
+        next_header = next_packet[:24]
+        next_subs = [next_packet[24+56*i:24+56*(i+1)] for i in range(4)]
+        self.sync.pix += [
+            If(load,
+                header_sr.eq(Cat(next_header, bch_parity(next_header, 24))),
+                [sr.eq(Cat(sub, bch_parity(sub, 56))) for sr, sub in zip(sub_srs, next_subs)]
+            ).Else(
+                header_sr.eq(header_sr[1:]),
+                [sr.eq(sr[2:]) for sr in sub_srs]
+            ),
+            If(load & (pending != 0),
+                pending.eq(pending & ~(1 << slot))
+            ),
+            If(vsync & ~vsync_r,
+                pending.eq(slot_enable)
+            )
+        ]
+        self.comb += fifo.source.ready.eq(load & (pending == 0))
+
+        # data island sequencing
+        count = Signal(5)
+        n_packets = Signal(max=max_packets+1)
+        first = Signal()
+        room = Signal()
+        self.comb += room.eq((line_counter + 32 + 2 + 14) <= budget)
+
+        self.submodules.fsm = fsm = ClockDomainsRenamer("pix")(FSM(reset_state="IDLE"))
+        fsm.act("IDLE",
+            NextValue(count, 0),
+            If(hdmi & hsync_rising & available & (budget >= (4 + 8 + 2 + 32 + 2 + 14)),
+                NextState("WAIT")
+            )
+        )
+        fsm.act("WAIT",
+            NextValue(count, count + 1),
+            If(count == 3,
+                NextValue(count, 0),
+                NextState("PREAMBLE")
+            )
+        )
+        fsm.act("PREAMBLE",
+            NextValue(count, count + 1),
+            If(count == 7,
+                NextValue(count, 0),
+                NextState("LEADING_GB")
+            )
+        )
+        fsm.act("LEADING_GB",
+            NextValue(count, count + 1),
+            If(count == 1,
+                load.eq(1),
+                NextValue(count, 0),
+                NextValue(n_packets, 1),
+                NextValue(first, 1),
+                NextState("PACKET")
+            )
+        )
+        fsm.act("PACKET",
+            NextValue(count, count + 1),
+            NextValue(first, 0),
+            If(count == 31,
+                If(available & room & (n_packets != max_packets),
+                    load.eq(1),
+                    NextValue(n_packets, n_packets + 1)
+                ).Else(
+                    NextState("TRAILING_GB")
+                )
+            )
+        )
+        fsm.act("TRAILING_GB",
+            NextValue(count, count + 1),
+            If(count == 1,
+                NextState("IDLE")
+            )
+        )
+
+        # encoders controls
+        chs = [self.ch0, self.ch1, self.ch2]
+        for ch, name in zip(chs, ["b", "g", "r"]):
+            self.comb += [
+                ch.d.eq(delayed[name]),
+                ch.de.eq(de)
+            ]
+        self.comb += [
+            self.ch0.c.eq(Cat(hsync, vsync)),
+            If(hdmi & video_gb,
+                [ch.raw_en.eq(1) for ch in chs],
+                [ch.raw.eq(t) for ch, t in zip(chs, video_gb_tokens)]
+            ).Elif(hdmi & video_preamble,
+                self.ch1.c.eq(0b01),
+                self.ch2.c.eq(0b00)
+            ).Elif(fsm.ongoing("PREAMBLE"),
+                self.ch1.c.eq(0b01),
+                self.ch2.c.eq(0b01)
+            ).Elif(fsm.ongoing("LEADING_GB") | fsm.ongoing("TRAILING_GB"),
+                self.ch0.terc4.eq(1),
+                self.ch0.d.eq(Cat(hsync, vsync, 1, 1)),
+                [ch.raw_en.eq(1) for ch in chs[1:]],
+                [ch.raw.eq(data_gb_token) for ch in chs[1:]]
+            ).Elif(fsm.ongoing("PACKET"),
+                [ch.terc4.eq(1) for ch in chs],
+                # bit 3 of channel 0 is 0 on the first character of the island
+                self.ch0.d.eq(Cat(hsync, vsync, header_sr[0], ~first)),
+                self.ch1.d.eq(Cat(*[sr[0] for sr in sub_srs])),
+                self.ch2.d.eq(Cat(*[sr[1] for sr in sub_srs]))
+            )
+        ]
@@ -3,16 +3,32 @@ from operator import add
 
 from migen import *
 
+from litevideo.output.common import encoder_layout
+
 control_tokens = [0b1101010100, 0b0010101011, 0b0101010100, 0b1010101011]
 
+terc4_tokens = [
+    0b1010011100, 0b1001100011, 0b1011100100, 0b1011100010,
+    0b0101110001, 0b0100011110, 0b0110001110, 0b0100111100,
+    0b1011001100, 0b0100111001, 0b0110011100, 0b1011000110,
+    0b1010001110, 0b1001110001, 0b0101100011, 0b1011000011,
+]
+
+data_gb_token = 0b0100110011  # channels 1 and 2, channel 0 is TERC4 encoded
+
+video_gb_tokens = [0b1011001100, 0b0100110011, 0b1011001100]
+
+
+class _TransitionMinimizer(Module):
+    """Stages 1 to 3 of the TMDS encoding: transition minimized q_m and its
+    number of 1s and 0s, without any state."""
+    latency = 3
 
-class Encoder(Module):
     def __init__(self):
         self.d = Signal(8)
-        self.c = Signal(2)
-        self.de = Signal()
-
-        self.out = Signal(10)
+        self.q_m = Signal(9)
+        self.n1q_m = Signal(max=9)
+        self.n0q_m = Signal(max=9)
 
         # # #
 
@@ -37,52 +53,136 @@ class Encoder(Module):
         self.sync += q_m[8].eq(~q_m8_n)
 
         # stage 3 - count number of 1s and 0s in q_m[:8]
-        q_m_r = Signal(9)
-        n0q_m = Signal(max=9)
-        n1q_m = Signal(max=9)
         self.sync += [
-            n0q_m.eq(reduce(add, [~q_m[i] for i in range(8)])),
-            n1q_m.eq(reduce(add, [q_m[i] for i in range(8)])),
-            q_m_r.eq(q_m)
+            self.n0q_m.eq(reduce(add, [~q_m[i] for i in range(8)])),
+            self.n1q_m.eq(reduce(add, [q_m[i] for i in range(8)])),
+            self.q_m.eq(q_m)
         ]
 
-        # stage 4 - final encoding
-        cnt = Signal((6, True))
 
-        s_c = self.c
-        s_de = self.de
-        for p in range(3):
-            new_c = Signal(2)
-            new_de = Signal()
-            self.sync += new_c.eq(s_c), new_de.eq(s_de)
-            s_c, s_de = new_c, new_de
-
-        self.sync += \
-            If(s_de,
-                If((cnt == 0) | (n1q_m == n0q_m),
-                    self.out[9].eq(~q_m_r[8]),
-                    self.out[8].eq(q_m_r[8]),
-                    If(q_m_r[8],
-                        self.out[:8].eq(q_m_r[:8]),
-                        cnt.eq(cnt + n1q_m - n0q_m)
-                    ).Else(
-                        self.out[:8].eq(~q_m_r[:8]),
-                        cnt.eq(cnt + n0q_m - n1q_m)
-                    )
-                ).Else(
-                    If((~cnt[5] & (n1q_m > n0q_m)) | (cnt[5] & (n0q_m > n1q_m)),
-                        self.out[9].eq(1),
-                        self.out[8].eq(q_m_r[8]),
-                        self.out[:8].eq(~q_m_r[:8]),
-                        cnt.eq(cnt + Cat(0, q_m_r[8]) + n0q_m - n1q_m)
-                    ).Else(
-                        self.out[9].eq(0),
-                        self.out[8].eq(q_m_r[8]),
-                        self.out[:8].eq(q_m_r[:8]),
-                        cnt.eq(cnt - Cat(0, ~q_m_r[8]) + n1q_m - n0q_m)
-                    )
-                )
+def _delay_controls(module, controls, latency):
+    """Delays the controls Record of an encoder by latency cycles"""
+    for i in range(latency):
+        controls_n = Record(encoder_layout)
+        module.sync += controls_n.eq(controls)
+        controls = controls_n
+    return controls
+
+
+def _encode(controls, tm, cnt, out, cnt_next):
+    """Stage 4 of the TMDS encoding: final encoding from the cnt disparity,
+    sets out and the cnt_next disparity (cnt_next can be cnt in sync)"""
+    q_m, n1q_m, n0q_m = tm.q_m, tm.n1q_m, tm.n0q_m
+    return If(controls.raw_en,
+        out.eq(controls.raw),
+        cnt_next.eq(0)
+    ).Elif(controls.terc4,
+        out.eq(Array(terc4_tokens)[controls.d[:4]]),
+        cnt_next.eq(0)
+    ).Elif(controls.de,
+        If((cnt == 0) | (n1q_m == n0q_m),
+            out[9].eq(~q_m[8]),
+            out[8].eq(q_m[8]),
+            If(q_m[8],
+                out[:8].eq(q_m[:8]),
+                cnt_next.eq(cnt + n1q_m - n0q_m)
+            ).Else(
+                out[:8].eq(~q_m[:8]),
+                cnt_next.eq(cnt + n0q_m - n1q_m)
+            )
+        ).Else(
+            If((~cnt[5] & (n1q_m > n0q_m)) | (cnt[5] & (n0q_m > n1q_m)),
+                out[9].eq(1),
+                out[8].eq(q_m[8]),
+                out[:8].eq(~q_m[:8]),
+                cnt_next.eq(cnt + Cat(0, q_m[8]) + n0q_m - n1q_m)
             ).Else(
-                self.out.eq(Array(control_tokens)[s_c]),
-                cnt.eq(0)
+                out[9].eq(0),
+                out[8].eq(q_m[8]),
+                out[:8].eq(q_m[:8]),
+                cnt_next.eq(cnt - Cat(0, ~q_m[8]) + n1q_m - n0q_m)
             )
+        )
+    ).Else(
+        out.eq(Array(control_tokens)[controls.c]),
+        cnt_next.eq(0)
+    )
+
+
+class Encoder(Module):
+    """TMDS encoder
+
+    Encodes d when de is set, c otherwise. For HDMI, terc4 selects the TERC4
+    encoding of d[:4] (data islands) and raw_en outputs raw as is (guard
+    bands); both have priority over de.
+    """
+    def __init__(self):
+        self.d = Signal(8)
+        self.c = Signal(2)
+        self.de = Signal()
+        self.terc4 = Signal()
+        self.raw_en = Signal()
+        self.raw = Signal(10)
+
+        self.out = Signal(10)
+
+        # # #
+
+        # stages 1 to 3
+        self.submodules.tm = tm = _TransitionMinimizer()
+        self.comb += tm.d.eq(self.d)
+
+        controls = Record(encoder_layout)
+        self.comb += [
+            controls.d.eq(self.d),
+            controls.c.eq(self.c),
+            controls.de.eq(self.de),
+            controls.terc4.eq(self.terc4),
+            controls.raw_en.eq(self.raw_en),
+            controls.raw.eq(self.raw)
+        ]
+        controls = _delay_controls(self, controls, tm.latency)
+
+        # stage 4 - final encoding
+        cnt = Signal((6, True))
+        self.sync += _encode(controls, tm, cnt, self.out, cnt)
+
+
+class DualEncoder(Module):
+    """Dual TMDS encoder
+
+    Encodes two symbols per clock, lanes[0] being transmitted first, with the
+    disparity carried from the first symbol to the second. Same latency as
+    Encoder, at half its clock rate.
+    """
+    def __init__(self):
+        self.lanes = [Record(encoder_layout) for i in range(2)]
+
+        self.out = Signal(20)
+
+        # # #
+
+        # stages 1 to 3
+        tms = []
+        controls = []
+        for lane in self.lanes:
+            tm = _TransitionMinimizer()
+            self.submodules += tm
+            self.comb += tm.d.eq(lane.d)
+            tms.append(tm)
+            controls.append(_delay_controls(self, lane, tm.latency))
+
+        # stage 4 - final encoding of both symbols
+        cnt = Signal((6, True))
+        cnt_mid = Signal((6, True))
+        cnt_next = Signal((6, True))
+        out0 = Signal(10)
+        out1 = Signal(10)
+        self.comb += [
+            _encode(controls[0], tms[0], cnt, out0, cnt_mid),
+            _encode(controls[1], tms[1], cnt_mid, out1, cnt_next)
+        ]
+        self.sync += [
+            self.out.eq(Cat(out0, out1)),
+            cnt.eq(cnt_next)
+        ]
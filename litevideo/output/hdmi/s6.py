@@ -5,12 +5,14 @@ from litex.soc.interconnect import stream
 from litex.soc.interconnect.csr import *
 
 from litevideo.output.common import *
+from litevideo.drp import add_drp
 from litevideo.output.hdmi.encoder import Encoder
+from litevideo.output.hdmi.dataisland import DataIsland
 
 
 # This assumes a 50MHz base clock
 class S6HDMIOutClocking(Module, AutoCSR):
-    def __init__(self, pads, external_clocking, max_pix_clk=100e6):
+    def __init__(self, pads, external_clocking, max_pix_clk=100e6, drp_modes=None):
         if external_clocking is None:
             self._cmd_data = CSRStorage(10)
             self._send_cmd_data = CSR()
@@ -113,12 +115,16 @@ class S6HDMIOutClocking(Module, AutoCSR):
             pll1_pix2x = Signal()
             pll2_pix = Signal()
             locked_async = Signal()
-            pll_drdy = Signal()
+            pll_drp, pll_reset = add_drp(self,
+                self._pll_adr.storage, self._pll_dat_w.storage,
+                self._pll_read.re, self._pll_write.re,
+                ~pix_locked | self._pll_reset.storage, pll_locked, drp_modes, 5)
             self.sync += If(self._pll_read.re | self._pll_write.re,
                 self._pll_drdy.status.eq(0)
-            ).Elif(pll_drdy,
+            ).Elif(pll_drp.drdy,
                 self._pll_drdy.status.eq(1)
             )
+            self.comb += self._pll_dat_r.status.eq(pll_drp.do)
             self.specials += [
                 Instance("PLL_ADV",
                          name="hdmi_out_pll_adv",
@@ -133,14 +139,14 @@ class S6HDMIOutClocking(Module, AutoCSR):
                          o_CLKOUT0=pll0_pix10x, o_CLKOUT1=pll1_pix2x, o_CLKOUT2=pll2_pix,
                          o_CLKFBOUT=clkfbout, i_CLKFBIN=clkfbout,
                          o_LOCKED=pll_locked,
-                         i_RST=~pix_locked | self._pll_reset.storage,
-
-                         i_DADDR=self._pll_adr.storage,
-                         o_DO=self._pll_dat_r.status,
-                         i_DI=self._pll_dat_w.storage,
-                         i_DEN=self._pll_read.re | self._pll_write.re,
-                         i_DWE=self._pll_write.re,
-                         o_DRDY=pll_drdy,
+                         i_RST=pll_reset,
+
+                         i_DADDR=pll_drp.adr,
+                         o_DO=pll_drp.do,
+                         i_DI=pll_drp.di,
+                         i_DEN=pll_drp.den,
+                         i_DWE=pll_drp.dwe,
+                         o_DRDY=pll_drp.drdy,
                          i_DCLK=ClockSignal()),
                 Instance("BUFPLL", name="hdmi_out_bufpll", p_DIVIDE=5,
                          i_PLLIN=pll0_pix10x, i_GCLK=ClockSignal("pix2x"), i_LOCKED=pll_locked,
@@ -191,6 +197,7 @@ class _S6HDMIOutEncoderSerializer(Module):
         if not bypass_encoder:
             self.submodules.encoder = ClockDomainsRenamer("pix")(Encoder())
             self.d, self.c, self.de = self.encoder.d, self.encoder.c, self.encoder.de
+            self.terc4, self.raw_en, self.raw = self.encoder.terc4, self.encoder.raw_en, self.encoder.raw
             self.data = self.encoder.out
         else:
             self.data = Signal(10)
@@ -242,8 +249,8 @@ class _S6HDMIOutEncoderSerializer(Module):
         ]
 
 
-class S6HDMIOutPHY(Module):
-    def __init__(self, pads, mode):
+class S6HDMIOutPHY(Module, AutoCSR):
+    def __init__(self, pads, mode, hdmi=False):
         self.serdesstrobe = Signal()
         self.sink = sink = stream.Endpoint(phy_layout(mode))
 
@@ -260,6 +267,19 @@ class S6HDMIOutPHY(Module):
                 self.es1.data.eq(sink.c1),
                 self.es2.data.eq(sink.c2)
             ]
+        elif hdmi:
+            self.submodules.data_island = DataIsland(mode)
+            self.comb += sink.connect(self.data_island.sink)
+            for es, ch in zip([self.es0, self.es1, self.es2],
+                              [self.data_island.ch0, self.data_island.ch1, self.data_island.ch2]):
+                self.comb += [
+                    es.d.eq(ch.d),
+                    es.c.eq(ch.c),
+                    es.de.eq(ch.de),
+                    es.terc4.eq(ch.terc4),
+                    es.raw_en.eq(ch.raw_en),
+                    es.raw.eq(ch.raw)
+                ]
         else:
             self.comb += [
                 sink.ready.eq(1),
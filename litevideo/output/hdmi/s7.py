@@ -4,30 +4,68 @@ from litex.soc.interconnect import stream
 from litex.soc.interconnect.csr import *
 
 from litevideo.output.common import *
-from litevideo.output.hdmi.encoder import Encoder
+from litevideo.drp import add_drp
+from litevideo.output.hdmi.encoder import Encoder, DualEncoder
+from litevideo.output.hdmi.dataisland import DataIsland
 
 # Serializer and Clocking initial configurations come
 # from http://hamsterworks.co.nz/.
 
 class S7HDMIOutEncoderSerializer(Module):
-    def __init__(self, pad_p, pad_n, bypass_encoder=False):
-        if not bypass_encoder:
-            self.submodules.encoder = ClockDomainsRenamer("pix")(Encoder())
-            self.d, self.c, self.de = self.encoder.d, self.encoder.c, self.encoder.de
-            self.data = self.encoder.out
+    """Encoder and serializer of a TMDS channel
+
+    With dual, two symbols are encoded per pix clock (lanes[0] first) and a
+    gearbox presents them one at a time to the OSERDESE2s in pix2x, the bit
+    clock being pix10x: the logic runs at half the pixel rate.
+    """
+    def __init__(self, pad_p, pad_n, bypass_encoder=False, dual=False):
+        if dual:
+            if not bypass_encoder:
+                self.submodules.encoder = ClockDomainsRenamer("pix")(DualEncoder())
+                self.lanes = self.encoder.lanes
+                self.data = self.encoder.out
+            else:
+                self.data = Signal(20)
+            div_cd, ser_cd = "pix2x", "pix10x"
         else:
-            self.data = Signal(10)
+            if not bypass_encoder:
+                self.submodules.encoder = ClockDomainsRenamer("pix")(Encoder())
+                self.d, self.c, self.de = self.encoder.d, self.encoder.c, self.encoder.de
+                self.terc4, self.raw_en, self.raw = self.encoder.terc4, self.encoder.raw_en, self.encoder.raw
+                self.data = self.encoder.out
+            else:
+                self.data = Signal(10)
+            div_cd, ser_cd = "pix", "pix5x"
 
         # # #
 
         data = Signal(10)
+        if dual:
+            data_2x = Signal(20)
+            self.sync.pix += data_2x.eq(self.data)
+            # pix2x phase (set during the second half of the pix cycle),
+            # aligned on a pix toggle: the pix2x copy of the toggle only
+            # differs from it during the first half
+            toggle = Signal()
+            toggle_2x = Signal()
+            phase = Signal()
+            self.sync.pix += toggle.eq(~toggle)
+            self.sync.pix2x += [
+                toggle_2x.eq(toggle),
+                phase.eq(toggle != toggle_2x)
+            ]
+            data_1x = Signal(10)
+            self.sync.pix2x += data_1x.eq(Mux(phase, data_2x[10:], data_2x[:10]))
+        else:
+            data_1x = self.data
         if hasattr(pad_p, "inverted"):
-            self.comb += data.eq(~self.data)
+            self.comb += data.eq(~data_1x)
         else:
-            self.comb += data.eq(self.data)
+            self.comb += data.eq(data_1x)
 
         ce = Signal()
-        self.sync.pix5x += ce.eq(~ResetSignal("pix"))
+        sync_ser = getattr(self.sync, ser_cd)
+        sync_ser += ce.eq(~ResetSignal("pix"))
 
         shift = Signal(2)
         pad_se = Signal()
@@ -43,7 +81,7 @@ class S7HDMIOutEncoderSerializer(Module):
                 i_OCE=ce,
                 i_TCE=0,
                 i_RST=ResetSignal("pix"),
-                i_CLK=ClockSignal("pix5x"), i_CLKDIV=ClockSignal("pix"),
+                i_CLK=ClockSignal(ser_cd), i_CLKDIV=ClockSignal(div_cd),
                 i_D1=data[0], i_D2=data[1],
                 i_D3=data[2], i_D4=data[3],
                 i_D5=data[4], i_D6=data[5],
@@ -60,7 +98,7 @@ class S7HDMIOutEncoderSerializer(Module):
                 i_OCE=ce,
                 i_TCE=0,
                 i_RST=ResetSignal("pix"),
-                i_CLK=ClockSignal("pix5x"), i_CLKDIV=ClockSignal("pix"),
+                i_CLK=ClockSignal(ser_cd), i_CLKDIV=ClockSignal(div_cd),
                 i_D1=0, i_D2=0,
                 i_D3=data[8], i_D4=data[9],
                 i_D5=0, i_D6=0,
@@ -74,11 +112,17 @@ class S7HDMIOutEncoderSerializer(Module):
 
 
 # This assumes a 100MHz base clock
+# With dual, pix is half the pixel clock, pix2x the pixel clock and pix10x the
+# DDR bit clock (see S7HDMIOutEncoderSerializer).
 class S7HDMIOutClocking(Module, AutoCSR):
-    def __init__(self, pads, external_clocking):
+    def __init__(self, pads, external_clocking, dual=False, drp_modes=None):
         # TODO: implement external clocking
         self.clock_domains.cd_pix = ClockDomain("pix")
-        self.clock_domains.cd_pix5x = ClockDomain("pix5x", reset_less=True)
+        if dual:
+            self.clock_domains.cd_pix2x = ClockDomain("pix2x", reset_less=True)
+            self.clock_domains.cd_pix10x = ClockDomain("pix10x", reset_less=True)
+        else:
+            self.clock_domains.cd_pix5x = ClockDomain("pix5x", reset_less=True)
 
         self._mmcm_reset = CSRStorage()
         self._mmcm_read = CSR()
@@ -94,12 +138,16 @@ class S7HDMIOutClocking(Module, AutoCSR):
         mmcm_fb = Signal()
         mmcm_clk0 = Signal()
         mmcm_clk1 = Signal()
-        mmcm_drdy = Signal()
+        mmcm_clk2 = Signal()
+        mmcm_drp, mmcm_reset = add_drp(self,
+            self._mmcm_adr.storage, self._mmcm_dat_w.storage,
+            self._mmcm_read.re, self._mmcm_write.re,
+            self._mmcm_reset.storage, mmcm_locked, drp_modes)
 
         self.specials += [
             Instance("MMCME2_ADV",
                 p_BANDWIDTH="OPTIMIZED",
-                i_RST=self._mmcm_reset.storage, o_LOCKED=mmcm_locked,
+                i_RST=mmcm_reset, o_LOCKED=mmcm_locked,
 
                 # VCO
                 p_REF_JITTER1=0.01, p_CLKIN1_PERIOD=10.0,
@@ -107,54 +155,95 @@ class S7HDMIOutClocking(Module, AutoCSR):
                 i_CLKIN1=ClockSignal("clk100"), i_CLKFBIN=mmcm_fb, o_CLKFBOUT=mmcm_fb,
 
                 # CLK0
-                p_CLKOUT0_DIVIDE_F=5.0, p_CLKOUT0_PHASE=0.000, o_CLKOUT0=mmcm_clk0,
+                p_CLKOUT0_DIVIDE_F=10.0 if dual else 5.0, p_CLKOUT0_PHASE=0.000, o_CLKOUT0=mmcm_clk0,
                 # CLK1
-                p_CLKOUT1_DIVIDE=1, p_CLKOUT1_PHASE=0.000, o_CLKOUT1=mmcm_clk1,
+                p_CLKOUT1_DIVIDE=5 if dual else 1, p_CLKOUT1_PHASE=0.000, o_CLKOUT1=mmcm_clk1,
+                # CLK2
+                p_CLKOUT2_DIVIDE=1, p_CLKOUT2_PHASE=0.000, o_CLKOUT2=mmcm_clk2,
 
                 # DRP
                 i_DCLK=ClockSignal(),
-                i_DWE=self._mmcm_write.re,
-                i_DEN=self._mmcm_read.re | self._mmcm_write.re,
-                o_DRDY=mmcm_drdy,
-                i_DADDR=self._mmcm_adr.storage,
-                i_DI=self._mmcm_dat_w.storage,
-                o_DO=self._mmcm_dat_r.status
+                i_DWE=mmcm_drp.dwe,
+                i_DEN=mmcm_drp.den,
+                o_DRDY=mmcm_drp.drdy,
+                i_DADDR=mmcm_drp.adr,
+                i_DI=mmcm_drp.di,
+                o_DO=mmcm_drp.do
             ),
-            Instance("BUFG", i_I=mmcm_clk0, o_O=self.cd_pix.clk),
-            Instance("BUFG", i_I=mmcm_clk1, o_O=self.cd_pix5x.clk)
+            Instance("BUFG", i_I=mmcm_clk0, o_O=self.cd_pix.clk)
         ]
+        if dual:
+            self.specials += [
+                Instance("BUFG", i_I=mmcm_clk1, o_O=self.cd_pix2x.clk),
+                Instance("BUFG", i_I=mmcm_clk2, o_O=self.cd_pix10x.clk)
+            ]
+        else:
+            self.specials += Instance("BUFG", i_I=mmcm_clk1, o_O=self.cd_pix5x.clk)
         self.sync += [
             If(self._mmcm_read.re | self._mmcm_write.re,
                 self._mmcm_drdy.status.eq(0)
-            ).Elif(mmcm_drdy,
+            ).Elif(mmcm_drp.drdy,
                 self._mmcm_drdy.status.eq(1)
             )
         ]
+        self.comb += self._mmcm_dat_r.status.eq(mmcm_drp.do)
         self.comb += self.cd_pix.rst.eq(~mmcm_locked)
         if hasattr(pads, "clk_p"):
-            self.submodules.clk_gen = S7HDMIOutEncoderSerializer(pads.clk_p, pads.clk_n, bypass_encoder=True)
-            self.comb += self.clk_gen.data.eq(Signal(10, reset=0b0000011111))
+            self.submodules.clk_gen = S7HDMIOutEncoderSerializer(pads.clk_p, pads.clk_n,
+                bypass_encoder=True, dual=dual)
+            self.comb += self.clk_gen.data.eq(Replicate(Constant(0b0000011111, 10), 2 if dual else 1))
         else:
-            self.comb += pads.clk.eq(ClockSignal("pix")) # FIXME: use primitive (ODDR2?)
+            self.comb += pads.clk.eq(ClockSignal("pix2x" if dual else "pix")) # FIXME: use primitive (ODDR2?)
+
 
+class S7HDMIOutPHY(Module, AutoCSR):
+    """HDMI/DVI output PHY
 
-class S7HDMIOutPHY(Module):
-    def __init__(self, pads, mode):
-        self.sink = sink = stream.Endpoint(phy_layout(mode))
+    With dual, the sink carries two pixels per pix clock (see phy_layout).
+    """
+    def __init__(self, pads, mode, hdmi=False, dual=False):
+        lanes = 2 if dual else 1
+        self.sink = sink = stream.Endpoint(phy_layout(mode, lanes))
 
         # # #
 
-        self.submodules.es0 = S7HDMIOutEncoderSerializer(pads.data0_p, pads.data0_n, mode == "raw")
-        self.submodules.es1 = S7HDMIOutEncoderSerializer(pads.data1_p, pads.data1_n, mode == "raw")
-        self.submodules.es2 = S7HDMIOutEncoderSerializer(pads.data2_p, pads.data2_n, mode == "raw")
+        self.submodules.es0 = S7HDMIOutEncoderSerializer(pads.data0_p, pads.data0_n, mode == "raw", dual)
+        self.submodules.es1 = S7HDMIOutEncoderSerializer(pads.data1_p, pads.data1_n, mode == "raw", dual)
+        self.submodules.es2 = S7HDMIOutEncoderSerializer(pads.data2_p, pads.data2_n, mode == "raw", dual)
 
         if mode == "raw":
             self.comb += [
                 sink.ready.eq(1),
-                self.es0.data.eq(sink.c0),
-                self.es1.data.eq(sink.c1),
-                self.es2.data.eq(sink.c2)
+                self.es0.data.eq(Cat(*[sink.c0[10*i:10*(i+1)] for i in range(lanes)])),
+                self.es1.data.eq(Cat(*[sink.c1[10*i:10*(i+1)] for i in range(lanes)])),
+                self.es2.data.eq(Cat(*[sink.c2[11*i:11*i+10] for i in range(lanes)]))
             ]
+        elif dual:
+            assert not hdmi
+            self.comb += sink.ready.eq(1)
+            for i in range(lanes):
+                self.comb += [
+                    self.es0.lanes[i].d.eq(sink.b[8*i:8*(i+1)]),
+                    self.es1.lanes[i].d.eq(sink.g[8*i:8*(i+1)]),
+                    self.es2.lanes[i].d.eq(sink.r[8*i:8*(i+1)]),
+                    self.es0.lanes[i].c.eq(Cat(sink.hsync[i], sink.vsync[i])),
+                    self.es0.lanes[i].de.eq(sink.de[i]),
+                    self.es1.lanes[i].de.eq(sink.de[i]),
+                    self.es2.lanes[i].de.eq(sink.de[i])
+                ]
+        elif hdmi:
+            self.submodules.data_island = DataIsland(mode)
+            self.comb += sink.connect(self.data_island.sink)
+            for es, ch in zip([self.es0, self.es1, self.es2],
+                              [self.data_island.ch0, self.data_island.ch1, self.data_island.ch2]):
+                self.comb += [
+                    es.d.eq(ch.d),
+                    es.c.eq(ch.c),
+                    es.de.eq(ch.de),
+                    es.terc4.eq(ch.terc4),
+                    es.raw_en.eq(ch.raw_en),
+                    es.raw.eq(ch.raw)
+                ]
         else:
             self.comb += [
                 sink.ready.eq(1),
@@ -0,0 +1,355 @@
+"""Video modes database and clocking parameters
+
+Pure Python (no HDL): CEA-861/VESA DMT timings and CVT reduced blanking
+timings, the corresponding frame_parameter_layout values for the Initiator,
+MMCME2/PLLE2/PLL_ADV multiply/divide solutions, MMCME2/PLLE2 DRP register
+images (for DRPSequencer or the raw DRP CSRs) and DCM_CLKGEN commands.
+
+mode_table() computes all this for the common modes once; c_header() turns it
+into a header the firmware can embed.
+"""
+
+from collections import namedtuple, OrderedDict
+from functools import lru_cache
+from math import floor
+
+from litevideo.output.common import hbits, vbits
+
+
+Timing = namedtuple("Timing", [
+    "pix_clk",                                          # in Hz
+    "hres", "hfront_porch", "hsync_width", "hback_porch",
+    "vres", "vfront_porch", "vsync_width", "vback_porch",
+    "hsync_pol", "vsync_pol"                            # 1: positive
+])
+
+def timing_htotal(timing):
+    return timing.hres + timing.hfront_porch + timing.hsync_width + timing.hback_porch
+
+def timing_vtotal(timing):
+    return timing.vres + timing.vfront_porch + timing.vsync_width + timing.vback_porch
+
+def timing_refresh(timing):
+    return timing.pix_clk/(timing_htotal(timing)*timing_vtotal(timing))
+
+
+# CEA-861 (progressive) by VIC
+cea_modes = {
+    1:  Timing(25.175e6,  640,  16,  96,  48,  480,  10,  2, 33, 0, 0), # 640x480@60
+    2:  Timing(27.0e6,    720,  16,  62,  60,  480,   9,  6, 30, 0, 0), # 720x480@60
+    4:  Timing(74.25e6,  1280, 110,  40, 220,  720,   5,  5, 20, 1, 1), # 1280x720@60
+    16: Timing(148.5e6,  1920,  88,  44, 148, 1080,   4,  5, 36, 1, 1), # 1920x1080@60
+    17: Timing(27.0e6,    720,  12,  64,  68,  576,   5,  5, 39, 0, 0), # 720x576@50
+    19: Timing(74.25e6,  1280, 440,  40, 220,  720,   5,  5, 20, 1, 1), # 1280x720@50
+    31: Timing(148.5e6,  1920, 528,  44, 148, 1080,   4,  5, 36, 1, 1), # 1920x1080@50
+    32: Timing(74.25e6,  1920, 638,  44, 148, 1080,   4,  5, 36, 1, 1), # 1920x1080@24
+    33: Timing(74.25e6,  1920, 528,  44, 148, 1080,   4,  5, 36, 1, 1), # 1920x1080@25
+    34: Timing(74.25e6,  1920,  88,  44, 148, 1080,   4,  5, 36, 1, 1), # 1920x1080@30
+}
+
+# VESA DMT by DMT ID
+dmt_modes = {
+    0x04: Timing(25.175e6,  640,  16,  96,  48,  480, 10, 2, 33, 0, 0), # 640x480@60
+    0x09: Timing(40.0e6,    800,  40, 128,  88,  600,  1, 4, 23, 1, 1), # 800x600@60
+    0x10: Timing(65.0e6,   1024,  24, 136, 160,  768,  3, 6, 29, 0, 0), # 1024x768@60
+    0x1c: Timing(83.5e6,   1280,  72, 128, 200,  800,  3, 6, 22, 0, 1), # 1280x800@60
+    0x23: Timing(108.0e6,  1280,  48, 112, 248, 1024,  1, 3, 38, 1, 1), # 1280x1024@60
+    0x2f: Timing(106.5e6,  1440,  80, 152, 232,  900,  3, 6, 25, 0, 1), # 1440x900@60
+    0x33: Timing(162.0e6,  1600,  64, 192, 304, 1200,  1, 3, 46, 1, 1), # 1600x1200@60
+    0x3a: Timing(146.25e6, 1680, 104, 176, 280, 1050,  3, 6, 30, 0, 1), # 1680x1050@60
+    0x44: Timing(154.0e6,  1920,  48,  32,  80, 1200,  3, 6, 26, 1, 0), # 1920x1200@60 RB
+    0x51: Timing(85.5e6,   1366,  70, 143, 213,  768,  3, 3, 24, 1, 1), # 1366x768@60
+    0x52: Timing(148.5e6,  1920,  88,  44, 148, 1080,  4, 5, 36, 1, 1), # 1920x1080@60
+}
+
+
+def cvt_rb_timing(hres, vres, refresh=60):
+    """CVT reduced blanking (v1) timing, progressive, no margins"""
+    h_blank, h_sync, h_front_porch = 160, 32, 48
+    min_v_blank = 460       # us
+    v_front_porch = 3
+    min_v_back_porch = 6
+    clock_step = 0.25e6
+
+    hres = 8*(hres//8)
+    aspect_vsync = [((4, 3), 4), ((16, 9), 5), ((16, 10), 6), ((5, 4), 7), ((15, 9), 7)]
+    v_sync = 10
+    for (w, h), s in aspect_vsync:
+        if vres*w == hres*h:
+            v_sync = s
+    h_period_est = (1e6/refresh - min_v_blank)/vres
+    vbi_lines = max(floor(min_v_blank/h_period_est) + 1,
+                    v_front_porch + v_sync + min_v_back_porch)
+    htotal = hres + h_blank
+    vtotal = vres + vbi_lines
+    pix_clk = clock_step*floor(refresh*htotal*vtotal/clock_step)
+    return Timing(pix_clk,
+        hres, h_front_porch, h_sync, h_blank - h_front_porch - h_sync,
+        vres, v_front_porch, v_sync, vbi_lines - v_front_porch - v_sync,
+        1, 0)
+
+
+def frame_parameters(timing):
+    """frame_parameter_layout values of timing for the Initiator
+
+    The TimingGenerator counts from 0 to hscan/vscan included.
+    """
+    hsync_start = timing.hres + timing.hfront_porch
+    vsync_start = timing.vres + timing.vfront_porch
+    parameters = OrderedDict([
+        ("hres",        timing.hres),
+        ("hsync_start", hsync_start),
+        ("hsync_end",   hsync_start + timing.hsync_width),
+        ("hscan",       timing_htotal(timing) - 1),
+        ("vres",        timing.vres),
+        ("vsync_start", vsync_start),
+        ("vsync_end",   vsync_start + timing.vsync_width),
+        ("vscan",       timing_vtotal(timing) - 1)
+    ])
+    if parameters["hscan"] >= 2**hbits or parameters["vscan"] >= 2**vbits:
+        raise ValueError("Timing does not fit in {}/{} bits".format(hbits, vbits))
+    return parameters
+
+
+# PLL solver
+
+PLLLimits = namedtuple("PLLLimits", [
+    "vco_min", "vco_max",
+    "pfd_min", "pfd_max",
+    "mult_min", "mult_max",
+    "div_min", "div_max",
+    "out_div_max"
+])
+
+mmcme2_limits  = PLLLimits(600e6, 1200e6, 10e6, 450e6, 2, 64, 1, 106, 128)
+plle2_limits   = PLLLimits(800e6, 1600e6, 19e6, 450e6, 2, 64, 1,  56, 128)
+pll_adv_limits = PLLLimits(400e6, 1000e6, 19e6, 400e6, 1, 64, 1,  52, 128)
+
+PLLSolution = namedtuple("PLLSolution", ["divclk", "mult", "dividers", "vco", "pix_clk", "error"])
+
+def solve_pll(clkin, pix_clk, mults, limits=mmcme2_limits):
+    """Multiply/divide values generating pix_clk*mults[i] on output i
+
+    mults are the frequencies of the outputs relative to pix_clk (e.g. [1, 5]
+    for pix/pix5x), the fastest one divided by each must be an integer. The
+    solution has the smallest frequency error (in ppm) then the highest VCO.
+    Raises ValueError when no setting fits the limits.
+    """
+    fastest = max(mults)
+    ratios = [fastest/m for m in mults]
+    assert all(r == int(r) for r in ratios)
+    ratios = [int(r) for r in ratios]
+
+    best = None
+    for divclk in range(limits.div_min, limits.div_max + 1):
+        pfd = clkin/divclk
+        if not (limits.pfd_min <= pfd <= limits.pfd_max):
+            continue
+        for mult in range(limits.mult_min, limits.mult_max + 1):
+            vco = pfd*mult
+            if not (limits.vco_min <= vco <= limits.vco_max):
+                continue
+            k = max(1, round(vco/(pix_clk*fastest)))
+            if max(ratios)*k > limits.out_div_max:
+                continue
+            f = vco/(k*fastest)
+            error = abs(f - pix_clk)/pix_clk*1e6
+            key = (round(error, 3), -vco, divclk)
+            if best is None or key < best[0]:
+                best = (key, PLLSolution(divclk, mult, [r*k for r in ratios], vco, f, error))
+    if best is None:
+        raise ValueError("No PLL setting for {} Hz".format(pix_clk))
+    return best[1]
+
+
+# MMCME2/PLLE2 DRP (XAPP888)
+
+mmcme2_power_adr = 0x28
+mmcme2_clkout_adr = {0: 0x08, 1: 0x0a, 2: 0x0c, 3: 0x0e, 4: 0x10, 5: 0x06, 6: 0x12}
+mmcme2_clkfbout_adr = 0x14
+mmcme2_divclk_adr = 0x16
+
+mmcme2_lock_adr = 0x18
+mmcme2_filter_adr = 0x4e
+
+# LockRefDly (= LockFBDly) and LockCnt of CLKFBOUT_MULT 1..64, LockSatHigh and
+# UnlockCnt being constant
+mmcme2_lock_dly = [6, 6, 8, 11, 14, 17, 19, 22, 25, 28] + [31]*54
+mmcme2_lock_cnt = [1000]*10 + [900, 825, 750, 700, 650, 625, 575, 550, 525, 500,
+    475, 450, 425, 400, 400, 375, 350, 350, 325, 325, 300, 300, 300, 275, 275, 275] + [250]*28
+mmcme2_lock_sat_high = 1001
+mmcme2_unlock_cnt = 1
+
+# (CP, RES, LFHF) of CLKFBOUT_MULT 1..64 for BANDWIDTH="HIGH"/"OPTIMIZED"
+mmcme2_filter_high = (
+    [(0b0010, 0b1011, 0b11), (0b0100, 0b1111, 0b11), (0b0101, 0b1011, 0b11),
+     (0b0111, 0b0111, 0b11), (0b1101, 0b0111, 0b11), (0b1110, 0b1011, 0b11),
+     (0b1110, 0b1101, 0b11), (0b1111, 0b0011, 0b11), (0b1110, 0b0101, 0b11),
+     (0b1111, 0b0101, 0b11), (0b1111, 0b1001, 0b11), (0b1101, 0b0001, 0b11)] +
+    [(0b1111, 0b1001, 0b11)]*4 + [(0b1111, 0b0101, 0b11)]*2 +
+    [(0b1100, 0b0001, 0b11)]*3 + [(0b0101, 0b1100, 0b11)]*4 +
+    [(0b0011, 0b0100, 0b11)]*16 + [(0b0010, 0b1000, 0b11)]*5 +
+    [(0b0111, 0b0001, 0b11)]*2 + [(0b0100, 0b1100, 0b11)]*4 +
+    [(0b0110, 0b0001, 0b11)]*2 + [(0b0101, 0b0110, 0b11)]*3 +
+    [(0b0010, 0b0100, 0b11)]*4 + [(0b0100, 0b1010, 0b11)] +
+    [(0b0011, 0b1100, 0b11)]*2
+)
+
+def _counter(divide):
+    """high time, low time, edge, no count of a 50% duty cycle counter"""
+    if divide == 1:
+        return 1, 1, 0, 1
+    high = divide//2
+    return high, divide - high, divide % 2, 0
+
+def mmcme2_drp_image(solution):
+    """(adr, mask, data) DRP entries of a solve_pll solution, CLKOUTn being the
+    n-th divider
+
+    The POWER register is set first (all clocks enabled). Fractional dividers
+    are disabled. The LOCK and FILTER registers are set for the feedback
+    multiplier, FILTER with BANDWIDTH="OPTIMIZED" (as the HIGH setting).
+    """
+    entries = [(mmcme2_power_adr, 0x0000, 0xffff)]
+    def output(adr, divide):
+        high, low, edge, no_count = _counter(divide)
+        entries.append((adr,     0x1000, (high << 6) | low))
+        entries.append((adr + 1, 0x8000, (edge << 7) | (no_count << 6)))
+    high, low, edge, no_count = _counter(solution.divclk)
+    entries.append((mmcme2_divclk_adr, 0xc000, (edge << 13) | (no_count << 12) | (high << 6) | low))
+    output(mmcme2_clkfbout_adr, solution.mult)
+    for n, divide in enumerate(solution.dividers):
+        output(mmcme2_clkout_adr[n], divide)
+    dly, lock_cnt = mmcme2_lock_dly[solution.mult - 1], mmcme2_lock_cnt[solution.mult - 1]
+    entries.append((mmcme2_lock_adr,     0xfc00, lock_cnt))
+    entries.append((mmcme2_lock_adr + 1, 0x8000, (dly << 10) | mmcme2_unlock_cnt))
+    entries.append((mmcme2_lock_adr + 2, 0x8000, (dly << 10) | mmcme2_lock_sat_high))
+    cp, res, lfhf = mmcme2_filter_high[solution.mult - 1]
+    filt = (cp << 6) | (res << 2) | lfhf
+    def bits(*fields):
+        # (filter bit, register bit) pairs
+        return sum(((filt >> i) & 1) << j for i, j in fields)
+    entries.append((mmcme2_filter_adr,     0x66ff, bits((9, 15), (8, 12), (7, 11), (6, 8))))
+    entries.append((mmcme2_filter_adr + 1, 0x666f, bits((5, 15), (4, 12), (3, 11), (2, 8), (1, 7), (0, 4))))
+    return entries
+
+
+# DCM_CLKGEN
+
+def solve_dcm_clkgen(clkin, pix_clk, m_max=256, d_max=256):
+    """(m, d, error in ppm) of the DCM_CLKGEN CLKFX closest to pix_clk"""
+    best = None
+    for d in range(1, d_max + 1):
+        m = round(pix_clk*d/clkin)
+        if not (2 <= m <= m_max):
+            continue
+        error = abs(clkin*m/d - pix_clk)/pix_clk*1e6
+        if best is None or error < best[2]:
+            best = (m, d, error)
+    if best is None:
+        raise ValueError("No DCM_CLKGEN setting for {} Hz".format(pix_clk))
+    return best
+
+def dcm_clkgen_commands(m, d):
+    """Values of S6HDMIOutClocking's cmd_data CSR (LoadD then LoadM), each to
+    be sent with send_cmd_data, followed by send_go"""
+    return [((d - 1) << 2) | 0b01, ((m - 1) << 2) | 0b11]
+
+
+# Clocking of the output PHYs
+
+def s7_hdmi_out_pll(pix_clk, dual=False, clkin=100e6):
+    """solve_pll solution for S7HDMIOutClocking"""
+    if dual:
+        return solve_pll(clkin, pix_clk, [0.5, 1, 5], mmcme2_limits)
+    else:
+        return solve_pll(clkin, pix_clk, [1, 5], mmcme2_limits)
+
+def s6_hdmi_out_clkgen(pix_clk, clkin=50e6):
+    """(m, d, error) of S6HDMIOutClocking's DCM_CLKGEN
+
+    Its PLL_ADV multiplies by 10 with a fixed ratio: pix_clk must keep the VCO
+    within pll_adv_limits.
+    """
+    if not (pll_adv_limits.vco_min <= 10*pix_clk <= pll_adv_limits.vco_max):
+        raise ValueError("{} Hz out of the S6HDMIOutClocking PLL range".format(pix_clk))
+    return solve_dcm_clkgen(clkin, pix_clk)
+
+
+# Common modes
+
+common_modes = OrderedDict([
+    ("640x480@60",   cea_modes[1]),
+    ("720x480@60",   cea_modes[2]),
+    ("720x576@50",   cea_modes[17]),
+    ("800x600@60",   dmt_modes[0x09]),
+    ("1024x768@60",  dmt_modes[0x10]),
+    ("1280x720@50",  cea_modes[19]),
+    ("1280x720@60",  cea_modes[4]),
+    ("1280x800@60",  dmt_modes[0x1c]),
+    ("1280x1024@60", dmt_modes[0x23]),
+    ("1366x768@60",  dmt_modes[0x51]),
+    ("1440x900@60",  dmt_modes[0x2f]),
+    ("1600x1200@60", dmt_modes[0x33]),
+    ("1680x1050@60", dmt_modes[0x3a]),
+    ("1920x1080@24", cea_modes[32]),
+    ("1920x1080@25", cea_modes[33]),
+    ("1920x1080@30", cea_modes[34]),
+    ("1920x1080@50", cea_modes[31]),
+    ("1920x1080@60", cea_modes[16]),
+    ("1920x1200@60", dmt_modes[0x44]),
+])
+
+@lru_cache(maxsize=None)
+def mode_table(dual=False):
+    """Timing, frame parameters and clocking of the common modes
+
+    s7 is the S7HDMIOutClocking solution and s7_drp its DRP image, s6 the
+    S6HDMIOutClocking DCM_CLKGEN (m, d, error) or None when out of range.
+    """
+    table = OrderedDict()
+    for name, timing in common_modes.items():
+        s7 = s7_hdmi_out_pll(timing.pix_clk, dual)
+        try:
+            s6 = s6_hdmi_out_clkgen(timing.pix_clk)
+        except ValueError:
+            s6 = None
+        table[name] = {
+            "timing": timing,
+            "frame_parameters": frame_parameters(timing),
+            "s7": s7,
+            "s7_drp": mmcme2_drp_image(s7),
+            "s6": s6
+        }
+    return table
+
+def drp_modes(table):
+    """DRP images of a mode_table, in order, for DRPSequencer"""
+    return [mode["s7_drp"] for mode in table.values()]
+
+def c_header(table):
+    """C header with the frame parameters and clocking of a mode_table"""
+    n_regs = max(len(mode["s7_drp"]) for mode in table.values())
+    r = "#ifndef __VIDEO_MODES_H\n#define __VIDEO_MODES_H\n\n"
+    r += "struct video_mode {\n"
+    r += "\tconst char *name;\n"
+    r += "\tunsigned int pix_clk;\n"
+    for name in frame_parameters(next(iter(table.values()))["timing"]):
+        r += "\tunsigned short {};\n".format(name)
+    r += "\tunsigned char hsync_pol, vsync_pol;\n"
+    r += "\tunsigned short clkgen_m, clkgen_d;\n"
+    r += "\tunsigned short drp[{}][3];\n".format(n_regs)
+    r += "};\n\n"
+    r += "static const struct video_mode video_modes[{}] = {{\n".format(len(table))
+    for name, mode in table.items():
+        timing = mode["timing"]
+        m, d = mode["s6"][:2] if mode["s6"] is not None else (0, 0)
+        r += "\t{{\"{}\", {}, ".format(name, int(timing.pix_clk))
+        r += ", ".join(str(v) for v in mode["frame_parameters"].values())
+        r += ", {}, {}, {}, {},\n".format(timing.hsync_pol, timing.vsync_pol, m, d)
+        r += "\t\t{" + ", ".join("{{0x{:02x}, 0x{:04x}, 0x{:04x}}}".format(*e) for e in mode["s7_drp"]) + "}},\n"
+    r += "};\n\n#endif\n"
+    return r
+
+if __name__ == "__main__":
+    print(c_header(mode_table()))
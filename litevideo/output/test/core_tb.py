@@ -5,6 +5,7 @@ from litex.soc.interconnect.stream import *
 from litedram.common import LiteDRAMPort
 
 from litevideo.output.core import VideoOutCore
+from litevideo.sim.dram import DRAMPortModel
 
 
 class TB(Module):
@@ -15,38 +16,6 @@ class TB(Module):
             self.core.source.ready.eq(~self.core.source.ready)
 
 
-class DRAMMemory:
-    def __init__(self, width, depth, init=[]):
-        self.width = width
-        self.depth = depth
-        self.mem = []
-        for d in init:
-            self.mem.append(d)
-        for _ in range(depth-len(init)):
-            self.mem.append(0)
-
-    @passive
-    def read_generator(self, dram_port):
-        address = 0
-        pending = 0
-        while True:
-            yield dram_port.cmd.ready.eq(0)
-            yield dram_port.rdata.valid.eq(0)
-            if pending:
-                yield dram_port.rdata.valid.eq(1)
-                yield dram_port.rdata.data.eq(self.mem[address%self.depth])
-                yield
-                yield dram_port.rdata.valid.eq(0)
-                yield dram_port.rdata.data.eq(0)
-                pending = 0
-            elif (yield dram_port.cmd.valid):
-                pending = not (yield dram_port.cmd.we)
-                address = (yield dram_port.cmd.adr)
-                yield
-                yield dram_port.cmd.ready.eq(1)
-            yield
-
-
 video_data = []
 
 @passive
@@ -98,13 +67,14 @@ def main_generator(dut):
 if __name__ == "__main__":
     for video_clk_ns in  [20, 10, 5]:
         tb = TB()
-        mem = DRAMMemory(32, 1024, [i for i in range(256)])
+        mem = DRAMPortModel(tb.dram_port, 1024, [i for i in range(256)])
         generators = {
             "sys":   [main_generator(tb)],
             "video": [video_capture_generator(tb),
-                      mem.read_generator(tb.dram_port)],
+                      mem.generator()],
         }
         clocks = {"sys":   10,
-                  "video": video_clk_ns}
+                  "video": video_clk_ns,
+                  "pix_o": video_clk_ns}
         video_data = []
         run_simulation(tb, generators, clocks, vcd_name="sim.vcd")
@@ -0,0 +1,59 @@
+import unittest
+
+import numpy as np
+
+from migen import *
+
+from litedram.common import LiteDRAMPort
+
+from litevideo.output.core import VideoOutCore
+from litevideo.sim.verilator import *
+
+
+# 1080p60
+hres, hsync_start, hsync_end, hscan = 1920, 2008, 2052, 2200
+vres, vsync_start, vsync_end, vscan = 1080, 1084, 1089, 1125
+frames = 3
+
+prng = np.random.RandomState(42)
+frame = prng.randint(0, 2**32, hres*vres, dtype=np.uint64).astype(np.uint32)
+
+
+class TB(Module):
+    def __init__(self):
+        self.dram_port = LiteDRAMPort(mode="read", aw=32, dw=32, cd="video")
+        self.submodules.core = VideoOutCore(self.dram_port)
+
+
+def main_generator(dut, video_sink):
+    initiator = dut.core.initiator
+    for name, value in [("hres", hres), ("hsync_start", hsync_start),
+                        ("hsync_end", hsync_end), ("hscan", hscan),
+                        ("vres", vres), ("vsync_start", vsync_start),
+                        ("vsync_end", vsync_end), ("vscan", vscan),
+                        ("base", 0), ("length", hres*vres*4)]:
+        yield getattr(initiator, name).storage.eq(value)
+    yield
+    yield initiator.enable.storage.eq(1)
+    yield
+
+    # full frames, without going back to Python for each pixel
+    while len(video_sink.data) < frames*hres*vres:
+        yield Cycles(hscan*vscan//16)
+
+
+if __name__ == "__main__":
+    tb = TB()
+    dram = DRAMPort(tb.dram_port, hres*vres*4, latency=8, depth=16)
+    video_sink = StreamSink(tb.core.source, ["data"], frames*hres*vres + hscan*vscan,
+                            qualifier=tb.core.source.de, domain="video")
+    sim = VerilatorSim(tb, {"sys": 10, "video": 6.734, "pix_o": 6.734}, [dram, video_sink],
+                       ios=default_ios(tb.core))
+    dram.mem.view(np.uint32)[:] = frame
+    sim.run(main_generator(tb, video_sink))
+    sim.close()
+
+    testcase = unittest.TestCase()
+    testcase.assertEqual(video_sink.overflows, 0)
+    video_data = video_sink.data[:frames*hres*vres]
+    testcase.assertTrue(np.array_equal(video_data, np.tile(frame & 0xffffff, frames)))
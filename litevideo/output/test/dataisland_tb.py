@@ -0,0 +1,135 @@
+import random
+import unittest
+
+from migen import *
+
+from litevideo.output.hdmi.encoder import Encoder
+from litevideo.output.hdmi.dataisland import DataIsland
+from litevideo.input.decoding import Decoding, DecodeTERC4
+from litevideo.input.packet import PacketDecoder
+
+
+prng = random.Random(42)
+
+# lines of 32 pixels and 160 blanking cycles (hsync 8 cycles after DE), room
+# for 3 packets per line; vsync on the first line of the frames
+hres, hblank, hsync_start, hsync_end = 32, 160, 8, 24
+lines, frames = 6, 3
+
+names = ["header", "sub0", "sub1", "sub2", "sub3"]
+
+def random_packet():
+    return {name: prng.getrandbits(24 if name == "header" else 56) for name in names}
+
+fifo_packets = [random_packet() for i in range(8)]
+slot_packets = [random_packet() for i in range(2)]
+
+
+class TB(Module):
+    """DataIsland -> TMDS encoders -> TMDS decoding, DecodeTERC4 and
+    PacketDecoder of the HDMI input"""
+    def __init__(self):
+        self.clock_domains.cd_sys = ClockDomain()
+        self.clock_domains.cd_pix = ClockDomain()
+
+        self.submodules.data_island = DataIsland("rgb")
+        self.submodules.decode_terc4 = ClockDomainsRenamer("pix")(DecodeTERC4())
+        self.submodules.packet_decoder = ClockDomainsRenamer("pix")(PacketDecoder())
+        self.comb += [
+            self.decode_terc4.valid_i.eq(1),
+            self.decode_terc4.source.connect(self.packet_decoder.sink)
+        ]
+        for i in range(3):
+            ch = getattr(self.data_island, "ch" + str(i))
+            encoder = ClockDomainsRenamer("pix")(Encoder())
+            decoding = Decoding()
+            setattr(self.submodules, "encoder" + str(i), encoder)
+            setattr(self.submodules, "decoding" + str(i), decoding)
+            self.comb += [
+                encoder.d.eq(ch.d),
+                encoder.c.eq(ch.c),
+                encoder.de.eq(ch.de),
+                encoder.terc4.eq(ch.terc4),
+                encoder.raw_en.eq(ch.raw_en),
+                encoder.raw.eq(ch.raw),
+                decoding.valid_i.eq(1),
+                decoding.input.eq(encoder.out),
+                getattr(self.decode_terc4, "data_in" + str(i)).eq(decoding.output)
+            ]
+
+
+def csr_write(csr, value):
+    yield csr.storage.eq(value)
+    yield
+
+def csr_strobe(csr):
+    yield csr.re.eq(1)
+    yield
+    yield csr.re.eq(0)
+    yield
+
+def sys_generator(dut):
+    # slots, sent after each vsync rising edge
+    for i, packet in enumerate(slot_packets):
+        for name in names:
+            yield from csr_write(getattr(dut, "_" + name), packet[name])
+        yield from csr_write(dut._slot_adr, i)
+        yield from csr_strobe(dut._slot_we)
+    yield from csr_write(dut._slot_enable, 0b11)
+    # fifo
+    for packet in fifo_packets:
+        yield dut.packets.valid.eq(1)
+        for name in names:
+            yield getattr(dut.packets, name).eq(packet[name])
+        yield
+        while not (yield dut.packets.ready):
+            yield
+    yield dut.packets.valid.eq(0)
+
+def video_generator(sink):
+    # let the CSRs be written before the first frame
+    for i in range(128):
+        yield
+    for frame in range(frames + 1):
+        for line in range(lines):
+            for x in range(hres + hblank):
+                de = x < hres and frame < frames
+                yield sink.de.eq(de)
+                yield sink.hsync.eq(hres + hsync_start <= x < hres + hsync_end)
+                yield sink.vsync.eq(line == 0 and frame < frames)
+                for color in ["r", "g", "b"]:
+                    yield getattr(sink, color).eq(prng.getrandbits(8) if de else 0)
+                yield
+
+@passive
+def packet_monitor(source, packets, status):
+    while True:
+        if (yield source.valid):
+            packet = {}
+            for name in names:
+                packet[name] = (yield getattr(source, name))
+            packets.append(packet)
+            status.append(((yield source.corrected), (yield source.error)))
+        yield
+
+
+class TestDataIsland(unittest.TestCase):
+    def test_loopback(self):
+        tb = TB()
+        packets, status = [], []
+        generators = {
+            "sys": sys_generator(tb.data_island),
+            "pix": [video_generator(tb.data_island.sink),
+                    packet_monitor(tb.packet_decoder.source, packets, status)]
+        }
+        run_simulation(tb, generators, {"sys": 10, "pix": 12})
+
+        # the slots once per frame, the fifo packets in order, all without errors
+        for packet in slot_packets:
+            self.assertEqual(packets.count(packet), frames)
+        self.assertEqual([p for p in packets if p not in slot_packets], fifo_packets)
+        self.assertEqual(status, [(0, 0)]*len(packets))
+
+
+if __name__ == "__main__":
+    unittest.main()
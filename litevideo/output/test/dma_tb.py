@@ -0,0 +1,74 @@
+from migen import *
+
+from litedram.common import LiteDRAMPort
+
+from litevideo.output.core import VideoOutCore
+from litevideo.sim.dram import DRAMPortModel, ddr3_timing
+
+
+# small frames, 50% of active pixels per line
+hres, hsync_start, hsync_end, hscan = 64, 80, 96, 128
+vres, vsync_start, vsync_end, vscan = 8, 9, 10, 12
+frames = 2
+
+
+class TB(Module):
+    def __init__(self, fifo_depth):
+        self.dram_port = LiteDRAMPort(mode="read", aw=32, dw=32, cd="video")
+        self.submodules.core = VideoOutCore(self.dram_port, fifo_depth=fifo_depth)
+        self.comb += self.core.source.ready.eq(1)
+
+
+class VideoMonitor:
+    def __init__(self):
+        self.data = []
+        self.underflows = 0
+
+    @passive
+    def generator(self, dut):
+        timing, dma = dut.core.timing, dut.core.dma
+        while True:
+            # the timing generator waits for the DMA: counts the pixels that
+            # would have been missed at a fixed pixel clock
+            if (yield timing.source.valid) and (yield timing.source.de):
+                if (yield dma.source.valid):
+                    self.data.append((yield dut.core.source.data))
+                elif self.data:
+                    self.underflows += 1
+            yield
+
+
+def main_generator(dut, monitor):
+    initiator = dut.core.initiator
+    for name, value in [("hres", hres), ("hsync_start", hsync_start),
+                        ("hsync_end", hsync_end), ("hscan", hscan),
+                        ("vres", vres), ("vsync_start", vsync_start),
+                        ("vsync_end", vsync_end), ("vscan", vscan),
+                        ("base", 0), ("length", hres*vres*4)]:
+        yield getattr(initiator, name).storage.eq(value)
+    yield
+    yield initiator.enable.storage.eq(1)
+    yield
+
+    while len(monitor.data) < frames*hres*vres:
+        yield
+
+
+if __name__ == "__main__":
+    frame = [(i*0x010203) & 0xffffff for i in range(hres*vres)]
+    print("{:>6} {:>5} {:>10} {:>10} {:>12} {:>12}".format(
+        "load", "fifo", "underflows", "row misses", "load stalls", "max latency"))
+    for load in [0, 0.25, 0.5]:
+        for fifo_depth in [16, 64, 256]:
+            tb = TB(fifo_depth)
+            mem = DRAMPortModel(tb.dram_port, hres*vres, frame, ddr3_timing, load=load)
+            monitor = VideoMonitor()
+            generators = {
+                "sys":   [main_generator(tb, monitor)],
+                "video": [monitor.generator(tb), mem.generator()]
+            }
+            run_simulation(tb, generators, {"sys": 10, "video": 10, "pix_o": 10})
+            assert monitor.data[:frames*hres*vres] == frame*frames
+            print("{:>6} {:>5} {:>10} {:>10} {:>12} {:>12}".format(
+                load, fifo_depth, monitor.underflows, mem.stats["row_misses"],
+                mem.stats["load_stalls"], mem.stats["max_read_latency"]))
@@ -0,0 +1,62 @@
+import unittest
+
+from migen import *
+
+from litevideo.drp import DRPSequencer
+
+
+modes = [
+    [(0x08, 0x1000, 0x0041), (0x09, 0x8000, 0x0000)],
+    [(0x14, 0x1000, 0x0105), (0x15, 0x8000, 0x0080), (0x16, 0xc000, 0x1041)],
+]
+
+class TB(Module):
+    def __init__(self):
+        self.submodules.sequencer = DRPSequencer(modes)
+
+
+registers = {0x08: 0x1234, 0x09: 0xffff, 0x14: 0xabcd, 0x15: 0x5555, 0x16: 0xc3c3}
+
+def reference(mode):
+    r = dict(registers)
+    for adr, mask, data in modes[mode]:
+        r[adr] = (r[adr] & mask) | data
+    return r
+
+@passive
+def drp_generator(drp, sequencer):
+    while True:
+        yield sequencer.locked.eq(not (yield sequencer.reset))
+        yield drp.drdy.eq(0)
+        if (yield drp.den):
+            adr = (yield drp.adr)
+            if (yield drp.dwe):
+                registers[adr] = (yield drp.di)
+            for i in range(3):
+                yield
+            yield drp.do.eq(registers.get(adr, 0))
+            yield drp.drdy.eq(1)
+        yield
+
+def main_generator(sequencer, results):
+    for mode in [1, 0]:
+        expected = reference(mode)
+        yield sequencer._mode.storage.eq(mode)
+        yield sequencer._mode.re.eq(1)
+        yield
+        yield sequencer._mode.re.eq(0)
+        yield
+        while (yield sequencer.busy):
+            yield
+        results.append((dict(registers), expected))
+
+if __name__ == "__main__":
+    tb = TB()
+    results = []
+    run_simulation(tb, [main_generator(tb.sequencer, results),
+                        drp_generator(tb.sequencer.drp, tb.sequencer)], vcd_name="drp.vcd")
+
+    testcase = unittest.TestCase()
+    testcase.assertEqual(len(results), 2)
+    for registers_, expected in results:
+        testcase.assertEqual(registers_, expected)
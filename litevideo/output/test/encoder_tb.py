@@ -0,0 +1,51 @@
+import random
+import unittest
+
+from migen import *
+
+from litevideo.output.hdmi.encoder import Encoder, DualEncoder
+
+
+prng = random.Random(42)
+
+latency = 4
+
+symbols = []
+for i in range(256):
+    de = int((i % 64) < 48)
+    symbols.append((prng.getrandbits(8), prng.getrandbits(2), de))
+
+encoder_out = []
+dual_encoder_out = []
+
+
+def encoder_generator(dut):
+    for n, (d, c, de) in enumerate(symbols + [(0, 0, 0)]*latency):
+        yield dut.d.eq(d)
+        yield dut.c.eq(c)
+        yield dut.de.eq(de)
+        yield
+        if n >= latency:
+            encoder_out.append((yield dut.out))
+
+def dual_encoder_generator(dut):
+    pairs = [symbols[i:i+2] for i in range(0, len(symbols), 2)]
+    for n, pair in enumerate(pairs + [[(0, 0, 0)]*2]*latency):
+        for lane, (d, c, de) in zip(dut.lanes, pair):
+            yield lane.d.eq(d)
+            yield lane.c.eq(c)
+            yield lane.de.eq(de)
+        yield
+        if n >= latency:
+            out = (yield dut.out)
+            dual_encoder_out.extend([out & 0x3ff, out >> 10])
+
+if __name__ == "__main__":
+    encoder = Encoder()
+    run_simulation(encoder, [encoder_generator(encoder)], vcd_name="encoder.vcd")
+    dual_encoder = DualEncoder()
+    run_simulation(dual_encoder, [dual_encoder_generator(dual_encoder)], vcd_name="dual_encoder.vcd")
+
+    testcase = unittest.TestCase()
+    testcase.assertEqual(len(dual_encoder_out), len(symbols))
+    testcase.assertEqual(dual_encoder_out, encoder_out)
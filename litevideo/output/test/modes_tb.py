@@ -0,0 +1,57 @@
+import unittest
+
+from litevideo.output.modes import *
+
+
+class TestModes(unittest.TestCase):
+    def test_cvt_rb(self):
+        # 1920x1200@60 RB is DMT 0x44
+        self.assertEqual(cvt_rb_timing(1920, 1200, 60), dmt_modes[0x44])
+        timing = cvt_rb_timing(1920, 1080, 60)
+        self.assertEqual(timing.pix_clk, 138.5e6)
+        self.assertEqual((timing_htotal(timing), timing_vtotal(timing)), (2080, 1111))
+
+    def test_frame_parameters(self):
+        parameters = frame_parameters(cea_modes[4])
+        self.assertEqual(list(parameters.values()),
+                         [1280, 1390, 1430, 1649, 720, 725, 730, 749])
+
+    def test_solve_pll(self):
+        for name, timing in common_modes.items():
+            for mults in [[1, 5], [0.5, 1, 5]]:
+                s = solve_pll(100e6, timing.pix_clk, mults)
+                self.assertTrue(mmcme2_limits.vco_min <= s.vco <= mmcme2_limits.vco_max)
+                self.assertEqual(s.dividers[-1]*5, s.dividers[-2]*mults[-2])
+                self.assertLess(s.error, 1e4)
+
+    def test_drp_image(self):
+        s = PLLSolution(1, 10, [5, 1], 1e9, 0, 0)
+        self.assertEqual(mmcme2_drp_image(s), [
+            (0x28, 0x0000, 0xffff),
+            (0x16, 0xc000, 0x1041),
+            (0x14, 0x1000, 0x0145), (0x15, 0x8000, 0x0000),
+            (0x08, 0x1000, 0x0083), (0x09, 0x8000, 0x0080),
+            (0x0a, 0x1000, 0x0041), (0x0b, 0x8000, 0x0040),
+            (0x18, 0xfc00, 0x03e8), (0x19, 0x8000, 0x7001), (0x1a, 0x8000, 0x73e9),
+            (0x4e, 0x66ff, 0x9900), (0x4f, 0x666f, 0x1190)])
+        # LOCK and FILTER follow the feedback multiplier
+        s = PLLSolution(1, 40, [8, 1], 1e9, 0, 0)
+        self.assertEqual(mmcme2_drp_image(s)[-5:], [
+            (0x18, 0xfc00, 0x00fa), (0x19, 0x8000, 0x7c01), (0x1a, 0x8000, 0x7fe9),
+            (0x4e, 0x66ff, 0x0900), (0x4f, 0x666f, 0x1090)])
+        for name, mode in mode_table().items():
+            self.assertEqual(len(mode["s7_drp"]), 13)
+
+    def test_dcm_clkgen(self):
+        m, d, error = solve_dcm_clkgen(50e6, 74.25e6)
+        self.assertLess(error, 100)
+        self.assertEqual(dcm_clkgen_commands(3, 2), [0b0101, 0b1011])
+
+    def test_mode_table(self):
+        table = mode_table()
+        self.assertIs(mode_table(), table)
+        self.assertEqual(len(drp_modes(table)), len(common_modes))
+        self.assertIn("1920x1080@60", c_header(table))
+
+if __name__ == "__main__":
+    unittest.main()
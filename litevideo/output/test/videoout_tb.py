@@ -0,0 +1,91 @@
+import random
+import unittest
+
+from migen import *
+
+from litedram.common import LiteDRAMPort
+
+from litevideo.output import VideoOut
+from litevideo.output.core import modes_dw
+from litevideo.sim.dram import DRAMPortModel
+
+
+prng = random.Random(42)
+
+# frames of 8x4 pixels
+hres, vres = 8, 4
+
+
+class TB(Module):
+    def __init__(self, mode):
+        self.clock_domains.cd_sys = ClockDomain()
+        self.clock_domains.cd_pix_o = ClockDomain()
+        dw = 2**log2_int(modes_dw[mode], need_pow2=False)
+        self.dram_port = LiteDRAMPort(mode="read", aw=32, dw=dw, cd="pix")
+        self.pads = Record([("clk", 1), ("hsync_n", 1), ("vsync_n", 1),
+                            ("r", 8), ("g", 8), ("b", 8), ("psave_n", 1)])
+        self.submodules.video_out = VideoOut("xc7", self.pads, self.dram_port, mode)
+
+
+def clocking_overrides():
+    """special_overrides removing the MMCM and BUFGs of the clocking, the pix
+    clock being generated by the simulation and the MMCM locked"""
+    class SimInstance:
+        @staticmethod
+        def lower(instance):
+            module = Module()
+            for item in instance.items:
+                if isinstance(item, Instance.Output) and item.name == "LOCKED":
+                    module.comb += item.expr.eq(1)
+            return module
+    return {Instance: SimInstance}
+
+
+def main_generator(dut, length):
+    initiator = dut.video_out.core.initiator
+    for name, value in [("hres", hres), ("hsync_start", hres + 2), ("hsync_end", hres + 4),
+                        ("hscan", hres + 8), ("vres", vres), ("vsync_start", vres + 1),
+                        ("vsync_end", vres + 2), ("vscan", vres + 3),
+                        ("base", 0), ("length", length)]:
+        yield getattr(initiator, name).storage.eq(value)
+    yield
+    yield initiator.enable.storage.eq(1)
+    for i in range(1024):
+        yield
+
+@passive
+def video_capture_generator(sink, pixels):
+    while True:
+        if (yield sink.valid) and (yield sink.de):
+            pixels.append(((yield sink.r), (yield sink.g), (yield sink.b)))
+        yield
+
+
+class TestVideoOut(unittest.TestCase):
+    def deep_colour(self, mode):
+        # the PHY gets the 8 MSBs of each component of the frames
+        cw = modes_dw[mode]//3
+        data = [prng.getrandbits(3*cw) for i in range(hres*vres)]
+        tb = TB(mode)
+        mem = DRAMPortModel(tb.dram_port, len(data), data)
+        pixels = []
+        generators = {
+            "sys": main_generator(tb, len(data)*tb.dram_port.dw//8),
+            "pix": [video_capture_generator(tb.video_out.driver.sink, pixels),
+                    mem.generator()]
+        }
+        run_simulation(tb, generators, {"sys": 10, "pix": 10, "pix_o": 10},
+                       special_overrides=clocking_overrides())
+        reference = [tuple((d >> (c*cw + cw - 8)) & 0xff for c in range(3)) for d in data]
+        self.assertGreaterEqual(len(pixels), len(data))
+        self.assertEqual(pixels[:len(data)], reference)
+
+    def test_rgb30(self):
+        self.deep_colour("rgb30")
+
+    def test_rgb36(self):
+        self.deep_colour("rgb36")
+
+
+if __name__ == "__main__":
+    unittest.main()
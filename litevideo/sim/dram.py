@@ -0,0 +1,144 @@
+"""Cycle-approximate LiteDRAM port model
+
+DRAMPortModel serves the commands of a LiteDRAM native port in
+run_simulation the way a controller shared with other clients would: read
+data comes back after the CAS latency, row misses cost a precharge and an
+activate, refreshes and the accesses of the other clients block the port, and
+only a limited number of commands can be outstanding. This shows the stalls
+that cause FIFO underflows/overflows on real hardware, so that the DMAs and
+their fifo_depth can be stress tested in simulation.
+
+All the timings are in cycles of the clock domain of the port.
+"""
+
+import random
+from collections import namedtuple, deque
+
+from migen import *
+
+
+DRAMTiming = namedtuple("DRAMTiming", [
+    "cl",                   # read command to data
+    "trcd",                 # activate to read/write
+    "trp",                  # precharge to activate
+    "trefi", "trfc",        # refresh interval and duration (trefi=0: no refresh)
+    "bank_bits",
+    "col_bits"              # port words per row (log2)
+])
+
+# ideal memory: one cycle latency, no stalls
+ideal_timing = DRAMTiming(cl=1, trcd=0, trp=0, trefi=0, trfc=0, bank_bits=0, col_bits=32)
+
+# DDR3-800 behind a 4:1 PHY, 100MHz controller
+ddr3_timing = DRAMTiming(cl=8, trcd=2, trp=2, trefi=780, trfc=26, bank_bits=3, col_bits=8)
+
+
+class DRAMPortModel:
+    """LiteDRAM native port model
+
+    Memory of depth port words (init: initial content). Commands are accepted
+    while less than max_pending are outstanding; reads are returned in order,
+    timing.cl cycles after the command (plus the row miss penalty), one word
+    per cycle (rdata.valid held until rdata.ready). Write data is taken in
+    order of the write commands, wdata.we being the byte enables.
+
+    The other clients of the controller are modeled as slots of load_burst
+    cycles taken with a probability of load, during which the port is not
+    served and random rows are opened.
+
+    generator() must run in the clock domain of the port. stats counts the
+    accesses, row hits/misses and the stall cycles by cause.
+    """
+    def __init__(self, port, depth, init=[], timing=ddr3_timing, max_pending=8,
+                 load=0, load_burst=8, seed=42):
+        self.port = port
+        self.width = port.dw
+        self.depth = depth
+        self.mem = list(init) + [0]*(depth - len(init))
+        self.timing = timing
+        self.max_pending = max_pending
+        self.load = load
+        self.load_burst = load_burst
+        self.prng = random.Random(seed)
+        self.stats = {name: 0 for name in [
+            "reads", "writes", "row_hits", "row_misses",
+            "refresh_stalls", "load_stalls", "pending_stalls", "bank_stalls",
+            "max_read_latency"]}
+
+    def _bank_row(self, address):
+        t = self.timing
+        return (address >> t.col_bits) & (2**t.bank_bits - 1), address >> (t.col_bits + t.bank_bits)
+
+    def _activate(self, open_rows, address):
+        # returns the penalty of a command to address and opens its row
+        t = self.timing
+        bank, row = self._bank_row(address)
+        if open_rows.get(bank) == row:
+            self.stats["row_hits"] += 1
+            return 0
+        self.stats["row_misses"] += 1
+        penalty = t.trcd + (t.trp if bank in open_rows else 0)
+        open_rows[bank] = row
+        return penalty
+
+    @passive
+    def generator(self):
+        port, t = self.port, self.timing
+        wdata_we = getattr(port.wdata, "we", None)
+        open_rows = {}
+        reads = deque()     # address, data cycle, command cycle
+        writes = deque()
+        busy_until = 0
+        loaded = False
+        cycle = 0
+        while True:
+            # outputs of this cycle
+            refresh = t.trefi and cycle % t.trefi < t.trfc
+            if refresh:
+                open_rows.clear()
+            if cycle % self.load_burst == 0:
+                loaded = self.prng.random() < self.load
+                if loaded:
+                    bank = self.prng.randrange(2**t.bank_bits)
+                    open_rows[bank] = self.prng.randrange(2**16)
+            pending = len(reads) + len(writes) >= self.max_pending
+            cmd_ready = not (refresh or loaded or pending or cycle < busy_until)
+            wdata_ready = bool(writes)
+            rdata_valid = bool(reads) and reads[0][1] <= cycle
+            yield port.cmd.ready.eq(cmd_ready)
+            yield port.wdata.ready.eq(wdata_ready)
+            yield port.rdata.valid.eq(rdata_valid)
+            if rdata_valid:
+                yield port.rdata.data.eq(self.mem[reads[0][0]])
+            yield
+
+            # transfers of this cycle
+            if (yield port.cmd.valid):
+                if cmd_ready:
+                    address = (yield port.cmd.adr) % self.depth
+                    penalty = self._activate(open_rows, address)
+                    busy_until = cycle + 1 + penalty
+                    if (yield port.cmd.we):
+                        self.stats["writes"] += 1
+                        writes.append(address)
+                    else:
+                        self.stats["reads"] += 1
+                        reads.append((address, max(cycle + penalty + t.cl, reads[-1][1] + 1 if reads else 0), cycle))
+                elif refresh:
+                    self.stats["refresh_stalls"] += 1
+                elif loaded:
+                    self.stats["load_stalls"] += 1
+                elif pending:
+                    self.stats["pending_stalls"] += 1
+                else:
+                    self.stats["bank_stalls"] += 1
+            if rdata_valid and (yield port.rdata.ready):
+                address, data_cycle, cmd_cycle = reads.popleft()
+                self.stats["max_read_latency"] = max(self.stats["max_read_latency"], cycle - cmd_cycle)
+            if wdata_ready and (yield port.wdata.valid):
+                address = writes.popleft()
+                data = (yield port.wdata.data)
+                we = (yield wdata_we) if wdata_we is not None else 2**(self.width//8) - 1
+                mask = sum(0xff << 8*i for i in range(self.width//8) if (we >> i) & 1)
+                self.mem[address] = (self.mem[address] & ~mask) | (data & mask)
+            cycle += 1
@@ -0,0 +1,396 @@
+"""Behavioural models of the Xilinx IO primitives
+
+The PHYs instantiate the IO buffers, delays and serializers/deserializers of
+the FPGA as Instances, which run_simulation can not simulate. The overrides
+returned by primitive_overrides lower these Instances to behavioural models:
+
+    run_simulation(dut, generators, clocks, special_overrides=primitive_overrides())
+
+Models are provided for IBUFDS, IBUFDS_DIFF_OUT, OBUFDS, IDELAYE2, ISERDESE2
+and OSERDESE2 (7 series) and for IODELAY2, ISERDES2 and OSERDES2
+(Spartan-6). The other Instances (clocking, vendor IP) are not lowered and
+must be kept out of the simulated design.
+
+The serial data is modelled bit by bit:
+
+- the serializers/deserializers handle one bit per rising edge of their CLK
+  (CLK0) domain: with DATA_RATE=DDR, this domain must run at twice its
+  hardware frequency in simulation (the bit rate), CLKB being ignored.
+- the delays are delay lines in the line_cd domain, one tap per line_cd
+  cycle: line_cd runs at a multiple of the bit rate, the pads being driven
+  and sampled in this domain (see litevideo.sim.tmds).
+
+bit_clocks gives the simulation clocks of such designs and derived_clocks adds
+the local domains clocked by them (Gearbox of S7DataCapture). The phase
+detectors of ISERDES2 are not modelled (VALID stays low).
+"""
+
+from migen import *
+from migen.fhdl.structure import _Assign
+
+
+def bit_clocks(domains, ui=8, line_cd="line"):
+    """Simulation clocks of run_simulation for domains ({name: bit periods per
+    cycle}), a bit period lasting ui line_cd cycles (taps)"""
+    clocks = {name: 2*ui*bits for name, bits in domains.items()}
+    clocks[line_cd] = 2
+    return clocks
+
+
+def derived_clocks(module, clocks):
+    """clocks completed with the local domains of module clocked by one of
+    them (cd.clk.eq(ClockSignal(...)), e.g. in Gearbox), that run_simulation
+    would not tick"""
+    module.finalize()
+    fragment = module._fragment
+    clocks = dict(clocks)
+    for cd in fragment.clock_domains:
+        for statement in fragment.comb:
+            if (isinstance(statement, _Assign) and statement.l is cd.clk
+                    and isinstance(statement.r, ClockSignal) and statement.r.cd in clocks):
+                clocks[cd.name] = clocks[statement.r.cd]
+    return clocks
+
+
+class _Primitive(Module):
+    def __init__(self, instance):
+        self.params = {}
+        self.ios = {}
+        for item in instance.items:
+            if isinstance(item, Instance.Parameter):
+                value = item.value
+                self.params[item.name] = value.value if isinstance(value, Constant) else value
+            else:
+                self.ios[item.name] = item.expr
+
+    def io(self, name, width=1):
+        # unconnected ios are replaced by internal signals
+        return self.ios.get(name, Signal(width))
+
+    def clock_domain(self, name):
+        clk = self.ios[name]
+        if not isinstance(clk, ClockSignal):
+            raise ValueError("{} of {} must be a ClockSignal".format(name, self.__class__.__name__))
+        return clk.cd
+
+
+class _Toggle(Module):
+    # edges of the from_cd domain, seen from the to_cd domain
+    def __init__(self, from_cd, to_cd):
+        self.edge = Signal()
+
+        # # #
+
+        toggle = Signal()
+        toggle_r = Signal()
+        sync_from = getattr(self.sync, from_cd)
+        sync_from += toggle.eq(~toggle)
+        sync_to = getattr(self.sync, to_cd)
+        sync_to += toggle_r.eq(toggle)
+        self.comb += self.edge.eq(toggle != toggle_r)
+
+
+class IBUFDS(_Primitive):
+    def __init__(self, instance, line_cd):
+        _Primitive.__init__(self, instance)
+        self.comb += self.io("O").eq(self.io("I"))
+
+
+class IBUFDS_DIFF_OUT(_Primitive):
+    def __init__(self, instance, line_cd):
+        _Primitive.__init__(self, instance)
+        self.comb += [
+            self.io("O").eq(self.io("I")),
+            self.io("OB").eq(~self.io("I"))
+        ]
+
+
+class OBUFDS(_Primitive):
+    def __init__(self, instance, line_cd):
+        _Primitive.__init__(self, instance)
+        self.comb += [
+            self.io("O").eq(self.io("I")),
+            self.io("OB").eq(~self.io("I"))
+        ]
+
+
+class _DelayLine(Module):
+    def __init__(self, i, o, taps, line_cd, depth=32):
+        line = Signal(depth)
+        sync = getattr(self.sync, line_cd)
+        sync += line.eq(Cat(i, line[:-1]))
+        self.comb += o.eq((Cat(i, line) >> taps)[0])
+
+
+class IDELAYE2(_Primitive):
+    """IDELAYE2 (FIXED, VARIABLE and VAR_LOAD types)"""
+    def __init__(self, instance, line_cd):
+        _Primitive.__init__(self, instance)
+        delay_type = self.params.get("IDELAY_TYPE", "FIXED")
+        value = self.params.get("IDELAY_VALUE", 0)
+        i = self.io("DATAIN" if self.params.get("DELAY_SRC") == "DATAIN" else "IDATAIN")
+
+        taps = Signal(5, reset=value)
+        if delay_type != "FIXED":
+            sync = getattr(self.sync, self.clock_domain("C"))
+            sync += [
+                If(self.io("LD"),
+                    taps.eq(self.io("CNTVALUEIN", 5) if delay_type == "VAR_LOAD" else value)
+                ).Elif(self.io("CE"),
+                    If(self.io("INC"),
+                        taps.eq(taps + 1)
+                    ).Else(
+                        taps.eq(taps - 1)
+                    )
+                )
+            ]
+        self.comb += self.io("CNTVALUEOUT", 5).eq(taps)
+        self.submodules += _DelayLine(i, self.io("DATAOUT"), taps, line_cd)
+
+
+class ISERDESE2(_Primitive):
+    """ISERDESE2 (NETWORKING, up to 8 bits)
+
+    Q1 is the last received bit. Each BITSLIP shifts the word by one bit.
+    """
+    def __init__(self, instance, line_cd):
+        _Primitive.__init__(self, instance)
+        width = self.params["DATA_WIDTH"]
+        assert width <= 8
+        assert self.params.get("INTERFACE_TYPE", "MEMORY") == "NETWORKING"
+        i = self.io("DDLY" if self.params.get("IOBDELAY", "NONE") in ["IFD", "BOTH"] else "D")
+        sync_clk = getattr(self.sync, self.clock_domain("CLK"))
+        sync_clkdiv = getattr(self.sync, self.clock_domain("CLKDIV"))
+        rst = self.io("RST")
+
+        # last 2*width bits, last received in the MSB
+        shift = Signal(2*width)
+        sync_clk += [
+            If(rst,
+                shift.eq(0)
+            ).Elif(self.io("CE1") if "CE1" in self.ios else 1,
+                shift.eq(Cat(shift[1:], i))
+            )
+        ]
+
+        slip = Signal(max=width)
+        q = Signal(width)
+        sync_clkdiv += [
+            If(rst,
+                slip.eq(0),
+                q.eq(0)
+            ).Else(
+                If(self.io("BITSLIP"),
+                    If(slip == width - 1,
+                        slip.eq(0)
+                    ).Else(
+                        slip.eq(slip + 1)
+                    )
+                ),
+                q.eq(shift >> (width - slip))
+            )
+        ]
+        self.comb += [self.io("Q" + str(width - n)).eq(q[n]) for n in range(width)]
+
+
+class OSERDESE2(_Primitive):
+    """OSERDESE2 (up to 8 bits, 10 and 14 bits with a SLAVE)
+
+    D1 is sent first. The SLAVE passes its D3-D8 to the MASTER through
+    SHIFTOUT1/2 (and does not serialize them itself).
+    """
+    def __init__(self, instance, line_cd):
+        _Primitive.__init__(self, instance)
+        width = self.params["DATA_WIDTH"]
+        if self.params.get("SERDES_MODE", "MASTER") == "SLAVE":
+            self.comb += [
+                self.io("SHIFTOUT1").eq(self.io("D3")),
+                self.io("SHIFTOUT2").eq(self.io("D4"))
+            ]
+            return
+
+        d = [self.io("D" + str(n)) for n in range(1, 9)] + [self.io("SHIFTIN1"), self.io("SHIFTIN2")]
+        assert width <= len(d)
+        clk_cd, clkdiv_cd = self.clock_domain("CLK"), self.clock_domain("CLKDIV")
+        sync_clk = getattr(self.sync, clk_cd)
+        rst = self.io("RST")
+
+        word = Signal(width)
+        sync_clkdiv = getattr(self.sync, clkdiv_cd)
+        sync_clkdiv += word.eq(Cat(*d[:width]))
+
+        # loaded on the first CLK edge after each CLKDIV edge
+        self.submodules.clkdiv = clkdiv = _Toggle(clkdiv_cd, clk_cd)
+        shift = Signal(width)
+        sync_clk += [
+            If(rst,
+                shift.eq(0)
+            ).Elif(self.io("OCE") if "OCE" in self.ios else 1,
+                If(clkdiv.edge,
+                    shift.eq(word)
+                ).Else(
+                    shift.eq(shift[1:])
+                )
+            )
+        ]
+        self.comb += self.io("OQ").eq(shift[0])
+
+
+class IODELAY2(_Primitive):
+    """IODELAY2 (IDATAIN to DATAOUT)
+
+    CAL measures the bit period (IOCLK0) in taps. RST loads half of it in a
+    MASTER in DIFF_PHASE_DETECTOR mode and 0 otherwise. BUSY is set for 4
+    CLK cycles after CAL, RST and CE.
+    """
+    def __init__(self, instance, line_cd):
+        _Primitive.__init__(self, instance)
+        delay_type = self.params.get("IDELAY_TYPE", "DEFAULT")
+        master = self.params.get("SERDES_MODE", "NONE") != "SLAVE"
+        wraparound = self.params.get("COUNTER_WRAPAROUND", "WRAPAROUND") == "WRAPAROUND"
+        value = self.params.get("IDELAY_VALUE", 0)
+        sync = getattr(self.sync, self.clock_domain("CLK"))
+
+        # bit period, in taps
+        self.submodules.ioclk = ioclk = _Toggle(self.clock_domain("IOCLK0"), line_cd)
+        count = Signal(8)
+        period = Signal(8)
+        sync_line = getattr(self.sync, line_cd)
+        sync_line += [
+            If(ioclk.edge,
+                count.eq(1),
+                period.eq(count)
+            ).Else(
+                count.eq(count + 1)
+            )
+        ]
+
+        cal = Signal(8)
+        taps = Signal(8, reset=value)
+        busy = Signal(max=5)
+        sync += [
+            If(busy != 0,
+                busy.eq(busy - 1)
+            ).Elif(self.io("CAL"),
+                cal.eq(period),
+                busy.eq(4)
+            ).Elif(self.io("RST"),
+                taps.eq(cal[1:] if master and delay_type == "DIFF_PHASE_DETECTOR" else 0),
+                busy.eq(4)
+            ).Elif(self.io("CE"),
+                If(self.io("INC"),
+                    If(taps != 255,
+                        taps.eq(taps + 1)
+                    ).Elif(wraparound,
+                        taps.eq(0)
+                    )
+                ).Else(
+                    If(taps != 0,
+                        taps.eq(taps - 1)
+                    ).Elif(wraparound,
+                        taps.eq(255)
+                    )
+                ),
+                busy.eq(4)
+            )
+        ]
+        self.comb += self.io("BUSY").eq(busy != 0)
+        self.submodules += _DelayLine(self.io("IDATAIN"), self.io("DATAOUT"), taps, line_cd, 256)
+
+
+class ISERDES2(_Primitive):
+    """ISERDES2 (SDR, RETIMED, up to 4 bits, 5 to 8 bits with a SLAVE)
+
+    Q4 is the last received bit. The MASTER shifts its oldest bit to the
+    SLAVE through SHIFTOUT; both present their bits on IOCE. The phase
+    detector is not modelled.
+    """
+    def __init__(self, instance, line_cd):
+        _Primitive.__init__(self, instance)
+        assert self.params.get("DATA_RATE", "SDR") == "SDR"
+        assert self.params.get("BITSLIP_ENABLE", "FALSE") == "FALSE"
+        master = self.params.get("SERDES_MODE", "NONE") != "SLAVE"
+        sync_clk = getattr(self.sync, self.clock_domain("CLK0"))
+        sync_clkdiv = getattr(self.sync, self.clock_domain("CLKDIV"))
+
+        shift = Signal(4)
+        q_io = Signal(4)
+        q = Signal(4)
+        sync_clk += [
+            shift.eq(Cat(shift[1:], self.io("D") if master else self.io("SHIFTIN"))),
+            If(self.io("IOCE"), q_io.eq(shift))
+        ]
+        sync_clkdiv += q.eq(q_io)
+        if master:
+            self.comb += self.io("SHIFTOUT").eq(shift[0])
+        self.comb += [
+            [self.io("Q" + str(n + 1)).eq(q[n]) for n in range(4)],
+            self.io("VALID").eq(0),
+            self.io("INCDEC").eq(0)
+        ]
+
+
+class OSERDES2(_Primitive):
+    """OSERDES2 (SDR, up to 4 bits, 5 to 8 bits with a SLAVE)
+
+    Words are loaded on IOCE. With a SLAVE, its D1-D4 are sent first (through
+    SHIFTOUT3/SHIFTIN3) then the D1-D4 of the MASTER.
+    """
+    def __init__(self, instance, line_cd):
+        _Primitive.__init__(self, instance)
+        assert self.params.get("DATA_RATE_OQ", "DDR") == "SDR"
+        width = self.params["DATA_WIDTH"]
+        master = self.params.get("SERDES_MODE", "NONE") != "SLAVE"
+        sync = getattr(self.sync, self.clock_domain("CLK0"))
+        ioce = self.io("IOCE")
+
+        d = Cat(*[self.io("D" + str(n)) for n in range(1, 5)])
+        if not master:
+            shift = Signal(4)
+            sync += If(ioce,
+                shift.eq(d)
+            ).Else(
+                shift.eq(shift[1:])
+            )
+            self.comb += self.io("SHIFTOUT3").eq(shift[0])
+            return
+
+        # the bits of the SLAVE then the ones of the MASTER
+        slave_bits = 4 if width > 4 else 0
+        word = Signal(4)
+        position = Signal(3)
+        bit = Signal()
+        self.comb += bit.eq(Array(word)[position[:2]])
+        sync += [
+            If(ioce, word.eq(d)),
+            If(ioce,
+                position.eq(0)
+            ).Else(
+                position.eq(position + 1)
+            ),
+            If(position < slave_bits,
+                self.io("OQ").eq(self.io("SHIFTIN3"))
+            ).Else(
+                self.io("OQ").eq(bit)
+            )
+        ]
+
+
+models = {cls.__name__: cls for cls in [
+    IBUFDS, IBUFDS_DIFF_OUT, OBUFDS,
+    IDELAYE2, ISERDESE2, OSERDESE2,
+    IODELAY2, ISERDES2, OSERDES2
+]}
+
+
+def primitive_overrides(line_cd="line"):
+    """special_overrides of run_simulation lowering the Instances of the
+    modelled primitives"""
+    class SimInstance:
+        @staticmethod
+        def lower(instance):
+            model = models.get(instance.of)
+            if model is None:
+                return None
+            return model(instance, line_cd)
+    return {Instance: SimInstance}
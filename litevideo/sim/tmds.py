@@ -0,0 +1,146 @@
+"""TMDS serial lines
+
+Stimulus and channel models of the serial TMDS lines, for the PHYs simulated
+with the models of litevideo.sim.primitives. The generators run in the line_cd
+domain, a bit lasting ui cycles:
+
+- TMDSLine drives a pad pair with TMDS characters (sent LSB first).
+- TMDSChannel connects an output pad to an input pad pair (loopback).
+
+Both can skew the line (constant delay, in line_cd cycles) and inject jitter
+(each transition being moved by a random number of cycles in [-jitter,
+jitter]). TMDSEncoder encodes the characters as the DVI specification does.
+"""
+
+import random
+from collections import deque
+
+from migen import *
+
+from litevideo.output.hdmi.encoder import control_tokens, terc4_tokens
+
+
+def _ones(v, n):
+    return sum((v >> i) & 1 for i in range(n))
+
+
+class TMDSEncoder:
+    """Reference TMDS encoder, keeping the running disparity"""
+    def __init__(self):
+        self.cnt = 0
+
+    def encode(self, d):
+        """Character of the 8-bit video/guard band data d"""
+        n1d = _ones(d, 8)
+        xnor = n1d > 4 or (n1d == 4 and not d & 1)
+        q_m = d & 1
+        for i in range(1, 8):
+            b = ((q_m >> (i - 1)) ^ (d >> i) ^ xnor) & 1
+            q_m |= b << i
+        if not xnor:
+            q_m |= 1 << 8
+        q_m8 = q_m >> 8
+        n1q_m = _ones(q_m, 8)
+        n0q_m = 8 - n1q_m
+
+        if self.cnt == 0 or n1q_m == n0q_m:
+            char = (q_m8 ^ 1) << 9 | q_m8 << 8 | (q_m if q_m8 else ~q_m) & 0xff
+            self.cnt += n1q_m - n0q_m if q_m8 else n0q_m - n1q_m
+        elif (self.cnt > 0 and n1q_m > n0q_m) or (self.cnt < 0 and n0q_m > n1q_m):
+            char = 1 << 9 | q_m8 << 8 | ~q_m & 0xff
+            self.cnt += 2*q_m8 + n0q_m - n1q_m
+        else:
+            char = q_m8 << 8 | q_m & 0xff
+            self.cnt += -2*(q_m8 ^ 1) + n1q_m - n0q_m
+        return char
+
+    def control(self, c):
+        """Control character of the 2-bit c (resets the disparity)"""
+        self.cnt = 0
+        return control_tokens[c]
+
+    def terc4(self, d):
+        """TERC4 character of the 4-bit d (data islands)"""
+        self.cnt = 0
+        return terc4_tokens[d]
+
+
+def tmds_characters():
+    """All the characters a TMDS encoder can produce (video data, control
+    and TERC4)"""
+    characters = set(control_tokens) | set(terc4_tokens)
+    for cnt in range(-8, 10, 2):
+        for d in range(256):
+            encoder = TMDSEncoder()
+            encoder.cnt = cnt
+            characters.add(encoder.encode(d))
+    return characters
+
+
+class _Transitions:
+    # delays the transitions of a line by skew cycles, plus jitter
+    def __init__(self, skew, jitter, seed):
+        assert 0 <= jitter <= skew
+        self.skew = skew
+        self.jitter = jitter
+        self.prng = random.Random(seed)
+        self.value = 0
+        self.output = 0
+        self.last = 0
+        self.pending = deque()
+
+    def step(self, now, value):
+        if value != self.value:
+            self.value = value
+            t = now + self.skew + self.prng.randint(-self.jitter, self.jitter)
+            # transitions are kept in order
+            t = max(t, self.last + 1)
+            self.pending.append((t, value))
+            self.last = t
+        while self.pending and self.pending[0][0] <= now:
+            self.output = self.pending.popleft()[1]
+        return self.output
+
+
+class TMDSLine:
+    """Sends characters (iterable of 10-bit characters) on the pad_p/pad_n
+    pair, ui line_cd cycles per bit"""
+    def __init__(self, pad_p, pad_n, characters, ui=8, skew=0, jitter=0, seed=42):
+        self.pad_p = pad_p
+        self.pad_n = pad_n
+        self.characters = characters
+        self.ui = ui
+        self.transitions = _Transitions(skew, jitter, seed)
+
+    @passive
+    def generator(self):
+        now = 0
+        for char in self.characters:
+            for i in range(10):
+                bit = (char >> i) & 1
+                for j in range(self.ui):
+                    v = self.transitions.step(now, bit)
+                    yield self.pad_p.eq(v)
+                    yield self.pad_n.eq(v ^ 1)
+                    yield
+                    now += 1
+
+
+class TMDSChannel:
+    """Copies the output pad o to the input pad pair i_p/i_n, skewed and with
+    jitter"""
+    def __init__(self, o, i_p, i_n, skew=0, jitter=0, seed=42):
+        self.o = o
+        self.i_p = i_p
+        self.i_n = i_n
+        self.transitions = _Transitions(skew, jitter, seed)
+
+    @passive
+    def generator(self):
+        now = 0
+        while True:
+            v = self.transitions.step(now, (yield self.o))
+            yield self.i_p.eq(v)
+            yield self.i_n.eq(v ^ 1)
+            yield
+            now += 1
@@ -0,0 +1,725 @@
+"""Verilator co-simulation
+
+Runs a module converted to Verilog under Verilator with the generators of
+run_simulation: yield signal.eq(value), (yield signal) and yield for one
+clock cycle of the domain of the generators. yield Cycles(n) lets the
+simulation run n cycles without going back to Python, so that full frames
+can be simulated in seconds.
+
+Per-cycle traffic (DRAM ports, pixel streams) is handled by C++ models
+(DRAMPort, StreamSource, StreamSink) whose buffers are in the memory shared
+with the simulation and accessed from Python as NumPy arrays.
+
+The generators can only access the top level ios of the converted module:
+the stream endpoints and CSRs found by default_ios, the ios given and the
+signals of the models.
+"""
+
+import os
+import re
+import mmap
+import time
+import hashlib
+import tempfile
+import subprocess
+
+import numpy as np
+
+from migen import *
+from migen.fhdl import verilog
+from migen.fhdl.structure import _Assign, _Slice, _Fragment
+from migen.fhdl.tools import list_clock_domains
+
+
+# shared memory header (64 bit words)
+_CMD, _ACK, _ARG, _OP, _CYCLE = range(5)
+_OP_STEP, _OP_QUIT = 1, 2
+_HEADER_WORDS = 8
+
+
+class Cycles:
+    """Generator request: waits n clock cycles"""
+    def __init__(self, n):
+        self.n = n
+
+
+def default_ios(module):
+    """Stream endpoints and CSR storages/statuses of module and of its
+    submodules, as top level ios"""
+    ios = set()
+    for name in ["sink", "source"]:
+        endpoint = getattr(module, name, None)
+        if isinstance(endpoint, Record):
+            ios |= set(endpoint.flatten())
+    if hasattr(module, "get_csrs"):
+        for csr in module.get_csrs():
+            for name in ["storage", "status", "r", "re"]:
+                if hasattr(csr, name):
+                    ios.add(getattr(csr, name))
+    return ios
+
+
+def _words(width):
+    return (width + 63)//64
+
+
+def _set(port, width, src):
+    # copies width bits from the uint32_t array src to a Verilator port
+    if width <= 32:
+        return "top->{} = {}[0];".format(port, src)
+    elif width <= 64:
+        return "top->{} = (uint64_t){s}[0] | ((uint64_t){s}[1] << 32);".format(port, s=src)
+    else:
+        return "for (int i = 0; i < {}; i++) top->{}[i] = {}[i];".format((width + 31)//32, port, src)
+
+def _get(port, width, dst):
+    # copies a Verilator port to the uint32_t array dst
+    if width <= 32:
+        return "{}[0] = top->{};".format(dst, port)
+    elif width <= 64:
+        return "{d}[0] = (uint32_t)top->{p}; {d}[1] = (uint32_t)((uint64_t)top->{p} >> 32);".format(d=dst, p=port)
+    else:
+        return "for (int i = 0; i < {}; i++) {}[i] = top->{}[i];".format((width + 31)//32, dst, port)
+
+
+class _Model:
+    """C++ model of the signals of a clock domain
+
+    words is the number of 64 bit words of shared memory of the model. The
+    C++ code (see cpp) samples the outputs before the rising edges of domain
+    and drives the inputs after them.
+    """
+    words = 0
+
+    def ios(self):
+        raise NotImplementedError
+
+    def inputs(self):
+        """Inputs driven by the model"""
+        raise NotImplementedError
+
+    def attach(self, shm, offset):
+        self.shm = shm[offset:offset + self.words]
+        self.offset = offset
+
+    def cpp(self, prefix, names, widths):
+        """Returns the declarations, init, sample and drive C++ code"""
+        raise NotImplementedError
+
+
+def _concat(fields, names, widths):
+    # C++ expression of the concatenation of fields, LSB first
+    terms, shift = [], 0
+    for field in fields:
+        terms.append("((uint64_t)top->{} << {})".format(names[field], shift))
+        shift += widths[names[field]]
+    assert shift <= 64
+    return " | ".join(terms)
+
+def _split(fields, names, widths, value):
+    # C++ statements setting fields from the concatenation value, LSB first
+    statements, shift = [], 0
+    for field in fields:
+        w = widths[names[field]]
+        statements.append("top->{} = ({} >> {}) & {}ull;".format(names[field], value, shift, 2**w-1))
+        shift += w
+    assert shift <= 64
+    return " ".join(statements)
+
+
+class StreamSource(_Model):
+    """Drives the fields names of endpoint (LSB first, 64 bits max) with the
+    words of data, one per valid/ready transfer, or one per cycle when
+    endpoint has no valid/ready (Record)."""
+    def __init__(self, endpoint, names, depth, domain="sys"):
+        self.fields = [getattr(endpoint, name) for name in names]
+        self.valid = getattr(endpoint, "valid", None)
+        self.ready = getattr(endpoint, "ready", None)
+        self.domain = domain
+        self.depth = depth
+        self.words = 2 + depth
+
+    def ios(self):
+        return set(self.fields) | {s for s in [self.valid, self.ready] if s is not None}
+
+    def inputs(self):
+        return set(self.fields) | ({self.valid} if self.valid is not None else set())
+
+    @property
+    def data(self):
+        return self.shm[2:]
+
+    def send(self, data):
+        """Sets the words to send (before or during the simulation)"""
+        data = np.asarray(data, np.uint64)
+        self.shm[2:2 + len(data)] = data
+        self.shm[1] = 0
+        self.shm[0] = len(data)
+
+    @property
+    def sent(self):
+        return int(self.shm[1])
+
+    def cpp(self, prefix, names, widths):
+        count, index = "shm[{}]".format(self.offset), "shm[{}]".format(self.offset + 1)
+        data = "shm[{} + {}]".format(self.offset + 2, index)
+        if self.valid is None:
+            sample = "if ({i} < {c}) {i}++;".format(i=index, c=count)
+            drive = "if ({i} < {c}) {{ uint64_t v = {d}; {s} }}".format(
+                i=index, c=count, d=data, s=_split(self.fields, names, widths, "v"))
+        else:
+            valid, ready = names[self.valid], names[self.ready]
+            sample = "if (top->{} && top->{}) {}++;".format(valid, ready, index)
+            drive = "top->{v} = {i} < {c}; if (top->{v}) {{ uint64_t v = {d}; {s} }}".format(
+                v=valid, i=index, c=count, d=data, s=_split(self.fields, names, widths, "v"))
+        return "", drive, sample, drive
+
+
+class StreamSink(_Model):
+    """Captures the fields names of endpoint (LSB first, 64 bits max) in data
+    on each valid/ready transfer (ready being set), or on each cycle when
+    endpoint has no valid/ready (Record), when qualifier (an output) is set"""
+    def __init__(self, endpoint, names, depth, qualifier=None, domain="sys"):
+        self.fields = [getattr(endpoint, name) for name in names]
+        self.valid = getattr(endpoint, "valid", None)
+        self.ready = getattr(endpoint, "ready", None)
+        self.qualifier = qualifier
+        self.domain = domain
+        self.depth = depth
+        self.words = 2 + depth
+
+    def ios(self):
+        return set(self.fields) | {s for s in [self.valid, self.ready, self.qualifier] if s is not None}
+
+    def inputs(self):
+        return {self.ready} if self.ready is not None else set()
+
+    @property
+    def data(self):
+        return self.shm[2:2 + int(self.shm[0])]
+
+    @property
+    def overflows(self):
+        return int(self.shm[1])
+
+    def clear(self):
+        self.shm[0] = 0
+        self.shm[1] = 0
+
+    def cpp(self, prefix, names, widths):
+        count, overflows = "shm[{}]".format(self.offset), "shm[{}]".format(self.offset + 1)
+        condition = ["1"]
+        if self.valid is not None:
+            condition += ["top->" + names[self.valid], "top->" + names[self.ready]]
+        if self.qualifier is not None:
+            condition.append("top->" + names[self.qualifier])
+        sample = ("if ({cond}) {{ if ({c} < {depth}) {{ shm[{o} + {c}] = {v}; {c}++; }} else {ov}++; }}"
+                  .format(cond=" && ".join(condition), c=count, depth=self.depth, o=self.offset + 2,
+                          v=_concat(self.fields, names, widths), ov=overflows))
+        init = "top->{} = 1;".format(names[self.ready]) if self.ready is not None else ""
+        return "", init, sample, ""
+
+
+class DRAMPort(_Model):
+    """LiteDRAM native port of size bytes of memory
+
+    Accepts up to depth outstanding commands and returns the read data latency
+    cycles after the commands, in order. Write data is taken in order of the
+    write commands, wdata.we being the byte enables.
+    """
+    def __init__(self, port, size, latency=8, depth=8):
+        self.port = port
+        self.domain = getattr(port, "cd", "sys")
+        self.size = size
+        self.latency = latency
+        self.depth = depth
+        self.words = (size + 7)//8
+
+    def ios(self):
+        return set(self.port.cmd.flatten()) | set(self.port.wdata.flatten()) | set(self.port.rdata.flatten())
+
+    def inputs(self):
+        p = self.port
+        return {p.cmd.ready, p.wdata.ready, p.rdata.valid, p.rdata.data}
+
+    @property
+    def mem(self):
+        """Memory as bytes (use .view to access it as words)"""
+        return self.shm.view(np.uint8)[:self.size]
+
+    def cpp(self, prefix, names, widths):
+        p = self.port
+        n = lambda s: names[s]
+        dw = p.dw
+        n32 = (dw + 31)//32
+        decl = """
+static std::deque<std::pair<uint64_t, uint64_t>> {p}rq; // address, ready cycle
+static std::deque<uint64_t> {p}wq;
+static uint64_t {p}cycle;
+static uint8_t *{p}mem;
+static uint32_t {p}buf[{n32}];
+static uint32_t {p}we[{nwe}];
+""".format(p=prefix, n32=n32, nwe=(dw//8 + 31)//32)
+        init = "{p}mem = (uint8_t *)&shm[{o}];".format(p=prefix, o=self.offset)
+        words = self.size//(dw//8)
+        sample = """
+if (top->{cv} && top->{cr}) {{
+    if (top->{cwe}) {p}wq.push_back(top->{ca} % {words});
+    else {p}rq.push_back(std::make_pair((uint64_t)(top->{ca} % {words}), {p}cycle + {latency}));
+}}
+if (top->{rv} && top->{rr}) {p}rq.pop_front();
+if (top->{wv} && top->{wr}) {{
+    uint8_t *dst = {p}mem + {p}wq.front()*{bytes};
+    {get_data}
+    {get_we}
+    for (int i = 0; i < {bytes}; i++)
+        if (({p}we[i/32] >> (i%32)) & 1) dst[i] = ((uint8_t *){p}buf)[i];
+    {p}wq.pop_front();
+}}
+{p}cycle++;
+""".format(p=prefix, cv=n(p.cmd.valid), cr=n(p.cmd.ready), cwe=n(p.cmd.we), ca=n(p.cmd.adr),
+           rv=n(p.rdata.valid), rr=n(p.rdata.ready), wv=n(p.wdata.valid), wr=n(p.wdata.ready),
+           words=words, latency=self.latency, bytes=dw//8,
+           get_data=_get(n(p.wdata.data), dw, prefix + "buf"),
+           get_we=_get(n(p.wdata.we), dw//8, prefix + "we"))
+        drive = """
+top->{cr} = {p}rq.size() + {p}wq.size() < {depth};
+top->{wr} = !{p}wq.empty();
+top->{rv} = !{p}rq.empty() && {p}rq.front().second <= {p}cycle;
+if (top->{rv}) {{
+    memcpy({p}buf, {p}mem + {p}rq.front().first*{bytes}, {bytes});
+    {set_data}
+}}
+""".format(p=prefix, cr=n(p.cmd.ready), wr=n(p.wdata.ready), rv=n(p.rdata.valid),
+           depth=self.depth, bytes=dw//8, set_data=_set(n(p.rdata.data), dw, prefix + "buf"))
+        return decl, init + drive, sample, drive
+
+
+_cpp_template = """// Machine-generated by litevideo.sim.verilator
+#include <cstdint>
+#include <cstdio>
+#include <cstdlib>
+#include <cstring>
+#include <deque>
+#include <utility>
+#include <fcntl.h>
+#include <sched.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
+
+#include "verilated.h"
+#include "Vtop.h"
+#if VM_TRACE
+#include "verilated_vcd_c.h"
+#endif
+
+static volatile uint64_t *shm;
+static Vtop *top;
+#if VM_TRACE
+static VerilatedVcdC *tfp;
+#endif
+static uint64_t sim_time;
+
+struct Clock {{ uint64_t half; uint64_t next; bool level; }};
+static Clock clocks[{n_clocks}] = {{ {clocks} }};
+
+{decls}
+
+static void apply_inputs() {{
+    uint32_t *shm32 = (uint32_t *)shm;
+{apply_inputs}
+}}
+
+static void publish_outputs() {{
+    uint32_t *shm32 = (uint32_t *)shm;
+{publish_outputs}
+}}
+
+// advances to the next clock edge(s), returns 1 on rising edges of the
+// domain of the generators
+static int tick() {{
+    uint64_t t = clocks[0].next;
+    for (int i = 1; i < {n_clocks}; i++)
+        if (clocks[i].next < t) t = clocks[i].next;
+    bool rise[{n_clocks}];
+    for (int i = 0; i < {n_clocks}; i++) {{
+        rise[i] = false;
+        if (clocks[i].next == t) {{
+            clocks[i].level = !clocks[i].level;
+            clocks[i].next += clocks[i].half;
+            rise[i] = clocks[i].level;
+        }}
+    }}
+    sim_time = t;
+{sample}
+{set_clocks}
+    top->eval();
+{drive}
+    return rise[{gen_clock}];
+}}
+
+int main(int argc, char **argv) {{
+    Verilated::commandArgs(argc, argv);
+    int fd = open(argv[1], O_RDWR);
+    struct stat st;
+    fstat(fd, &st);
+    shm = (volatile uint64_t *)mmap(NULL, st.st_size, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+    if (shm == MAP_FAILED) {{
+        perror("mmap");
+        return 1;
+    }}
+    top = new Vtop;
+#if VM_TRACE
+    Verilated::traceEverOn(true);
+    tfp = new VerilatedVcdC;
+    top->trace(tfp, 99);
+    tfp->open("sim.vcd");
+#endif
+{set_clocks}
+    apply_inputs();
+{init}
+    top->eval();
+    publish_outputs();
+    uint64_t cmd = 0;
+    __atomic_store_n(&shm[{ACK}], 0, __ATOMIC_RELEASE);
+    while (true) {{
+        int spins = 0;
+        while (__atomic_load_n(&shm[{CMD}], __ATOMIC_ACQUIRE) == cmd)
+            if (++spins > 1024) {{
+                sched_yield();
+                spins = 0;
+            }}
+        cmd = shm[{CMD}];
+        if (shm[{OP}] == {OP_QUIT})
+            break;
+        uint64_t n = shm[{ARG}];
+        bool applied = false;
+        while (n) {{
+            if (tick()) {{
+                if (!applied) {{
+                    apply_inputs();
+                    applied = true;
+                }}
+                n--;
+                shm[{CYCLE}]++;
+            }}
+            top->eval();
+#if VM_TRACE
+            tfp->dump(sim_time);
+#endif
+        }}
+        publish_outputs();
+        __atomic_store_n(&shm[{ACK}], cmd, __ATOMIC_RELEASE);
+    }}
+    top->final();
+#if VM_TRACE
+    tfp->close();
+#endif
+    delete top;
+    return 0;
+}}
+"""
+
+
+def _signal_of(target):
+    return target.value if isinstance(target, _Slice) else target
+
+
+def _parse_ports(src):
+    # port directions and widths from the module header of the Verilog
+    ports = {}
+    header = src[:src.index(");")]
+    for m in re.finditer(r"^\s*(input|output)\s+(?:reg\s+)?(?:signed\s+)?(?:\[(\d+):0\]\s+)?(\w+),?\s*$",
+                         header, re.M):
+        direction, msb, name = m.groups()
+        ports[name] = (direction, int(msb) + 1 if msb is not None else 1)
+    return ports
+
+
+class VerilatorSim:
+    """Verilator simulation of dut
+
+    clocks gives the period of the clock domains (ns), the generators running
+    in domain. The model buffers can be accessed once the VerilatorSim is
+    built, before and after run.
+    """
+    def __init__(self, dut, clocks={"sys": 10}, models=[], ios=None, domain="sys",
+                 build_dir="build_verilator", trace=False, verilator="verilator"):
+        assert domain in clocks
+        self.models = models
+        self.domain = domain
+
+        fragment = dut if isinstance(dut, _Fragment) else dut.get_fragment()
+        if ios is None:
+            ios = set()
+        ios = set(ios) | (set() if isinstance(dut, _Fragment) else default_ios(dut))
+        for model in models:
+            ios |= model.ios()
+
+        # clock domains, created in the fragment to control their names
+        for name in sorted(set(list_clock_domains(fragment)) | set(clocks)):
+            try:
+                cd = fragment.clock_domains[name]
+            except KeyError:
+                cd = ClockDomain(name)
+                fragment.clock_domains.append(cd)
+            ios |= {cd.clk, cd.rst}
+        for name in list_clock_domains(fragment):
+            assert name in clocks, "No clock given for the {} domain".format(name)
+
+        conv = verilog.convert(fragment, ios, name="top", create_clock_domains=False)
+        ports = _parse_ports(conv.main_source)
+        name = lambda s: conv.ns.get_name(s)
+        names = {s: name(s) for s in ios if name(s) in ports}
+        widths = {n: w for n, (d, w) in ports.items()}
+        clk_names = [name(fragment.clock_domains[cd].clk) for cd in sorted(clocks)]
+
+        # shared memory layout
+        model_inputs = set()
+        for model in models:
+            model_inputs |= model.inputs()
+        self.inputs = {}
+        self.outputs = {}
+        offset = _HEADER_WORDS
+        for s in sorted(ios, key=lambda s: s.duid):
+            if s not in names or names[s] in clk_names:
+                continue
+            direction, width = ports[names[s]]
+            if direction == "input" and s in model_inputs:
+                continue
+            table = self.inputs if direction == "input" else self.outputs
+            table[s] = offset
+            offset += _words(width)
+        model_offsets = []
+        for model in models:
+            model_offsets.append(offset)
+            offset += model.words
+
+        # C++
+        def copy(table, f):
+            lines = []
+            for s, o in sorted(table.items(), key=lambda i: i[1]):
+                lines.append("    " + f(names[s], widths[names[s]], "(shm32 + {})".format(2*o)))
+            return "\n".join(lines)
+        domains = sorted(clocks)
+        decls, init, sample, drive = [], [], [], []
+        for i, (model, o) in enumerate(zip(models, model_offsets)):
+            model.offset = o
+            d, n, s, r = model.cpp("m{}_".format(i), names, widths)
+            k = domains.index(model.domain)
+            decls.append(d)
+            init.append(n)
+            sample.append("    if (rise[{}]) {{ {} }}".format(k, s))
+            drive.append("    if (rise[{}]) {{ {} }}".format(k, r))
+        half = lambda cd: int(clocks[cd]*1000)//2
+        cpp = _cpp_template.format(
+            n_clocks=len(domains),
+            clocks=", ".join("{{{}, {}, false}}".format(half(cd), half(cd)) for cd in domains),
+            decls="\n".join(decls),
+            apply_inputs=copy(self.inputs, _set),
+            publish_outputs=copy(self.outputs, _get),
+            sample="\n".join(sample),
+            set_clocks="\n".join("    top->{} = clocks[{}].level;".format(clk, i)
+                                 for i, clk in enumerate(clk_names)),
+            drive="\n".join(drive),
+            init="\n".join("    " + i for i in init),
+            gen_clock=domains.index(domain),
+            CMD=_CMD, ACK=_ACK, ARG=_ARG, OP=_OP, OP_QUIT=_OP_QUIT, CYCLE=_CYCLE)
+
+        self.binary = self._build(build_dir, conv, cpp, trace, verilator)
+        self.build_dir = build_dir
+
+        # shared memory, zeroed
+        shm_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+        self.shm_file = tempfile.NamedTemporaryFile(prefix="litevideo_", dir=shm_dir)
+        self.shm_file.truncate(8*offset)
+        self.mmap = mmap.mmap(self.shm_file.fileno(), 8*offset)
+        self.shm = np.frombuffer(self.mmap, np.uint64)
+        for model, o in zip(models, model_offsets):
+            model.attach(self.shm, o)
+
+        # inputs start at their reset values
+        self.values = {}
+        for s in self.inputs:
+            self._store(s, s.reset.value)
+
+    def _build(self, build_dir, conv, cpp, trace, verilator):
+        os.makedirs(build_dir, exist_ok=True)
+        files = dict(conv.data_files)
+        files["top.v"] = conv.main_source
+        files["sim.cpp"] = cpp
+        digest = hashlib.sha1(repr(sorted(files.items())).encode() + bytes([trace])).hexdigest()
+        binary = os.path.join(build_dir, "obj_dir", "Vtop")
+        digest_file = os.path.join(build_dir, "digest")
+        if os.path.exists(binary) and os.path.exists(digest_file):
+            with open(digest_file) as f:
+                if f.read() == digest:
+                    return binary
+        for filename, content in files.items():
+            with open(os.path.join(build_dir, filename), "w") as f:
+                f.write(content)
+        cmd = [verilator, "--cc", "top.v", "--exe", "sim.cpp", "--top-module", "top",
+               "-Mdir", "obj_dir", "-O3", "--x-assign", "fast", "--x-initial", "fast",
+               "-Wno-fatal", "-Wno-lint", "-Wno-style", "-Wno-INITIALDLY",
+               "-Wno-COMBDLY", "-CFLAGS", "-O2"]
+        if trace:
+            cmd.append("--trace")
+        subprocess.check_call(cmd, cwd=build_dir)
+        subprocess.check_call(["make", "-s", "-j", str(os.cpu_count() or 1), "-C", "obj_dir",
+                               "-f", "Vtop.mk", "Vtop"], cwd=build_dir)
+        with open(digest_file, "w") as f:
+            f.write(digest)
+        return binary
+
+    # signal values
+    def _store(self, signal, value):
+        o = self.inputs[signal]
+        value &= 2**len(signal)-1
+        self.values[signal] = value
+        for i in range(_words(len(signal))):
+            self.shm[o + i] = (value >> 64*i) & (2**64-1)
+
+    def _load(self, signal):
+        if signal in self.inputs:
+            value = self.values[signal]
+        elif signal in self.outputs:
+            o = self.outputs[signal]
+            value = 0
+            for i in range(_words(len(signal))):
+                value |= int(self.shm[o + i]) << 64*i
+        else:
+            raise KeyError("{} is not a top level io of the simulation".format(signal))
+        if signal.signed and value & 2**(len(signal)-1):
+            value -= 2**len(signal)
+        return value
+
+    def _eval(self, expr):
+        if isinstance(expr, int):
+            return expr
+        elif isinstance(expr, Constant):
+            return expr.value
+        elif isinstance(expr, Signal):
+            return self._load(expr)
+        elif isinstance(expr, _Slice):
+            return (self._eval(expr.value) >> expr.start) & (2**(expr.stop - expr.start)-1)
+        raise NotImplementedError("Unsupported expression: {}".format(expr))
+
+    def _assign(self, statement, pending):
+        target, value = statement.l, self._eval(statement.r)
+        if _signal_of(target) not in self.inputs:
+            raise KeyError("{} is not an input of the simulation".format(_signal_of(target)))
+        if isinstance(target, _Slice) and isinstance(target.value, Signal):
+            signal = target.value
+            mask = (2**(target.stop - target.start)-1) << target.start
+            old = pending.get(signal, self.values.get(signal, 0))
+            pending[signal] = (old & ~mask) | ((value << target.start) & mask)
+        elif isinstance(target, Signal):
+            pending[target] = value
+        else:
+            raise NotImplementedError("Unsupported assignment target: {}".format(target))
+
+    def _request(self, request, pending):
+        if isinstance(request, _Assign):
+            self._assign(request, pending)
+        elif isinstance(request, (list, tuple)):
+            for r in request:
+                self._request(r, pending)
+        else:
+            return self._eval(request)
+
+    # simulation control
+    def _command(self, op, arg=0):
+        self.seq += 1
+        self.shm[_ARG] = arg
+        self.shm[_OP] = op
+        self.shm[_CMD] = self.seq
+        if op == _OP_QUIT:
+            return
+        self._wait(self.seq)
+
+    def _wait(self, seq):
+        spins = 0
+        while self.shm[_ACK] != seq:
+            spins += 1
+            if spins % 100000 == 0:
+                if self.process.poll() is not None:
+                    raise RuntimeError("Verilator simulation exited ({})".format(self.process.returncode))
+                time.sleep(0)
+
+    @property
+    def cycle(self):
+        """Cycles of the domain of the generators since the start"""
+        return int(self.shm[_CYCLE])
+
+    def run(self, generators):
+        """Runs generators (a generator, a list of generators or a dict with
+        the domain of the simulation as key) until all are exhausted or
+        passive"""
+        if isinstance(generators, dict):
+            assert set(generators) == {self.domain}, "Generators can only run in the {} domain".format(self.domain)
+            generators = generators[self.domain]
+        if not isinstance(generators, list):
+            generators = [generators]
+
+        self.shm[_ACK] = 2**64-1
+        self.seq = 0
+        self.process = subprocess.Popen([os.path.abspath(self.binary), self.shm_file.name],
+                                        cwd=self.build_dir)
+        try:
+            self._wait(0)
+            waits = {g: 0 for g in generators}
+            passive = set()
+            while set(waits) - passive:
+                pending = {}
+                for generator in list(waits):
+                    if waits[generator]:
+                        continue
+                    reply = None
+                    while True:
+                        try:
+                            request = generator.send(reply)
+                        except StopIteration:
+                            del waits[generator]
+                            passive.discard(generator)
+                            break
+                        reply = None
+                        if request is None:
+                            waits[generator] = 1
+                            break
+                        elif isinstance(request, Cycles):
+                            waits[generator] = request.n
+                            break
+                        elif isinstance(request, str):
+                            if request == "passive":
+                                passive.add(generator)
+                            elif request == "active":
+                                passive.discard(generator)
+                            else:
+                                raise ValueError("Unknown simulator command: '{}'".format(request))
+                        else:
+                            reply = self._request(request, pending)
+                for signal, value in pending.items():
+                    self._store(signal, value)
+                if not set(waits) - passive:
+                    break
+                n = min(waits.values())
+                self._command(_OP_STEP, n)
+                for generator in waits:
+                    waits[generator] -= n
+        finally:
+            self._command(_OP_QUIT)
+            self.process.wait()
+
+    def close(self):
+        # the mapping stays valid for the model buffers until they are freed
+        self.shm_file.close()
+
+
+def run_verilator(dut, generators, clocks={"sys": 10}, models=[], **kwargs):
+    """run_simulation under Verilator (see VerilatorSim)"""
+    sim = VerilatorSim(dut, clocks, models, **kwargs)
+    try:
+        sim.run(generators)
+    finally:
+        sim.close()